@@ -0,0 +1,480 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+平衡回歸測試 (Balance Regression)
+比較兩份資料（例如 git HEAD 與工作目錄）中每個關卡的戰鬥結果：勝率、回合數與傷害。
+
+1. 引用索引：關卡 -> 波次中的敵人 -> 敵人技能；測試隊伍的卡片 -> 隊長技能 / 主動技能。
+   每個關卡的快取鍵 = 傳遞依賴中每筆記錄的內容雜湊 + 模擬參數 + 模擬器原始碼雜湊，
+   兩份資料的鍵相同的關卡結果必然相同，不需要重跑。
+2. 依賴有變動的關卡：兩份資料各跑同一批有種子的模擬戰鬥（第 i 場的亂數種子只取決於 seed / 關卡 / i），
+   以 multiprocessing.Pool 平行執行；結果以快取鍵存在 .gm_cache/balance_regression，之後不再重算。
+3. 同一個種子的戰鬥在兩份資料中配對比較：勝率用 McNemar 檢定，回合數與傷害用配對 t 檢定（常態近似），
+   p < alpha 的變化視為顯著。
+
+模擬戰鬥使用 BattleReplay.Battle：每回合隨機斬擊（元素均勻分布、間隔隨機），
+有 SP 的隊員全部攻擊第一個存活的敵人，主動技能 CD 歸零即施放，全隊 SP 用完時休息。
+
+用法:
+    python BalanceRegression.py ../data                        # 與 git HEAD 的 data 比較
+    python BalanceRegression.py ../data --base /tmp/old_data   # 與另一個資料夾比較
+    python BalanceRegression.py ../data --base git:HEAD~3 --battles 500 --stage STAGE_001 --out report.json
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import multiprocessing
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+
+from BattleReplay import ACTION_ATTACK, ACTION_REST, ACTION_SKILL, Action, ReplaySimulator, Swipe, Turn
+from DataSchema import FILE_PATHS, build_indexes
+from SkillCompiler import ELEMENTS
+from SnapshotCache import CACHE_DIR_NAME
+
+RESULT_VERSION = 1
+CACHE_SUBDIR = "balance_regression"
+DATA_KEYS = ["cards", "enemies", "stages", "active_skills", "leader_skills", "enemy_skills"]
+ENGINE_SOURCES = ["BattleReplay.py", "DamageStacking.py", "SkillCompiler.py", "LeaderMultiplierTable.py",
+                  "BalanceRegression.py"]
+
+DEFAULT_TEAM = ["001", "002", "003", "004", "005"]
+DEFAULT_BATTLES = 200
+DEFAULT_SEED = 42
+DEFAULT_MAX_TURNS = 50
+DEFAULT_ALPHA = 0.01
+SWIPES_PER_TURN = (3, 12)
+SWIPE_INTERVAL_MS = (150, 900)
+
+
+# ========== 引用索引 ==========
+
+def load_dataset(data_dir):
+    """讀取模擬需要的資料檔（不存在的檔案為 None）"""
+    dataset = {}
+    for key in DATA_KEYS:
+        path = os.path.join(data_dir, FILE_PATHS[key])
+        dataset[key] = None
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                dataset[key] = json.load(f)
+    return dataset
+
+
+def direct_references(data_key, record, indexes):
+    """一筆記錄直接引用的其他記錄：[(data_key, record_id)]"""
+    refs = []
+    if data_key == "stages":
+        for wave in record.get("waves", []):
+            for group in wave.get("enemies", []):
+                refs.append(("enemies", group.get("enemy_id")))
+    elif data_key == "enemies":
+        for skill_id in (record.get("passive_skill_ids") or []) + (record.get("attack_skill_ids") or []):
+            if skill_id in indexes.get("enemy_skills", {}):
+                refs.append(("enemy_skills", skill_id))
+    elif data_key == "cards":
+        for skill_id in record.get("leader_skill_ids") or []:
+            refs.append(("leader_skills", skill_id))
+        if record.get("active_skill_id"):
+            refs.append(("active_skills", record["active_skill_id"]))
+    return refs
+
+
+class ReferenceIndex:
+    """記錄之間的引用關係與內容雜湊"""
+
+    def __init__(self, dataset):
+        self.indexes = build_indexes(dataset, DATA_KEYS)
+        self._hashes = {}
+        self._closure = {}
+
+    def record_hash(self, data_key, record_id):
+        key = (data_key, record_id)
+        if key not in self._hashes:
+            record = self.indexes.get(data_key, {}).get(record_id)
+            text = "-" if record is None else json.dumps(record, sort_keys=True, ensure_ascii=False)
+            self._hashes[key] = hashlib.sha1(text.encode("utf-8")).hexdigest()
+        return self._hashes[key]
+
+    def closure(self, data_key, record_id):
+        """傳遞依賴（包含自己）"""
+        key = (data_key, record_id)
+        if key in self._closure:
+            return self._closure[key]
+        seen, pending = {key}, [key]
+        while pending:
+            current = pending.pop()
+            record = self.indexes.get(current[0], {}).get(current[1])
+            if record is None:
+                continue
+            for ref in direct_references(current[0], record, self.indexes):
+                if ref not in seen:
+                    seen.add(ref)
+                    pending.append(ref)
+        self._closure[key] = frozenset(seen)
+        return self._closure[key]
+
+    def stage_dependencies(self, stage_id, team):
+        deps = set(self.closure("stages", stage_id))
+        for card_id in team:
+            deps |= self.closure("cards", card_id)
+        return deps
+
+    def stage_key(self, stage_id, options):
+        """關卡結果的快取鍵"""
+        digest = hashlib.sha1()
+        digest.update(json.dumps(options, sort_keys=True).encode("utf-8"))
+        for data_key, record_id in sorted(self.stage_dependencies(stage_id, options["team"]), key=str):
+            digest.update(f"{data_key}/{record_id}={self.record_hash(data_key, record_id)}\n".encode("utf-8"))
+        return digest.hexdigest()
+
+
+def engine_hash():
+    """模擬器原始碼的雜湊（程式修改後舊快取自動失效）"""
+    digest = hashlib.sha1(str(RESULT_VERSION).encode("utf-8"))
+    here = os.path.dirname(os.path.abspath(__file__))
+    for name in ENGINE_SOURCES:
+        with open(os.path.join(here, name), 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+# ========== 模擬戰鬥 ==========
+
+def _policy_turn(rng, battle, sp, cooldowns, skill_costs):
+    """產生一個回合：隨機斬擊 + 施放就緒的主動技能 + 有 SP 的隊員攻擊（全隊沒有 SP 時休息）"""
+    swipes, time_ms = [], 0
+    for _ in range(rng.randint(*SWIPES_PER_TURN)):
+        swipes.append(Swipe(time_ms, rng.randrange(len(ELEMENTS))))
+        time_ms += rng.randint(*SWIPE_INTERVAL_MS)
+    actions = [Action(ACTION_SKILL, index) for index, cd in enumerate(cooldowns) if cd == 0]
+    for action in actions:
+        cooldowns[action.card_index] = skill_costs[action.card_index]
+    alive = battle.alive
+    target = alive[0] if alive else 0
+    attackers = [index for index, points in enumerate(sp) if points > 0]
+    for index in attackers:
+        sp[index] -= 1
+        actions.append(Action(ACTION_ATTACK, index, target))
+    if not attackers:
+        actions.append(Action(ACTION_REST))
+    return Turn(swipes, actions)
+
+
+def simulate_battle(simulator, stage_id, team, level, rng, max_turns):
+    """一場模擬戰鬥：回傳 [勝利(0/1), 回合數, 造成傷害, 承受傷害]"""
+    members = [(card_id, level) for card_id in team]
+    battle = simulator.battle(stage_id, members)
+    cards = battle.team
+    skill_costs = [simulator.skill_cost(card) for card in cards]
+    cooldowns = list(skill_costs)   # CardData.reset_for_battle：戰鬥開始時 CD 為最大值；None = 沒有主動技能
+    sp = [int(card.get("initial_sp", 1)) for card in cards]
+    max_sp = [int(card.get("max_sp", 3)) for card in cards]
+    turns = dealt = taken = 0
+    while not battle.finished and turns < max_turns:
+        wave = battle.wave_index
+        turn = _policy_turn(rng, battle, sp, cooldowns, skill_costs)
+        row = battle.play(turn, retarget=True)
+        turns += 1
+        dealt += row["total"]
+        taken += row["incoming"]
+        # 休息與波次切換各恢復 1 SP；主動技能 CD 每回合結束減 1
+        recovered = turn.actions[-1].kind == ACTION_REST or battle.wave_index != wave
+        for index in range(len(cards)):
+            if recovered:
+                sp[index] = min(sp[index] + 1, max_sp[index])
+            if cooldowns[index]:
+                cooldowns[index] -= 1
+    return [1 if battle.cleared else 0, turns, dealt, taken]
+
+
+_simulators = {}
+
+
+def _simulate_stage(task):
+    """worker：(data_dir, stage_id, key, options) -> (key, 每場結果列表)"""
+    data_dir, stage_id, key, options = task
+    if data_dir not in _simulators:
+        _simulators[data_dir] = ReplaySimulator(data_dir)
+    simulator = _simulators[data_dir]
+    battles = []
+    for index in range(options["battles"]):
+        rng = random.Random(f"{options['seed']}:{stage_id}:{index}")
+        battles.append(simulate_battle(simulator, stage_id, options["team"], options["level"], rng,
+                                       options["max_turns"]))
+    return key, battles
+
+
+# ========== 統計 ==========
+
+def _p_value(z):
+    """雙尾常態 p 值"""
+    return math.erfc(abs(z) / math.sqrt(2.0))
+
+
+def mcnemar(base, head):
+    """配對勝負的 McNemar 檢定（連續性校正）：回傳 (只有 base 贏, 只有 head 贏, p)"""
+    only_base = sum(1 for b, h in zip(base, head) if b and not h)
+    only_head = sum(1 for b, h in zip(base, head) if h and not b)
+    if only_base + only_head == 0:
+        return only_base, only_head, 1.0
+    z = (abs(only_head - only_base) - 1) / math.sqrt(only_base + only_head)
+    return only_base, only_head, _p_value(max(z, 0.0))
+
+
+def paired_test(base, head):
+    """配對差值的 t 檢定（常態近似）：回傳 (平均差, p)"""
+    diffs = [h - b for b, h in zip(base, head)]
+    n = len(diffs)
+    if n == 0:
+        return 0.0, 1.0
+    mean = sum(diffs) / n
+    if n < 2:
+        return mean, 1.0
+    variance = sum((d - mean) ** 2 for d in diffs) / (n - 1)
+    if variance == 0:
+        return mean, 1.0 if mean == 0 else 0.0
+    return mean, _p_value(mean / math.sqrt(variance / n))
+
+
+def _mean(values):
+    return sum(values) / len(values) if values else 0.0
+
+
+def compare_stage(base, head, alpha):
+    """比較同一個關卡在兩份資料中的每場結果"""
+    base_wins, head_wins = [b[0] for b in base], [h[0] for h in head]
+    only_base, only_head, win_p = mcnemar(base_wins, head_wins)
+    # 回合數只比較兩邊都通關的戰鬥；傷害以每回合造成 / 承受計
+    both = [(b, h) for b, h in zip(base, head) if b[0] and h[0]]
+    turn_delta, turn_p = paired_test([b[1] for b, _ in both], [h[1] for _, h in both])
+    dealt_delta, dealt_p = paired_test([b[2] / max(b[1], 1) for b in base], [h[2] / max(h[1], 1) for h in head])
+    taken_delta, taken_p = paired_test([b[3] / max(b[1], 1) for b in base], [h[3] / max(h[1], 1) for h in head])
+    metrics = {
+        "win_rate": {"base": _mean(base_wins), "head": _mean(head_wins), "delta": _mean(head_wins) - _mean(base_wins),
+                     "p": win_p, "only_base": only_base, "only_head": only_head},
+        "turns": {"base": _mean([b[1] for b, _ in both]), "head": _mean([h[1] for _, h in both]),
+                  "delta": turn_delta, "p": turn_p, "pairs": len(both)},
+        "damage_dealt": {"base": _mean([b[2] / max(b[1], 1) for b in base]),
+                         "head": _mean([h[2] / max(h[1], 1) for h in head]), "delta": dealt_delta, "p": dealt_p},
+        "damage_taken": {"base": _mean([b[3] / max(b[1], 1) for b in base]),
+                         "head": _mean([h[3] / max(h[1], 1) for h in head]), "delta": taken_delta, "p": taken_p},
+    }
+    for metric in metrics.values():
+        metric["significant"] = metric["p"] < alpha
+    return metrics
+
+
+def direction(metrics):
+    """顯著變化的方向：easier / harder / mixed / None
+
+    方向只由勝率與回合數決定；每回合承受傷害會因戰鬥拉長而被稀釋，只作為參考（單獨顯著時為 shifted）
+    """
+    votes = set()
+    if metrics["win_rate"]["significant"]:
+        votes.add("easier" if metrics["win_rate"]["delta"] > 0 else "harder")
+    if metrics["turns"]["significant"]:
+        votes.add("easier" if metrics["turns"]["delta"] < 0 else "harder")
+    if not votes:
+        return "shifted" if any(m["significant"] for m in metrics.values()) else None
+    return votes.pop() if len(votes) == 1 else "mixed"
+
+
+# ========== 資料來源 ==========
+
+def export_revision(data_dir, revision, out_dir):
+    """把 data_dir 在 git revision 的資料檔匯出到 out_dir（檔案不存在於該版本時略過）"""
+    prefix = subprocess.run(["git", "-C", data_dir, "rev-parse", "--show-prefix"], capture_output=True,
+                            text=True, check=True).stdout.strip()
+    for key in DATA_KEYS:
+        rel_path = FILE_PATHS[key].replace(os.sep, "/")
+        shown = subprocess.run(["git", "-C", data_dir, "show", f"{revision}:{prefix}{rel_path}"], capture_output=True)
+        if shown.returncode != 0:
+            continue
+        target = os.path.join(out_dir, FILE_PATHS[key])
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target, 'wb') as f:
+            f.write(shown.stdout)
+    return out_dir
+
+
+# ========== 比較 ==========
+
+class ResultCache:
+    """以快取鍵儲存每個關卡的每場結果"""
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, key):
+        path = self._path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return data.get("battles") if data.get("key") == key else None
+
+    def put(self, key, stage_id, battles):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        temp_path = self._path(key) + ".tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({"key": key, "stage_id": stage_id, "battles": battles}, f, separators=(",", ":"))
+        os.replace(temp_path, self._path(key))
+
+
+def compare(base_dir, head_dir, team=None, level=0, battles=DEFAULT_BATTLES, seed=DEFAULT_SEED,
+            max_turns=DEFAULT_MAX_TURNS, alpha=DEFAULT_ALPHA, stages=None, workers=None, cache_dir=None,
+            progress=None):
+    """比較兩份資料中每個關卡的戰鬥結果
+
+    回傳 {"options", "unchanged": [stage_id], "added": [...], "removed": [...],
+          "stages": [{"stage_id", "direction", "metrics"}], "simulated": 場數, "cached": 關卡數}
+    """
+    options = {"team": list(team or DEFAULT_TEAM), "level": level, "battles": battles, "seed": seed,
+               "max_turns": max_turns, "engine": engine_hash()}
+    cache = ResultCache(cache_dir or os.path.join(head_dir, CACHE_DIR_NAME, CACHE_SUBDIR))
+    sides = {}
+    for side, data_dir in (("base", base_dir), ("head", head_dir)):
+        dataset = load_dataset(data_dir)
+        index = ReferenceIndex(dataset)
+        stage_ids = list(index.indexes.get("stages", {}))
+        if stages:
+            stage_ids = [s for s in stage_ids if s in stages]
+        sides[side] = (data_dir, {stage_id: index.stage_key(stage_id, options) for stage_id in stage_ids})
+
+    base_keys, head_keys = sides["base"][1], sides["head"][1]
+    report = {"options": options, "unchanged": [], "stages": [], "simulated": 0, "cached": 0,
+              "added": sorted(set(head_keys) - set(base_keys)), "removed": sorted(set(base_keys) - set(head_keys))}
+    changed = []
+    for stage_id, key in head_keys.items():
+        if stage_id not in base_keys:
+            continue
+        if base_keys[stage_id] == key:
+            report["unchanged"].append(stage_id)
+        else:
+            changed.append(stage_id)
+
+    results, tasks = {}, []
+    for stage_id in changed:
+        for side in ("base", "head"):
+            data_dir, keys = sides[side]
+            key = keys[stage_id]
+            if key in results or any(task[2] == key for task in tasks):
+                continue
+            cached = cache.get(key)
+            if cached is not None:
+                results[key] = cached
+                report["cached"] += 1
+            else:
+                tasks.append((data_dir, stage_id, key, options))
+
+    if tasks:
+        if workers == 1 or len(tasks) == 1:
+            outputs = map(_simulate_stage, tasks)
+            pool = None
+        else:
+            pool = multiprocessing.Pool(workers)
+            outputs = pool.imap_unordered(_simulate_stage, tasks)
+        stage_of = {task[2]: task[1] for task in tasks}
+        try:
+            for done, (key, stage_battles) in enumerate(outputs, 1):
+                results[key] = stage_battles
+                cache.put(key, stage_of[key], stage_battles)
+                report["simulated"] += len(stage_battles)
+                if progress:
+                    progress(done, len(tasks))
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+
+    for stage_id in changed:
+        metrics = compare_stage(results[base_keys[stage_id]], results[head_keys[stage_id]], alpha)
+        report["stages"].append({"stage_id": stage_id, "direction": direction(metrics), "metrics": metrics})
+    report["stages"].sort(key=lambda row: (row["direction"] is None, row["stage_id"]))
+    return report
+
+
+def format_report(report, alpha):
+    options = report["options"]
+    lines = [f"=== 平衡回歸（每關 {options['battles']} 場，seed={options['seed']}，隊伍 {', '.join(options['team'])}）===",
+             f"依賴未變動（略過）：{len(report['unchanged'])} 關；重新比較：{len(report['stages'])} 關",
+             f"模擬 {report['simulated']} 場，快取命中 {report['cached']} 組"]
+    if report["added"]:
+        lines.append(f"新增關卡（無法比較）：{', '.join(report['added'])}")
+    if report["removed"]:
+        lines.append(f"刪除關卡：{', '.join(report['removed'])}")
+    labels = {"win_rate": "勝率", "turns": "回合", "damage_dealt": "造成/回合", "damage_taken": "承受/回合"}
+    icons = {"easier": "⬇️ 變簡單", "harder": "⬆️ 變困難", "mixed": "⚠️ 方向不一", "shifted": "⚠️ 有變化"}
+    significant = [row for row in report["stages"] if row["direction"]]
+    lines.append(f"\n顯著變化（p < {alpha}）：{len(significant)} 關")
+    for row in report["stages"]:
+        if not row["direction"]:
+            continue
+        lines.append(f"  {icons[row['direction']]}  {row['stage_id']}")
+        for name, label in labels.items():
+            metric = row["metrics"][name]
+            fmt = "{:.0%}" if name == "win_rate" else "{:.1f}"
+            mark = "❗" if metric["significant"] else "  "
+            lines.append(f"      {mark} {label:<8} {fmt.format(metric['base']):>8} → {fmt.format(metric['head']):>8}"
+                         f"   p={metric['p']:.3g}")
+    quiet = [row["stage_id"] for row in report["stages"] if not row["direction"]]
+    if quiet:
+        lines.append(f"\n依賴有變動但結果無顯著差異：{', '.join(quiet)}")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="比較兩份資料的關卡戰鬥結果")
+    parser.add_argument("data_dir", help="要檢查的資料目錄（head）")
+    parser.add_argument("--base", default="git:HEAD", help="比較基準：資料目錄或 git:<revision>（預設 git:HEAD）")
+    parser.add_argument("--team", default=",".join(DEFAULT_TEAM), help="測試隊伍卡片 ID，逗號分隔，第一張為隊長")
+    parser.add_argument("--level", type=int, default=0, help="隊伍等級（0 = 滿等）")
+    parser.add_argument("--battles", type=int, default=DEFAULT_BATTLES, help=f"每關模擬場數（預設 {DEFAULT_BATTLES}）")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED, help="亂數種子")
+    parser.add_argument("--max-turns", type=int, default=DEFAULT_MAX_TURNS, help="超過此回合數視為失敗")
+    parser.add_argument("--alpha", type=float, default=DEFAULT_ALPHA, help=f"顯著水準（預設 {DEFAULT_ALPHA}）")
+    parser.add_argument("--stage", action="append", help="只比較指定關卡（可重複）")
+    parser.add_argument("--workers", type=int, default=None, help="worker process 數量（預設為 CPU 數）")
+    parser.add_argument("--cache", help="快取目錄（預設 <data_dir>/.gm_cache/balance_regression）")
+    parser.add_argument("--out", help="將報告寫入 JSON 檔")
+    args = parser.parse_args()
+
+    temp_dir = None
+    base_dir = args.base
+    try:
+        if base_dir.startswith("git:"):
+            temp_dir = tempfile.mkdtemp(prefix="balance_base_")
+            try:
+                export_revision(args.data_dir, base_dir[4:], temp_dir)
+            except (OSError, subprocess.CalledProcessError) as e:
+                print(f"❌ 無法從 git 匯出 {base_dir[4:]}：{e}")
+                return 2
+            base_dir = temp_dir
+        report = compare(base_dir, args.data_dir, team=[c for c in args.team.split(",") if c], level=args.level,
+                         battles=args.battles, seed=args.seed, max_turns=args.max_turns, alpha=args.alpha,
+                         stages=set(args.stage) if args.stage else None, workers=args.workers, cache_dir=args.cache)
+    finally:
+        if temp_dir:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+    print(format_report(report, args.alpha))
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    return 1 if any(row["direction"] for row in report["stages"]) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,427 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+戰鬥日誌解析 (Battle Log Parser)
+將 Godot stdout 擷取的戰鬥日誌（BattleManager / ElementPanel / SkillRegistry 的 print 輸出）
+解析成結構化的戰鬥事件，以欄式格式 (columnar) 存到磁碟，不需修改遊戲端：
+
+- 每種事件一個資料夾，每個欄位一個檔案：整數 .i64 / 浮點數 .f64 / 布林 .i8（array 二進位），字串 .jsonl（每行一個 JSON 字串）
+- 每一列都有共用欄位 line（日誌行號）、battle（第幾場戰鬥）、wave、turn，由 ⚔️ 戰鬥開始 / 🌊 波開始 / 回合開始 等行推得
+- manifest.json 記錄每個欄位已寫入的列數與位元組數，以及日誌已處理到的位元組位置；
+  重新執行或 --follow 時從該位置繼續，寫到一半中斷的欄位檔會被截回 manifest 記錄的長度
+- 逐行讀取，每個事件累積 FLUSH_ROWS 列就寫出，記憶體用量與日誌大小無關
+
+事件類型見 RULES（attack / damage / requirement / buff_tick / wave_start ...）；
+StageSelect 在戰鬥前印出的「選擇關卡」記為 stage_select，用來對應每場戰鬥的關卡。
+每條規則先以 marker 子字串過濾，再以具名群組的正規表示式取出欄位（型別由 FIELD_TYPES 決定）。
+
+用法：
+    python tool/BattleLogParser.py godot.log                      # 輸出到 godot.log.trace/
+    python tool/BattleLogParser.py godot.log --out trace --follow  # 持續追蹤正在寫入的日誌
+    python tool/BattleLogParser.py godot.log --reset --summary
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+from array import array
+
+
+TRACE_VERSION = 1
+MANIFEST_FILE = "manifest.json"
+FLUSH_ROWS = 4096             # 每種事件累積多少列寫出一次
+HEAD_BYTES = 4096             # 以日誌開頭的雜湊判斷是否為同一個檔案
+READ_CHUNK_ROWS = 65536       # TraceReader 每次讀取的列數
+
+CONTEXT_FIELDS = ("wave", "turn")
+COMMON_COLUMNS = [("line", "int"), ("battle", "int"), ("wave", "int"), ("turn", "int")]
+
+# 欄位型別 -> (array typecode, 副檔名)；字串以 JSON Lines 儲存
+COLUMN_FORMATS = {
+    "int": ("q", ".i64"),
+    "float": ("d", ".f64"),
+    "bool": ("b", ".i8"),
+    "str": (None, ".jsonl"),
+}
+
+FIELD_TYPES = {
+    "wave": "int", "turn": "int", "total_waves": "int", "damage": "int", "hp": "int", "max_hp": "int",
+    "combo": "int", "cd": "int", "remaining": "int", "percent": "int", "reduced": "int", "amount": "int",
+    "unique": "int", "continuous_count": "int",
+    "multiplier": "float",
+    "passed": "bool", "victory": "bool",
+}
+TRUE_MARKS = {"✓", "✅", "是", "true", "True"}
+
+# (事件類型, marker 子字串, 正規表示式, 固定欄位)；依序比對，第一條符合者生效
+RULES = [
+    ("stage_select", "選擇關卡:", r"^選擇關卡: (?P<stage_id>.+?) - (?P<stage_name>.+)$", {}),
+    ("battle_start", "戰鬥開始", r"^⚔️\s*戰鬥開始！$", {}),
+    ("battle_end", "勝利！", r"^🎉 勝利！$", {"victory": True}),
+    ("battle_end", "失敗...", r"^💀 失敗\.\.\.$", {"victory": False}),
+    ("wave_start", "波開始", r"^🌊 第 (?P<wave>\d+)/(?P<total_waves>\d+) 波開始！$", {}),
+    ("wave_clear", "波完成", r"^✅ 第 (?P<wave>\d+) 波完成！$", {}),
+    ("wave_transition", "WAVE 轉場 - 強制", r"^🌊 WAVE 轉場 - 強制進入玩家回合（回合數維持 (?P<turn>\d+)）$", {}),
+    ("turn_start", "回合開始（玩家）", r"^--- 第 (?P<turn>\d+) 回合開始（玩家） ---$", {}),
+    ("player_turn_end", "玩家回合結束", r"^--- 玩家回合結束 ---$", {}),
+    ("enemy_turn", "=== 敵人回合 ===", r"^👾 === 敵人回合 ===$", {}),
+    ("orb", "_on_orb_swiped] 消除",
+     r"消除 (?P<element>\w+) 珠！當前連擊: (?P<combo>\d+)$", {}),
+    ("requirement_data", "儲存條件數據",
+     r"連擊=(?P<combo>\d+), 累積=(?P<totals>.*), 連續=(?P<continuous_element>\w*)\((?P<continuous_count>-?\d+)\), "
+     r"種類=(?P<unique>\d+)$", {}),
+    ("combo_end", "連擊結束！", r"^🎯 連擊結束！總連擊: (?P<combo>\d+)$", {}),
+    ("active_skill", "使用主動技能！", r"^✨ (?P<card>.+?) 使用主動技能！$", {}),
+    ("requirement", "[條件檢查]", r"^\[條件檢查\] (?P<passed>[❌✓]) (?P<skill>.+?): (?P<detail>.+)$", {}),
+    ("damage_blocked", "不滿足傷害條件", r"^❌ 不滿足傷害條件！傷害被阻擋$", {}),
+    ("attack", "屬性) 攻擊",
+     r"^⚔️\s*(?P<source>.+?) \((?P<source_element>\w+)屬性\) 攻擊 (?P<target>.+?) \((?P<target_element>\w*)屬性\)$", {}),
+    ("attack_base", "基礎傷害 (ATK * 元素)", r": (?P<damage>-?\d+)$", {}),
+    ("attack_multiplier", "技能倍率 (來自", r"x(?P<multiplier>-?[\d.]+)$", {}),
+    ("attack_final", "最終傷害:", r"^最終傷害: (?P<damage>-?\d+)$", {}),
+    ("damage", "實際傷害！",
+     r"^對 (?P<target>.+?) 造成 (?P<damage>-?\d+) 實際傷害！\(剩餘 (?P<hp>-?\d+)/(?P<max_hp>\d+) HP\)$", {}),
+    ("end_turn_damage", "(滿足技能條件)", r"^✓ 對 (?P<target>.+?) 造成 (?P<damage>\d+) 點傷害 \(滿足技能條件\)$", {}),
+    ("enemy_attack", " 的回合：", r"^👾 (?P<enemy>.+?) 的回合：$", {}),
+    ("enemy_wait", "待機中...", r"^(?P<enemy>.+?) 待機中\.\.\. \(CD: (?P<cd>-?\d+)\)$", {}),
+    ("damage_reduction", "[DAMAGE_REDUCTION] 減傷", r"減傷(?P<percent>\d+)% \(減少(?P<reduced>\d+)點傷害\)$", {}),
+    ("dodge", "觸發迴避", r"^✨ 觸發迴避！未受到傷害$", {}),
+    ("player_damage", "玩家受到",
+     r"^💔 玩家受到 (?P<damage>-?\d+) 點傷害！\(剩餘 (?P<hp>-?\d+)/(?P<max_hp>\d+) HP\)$", {}),
+    ("heal", "點生命值", r"^💚 恢復 (?P<amount>-?\d+) 點生命值 \((?P<hp>-?\d+)/(?P<max_hp>\d+) HP\)$", {}),
+    ("enemy_defeated", "被擊敗！", r"^(?:☠️|💀)\s*(?P<enemy>.+?) 被擊敗！$", {}),
+    ("buff_tick", "[Buff]", r"^🔄 \[Buff\] (?P<skill>.+?) 剩餘 (?P<remaining>-?\d+) 回合$", {}),
+    ("buff_end", "[Buff]", r"^⏱️ \[Buff\] (?P<skill>.+?) 效果結束$", {}),
+    ("skill_trigger", "執行技能",
+     r"^\[(?P<source>JSON技能|敵人技能|效果管理器)\] (?:正在)?執行技能: (?P<skill>.+?)(?: \(時機: (?P<timing>\w+)\))?$", {}),
+    ("skill_effect", "✓ ", r"^✓ (?P<detail>.+)$", {}),
+]
+
+
+def _compile_rules(rules):
+    compiled, schemas = [], {}
+    for event_type, marker, pattern, constants in rules:
+        regex = re.compile(pattern)
+        fields = [name for name in regex.groupindex if name not in CONTEXT_FIELDS] + list(constants)
+        columns = COMMON_COLUMNS + [(name, FIELD_TYPES.get(name, "str")) for name in fields]
+        if schemas.setdefault(event_type, columns) != columns:
+            raise ValueError(f"事件 {event_type} 的規則欄位不一致")
+        compiled.append((event_type, marker, regex, constants))
+    return compiled, schemas
+
+
+COMPILED_RULES, EVENT_SCHEMAS = _compile_rules(RULES)
+
+
+def _convert(name, value):
+    if value is None:
+        return None
+    kind = FIELD_TYPES.get(name, "str")
+    if kind == "int":
+        return int(value)
+    if kind == "float":
+        return float(value)
+    if kind == "bool":
+        return value in TRUE_MARKS
+    return value
+
+
+def parse_line(text):
+    """解析一行日誌：回傳 (event_type, fields) 或 None"""
+    text = text.strip()
+    if not text:
+        return None
+    for event_type, marker, regex, constants in COMPILED_RULES:
+        if marker not in text:
+            continue
+        match = regex.search(text)
+        if match is None:
+            continue
+        fields = {name: _convert(name, value) for name, value in match.groupdict().items()}
+        fields.update(constants)
+        return event_type, fields
+    return None
+
+
+# ========== 欄式儲存 ==========
+
+def _column_path(out_dir, table, column, kind):
+    return os.path.join(out_dir, table, column + COLUMN_FORMATS[kind][1])
+
+
+def _encode_column(kind, values):
+    typecode = COLUMN_FORMATS[kind][0]
+    if typecode is None:
+        return "".join(json.dumps(value, ensure_ascii=False) + "\n" for value in values).encode("utf-8")
+    return array(typecode, (value or 0 for value in values)).tobytes()
+
+
+def _write_manifest(out_dir, manifest):
+    path = os.path.join(out_dir, MANIFEST_FILE)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+def _new_manifest():
+    return {"version": TRACE_VERSION, "byteorder": sys.byteorder, "source": None,
+            "state": {"line": 0, "battle": 0, "wave": 0, "turn": 0}, "tables": {}}
+
+
+class TraceWriter:
+    """將事件累積後追加到各欄位檔；每次寫出後更新 manifest"""
+
+    def __init__(self, out_dir, reset=False, flush_rows=FLUSH_ROWS):
+        self.out_dir = out_dir
+        self.flush_rows = flush_rows
+        self.pending = {}   # table -> [row dict]
+        self.pending_rows = 0
+        os.makedirs(out_dir, exist_ok=True)
+        manifest_path = os.path.join(out_dir, MANIFEST_FILE)
+        self.manifest = None
+        if not reset and os.path.exists(manifest_path):
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+            if manifest.get("version") == TRACE_VERSION and manifest.get("byteorder") == sys.byteorder:
+                self.manifest = manifest
+        if self.manifest is None:
+            self.manifest = _new_manifest()
+        self._truncate_to_manifest()
+
+    def _truncate_to_manifest(self):
+        """把欄位檔截回 manifest 記錄的長度（上次寫到一半中斷時），並刪除未記錄的欄位檔"""
+        tables = self.manifest["tables"]
+        for table in os.listdir(self.out_dir):
+            table_dir = os.path.join(self.out_dir, table)
+            if not os.path.isdir(table_dir):
+                continue
+            columns = tables.get(table, {}).get("columns", {})
+            for file_name in os.listdir(table_dir):
+                column, _ = os.path.splitext(file_name)
+                path = os.path.join(table_dir, file_name)
+                size = columns.get(column, {}).get("bytes")
+                if size is None:
+                    os.remove(path)
+                elif os.path.getsize(path) != size:
+                    with open(path, 'r+b') as f:
+                        f.truncate(size)
+
+    @property
+    def state(self):
+        return self.manifest["state"]
+
+    def add(self, table, row):
+        self.pending.setdefault(table, []).append(row)
+        self.pending_rows += 1
+        if len(self.pending[table]) >= self.flush_rows:
+            self._flush_table(table)
+
+    def _flush_table(self, table):
+        rows = self.pending.pop(table, None)
+        if not rows:
+            return
+        os.makedirs(os.path.join(self.out_dir, table), exist_ok=True)
+        info = self.manifest["tables"].setdefault(
+            table, {"rows": 0, "columns": {name: {"type": kind, "bytes": 0} for name, kind in EVENT_SCHEMAS[table]}})
+        for name, kind in EVENT_SCHEMAS[table]:
+            raw = _encode_column(kind, [row.get(name) for row in rows])
+            with open(_column_path(self.out_dir, table, name, kind), 'ab') as f:
+                f.write(raw)
+            info["columns"][name]["bytes"] += len(raw)
+        info["rows"] += len(rows)
+        self.pending_rows -= len(rows)
+
+    def flush(self, source=None):
+        """寫出所有累積的事件並更新 manifest（source 為日誌已處理到的位置）"""
+        for table in list(self.pending):
+            self._flush_table(table)
+        if source is not None:
+            self.manifest["source"] = source
+        _write_manifest(self.out_dir, self.manifest)
+
+
+class TraceReader:
+    """讀取欄式事件：columns() / iter_column() 分塊讀取，iter_rows() 逐列組合"""
+
+    def __init__(self, out_dir):
+        self.out_dir = out_dir
+        with open(os.path.join(out_dir, MANIFEST_FILE), 'r', encoding='utf-8') as f:
+            self.manifest = json.load(f)
+        self.swap = self.manifest.get("byteorder", sys.byteorder) != sys.byteorder
+
+    @property
+    def tables(self):
+        return {table: info["rows"] for table, info in self.manifest["tables"].items()}
+
+    def columns(self, table):
+        return list(self.manifest["tables"].get(table, {}).get("columns", {}))
+
+    def iter_column(self, table, column, chunk_rows=READ_CHUNK_ROWS, start=0):
+        """分塊讀取一個欄位；start 為起始位元組（舊 manifest 記錄的 bytes，只讀新增的列）"""
+        info = self.manifest["tables"].get(table)
+        if info is None or column not in info["columns"]:
+            raise KeyError(f"{table}.{column}")
+        kind = info["columns"][column]["type"]
+        limit = info["columns"][column]["bytes"] - start
+        typecode = COLUMN_FORMATS[kind][0]
+        with open(_column_path(self.out_dir, table, column, kind), 'rb') as f:
+            f.seek(start)
+            if typecode is None:
+                chunk, consumed = [], 0
+                for raw in f:
+                    consumed += len(raw)
+                    if consumed > limit:
+                        break
+                    chunk.append(json.loads(raw))
+                    if len(chunk) >= chunk_rows:
+                        yield chunk
+                        chunk = []
+                if chunk:
+                    yield chunk
+                return
+            item_size = array(typecode).itemsize
+            remaining = limit
+            while remaining > 0:
+                raw = f.read(min(remaining, chunk_rows * item_size))
+                if not raw:
+                    break
+                remaining -= len(raw)
+                values = array(typecode)
+                values.frombytes(raw)
+                if self.swap:
+                    values.byteswap()
+                yield [bool(v) for v in values] if kind == "bool" else values.tolist()
+
+    def iter_rows(self, table, columns=None, since=None):
+        """逐列讀取；since 為先前的 manifest，只讀取之後新增的列"""
+        columns = columns or self.columns(table)
+        if table not in self.manifest["tables"]:
+            return
+        previous = ((since or {}).get("tables") or {}).get(table, {}).get("columns", {})
+        iterators = [self.iter_column(table, column, start=previous.get(column, {}).get("bytes", 0))
+                     for column in columns]
+        for chunks in zip(*iterators):
+            for values in zip(*chunks):
+                yield dict(zip(columns, values))
+
+    def read(self, table, columns=None):
+        """整個事件表讀進記憶體：{column: [values]}（大型日誌請改用 iter_rows）"""
+        columns = columns or self.columns(table)
+        return {column: [v for chunk in self.iter_column(table, column) for v in chunk] for column in columns}
+
+
+# ========== 讀取日誌 ==========
+
+def _head_hash(path, length):
+    with open(path, 'rb') as f:
+        return hashlib.sha1(f.read(length)).hexdigest()
+
+
+def _record(writer, text):
+    state = writer.state
+    state["line"] += 1
+    parsed = parse_line(text)
+    if parsed is None:
+        return
+    event_type, fields = parsed
+    if event_type == "battle_start":
+        state["battle"] += 1
+        state["wave"], state["turn"] = 1, 1
+    for name in CONTEXT_FIELDS:
+        if name in fields:
+            state[name] = fields.pop(name)
+    row = dict(fields)
+    row.update(state)
+    writer.add(event_type, row)
+
+
+def ingest(log_path, out_dir, follow=False, poll_seconds=0.5, reset=False, flush_rows=FLUSH_ROWS):
+    """解析日誌並寫入 out_dir；回傳本次處理的行數。follow=True 時持續追蹤直到 Ctrl+C"""
+    writer = TraceWriter(out_dir, reset=reset, flush_rows=flush_rows)
+    source = writer.manifest.get("source") or {}
+    offset = processed = 0
+    # 只比對上次已處理的開頭部分，正在寫入的日誌變長不會被當成不同檔案
+    head_length = min(source.get("offset", 0), HEAD_BYTES)
+    if (source and source.get("offset", 0) <= os.path.getsize(log_path)
+            and source.get("head") == _head_hash(log_path, head_length)):
+        offset = source["offset"]
+    elif source:
+        # 不同的日誌（或已被覆寫）：從頭解析，戰鬥編號延續
+        writer.state.update({"line": 0, "wave": 0, "turn": 0})
+
+    def checkpoint():
+        writer.flush({"path": os.path.abspath(log_path), "offset": offset,
+                      "head": _head_hash(log_path, min(offset, HEAD_BYTES))})
+
+    f = open(log_path, 'rb')
+    try:
+        f.seek(offset)
+        while True:
+            raw = f.readline()
+            if raw.endswith(b"\n"):
+                offset += len(raw)
+                processed += 1
+                _record(writer, raw.decode("utf-8", "replace"))
+                continue
+            # 沒有完整的新行（Godot 的 print 一定以換行結尾，不完整的行還在寫入中）：未 follow 時結束，否則等待寫入
+            if not follow:
+                break
+            f.seek(offset)
+            if writer.pending_rows:
+                checkpoint()
+            time.sleep(poll_seconds)
+            if os.path.getsize(log_path) < offset:
+                # 日誌被截斷或重新建立（重新啟動遊戲）
+                f.close()
+                f = open(log_path, 'rb')
+                offset = 0
+                writer.state.update({"line": 0, "wave": 0, "turn": 0})
+    except KeyboardInterrupt:
+        pass
+    finally:
+        f.close()
+        checkpoint()
+    return processed
+
+
+def format_summary(out_dir):
+    reader = TraceReader(out_dir)
+    lines = [f"=== {out_dir} ==="]
+    source = reader.manifest.get("source") or {}
+    if source:
+        lines.append(f"日誌: {source.get('path')} (已處理 {source.get('offset', 0)} bytes, "
+                     f"{reader.manifest['state']['battle']} 場戰鬥)")
+    for table, rows in sorted(reader.tables.items()):
+        lines.append(f"  {table:<20} {rows:>10} 列  [{', '.join(reader.columns(table)[len(COMMON_COLUMNS):])}]")
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description="將 Godot 戰鬥日誌解析為欄式戰鬥事件")
+    parser.add_argument("log", help="Godot stdout 擷取的日誌檔")
+    parser.add_argument("--out", help="輸出資料夾（預設為 <log>.trace）")
+    parser.add_argument("--follow", action="store_true", help="持續追蹤日誌新增的內容（Ctrl+C 結束）")
+    parser.add_argument("--poll", type=float, default=0.5, help="--follow 的輪詢間隔（秒）")
+    parser.add_argument("--reset", action="store_true", help="捨棄既有輸出，從頭解析")
+    parser.add_argument("--summary", action="store_true", help="完成後列出每種事件的列數")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.log):
+        print(f"❌ 找不到日誌 {args.log}")
+        return 1
+    out_dir = args.out or args.log + ".trace"
+    started = time.perf_counter()
+    processed = ingest(args.log, out_dir, args.follow, args.poll, args.reset)
+    print(f"✅ 處理 {processed} 行 ({time.perf_counter() - started:.2f}s) -> {out_dir}")
+    if args.summary:
+        print("\n".join(format_summary(out_dir)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,799 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+戰鬥重播格式 (Battle Replay)
+將一場戰鬥記錄成精簡、有版本號的二進位重播檔，並以目前的資料檔案重新模擬每回合的傷害
+
+遊戲的靈珠生成 (get_random_element_with_modified_rates) 使用 Godot 的 randi()/randf()，
+Python 無法重現同一個亂數序列，因此重播檔直接記錄每回合實際斬出的靈珠序列與時間；
+seed 只作為中繼資料保存，方便在遊戲內重現同一場戰鬥。
+
+重播檔格式（版本 1，整數皆為 LEB128 varint，字串為 varint 長度 + UTF-8）:
+    b"CGRP" | u8 版本
+    varint seed | str stage_id | varint 隊伍人數 | 每位隊員: str card_id, varint 等級（0 = 滿等）
+    varint 回合數
+    每回合:
+        varint 標頭 = 斬擊數 << 2 | 有儲存靈珠 << 1 | 有傷害紀錄
+        斬擊 × N: varint (與上一斬的間隔毫秒 << 3) | 元素      ← 第一斬的間隔從斬擊開始計算
+        varint 行動數；行動 × M: varint (目標 << 5) | (隊員索引 << 2) | 類型（0 攻擊 / 1 技能 / 2 休息）
+        [有儲存靈珠] 6 × varint：斬擊時各元素的儲存靈珠數（ORB_COUNT_MULTIPLIER / REQUIRE_STORED_ORB_*）
+        [有傷害紀錄] 每次攻擊一個 zigzag varint：與同回合上一次攻擊傷害的差值
+
+重播庫 (.cgrl) 將大量重播檔串成一個 zlib 串流：b"CGRL" | u8 版本 | zlib(varint 數量 + 每筆 varint 長度 + 重播檔)，
+讀取時分段解壓，記憶體用量與重播庫大小無關。
+
+模擬範圍：斬擊倍率（含 1 秒連擊中斷、ORB_DUAL_EFFECT、COMBO_BOOST）、隊長 PERMANENT / BEFORE_ATTACK、
+主動技能 Buff 的施放與到期、屬性相克、敵人條件技能與減傷、敵人攻擊 CD、波次切換，
+以及全隊 HP（隊長 HP / REC 倍率、心珠回復、敵人普通攻擊、DEATH_DAMAGE、ENTER_HP_TO_ONE）。
+不模擬 SP 與敵人攻擊技能（重播紀錄的行動即為實際執行的行動）。
+
+用法:
+    python BattleReplay.py ../data battle.cgr                    # 重新模擬並與紀錄的傷害比對
+    python BattleReplay.py ../data library.cgrl --limit 20       # 重播庫回歸測試，列出前 20 筆差異
+    python BattleReplay.py ../data battle.cgr --dump              # 以 JSON 輸出重播內容
+    python BattleReplay.py ../data --pack library.cgrl a.cgr b.cgr  # 打包重播庫
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import zlib
+
+from DamageStacking import (ADVANTAGE, ADVANTAGE_MULTIPLIER, COMBO_MULTIPLIER_PER_HIT, DISADVANTAGE_MULTIPLIER,
+                            OTHER_ELEMENT_BONUS, OWN_ELEMENT_BONUS, active_buffs, card_element, leader_effects,
+                            level_atk, load_cards)
+from LeaderMultiplierTable import load_multipliers
+from SkillCompiler import ELEMENTS, load_table
+
+REPLAY_MAGIC = b"CGRP"
+LIBRARY_MAGIC = b"CGRL"
+REPLAY_VERSION = 1
+
+ACTION_ATTACK = 0
+ACTION_SKILL = 1
+ACTION_REST = 2
+ACTION_NAMES = ["attack", "skill", "rest"]
+
+SLASH_DURATION_MS = 5000     # ElementPanel.SLASH_DURATION
+MIN_SLASH_MS = 1000          # 斬擊時間至少 1 秒
+COMBO_TIMEOUT_MS = 1000      # ElementPanel.COMBO_TIMEOUT
+READ_CHUNK = 1 << 16
+HEART = ELEMENTS.index("HEART")
+
+GATE_TYPES = {"REQUIRE_COMBO", "REQUIRE_COMBO_EXACT", "REQUIRE_COMBO_MAX", "REQUIRE_ORB_TOTAL",
+              "REQUIRE_ORB_CONTINUOUS", "REQUIRE_ELEMENTS", "REQUIRE_STORED_ORB_MIN",
+              "REQUIRE_STORED_ORB_EXACT", "REQUIRE_ENEMY_ATTACK", "DAMAGE_ONCE_ONLY"}
+
+
+class ReplayError(ValueError):
+    """重播檔格式錯誤"""
+
+
+# ========== 資料結構 ==========
+
+class Swipe:
+    """一次斬擊：距離斬擊開始的毫秒數與斬出的元素"""
+
+    __slots__ = ("time_ms", "element")
+
+    def __init__(self, time_ms, element):
+        self.time_ms = time_ms
+        self.element = element
+
+
+class Action:
+    """玩家行動：攻擊（指定目標敵人索引）、施放主動技能或休息"""
+
+    __slots__ = ("kind", "card_index", "target")
+
+    def __init__(self, kind, card_index=0, target=0):
+        self.kind = kind
+        self.card_index = card_index
+        self.target = target
+
+
+class Turn:
+    """一個玩家回合：斬擊序列、行動與（可選）紀錄到的每次攻擊傷害"""
+
+    def __init__(self, swipes=None, actions=None, stored_orbs=None, damage=None):
+        self.swipes = swipes or []
+        self.actions = actions or []
+        self.stored_orbs = stored_orbs    # [6 個元素的儲存靈珠數] 或 None
+        self.damage = damage              # [每次攻擊的最終傷害] 或 None
+
+
+class Replay:
+    """一場戰鬥的重播"""
+
+    def __init__(self, stage_id, team, seed=0, turns=None):
+        self.stage_id = stage_id
+        self.team = team                  # [(card_id, level)]，level 0 = 滿等
+        self.seed = seed
+        self.turns = turns or []
+
+    def to_dict(self):
+        return {
+            "version": REPLAY_VERSION, "seed": self.seed, "stage_id": self.stage_id,
+            "team": [{"card_id": card_id, "level": level} for card_id, level in self.team],
+            "turns": [{
+                "swipes": [[s.time_ms, ELEMENTS[s.element]] for s in turn.swipes],
+                "actions": [{"type": ACTION_NAMES[a.kind], "card": a.card_index, "target": a.target}
+                            for a in turn.actions],
+                "stored_orbs": turn.stored_orbs, "damage": turn.damage,
+            } for turn in self.turns],
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        turns = []
+        for item in data.get("turns", []):
+            swipes = [Swipe(int(t), ELEMENTS.index(e) if isinstance(e, str) else int(e)) for t, e in item.get("swipes", [])]
+            actions = [Action(ACTION_NAMES.index(a.get("type", "attack")), a.get("card", 0), a.get("target", 0))
+                       for a in item.get("actions", [])]
+            turns.append(Turn(swipes, actions, item.get("stored_orbs"), item.get("damage")))
+        team = [(m["card_id"], m.get("level", 0)) for m in data.get("team", [])]
+        return cls(data.get("stage_id", ""), team, data.get("seed", 0), turns)
+
+
+# ========== 編碼 / 解碼 ==========
+
+def _varint(out, value):
+    if value < 0:
+        raise ReplayError(f"varint 不能是負數：{value}")
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _zigzag(value):
+    return value * 2 if value >= 0 else -value * 2 - 1
+
+
+def _unzigzag(value):
+    return value >> 1 if not value & 1 else -((value + 1) >> 1)
+
+
+def _string(out, text):
+    data = text.encode("utf-8")
+    _varint(out, len(data))
+    out.extend(data)
+
+
+class _Cursor:
+    """在 bytes 上依序讀取 varint / 字串"""
+
+    __slots__ = ("data", "pos")
+
+    def __init__(self, data, pos=0):
+        self.data = data
+        self.pos = pos
+
+    def varint(self):
+        result, shift, data = 0, 0, self.data
+        while True:
+            if self.pos >= len(data):
+                raise ReplayError("重播檔被截斷")
+            byte = data[self.pos]
+            self.pos += 1
+            result |= (byte & 0x7F) << shift
+            if byte < 0x80:
+                return result
+            shift += 7
+
+    def string(self):
+        length = self.varint()
+        end = self.pos + length
+        if end > len(self.data):
+            raise ReplayError("重播檔被截斷")
+        text = self.data[self.pos:end].decode("utf-8")
+        self.pos = end
+        return text
+
+
+def encode_replay(replay):
+    """Replay -> bytes"""
+    out = bytearray(REPLAY_MAGIC)
+    out.append(REPLAY_VERSION)
+    _varint(out, replay.seed)
+    _string(out, replay.stage_id)
+    _varint(out, len(replay.team))
+    for card_id, level in replay.team:
+        _string(out, card_id)
+        _varint(out, level)
+    _varint(out, len(replay.turns))
+    for number, turn in enumerate(replay.turns, 1):
+        has_stored = turn.stored_orbs is not None
+        has_damage = turn.damage is not None
+        if has_stored and len(turn.stored_orbs) != len(ELEMENTS):
+            raise ReplayError(f"第 {number} 回合：stored_orbs 必須有 {len(ELEMENTS)} 個元素")
+        if has_damage:
+            attacks = sum(1 for action in turn.actions if action.kind == ACTION_ATTACK)
+            if len(turn.damage) != attacks:
+                raise ReplayError(f"第 {number} 回合：傷害紀錄 {len(turn.damage)} 筆，但攻擊行動有 {attacks} 次")
+        _varint(out, len(turn.swipes) << 2 | has_stored << 1 | has_damage)
+        previous = 0
+        for swipe in turn.swipes:
+            if swipe.time_ms < previous:
+                raise ReplayError(f"斬擊時間必須遞增：{swipe.time_ms} < {previous}")
+            if not 0 <= swipe.element < len(ELEMENTS):
+                raise ReplayError(f"第 {number} 回合：斬擊元素超出範圍：{swipe.element}")
+            _varint(out, (swipe.time_ms - previous) << 3 | swipe.element)
+            previous = swipe.time_ms
+        _varint(out, len(turn.actions))
+        for action in turn.actions:
+            # 欄位寬度：kind 2 位元、card_index 3 位元、target 其餘位元
+            if not 0 <= action.kind < len(ACTION_NAMES):
+                raise ReplayError(f"第 {number} 回合：未知的行動類型：{action.kind}")
+            if not 0 <= action.card_index < 8:
+                raise ReplayError(f"第 {number} 回合：卡片索引超出範圍 (0..7)：{action.card_index}")
+            if action.target < 0:
+                raise ReplayError(f"第 {number} 回合：目標索引不能是負數：{action.target}")
+            _varint(out, action.target << 5 | action.card_index << 2 | action.kind)
+        if has_stored:
+            for element in range(len(ELEMENTS)):
+                _varint(out, turn.stored_orbs[element])
+        if has_damage:
+            previous = 0
+            for damage in turn.damage:
+                _varint(out, _zigzag(damage - previous))
+                previous = damage
+    return bytes(out)
+
+
+def decode_replay(data):
+    """bytes -> Replay"""
+    if data[:4] != REPLAY_MAGIC:
+        raise ReplayError("不是重播檔（magic 不符）")
+    if len(data) < 5 or data[4] != REPLAY_VERSION:
+        raise ReplayError(f"不支援的重播版本：{data[4] if len(data) > 4 else '?'}")
+    cursor = _Cursor(data, 5)
+    seed = cursor.varint()
+    stage_id = cursor.string()
+    team = []
+    for _ in range(cursor.varint()):
+        card_id = cursor.string()
+        team.append((card_id, cursor.varint()))
+    turns = []
+    for _ in range(cursor.varint()):
+        header = cursor.varint()
+        swipes, previous = [], 0
+        for _ in range(header >> 2):
+            packed = cursor.varint()
+            previous += packed >> 3
+            swipes.append(Swipe(previous, packed & 7))
+        actions = []
+        for _ in range(cursor.varint()):
+            packed = cursor.varint()
+            actions.append(Action(packed & 3, packed >> 2 & 7, packed >> 5))
+        stored = [cursor.varint() for _ in ELEMENTS] if header & 2 else None
+        damage = None
+        if header & 1:
+            damage, previous = [], 0
+            for action in actions:
+                if action.kind == ACTION_ATTACK:
+                    previous += _unzigzag(cursor.varint())
+                    damage.append(previous)
+        turns.append(Turn(swipes, actions, stored, damage))
+    return Replay(stage_id, team, seed, turns)
+
+
+def write_library(path, replays):
+    """把多個 Replay（或已編碼的 bytes）寫成重播庫，回傳筆數"""
+    records = [r if isinstance(r, (bytes, bytearray)) else encode_replay(r) for r in replays]
+    compressor = zlib.compressobj(9)
+    with open(path, "wb") as f:
+        f.write(LIBRARY_MAGIC + bytes([REPLAY_VERSION]))
+        head = bytearray()
+        _varint(head, len(records))
+        f.write(compressor.compress(bytes(head)))
+        for record in records:
+            head = bytearray()
+            _varint(head, len(record))
+            f.write(compressor.compress(bytes(head) + record))
+        f.write(compressor.flush())
+    return len(records)
+
+
+def iter_library(path):
+    """逐筆讀取重播庫中的 Replay（分段解壓）"""
+    decompressor = zlib.decompressobj()
+    with open(path, "rb") as f:
+        if f.read(5) != LIBRARY_MAGIC + bytes([REPLAY_VERSION]):
+            raise ReplayError(f"{path} 不是版本 {REPLAY_VERSION} 的重播庫")
+        cursor = _Cursor(b"")
+
+        def need(size):
+            # 確保游標之後至少有 size bytes；已讀過的部分順便丟掉
+            while len(cursor.data) - cursor.pos < size:
+                chunk = f.read(READ_CHUNK)
+                data = decompressor.decompress(chunk) if chunk else decompressor.flush()
+                if not chunk and not data:
+                    raise ReplayError("重播庫被截斷")
+                cursor.data = cursor.data[cursor.pos:] + data
+                cursor.pos = 0
+
+        def take_varint():
+            start = cursor.pos
+            while True:
+                try:
+                    return cursor.varint()
+                except ReplayError:
+                    cursor.pos = start
+                    need(len(cursor.data) - start + 1)
+                    start = cursor.pos
+
+        remaining = take_varint()
+        while remaining:
+            length = take_varint()
+            need(length)
+            record = cursor.data[cursor.pos:cursor.pos + length]
+            cursor.pos += length
+            remaining -= 1
+            yield decode_replay(record)
+
+
+def _is_library(path):
+    with open(path, "rb") as f:
+        return f.read(4) == LIBRARY_MAGIC
+
+
+def load_replays(path):
+    """依副檔名/magic 讀取單一重播檔、JSON 重播或重播庫"""
+    if _is_library(path):
+        return iter_library(path)
+    with open(path, "rb") as f:
+        data = f.read()
+    if data[:4] == REPLAY_MAGIC:
+        return iter([decode_replay(data)])
+    return iter([Replay.from_dict(json.loads(data.decode("utf-8")))])
+
+
+# ========== 重新模擬 ==========
+
+class _Enemy:
+    """戰鬥中的一隻敵人"""
+
+    def __init__(self, data, skills):
+        self.enemy_id = data.get("enemy_id", "")
+        self.hp = int(data.get("max_hp", 0))
+        self.element = card_element(data)
+        self.atk = int(data.get("base_atk", 0))
+        self.attack_cd = max(1, int(data.get("attack_cd", 1)))
+        self.cd = self.attack_cd
+        self.gates, self.reductions = [], []
+        self.slash_penalty_ms = 0
+        self.death_damage = 0
+        self.enter_hp_to_one = False
+        for effect in skills:
+            effect_type, params = effect["effect_type"], effect["params"]
+            if effect_type in GATE_TYPES:
+                self.gates.append((effect_type, params))
+            elif effect_type in ("DAMAGE_REDUCTION_PERCENT", "DAMAGE_REDUCTION_FLAT"):
+                self.reductions.append((effect_type, params))
+            elif effect_type == "REDUCE_SLASH_TIME":
+                self.slash_penalty_ms += int(params.get("reduce_seconds", 0.0) * 1000)
+            elif effect_type == "DEATH_DAMAGE":
+                self.death_damage += int(params.get("damage", 0))
+            elif effect_type == "ENTER_HP_TO_ONE":
+                self.enter_hp_to_one = True
+        self.attacked = False
+        self.damage_count = 0
+
+
+class _Slash:
+    """一回合斬擊後 ElementPanel 的狀態"""
+
+    def __init__(self):
+        self.combo = 0
+        self.multipliers = {}
+        self.heart_hits = 0.0
+        self.orb_totals = [0] * len(ELEMENTS)
+        self.continuous = (None, 0)
+        self.unique = 0
+
+
+class ReplaySimulator:
+    """以目前的資料檔案重新模擬重播中每回合的傷害"""
+
+    def __init__(self, data_dir):
+        self.cards = load_cards(data_dir)
+        with open(os.path.join(data_dir, "enemies.json"), 'r', encoding='utf-8') as f:
+            self.enemies = {e.get("enemy_id"): e for e in json.load(f).get("enemies", [])}
+        with open(os.path.join(data_dir, "stages.json"), 'r', encoding='utf-8') as f:
+            self.stages = {s.get("stage_id"): s for s in json.load(f).get("stages", [])}
+        self.table = load_table(data_dir)
+        self.multipliers = load_multipliers(data_dir)
+        self._enemy_skills = self.table["skills"].get("enemy", {})
+        self._active_skills = self.table["skills"].get("active", {})
+        self._teams = {}
+
+    def _team(self, members):
+        """隊伍中與重播無關的部分（隊長效果、主動技能 Buff）只計算一次"""
+        key = tuple(members)
+        if key not in self._teams:
+            diagnostics = []
+            team = []
+            for card_id, level in members:
+                if card_id not in self.cards:
+                    diagnostics.append(("error", card_id, "卡片不存在"))
+                    team.append({"card_id": card_id, "base_atk": 0})
+                else:
+                    team.append(self.cards[card_id])
+            leader = leader_effects(team, self.table, diagnostics)
+            # 隊員的 HP / ATK / REC 倍率（CardData.hp/atk/recovery_multiplier）直接查隊長技能倍率表
+            leader_skill_ids = (team[0].get("leader_skill_ids") or []) if team else []
+            try:
+                stats, _ = self.multipliers.team_multipliers(leader_skill_ids, [card_element(card) for card in team])
+                leader.atk_multipliers = stats["atk"]
+            except ValueError as error:
+                # 超出倍率表的隊伍人數：沿用 leader_effects 的 ATK 倍率，HP / REC 不套用隊長倍率
+                diagnostics.append(("warning", team[0].get("card_id", ""), f"{error}，改用 leader_effects 計算"))
+                stats = {"hp": [1.0] * len(team), "recovery": [1.0] * len(team)}
+            buffs = {buff.caster_index: buff for buff in active_buffs(team, self.table, diagnostics)}
+            extend = {}
+            for index, card in enumerate(team):
+                compiled = self._active_skills.get(card.get("active_skill_id", ""))
+                for effects in (compiled or {}).get("timings", {}).values():
+                    for effect in effects:
+                        if effect["effect_type"] == "EXTEND_SLASH_TIME":
+                            extend[index] = extend.get(index, 0) + int(effect["params"].get("extend_seconds", 0.0) * 1000)
+            durations = {i: (self._active_skills.get(team[i].get("active_skill_id", "")) or {}).get("duration", 0)
+                         for i in buffs}
+            max_hp = sum(int(level_atk(card.get("base_hp", 0), card, level or None) * mult)
+                         for card, (_, level), mult in zip(team, members, stats["hp"]))
+            recovery = sum(int(level_atk(card.get("base_recovery", 0), card, level or None) * mult)
+                           for card, (_, level), mult in zip(team, members, stats["recovery"]))
+            self._teams[key] = (team, leader, buffs, extend, durations, max_hp, recovery, diagnostics)
+        return self._teams[key]
+
+    def _wave(self, stage, index):
+        enemies = []
+        for group in stage["waves"][index].get("enemies", []):
+            data = self.enemies.get(group.get("enemy_id"), {"enemy_id": group.get("enemy_id")})
+            skills = []
+            for skill_id in data.get("passive_skill_ids", []) or []:
+                for effects in self._enemy_skills.get(skill_id, {}).get("timings", {}).values():
+                    skills.extend(effects)
+            for _ in range(group.get("count", 1)):
+                enemies.append(_Enemy(data, skills))
+        return enemies
+
+    def _slash(self, swipes, window_ms, leader, combo_bonus):
+        slash = _Slash()
+        counts = [0] * len(ELEMENTS)
+        last = None
+        for swipe in swipes:
+            if swipe.time_ms > window_ms:
+                break
+            if last is not None and swipe.time_ms - last > COMBO_TIMEOUT_MS:
+                slash.combo = 0
+            slash.combo += 1
+            counts[swipe.element] += 1
+            slash.orb_totals[swipe.element] += 1
+            element, count = slash.continuous
+            slash.continuous = (swipe.element, count + 1 if element == swipe.element else 1)
+            last = swipe.time_ms
+        if last is None:
+            return slash
+        if window_ms - last > COMBO_TIMEOUT_MS:
+            slash.combo = 0
+        slash.unique = sum(1 for c in counts if c)
+        effective = [float(c) for c in counts]
+        for source, (target, percent) in leader.dual_effects.items():
+            if counts[source] > 0:
+                effective[target] += counts[source] * percent / 100.0
+        slash.heart_hits = effective[HEART]
+        total = sum(effective)
+        combo_mult = 1.0 + (slash.combo + combo_bonus) * COMBO_MULTIPLIER_PER_HIT
+        for element in range(len(ELEMENTS)):
+            own = effective[element]
+            slash.multipliers[element] = (1.0 + own * OWN_ELEMENT_BONUS + (total - own) * OTHER_ELEMENT_BONUS) * combo_mult
+        return slash
+
+    @staticmethod
+    def _gate_open(enemy, slash, stored):
+        for effect_type, params in enemy.gates:
+            if effect_type == "REQUIRE_COMBO" and slash.combo < params.get("required_combo", 10):
+                return False
+            if effect_type == "REQUIRE_COMBO_EXACT" and slash.combo != params.get("required_combo", 7):
+                return False
+            if effect_type == "REQUIRE_COMBO_MAX" and slash.combo > params.get("max_combo", 5):
+                return False
+            if effect_type == "REQUIRE_ORB_TOTAL" and \
+                    slash.orb_totals[params.get("required_element", 0)] < params.get("required_count", 5):
+                return False
+            if effect_type == "REQUIRE_ORB_CONTINUOUS":
+                element, count = slash.continuous
+                if element != params.get("required_element", 0) or count < params.get("required_count", 3):
+                    return False
+            if effect_type == "REQUIRE_ELEMENTS" and slash.unique < params.get("required_unique_elements", 3):
+                return False
+            if effect_type in ("REQUIRE_STORED_ORB_MIN", "REQUIRE_STORED_ORB_EXACT") and stored is not None:
+                for requirement in params.get("requirements", []):
+                    have, need = stored[requirement.get("element", 0)], requirement.get("count", 0)
+                    if have < need or (effect_type == "REQUIRE_STORED_ORB_EXACT" and have != need):
+                        return False
+            if effect_type == "REQUIRE_ENEMY_ATTACK" and not enemy.attacked:
+                return False
+            if effect_type == "DAMAGE_ONCE_ONLY" and enemy.damage_count > 0:
+                return False
+        return True
+
+    @staticmethod
+    def _leader_factor(leader, element, stored):
+        total = 1.0
+        for effect_type, target, params in leader.before_attack:
+            if target != element:
+                continue
+            if effect_type == "DAMAGE_MULTIPLIER":
+                total *= params.get("multiplier", 1.0)
+            elif effect_type == "ALL_DAMAGE_BOOST":
+                total *= 1.0 + params.get("boost_percent", 30.0) / 100.0
+            elif effect_type == "ORB_COUNT_MULTIPLIER":
+                base, top = params.get("base_multiplier", 1.0), params.get("max_multiplier", 3.0)
+                per_tier = params.get("orb_per_tier", 3)
+                orbs = stored[element] if stored is not None else 0
+                mult = min(base + (orbs / float(per_tier) if per_tier > 0 else 0.0) * (top - base), top)
+                if mult > 1.0:
+                    total *= mult
+        return total
+
+    def _attack(self, team, leader, stacks, index, level, enemy, slash, stored):
+        """BattleManager.attack_with_card 對單一敵人造成的傷害（含敵人減傷）"""
+        card = team[index]
+        element = card_element(card)
+        base_atk = card.get("base_atk", 0)
+        damage_buff, element_boost = 1.0, 1.0
+        for buff in stacks:
+            for targets, percent in buff.base_boosts:
+                if index in targets:
+                    base_atk += int(base_atk * percent / 100.0)
+            damage_buff *= buff.damage
+            element_boost *= buff.element_boost.get(element, 1.0)
+        current_atk = int(level_atk(base_atk, card, level or None) * leader.atk_multipliers[index])
+        damage = int(current_atk * slash.multipliers.get(element, 1.0))
+        mult = self._leader_factor(leader, element, stored)
+        if damage_buff > 1.0:
+            mult *= damage_buff
+        if element_boost > 1.0:
+            mult *= element_boost
+        if element not in leader.ignore_resistance:
+            if ADVANTAGE.get(element) == enemy.element:
+                mult *= ADVANTAGE_MULTIPLIER
+            elif ADVANTAGE.get(enemy.element) == element:
+                mult *= DISADVANTAGE_MULTIPLIER
+        final = int(damage * mult)
+        if not self._gate_open(enemy, slash, stored):
+            final = 0
+        for effect_type, params in enemy.reductions:
+            if effect_type == "DAMAGE_REDUCTION_PERCENT":
+                final -= int(final * params.get("reduction_percent", 0.0) / 100.0)
+            else:
+                final = max(0, final - int(params.get("reduction_amount", 0)))
+        return final
+
+    def skill_cost(self, card):
+        """卡片主動技能的 CD（回合數）；沒有 JSON 主動技能時回傳 None"""
+        compiled = self._active_skills.get(card.get("active_skill_id", ""))
+        return None if compiled is None else int(compiled.get("skill_cost", 0))
+
+    def battle(self, stage_id, members):
+        """開始一場戰鬥；之後以 Battle.play(turn) 逐回合推進"""
+        return Battle(self, stage_id, members)
+
+    def run(self, replay):
+        """重新模擬一場重播
+
+        回傳 {"stage_id", "turns": [{"index", "turn", "wave", "combo", "damage", "total", "recorded", "kills",
+              "heal", "incoming", "hp"}], "cleared", "diagnostics": [(severity, source, message)]}
+        """
+        battle = self.battle(replay.stage_id, replay.team)
+        result = {"stage_id": replay.stage_id, "turns": [], "cleared": False, "diagnostics": battle.diagnostics}
+        for turn_index, turn in enumerate(replay.turns):
+            if battle.finished:
+                reason = "關卡已通關" if battle.cleared else "隊伍 HP 歸零"
+                battle.diagnostics.append(("warning", f"turn {turn_index}", f"{reason}，之後的回合未模擬"))
+                break
+            row = battle.play(turn)
+            row["index"] = turn_index
+            row["recorded"] = sum(turn.damage) if turn.damage is not None else None
+            result["turns"].append(row)
+        result["cleared"] = battle.cleared
+        return result
+
+
+class Battle:
+    """一場進行中的戰鬥（BattleManager 的回合流程）
+
+    玩家 HP 以全隊 HP 總和計算：斬擊結束時依心珠回復，敵人攻擊扣除 base_atk；HP 歸零即戰敗（finished 且未 cleared）。
+    """
+
+    def __init__(self, simulator, stage_id, members):
+        self.simulator = simulator
+        self.stage = simulator.stages.get(stage_id)
+        (self.team, self.leader, self.buffs, self.extend, self.durations,
+         self.max_hp, self.recovery, team_diagnostics) = simulator._team(members)
+        self.levels = [level for _, level in members]
+        self.diagnostics = list(team_diagnostics)
+        self.hp = self.max_hp
+        self.wave_index = 0
+        self.turn_number = 1
+        self.active = []   # [[ActiveBuff, 剩餘回合]]，依施放順序
+        self.bonus_ms = self.penalty_ms = 0
+        self.enemies = []
+        self.cleared = False
+        self.finished = False
+        if self.stage is None or not self.stage.get("waves"):
+            self.diagnostics.append(("error", stage_id, "關卡不存在或沒有波次"))
+            self.finished = True
+        else:
+            self._enter_wave()
+
+    def _enter_wave(self):
+        self.enemies = self.simulator._wave(self.stage, self.wave_index)
+        self.penalty_ms += sum(e.slash_penalty_ms for e in self.enemies)
+        if any(e.enter_hp_to_one for e in self.enemies):
+            self.hp = min(self.hp, 1)
+
+    @property
+    def alive(self):
+        """存活敵人的索引"""
+        return [i for i, enemy in enumerate(self.enemies) if enemy.hp > 0]
+
+    def play(self, turn, retarget=False):
+        """執行一個玩家回合（斬擊、行動），以及之後的敵人回合或波次切換；回傳該回合的結果
+
+        retarget=True 時，目標已倒下的攻擊改打第一個存活的敵人（模擬玩家重新選擇目標）
+        """
+        simulator, leader, enemies = self.simulator, self.leader, self.enemies
+        stacks = [buff for buff, _ in self.active]
+        combo_active = next((b.combo_bonus for b in stacks if b.combo_bonus), 0)
+        window = max(MIN_SLASH_MS, SLASH_DURATION_MS + self.bonus_ms - self.penalty_ms)
+        slash = simulator._slash(turn.swipes, window, leader, leader.combo_bonus + combo_active)
+        heal = 0
+        if turn.swipes and slash.heart_hits > 0 and self.recovery > 0:
+            heal = int(self.recovery * (1.0 + slash.heart_hits * OWN_ELEMENT_BONUS) *
+                       (1.0 + slash.combo * COMBO_MULTIPLIER_PER_HIT))
+            self.hp = min(self.max_hp, self.hp + heal)
+        row = {"turn": self.turn_number, "wave": self.wave_index + 1, "combo": slash.combo,
+               "damage": [], "total": 0, "kills": 0, "heal": heal, "incoming": 0}
+        wave_cleared = rested = False
+        for action in turn.actions:
+            if wave_cleared or rested:
+                self.diagnostics.append(("warning", f"turn {self.turn_number}", "回合已結束後仍有行動，已忽略"))
+                break
+            if action.card_index >= len(self.team):
+                self.diagnostics.append(("error", f"turn {self.turn_number}", f"隊員索引 {action.card_index} 超出隊伍"))
+                continue
+            if action.kind == ACTION_REST:
+                slash = _Slash()
+                rested = True
+            elif action.kind == ACTION_SKILL:
+                self.bonus_ms += self.extend.get(action.card_index, 0)
+                buff = self.buffs.get(action.card_index)
+                if buff is not None:
+                    self.active.append([buff, self.durations[action.card_index]])
+                    stacks = [b for b, _ in self.active]
+            else:
+                target = action.target
+                if retarget and (target >= len(enemies) or enemies[target].hp <= 0):
+                    target = next((i for i, e in enumerate(enemies) if e.hp > 0), target)
+                if target >= len(enemies) or enemies[target].hp <= 0:
+                    row["damage"].append(0)
+                    continue
+                enemy = enemies[target]
+                damage = simulator._attack(self.team, leader, stacks, action.card_index,
+                                           self.levels[action.card_index], enemy, slash, turn.stored_orbs)
+                if damage > 0:
+                    enemy.damage_count += 1
+                enemy.hp -= damage
+                row["damage"].append(damage)
+                if enemy.hp <= 0:
+                    row["kills"] += 1
+                    row["incoming"] += enemy.death_damage
+                    if all(e.hp <= 0 for e in enemies):
+                        wave_cleared = True
+        row["total"] = sum(row["damage"])
+
+        # 回合結束：Buff 倒數（波次切換的休息也會倒數）
+        for entry in self.active:
+            entry[1] -= 1
+        self.active = [entry for entry in self.active if entry[1] > 0]
+        if wave_cleared:
+            self.wave_index += 1
+            if self.wave_index >= len(self.stage["waves"]):
+                self.cleared = True
+            else:
+                self._enter_wave()
+        else:
+            for enemy in enemies:
+                if enemy.hp <= 0:
+                    continue
+                enemy.cd -= 1
+                if enemy.cd <= 0:
+                    row["incoming"] += enemy.atk
+                    enemy.attacked = True
+                    enemy.cd = enemy.attack_cd
+            self.turn_number += 1
+        self.hp -= row["incoming"]
+        row["hp"] = self.hp
+        if self.hp <= 0 and not self.cleared:
+            self.finished = True
+        if self.cleared:
+            self.finished = True
+        return row
+
+
+def mismatches(result):
+    """模擬結果中與紀錄傷害不同的回合：[(回合索引, 紀錄, 模擬)]"""
+    return [(row["index"], row["recorded"], row["total"]) for row in result["turns"]
+            if row["recorded"] is not None and row["recorded"] != row["total"]]
+
+
+def format_result(replay, result):
+    lines = [f"=== {replay.stage_id} seed={replay.seed} 隊伍 {', '.join(c for c, _ in replay.team)} ==="]
+    for row in result["turns"]:
+        mark = ""
+        if row["recorded"] is not None:
+            mark = "✅" if row["recorded"] == row["total"] else f"❌ 紀錄 {row['recorded']}"
+        lines.append(f"  回合 {row['turn']:>3}  波次 {row['wave']}  combo {row['combo']:>2}  "
+                     f"傷害 {row['total']:>9}  擊殺 {row['kills']}  {mark}")
+    lines.append(f"  {'✅ 通關' if result['cleared'] else '⚠️ 未通關'}")
+    icons = {"error": "❌", "warning": "⚠️"}
+    for severity, source, message in result["diagnostics"]:
+        lines.append(f"  {icons.get(severity, '-')} [{source}] {message}")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="戰鬥重播：重新模擬與回歸測試")
+    parser.add_argument("data_dir", help="資料目錄（含 cards.json、enemies.json、stages.json）")
+    parser.add_argument("paths", nargs="*", help="重播檔（.cgr）、JSON 重播或重播庫（.cgrl）")
+    parser.add_argument("--dump", action="store_true", help="以 JSON 輸出重播內容，不模擬")
+    parser.add_argument("--pack", metavar="LIBRARY", help="把 paths 中的重播打包成重播庫")
+    parser.add_argument("--limit", type=int, default=10, help="重播庫模式列出的差異筆數（預設 10）")
+    args = parser.parse_args()
+
+    if args.pack:
+        replays = [replay for path in args.paths for replay in load_replays(path)]
+        count = write_library(args.pack, replays)
+        print(f"✅ 已打包 {count} 筆重播 → {args.pack}（{os.path.getsize(args.pack)} bytes）")
+        return 0
+
+    if args.dump:
+        for path in args.paths:
+            for replay in load_replays(path):
+                print(json.dumps(replay.to_dict(), ensure_ascii=False))
+        return 0
+
+    simulator = ReplaySimulator(args.data_dir)
+    battles = turns = changed = 0
+    differences = []
+    started = time.perf_counter()
+    single = len(args.paths) == 1 and not _is_library(args.paths[0])
+    for path in args.paths:
+        for replay in load_replays(path):
+            result = simulator.run(replay)
+            battles += 1
+            turns += len(result["turns"])
+            if single:
+                print(format_result(replay, result))
+            diff = mismatches(result)
+            if diff:
+                changed += 1
+                differences.append((replay, diff))
+    elapsed = time.perf_counter() - started
+    if not single:
+        print(f"重播 {battles} 場 / {turns} 回合，耗時 {elapsed:.2f}s")
+        print(f"{'❌' if changed else '✅'} 傷害與紀錄不同的戰鬥：{changed}")
+        for replay, diff in differences[:args.limit]:
+            detail = ", ".join(f"#{i} {old}→{new}" for i, old, new in diff[:5])
+            print(f"  - {replay.stage_id} seed={replay.seed}: {detail}")
+    return 1 if changed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,352 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+卡片取得時間估算 (Card Acquisition Estimator)
+卡片有三種來源：關卡掉落 (stages.json rewards.card_drops)、抽卡池 (gacha_pools.json)、
+商城 specific_card / bundle 獎勵 (shop_items.json)。本工具把三者換算成「玩家遊玩時數」，
+估算每張卡片的期望取得時間，並以最短路徑搜尋求出取得 N 張（進化素材）最省時的來源組合。
+
+換算方式（依遊玩模式 PlayPattern）：
+- 關卡通關時間 = StageDifficulty 估算回合數 × 每回合秒數 + 每場固定秒數；
+  結果快取在 data/.gm_cache/clear_times.json（來源檔 md5 改變時重算），也可用 --clear-times 指定實測秒數
+- 金幣收入 = 每小時金幣最多的關卡；鑽石以商城最划算的「金幣換鑽石」價格換算成金幣
+- 掉落：每張期望時數 = 通關時數 ÷ drop_rate（calculate_rewards 每個 card_drops 各自擲骰）
+- 抽卡：每抽機率依 GachaScreen.draw_single_card（保底換算成等效傳說機率，空的稀有度清單會改抽 C001~C003）；
+  有 max_pulls 的卡池以期望張數當作使用上限
+- 商城：價格換算成時數，purchase_limit 為使用上限
+
+用法：
+    python tool/CardAcquisition.py data
+    python tool/CardAcquisition.py data --card AT2 --copies 2 --seconds-per-turn 20
+"""
+
+import argparse
+import hashlib
+import heapq
+import json
+import os
+import sys
+
+from SnapshotCache import CACHE_DIR_NAME
+from StageDifficulty import load_data, score_stages
+
+
+CLEAR_TIMES_FILE = "clear_times.json"
+CLEAR_TIMES_VERSION = 1
+CLEAR_TIME_SOURCES = ["stages.json", "enemies.json", "cards.json",
+                      os.path.join("config", "regions.json"), os.path.join("config", "enemy_skills.json")]
+GACHA_FALLBACK_CARDS = ["C001", "C002", "C003"]  # get_random_card_by_rarity 的空清單預設值
+MAX_SEARCH_STATES = 200000
+
+
+class PlayPattern:
+    """玩家的遊玩模式"""
+
+    def __init__(self, seconds_per_turn=15.0, battle_overhead=30.0, use_gacha=True, use_shop=True, farm_stages=None):
+        self.seconds_per_turn = seconds_per_turn
+        self.battle_overhead = battle_overhead
+        self.use_gacha = use_gacha
+        self.use_shop = use_shop
+        self.farm_stages = farm_stages  # 刷金幣的關卡（None 為所有關卡）
+
+    def clear_hours(self, turns):
+        return (turns * self.seconds_per_turn + self.battle_overhead) / 3600.0
+
+
+# ========== 通關時間快取 ==========
+
+def _sources_md5(data_dir):
+    digest = hashlib.md5()
+    for rel_path in CLEAR_TIME_SOURCES:
+        path = os.path.join(data_dir, rel_path)
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                digest.update(f.read())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def load_clear_turns(data_dir, data=None):
+    """每個關卡的估算回合數 {stage_id: turns}；使用 .gm_cache/clear_times.json 快取"""
+    from JsonWriter import write_json_if_changed
+
+    cache_path = os.path.join(data_dir, CACHE_DIR_NAME, CLEAR_TIMES_FILE)
+    signature = _sources_md5(data_dir)
+    if os.path.exists(cache_path):
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            cached = json.load(f)
+        if cached.get("version") == CLEAR_TIMES_VERSION and cached.get("source_md5") == signature:
+            return cached["turns"]
+    data = data or load_data(data_dir)
+    result = score_stages(data["stages"], data["enemies"], data["cards"], data["regions"], data["enemy_skills"])
+    turns = {row["stage_id"]: row["turns"] for row in result["stages"]}
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    write_json_if_changed(cache_path, {"version": CLEAR_TIMES_VERSION, "source_md5": signature, "turns": turns})
+    return turns
+
+
+# ========== 來源 ==========
+
+class Source:
+    """一種取得方式：每次使用花費 hours 小時、得到 copies 張，最多使用 limit 次（None 為無限）"""
+
+    def __init__(self, kind, source_id, hours, copies=1, limit=None, note=""):
+        self.kind = kind
+        self.source_id = source_id
+        self.hours = hours
+        self.copies = copies
+        self.limit = limit
+        self.note = note
+
+    @property
+    def label(self):
+        return f"{self.kind}:{self.source_id}"
+
+
+def pity_adjusted_rates(pool):
+    """保底換算後每抽落在各稀有度的機率 {bucket: rate}"""
+    legendary = pool.get("legendary_rate", 0.01)
+    epic = pool.get("epic_rate", 0.05)
+    rare = pool.get("rare_rate", 0.20)
+    common = max(1.0 - legendary - epic - rare, 0.0)
+    threshold = pool.get("pity_threshold", 90)
+    effective = legendary
+    if threshold and threshold > 0 and 0 < legendary < 1:
+        # 到保底為止的期望抽數 = (1 - (1 - r)^T) / r
+        effective = legendary / (1.0 - (1.0 - legendary) ** threshold)
+    rest = 1.0 - legendary
+    scale = (1.0 - effective) / rest if rest > 0 else 0.0
+    return {"legendary": effective, "epic": epic * scale, "rare": rare * scale, "common": common * scale}
+
+
+def pull_probabilities(pool):
+    """每抽得到各卡片的機率 {card_id: p}，以及使用預設清單的稀有度"""
+    card_pool = pool.get("card_pool", {}) or {}
+    probabilities, fallback = {}, []
+    for bucket, rate in pity_adjusted_rates(pool).items():
+        card_ids = card_pool.get(bucket) or []
+        if not card_ids:
+            if rate > 0:
+                fallback.append(bucket)
+            card_ids = GACHA_FALLBACK_CARDS
+        for card_id in card_ids:
+            probabilities[card_id] = probabilities.get(card_id, 0.0) + rate / len(card_ids)
+    return probabilities, fallback
+
+
+class Economy:
+    """金幣 / 鑽石換算成時數"""
+
+    def __init__(self, gold_per_hour, gold_per_gem):
+        self.gold_per_hour = gold_per_hour
+        self.gold_per_gem = gold_per_gem
+
+    def hours(self, amount, currency):
+        gold = amount * self.gold_per_gem if currency == "gem" else amount
+        return gold / self.gold_per_hour if self.gold_per_hour > 0 else float("inf")
+
+
+def build_economy(stages, shop_items, stage_hours, farm_stages=None):
+    gold_per_hour = max((stage.get("rewards", {}).get("gold", 0) / stage_hours[stage.get("stage_id")]
+                         for stage in stages if stage_hours.get(stage.get("stage_id"))
+                         and (farm_stages is None or stage.get("stage_id") in farm_stages)), default=0.0)
+    gem_prices = [item.get("price", 0) / item["reward_config"]["amount"]
+                  for item in shop_items
+                  if item.get("currency") == "gold" and item.get("reward_type") == "currency"
+                  and item.get("reward_config", {}).get("currency_type") == "gem"
+                  and item.get("reward_config", {}).get("amount")]
+    return Economy(gold_per_hour, min(gem_prices) if gem_prices else float("inf"))
+
+
+def _shop_card_rewards(item):
+    """商城物品包含的卡片 [(card_id, count)]"""
+    config = item.get("reward_config", {}) or {}
+    if item.get("reward_type") == "specific_card":
+        return [(config.get("card_id", ""), config.get("count", 1))]
+    if item.get("reward_type") == "bundle":
+        return [(reward.get("card_id", ""), reward.get("count", 1))
+                for reward in config.get("rewards", []) if reward.get("type") == "specific_card"]
+    return []
+
+
+class AcquisitionModel:
+    """所有卡片的取得來源"""
+
+    def __init__(self, data, clear_turns, pattern=None):
+        self.pattern = pattern or PlayPattern()
+        stages = (data.get("stages") or {}).get("stages", [])
+        shop_items = (data.get("shop_items") or {}).get("items", [])
+        pools = (data.get("gacha_pools") or {}).get("pools", [])
+        self.card_ids = [card.get("card_id", "") for card in (data.get("cards") or {}).get("cards", [])]
+        self.warnings = []
+        self.stage_hours = {sid: self.pattern.clear_hours(turns) for sid, turns in clear_turns.items()}
+        self.economy = build_economy(stages, shop_items, self.stage_hours, self.pattern.farm_stages)
+        self.sources = {}  # card_id -> [Source]
+
+        for stage in stages:
+            stage_id = stage.get("stage_id", "")
+            hours = self.stage_hours.get(stage_id)
+            rates = {}
+            for drop in stage.get("rewards", {}).get("card_drops", []) or []:
+                rates[drop.get("card_id", "")] = rates.get(drop.get("card_id", ""), 0.0) + drop.get("drop_rate", 0)
+            for card_id, rate in rates.items():
+                if hours and rate > 0:
+                    self._add(card_id, Source("drop", stage_id, hours / min(rate, 1.0), note=f"掉落率 {rate:.0%}"))
+
+        if self.pattern.use_gacha:
+            for pool in pools:
+                pool_id = pool.get("id", "")
+                cost = min(pool.get("single_pull_cost", 1), pool.get("ten_pull_cost", 10) / 10.0)
+                pull_hours = self.economy.hours(cost, pool.get("currency", "gem"))
+                probabilities, fallback = pull_probabilities(pool)
+                if fallback:
+                    self.warnings.append(f"卡池 {pool_id} 沒有 {', '.join(fallback)} 清單，抽到時會改抽 {', '.join(GACHA_FALLBACK_CARDS)}")
+                for card_id, probability in probabilities.items():
+                    limit = None
+                    if pool.get("max_pulls"):
+                        limit = int(pool["max_pulls"] * probability)
+                        if limit <= 0:
+                            continue
+                    self._add(card_id, Source("gacha", pool_id, pull_hours / probability, limit=limit,
+                                              note=f"每抽 {probability:.2%}"))
+
+        if self.pattern.use_shop:
+            for item in shop_items:
+                for card_id, count in _shop_card_rewards(item):
+                    if count <= 0:
+                        continue
+                    hours = self.economy.hours(item.get("price", 0), item.get("currency", "gold"))
+                    self._add(card_id, Source("shop", item.get("id", ""), hours, copies=count,
+                                              limit=item.get("purchase_limit"), note=f"{item.get('price')} {item.get('currency')}"))
+
+    def _add(self, card_id, source):
+        if card_id not in self.card_ids:
+            self.warnings.append(f"{source.label} 提供的卡片 {card_id} 不在 cards.json 中")
+        self.sources.setdefault(card_id, []).append(source)
+
+    def cheapest_path(self, card_id, copies=1):
+        """Dijkstra：狀態為 (已取得張數, 各有限來源已使用次數)，回傳 (總時數, [(Source, 次數)])
+
+        取得不到時回傳 (inf, [])
+        """
+        sources = [s for s in self.sources.get(card_id, []) if s.hours < float("inf")]
+        if copies <= 0:
+            return 0.0, []
+        limited = [i for i, s in enumerate(sources) if s.limit is not None]
+        slot = {index: position for position, index in enumerate(limited)}
+        start = (0, (0,) * len(limited))
+        best = {start: 0.0}
+        previous = {}
+        heap = [(0.0, start)]
+        while heap:
+            hours, state = heapq.heappop(heap)
+            if hours > best.get(state, float("inf")):
+                continue
+            owned, used = state
+            if owned >= copies:
+                path = []
+                while state in previous:
+                    state, index = previous[state]
+                    path.append(index)
+                counts = {}
+                for index in path:
+                    counts[index] = counts.get(index, 0) + 1
+                return hours, [(sources[index], times) for index, times in sorted(counts.items(), key=lambda kv: sources[kv[0]].label)]
+            if len(best) > MAX_SEARCH_STATES:
+                break
+            for index, source in enumerate(sources):
+                next_used = used
+                if index in slot:
+                    position = slot[index]
+                    if used[position] >= min(source.limit, copies):
+                        continue
+                    next_used = used[:position] + (used[position] + 1,) + used[position + 1:]
+                next_state = (min(owned + source.copies, copies), next_used)
+                cost = hours + source.hours
+                if cost < best.get(next_state, float("inf")):
+                    best[next_state] = cost
+                    previous[next_state] = (state, index)
+                    heapq.heappush(heap, (cost, next_state))
+        return float("inf"), []
+
+
+# ========== 進化素材 ==========
+
+def material_requirements(cards_data):
+    """素材卡片 -> 單次進化最多需要的張數"""
+    needed = {}
+    for card in (cards_data or {}).get("cards", []):
+        counts = {}
+        for material in card.get("material", []) or []:
+            counts[material] = counts.get(material, 0) + 1
+        for material, count in counts.items():
+            needed[material] = max(needed.get(material, 0), count)
+    return needed
+
+
+def load_model(data_dir, pattern=None, clear_times_path=None):
+    """讀取資料並建立 AcquisitionModel；clear_times_path 為實測通關秒數 {stage_id: seconds}"""
+    data = load_data(data_dir)
+    for key, rel_path in (("shop_items", os.path.join("config", "shop_items.json")),
+                          ("gacha_pools", os.path.join("config", "gacha_pools.json"))):
+        path = os.path.join(data_dir, rel_path)
+        data[key] = None
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                data[key] = json.load(f)
+    pattern = pattern or PlayPattern()
+    clear_turns = dict(load_clear_turns(data_dir, data))
+    if clear_times_path:
+        with open(clear_times_path, 'r', encoding='utf-8') as f:
+            measured = json.load(f)
+        for stage_id, seconds in measured.items():
+            clear_turns[stage_id] = max(seconds - pattern.battle_overhead, 0.0) / pattern.seconds_per_turn
+    return AcquisitionModel(data, clear_turns, pattern), data
+
+
+def format_path(hours, path):
+    if not path:
+        return "無法取得"
+    steps = "、".join(f"{source.label} ×{times}（{source.note}）" for source, times in path)
+    return f"{hours:.3g} 小時：{steps}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="估算卡片的期望取得時間（玩家時數）")
+    parser.add_argument("data_dir", help="data 資料夾路徑")
+    parser.add_argument("--card", help="只計算這張卡片")
+    parser.add_argument("--copies", type=int, default=None, help="需要的張數（預設：進化素材需求，其他卡片 1 張）")
+    parser.add_argument("--seconds-per-turn", type=float, default=15.0, help="每回合秒數（預設 15）")
+    parser.add_argument("--overhead", type=float, default=30.0, help="每場戰鬥的固定秒數（預設 30）")
+    parser.add_argument("--clear-times", help="實測通關秒數 JSON：{stage_id: seconds}")
+    parser.add_argument("--no-gacha", action="store_true", help="不使用抽卡")
+    parser.add_argument("--no-shop", action="store_true", help="不使用商城")
+    parser.add_argument("--farm", nargs="+", help="刷金幣的關卡 ID（預設為所有關卡中效率最高者）")
+    args = parser.parse_args()
+
+    pattern = PlayPattern(args.seconds_per_turn, args.overhead, not args.no_gacha, not args.no_shop, args.farm)
+    model, data = load_model(args.data_dir, pattern, args.clear_times)
+    materials = material_requirements(data["cards"])
+    economy = model.economy
+    print(f"=== 卡片取得時間：每小時 {economy.gold_per_hour:.0f} 金幣，1 鑽石 = {economy.gold_per_gem:g} 金幣 ===")
+    for warning in sorted(set(model.warnings)):
+        print(f"⚠️ {warning}")
+
+    card_ids = [args.card] if args.card else model.card_ids
+    unreachable = 0
+    for card_id in card_ids:
+        copies = args.copies or materials.get(card_id, 1)
+        hours, path = model.cheapest_path(card_id, copies)
+        if not path:
+            unreachable += 1
+            if not args.card and card_id not in materials:
+                continue
+        mark = "🧪" if card_id in materials else "  "
+        print(f"{mark} {card_id:<10} ×{copies}  {format_path(hours, path)}")
+    if unreachable:
+        print(f"⚠️ {unreachable} 張卡片沒有任何取得來源")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
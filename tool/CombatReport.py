@@ -0,0 +1,366 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+試玩戰鬥分析報表 (Combat Report)
+以 BattleLogParser 解析試玩日誌後的欄式事件，統計：
+
+1. 每個關卡的傷害分佈（attack_with_card 的實際傷害、玩家承受傷害），以兩位有效數字分桶
+2. 傷害條件（check_enemy_damage_requirements 的 [條件檢查] ✓ / ❌）每個技能的失敗率
+3. 連擊數分佈（ElementPanel 的「連擊結束！總連擊」）
+4. 每一波使用的回合數（wave_start → wave_clear 的回合差）
+5. 主動技能與被觸發技能的使用次數
+
+每份日誌的欄式資料與統計結果快取在日誌資料夾的 .gm_cache/combat_report/，
+日誌增長時只解析新增的行，統計也只讀取 manifest 記錄之後新增的列（各項統計皆可直接相加合併）。
+關卡由 StageSelect 在戰鬥前印出的「選擇關卡」對應；沒有該行的戰鬥歸在 UNKNOWN_STAGE。
+
+用法：
+    python tool/CombatReport.py playtest_logs/ --out combat_report.html
+    python tool/CombatReport.py a.log b.log --top 30
+"""
+
+import argparse
+import glob
+import hashlib
+import html
+import json
+import os
+import sys
+import time
+
+from BattleLogParser import TraceReader, ingest
+from SnapshotCache import CACHE_DIR_NAME
+
+
+AGGREGATE_VERSION = 1
+CACHE_SUBDIR = "combat_report"
+UNKNOWN_STAGE = "(未知關卡)"
+LOG_PATTERNS = ("*.log", "*.txt")
+TOP_SKILLS = 20               # 技能使用次數列出的數量
+PERCENTILES = (0.5, 0.9, 0.99)
+
+
+# ========== 統計 ==========
+
+def damage_bucket(value):
+    """以兩位有效數字分桶（123 -> 120, 4567 -> 4500），讓不同日誌的分佈可以相加"""
+    value = int(value)
+    if value <= 0:
+        return 0
+    scale = 10 ** max(len(str(value)) - 2, 0)
+    return value // scale * scale
+
+
+def _count(counter, key, amount=1):
+    key = str(key)
+    counter[key] = counter.get(key, 0) + amount
+
+
+def _merge_counts(target, source):
+    """合併巢狀的計數字典（數值相加）"""
+    for key, value in source.items():
+        if isinstance(value, dict):
+            _merge_counts(target.setdefault(key, {}), value)
+        elif key == "max_hit":
+            target[key] = max(target.get(key, 0), value)
+        else:
+            target[key] = target.get(key, 0) + value
+
+
+def new_aggregate():
+    return {"battles": 0, "victories": 0, "stages": {}, "requirements": {}, "combo": {},
+            "active_skills": {}, "skill_triggers": {},
+            # 跨增量需要保留的對應關係（合併報表時不使用）
+            "state": {"battle_stage": {}, "stage_names": {}, "last_stage": None, "wave_starts": {}}}
+
+
+def _stage(aggregate, stage_id):
+    return aggregate["stages"].setdefault(stage_id, {
+        "battles": 0, "victories": 0, "hits": {}, "hit_count": 0, "damage_total": 0, "max_hit": 0,
+        "incoming": {}, "blocked": 0, "wave_turns": {}, "requirements": {}})
+
+
+def _columns(reader, table, columns, since):
+    """逐塊讀取新增的列：yield [column values...]（每個元素為該欄位的一段 list）"""
+    if table not in reader.tables:
+        return
+    previous = ((since or {}).get("tables") or {}).get(table, {}).get("columns", {})
+    iterators = [reader.iter_column(table, column, start=previous.get(column, {}).get("bytes", 0))
+                 for column in columns]
+    yield from zip(*iterators)
+
+
+def update_aggregate(aggregate, reader, since=None):
+    """把 reader 中 since（先前的 manifest）之後新增的事件加進 aggregate"""
+    state = aggregate["state"]
+    battle_stage = state["battle_stage"]
+
+    # 關卡對應：依行號合併 stage_select 與 battle_start（兩者每場戰鬥各一列）
+    markers = []
+    for lines, stage_ids, names in _columns(reader, "stage_select", ["line", "stage_id", "stage_name"], since):
+        markers.extend((line, stage_id, name) for line, stage_id, name in zip(lines, stage_ids, names))
+    for lines, battles in _columns(reader, "battle_start", ["line", "battle"], since):
+        markers.extend((line, None, battle) for line, battle in zip(lines, battles))
+    for _, stage_id, value in sorted(markers, key=lambda marker: marker[0]):
+        if stage_id is not None:
+            state["last_stage"] = stage_id
+            state["stage_names"][stage_id] = value
+            continue
+        stage_id = state["last_stage"] or UNKNOWN_STAGE
+        battle_stage[str(value)] = stage_id
+        aggregate["battles"] += 1
+        _stage(aggregate, stage_id)["battles"] += 1
+
+    def stages_of(battles):
+        return [battle_stage.get(str(battle), UNKNOWN_STAGE) for battle in battles]
+
+    # 每一波的回合數
+    wave_starts = state["wave_starts"]
+    for battles, waves, turns in _columns(reader, "wave_start", ["battle", "wave", "turn"], since):
+        for battle, wave, turn in zip(battles, waves, turns):
+            wave_starts[f"{battle}:{wave}"] = turn
+    for battles, waves, turns in _columns(reader, "wave_clear", ["battle", "wave", "turn"], since):
+        for stage_id, battle, wave, turn in zip(stages_of(battles), battles, waves, turns):
+            start = wave_starts.pop(f"{battle}:{wave}", None)
+            if start is not None:
+                _count(_stage(aggregate, stage_id)["wave_turns"].setdefault(str(wave), {}), turn - start + 1)
+    for battles, victories in _columns(reader, "battle_end", ["battle", "victory"], since):
+        for stage_id, battle, victory in zip(stages_of(battles), battles, victories):
+            if victory:
+                aggregate["victories"] += 1
+                _stage(aggregate, stage_id)["victories"] += 1
+            # 戰敗時未完成的波次不再需要
+            prefix = f"{battle}:"
+            for key in [key for key in wave_starts if key.startswith(prefix)]:
+                del wave_starts[key]
+
+    # 傷害分佈
+    for battles, damages in _columns(reader, "damage", ["battle", "damage"], since):
+        for stage_id, damage in zip(stages_of(battles), damages):
+            stage = _stage(aggregate, stage_id)
+            _count(stage["hits"], damage_bucket(damage))
+            stage["hit_count"] += 1
+            stage["damage_total"] += damage
+            stage["max_hit"] = max(stage["max_hit"], damage)
+    for battles, damages in _columns(reader, "player_damage", ["battle", "damage"], since):
+        for stage_id, damage in zip(stages_of(battles), damages):
+            _count(_stage(aggregate, stage_id)["incoming"], damage_bucket(damage))
+    for (battles,) in _columns(reader, "damage_blocked", ["battle"], since):
+        for stage_id in stages_of(battles):
+            _stage(aggregate, stage_id)["blocked"] += 1
+
+    # 傷害條件
+    for battles, skills, passed in _columns(reader, "requirement", ["battle", "skill", "passed"], since):
+        for stage_id, skill, ok in zip(stages_of(battles), skills, passed):
+            outcome = "passed" if ok else "failed"
+            _count(aggregate["requirements"].setdefault(skill, {}), outcome)
+            _count(_stage(aggregate, stage_id)["requirements"].setdefault(skill, {}), outcome)
+
+    # 連擊與技能
+    for (combos,) in _columns(reader, "combo_end", ["combo"], since):
+        for combo in combos:
+            _count(aggregate["combo"], combo)
+    for (cards,) in _columns(reader, "active_skill", ["card"], since):
+        for card in cards:
+            _count(aggregate["active_skills"], card)
+    for sources, skills in _columns(reader, "skill_trigger", ["source", "skill"], since):
+        for source, skill in zip(sources, skills):
+            _count(aggregate["skill_triggers"], f"{source}: {skill}")
+    return aggregate
+
+
+# ========== 快取 ==========
+
+def _cache_prefix(log_path):
+    log_path = os.path.abspath(log_path)
+    digest = hashlib.sha1(log_path.encode("utf-8")).hexdigest()[:8]
+    cache_dir = os.path.join(os.path.dirname(log_path), CACHE_DIR_NAME, CACHE_SUBDIR)
+    return os.path.join(cache_dir, f"{os.path.basename(log_path)}.{digest}")
+
+
+def _is_prefix(previous, current):
+    """先前的 manifest 是否為目前 manifest 的前段（欄位只會往後追加）"""
+    for table, info in (previous.get("tables") or {}).items():
+        columns = current["tables"].get(table, {}).get("columns", {})
+        for column, column_info in info["columns"].items():
+            if columns.get(column, {}).get("bytes", -1) < column_info["bytes"]:
+                return False
+    return True
+
+
+def analyze_log(log_path):
+    """解析（增量）一份日誌並更新其統計快取；回傳 (aggregate, 本次新解析的行數)"""
+    prefix = _cache_prefix(log_path)
+    os.makedirs(os.path.dirname(prefix), exist_ok=True)
+    processed = ingest(log_path, prefix + ".trace")
+    reader = TraceReader(prefix + ".trace")
+
+    cache_path = prefix + ".json"
+    cached = None
+    if os.path.exists(cache_path):
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            cached = json.load(f)
+        if cached.get("version") != AGGREGATE_VERSION or not _is_prefix(cached["manifest"], reader.manifest):
+            cached = None
+    if cached is None:
+        aggregate, since = new_aggregate(), None
+    else:
+        aggregate, since = cached["aggregate"], cached["manifest"]
+    if since is None or since.get("tables") != reader.manifest["tables"]:
+        update_aggregate(aggregate, reader, since)
+        tmp_path = cache_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"version": AGGREGATE_VERSION, "manifest": {"tables": reader.manifest["tables"]},
+                       "aggregate": aggregate}, f, ensure_ascii=False)
+        os.replace(tmp_path, cache_path)
+    return aggregate, processed
+
+
+def collect_logs(paths):
+    logs = []
+    for path in paths:
+        if os.path.isdir(path):
+            for pattern in LOG_PATTERNS:
+                logs.extend(sorted(glob.glob(os.path.join(path, pattern))))
+        elif os.path.exists(path):
+            logs.append(path)
+    return logs
+
+
+def combine(aggregates):
+    """合併多份日誌的統計（不含 state）"""
+    combined = new_aggregate()
+    del combined["state"]
+    names = {}
+    for aggregate in aggregates:
+        names.update(aggregate["state"]["stage_names"])
+        _merge_counts(combined, {key: value for key, value in aggregate.items() if key != "state"})
+    combined["stage_names"] = names
+    return combined
+
+
+# ========== 報表 ==========
+
+def percentile(histogram, fraction):
+    """由分桶計數求百分位數（回傳所在的桶）"""
+    total = sum(histogram.values())
+    if total == 0:
+        return 0
+    running = 0
+    for bucket in sorted(histogram, key=int):
+        running += histogram[bucket]
+        if running >= fraction * total:
+            return int(bucket)
+    return 0
+
+
+def _bars(histogram, label_format="{}"):
+    """以 div 寬度畫出的橫條圖"""
+    if not histogram:
+        return "<p class='muted'>（沒有資料）</p>"
+    peak = max(histogram.values())
+    rows = []
+    for key in sorted(histogram, key=lambda k: int(k) if k.lstrip("-").isdigit() else k):
+        count = histogram[key]
+        width = 100.0 * count / peak
+        rows.append(f"<tr><td class='num'>{html.escape(label_format.format(key))}</td>"
+                    f"<td class='bar'><div style='width:{width:.1f}%'></div></td><td class='num'>{count}</td></tr>")
+    return "<table class='hist'>" + "".join(rows) + "</table>"
+
+
+def _rate(part, total):
+    return f"{100.0 * part / total:.1f}%" if total else "-"
+
+
+def render_html(combined, logs, top=TOP_SKILLS):
+    esc = html.escape
+    names = combined.get("stage_names", {})
+    parts = [
+        "<!DOCTYPE html><html lang='zh-Hant'><head><meta charset='utf-8'><title>試玩戰鬥分析</title><style>",
+        "body{font-family:'Noto Sans TC',sans-serif;margin:24px;color:#222}"
+        "table{border-collapse:collapse;margin:8px 0}td,th{border:1px solid #ccc;padding:3px 8px}"
+        "th{background:#f0f0f0}.num{text-align:right}.muted{color:#888}"
+        ".hist td{border:none;padding:1px 6px}.bar{width:320px}.bar div{background:#4a7bd0;height:12px}"
+        "details{margin:6px 0}",
+        "</style></head><body>",
+        "<h1>試玩戰鬥分析</h1>",
+        f"<p>{len(logs)} 份日誌｜{combined['battles']} 場戰鬥｜勝率 {_rate(combined['victories'], combined['battles'])}"
+        f"｜產生時間 {esc(time.strftime('%Y-%m-%d %H:%M:%S'))}</p>",
+    ]
+
+    # 關卡
+    parts.append("<h2>關卡</h2><table><tr><th>關卡</th><th>戰鬥</th><th>勝率</th><th>攻擊次數</th><th>平均傷害</th>"
+                 + "".join(f"<th>P{int(p * 100)}</th>" for p in PERCENTILES)
+                 + "<th>最大傷害</th><th>承受 P90</th><th>被阻擋</th><th>平均回合/波</th></tr>")
+    for stage_id in sorted(combined["stages"]):
+        stage = combined["stages"][stage_id]
+        wave_counts = [(int(turns), count) for waves in stage["wave_turns"].values() for turns, count in waves.items()]
+        wave_total = sum(count for _, count in wave_counts)
+        average_turns = f"{sum(t * c for t, c in wave_counts) / wave_total:.2f}" if wave_total else "-"
+        average_hit = f"{stage['damage_total'] / stage['hit_count']:.0f}" if stage["hit_count"] else "-"
+        label = stage_id + (f" {names[stage_id]}" if stage_id in names else "")
+        parts.append(f"<tr><td>{esc(label)}</td><td class='num'>{stage['battles']}</td>"
+                     f"<td class='num'>{_rate(stage['victories'], stage['battles'])}</td>"
+                     f"<td class='num'>{stage['hit_count']}</td><td class='num'>{average_hit}</td>"
+                     + "".join(f"<td class='num'>{percentile(stage['hits'], p)}</td>" for p in PERCENTILES)
+                     + f"<td class='num'>{stage['max_hit']}</td><td class='num'>{percentile(stage['incoming'], 0.9)}</td>"
+                     f"<td class='num'>{stage['blocked']}</td><td class='num'>{average_turns}</td></tr>")
+    parts.append("</table>")
+    for stage_id in sorted(combined["stages"]):
+        stage = combined["stages"][stage_id]
+        parts.append(f"<details><summary>{esc(stage_id)} 傷害分佈 / 每波回合數</summary>")
+        parts.append("<h4>玩家造成的傷害（兩位有效數字分桶）</h4>" + _bars(stage["hits"]))
+        parts.append("<h4>玩家承受的傷害</h4>" + _bars(stage["incoming"]))
+        for wave in sorted(stage["wave_turns"], key=int):
+            parts.append(f"<h4>第 {esc(wave)} 波回合數</h4>" + _bars(stage["wave_turns"][wave], "{} 回合"))
+        parts.append("</details>")
+
+    # 傷害條件
+    parts.append("<h2>傷害條件失敗率</h2><table><tr><th>技能</th><th>檢查次數</th><th>失敗</th><th>失敗率</th></tr>")
+    requirements = combined["requirements"]
+    for skill in sorted(requirements, key=lambda s: -requirements[s].get("failed", 0)):
+        passed, failed = requirements[skill].get("passed", 0), requirements[skill].get("failed", 0)
+        parts.append(f"<tr><td>{esc(skill)}</td><td class='num'>{passed + failed}</td><td class='num'>{failed}</td>"
+                     f"<td class='num'>{_rate(failed, passed + failed)}</td></tr>")
+    parts.append("</table>")
+
+    parts.append("<h2>連擊數分佈</h2>" + _bars(combined["combo"], "{} 連擊"))
+
+    parts.append("<h2>技能使用次數</h2>")
+    for title, counts in (("主動技能（卡片）", combined["active_skills"]), ("觸發的技能", combined["skill_triggers"])):
+        parts.append(f"<h4>{title}</h4><table><tr><th>名稱</th><th>次數</th></tr>")
+        for name in sorted(counts, key=lambda n: -counts[n])[:top]:
+            parts.append(f"<tr><td>{esc(name)}</td><td class='num'>{counts[name]}</td></tr>")
+        parts.append("</table>")
+
+    parts.append("<h2>日誌</h2><ul>" + "".join(f"<li>{esc(log)}</li>" for log in logs) + "</ul>")
+    parts.append("</body></html>")
+    return "\n".join(parts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="從試玩日誌產生戰鬥分析 HTML 報表")
+    parser.add_argument("paths", nargs="+", help="日誌檔或包含日誌的資料夾")
+    parser.add_argument("--out", default="combat_report.html", help="輸出的 HTML 檔")
+    parser.add_argument("--top", type=int, default=TOP_SKILLS, help="技能使用次數列出的數量")
+    args = parser.parse_args()
+
+    logs = collect_logs(args.paths)
+    if not logs:
+        print("❌ 找不到日誌")
+        return 1
+    started = time.perf_counter()
+    aggregates = []
+    for log in logs:
+        aggregate, processed = analyze_log(log)
+        aggregates.append(aggregate)
+        print(f"  {log}: 新增 {processed} 行，{aggregate['battles']} 場戰鬥")
+    combined = combine(aggregates)
+    with open(args.out, 'w', encoding='utf-8') as f:
+        f.write(render_html(combined, logs, args.top))
+    print(f"✅ 已寫入 {args.out} ({time.perf_counter() - started:.2f}s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
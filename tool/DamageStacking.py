@@ -0,0 +1,481 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+傷害倍率疊加計算 (Damage Stacking Calculator)
+依 BattleManager.attack_with_card 的公式，列舉一支隊伍所有可達的「隊長技能 × 主動技能 Buff 疊層」組合，
+計算每張卡片最終傷害倍率的最小 / 期望 / 最大值，並標出超過傷害上限的組合。
+
+傷害公式（與遊戲相同）：
+    current_atk = int(int(base_atk × 等級比例) × 永久攻擊倍率)      ← TEAM_*_MULTIPLIER / BASE_DAMAGE_BOOST / BASE_STAT_BOOST
+    damage      = int(current_atk × 斬擊元素倍率)                     ← ElementPanel（含 COMBO_BOOST、ORB_DUAL_EFFECT）
+    final       = int(damage × 隊長 BEFORE_ATTACK 倍率
+                              × (DAMAGE_MULTIPLIER × FINAL_DAMAGE_MULTIPLIER，>1 才套用)
+                              × (ELEMENT_DAMAGE_BOOST_<元素>，>1 才套用)
+                              × 屬性相克（IGNORE_RESISTANCE 的元素不套用）)
+
+組合格點：隊伍中每個主動技能的 Buff 疊層數 0 ~ ceil(duration / skill_cost)
+（duration 大於冷卻回合時，重複施放會讓 get_active_buff_multiplier 把每一層都乘進去）。
+期望值假設技能冷卻好就施放、各技能互相獨立；斬擊分為三種情境：
+- min：沒有斬擊、沒有儲存靈珠
+- typical：--typical-combo 次全部斬本屬性、儲存 --typical-orbs 顆靈珠
+- max：--max-combo 次、每次都選對該元素最有利的靈珠（含雙重效果），靈珠數量倍率達上限
+敵人屬性對 min / max 取最差 / 最好，期望值取六種屬性的平均。
+
+用法：
+    python tool/DamageStacking.py data --team 001 C001 003
+    python tool/DamageStacking.py data --all-leaders --ceiling 30
+"""
+
+import argparse
+import itertools
+import json
+import math
+import os
+import sys
+
+from SkillCompiler import ELEMENT_ALL, ELEMENTS, load_table
+
+
+FIRE = ELEMENTS.index("FIRE")
+# 五行相克（BattleManager.get_element_advantage_multiplier）：攻擊者 -> 被克制的元素
+ADVANTAGE = {
+    ELEMENTS.index("WOOD"): ELEMENTS.index("EARTH"),
+    ELEMENTS.index("EARTH"): ELEMENTS.index("WATER"),
+    ELEMENTS.index("WATER"): ELEMENTS.index("FIRE"),
+    ELEMENTS.index("FIRE"): ELEMENTS.index("METAL"),
+    ELEMENTS.index("METAL"): ELEMENTS.index("WOOD"),
+}
+ADVANTAGE_MULTIPLIER = 1.5
+DISADVANTAGE_MULTIPLIER = 0.5
+# ElementPanel 的斬擊倍率常數
+OWN_ELEMENT_BONUS = 0.25
+OTHER_ELEMENT_BONUS = 0.05
+COMBO_MULTIPLIER_PER_HIT = 0.10
+# match_card_criteria 的稀有度別名
+RARITY_ALIASES = {"R": "COMMON", "SR": "RARE", "SSR": "LEGENDARY"}
+# 會影響傷害的主動技能效果
+DAMAGE_BUFF_TYPES = {"DAMAGE_MULTIPLIER", "FINAL_DAMAGE_MULTIPLIER", "ELEMENT_DAMAGE_BOOST", "BASE_STAT_BOOST", "COMBO_BOOST"}
+
+TEAM_SIZE = 5
+DEFAULT_CEILING = 50.0
+DEFAULT_MAX_COMBO = 20
+DEFAULT_TYPICAL_COMBO = 6
+DEFAULT_TYPICAL_ORBS = 3
+MAX_COMBINATIONS = 200000
+PROFILES = ["min", "typical", "max"]
+
+
+# ========== 資料載入 ==========
+
+def load_cards(data_dir):
+    """讀取 cards.json：{card_id: card}"""
+    with open(os.path.join(data_dir, "cards.json"), 'r', encoding='utf-8') as f:
+        return {card.get("card_id", ""): card for card in json.load(f).get("cards", [])}
+
+
+def card_element(card):
+    """卡片元素索引（與 CardData 相同，無法解析時為 FIRE）"""
+    name = str(card.get("element", "FIRE")).upper()
+    return ELEMENTS.index(name) if name in ELEMENTS else FIRE
+
+
+def level_atk(base_atk, card, level=None):
+    """CardData.calculate_level_stats 的攻擊力（預設為最高等級）"""
+    max_level = int(card.get("max_level", 1) or 1)
+    level = max_level if level is None else level
+    percent = 1.0 if max_level <= 1 else 0.1 + 0.9 * (level - 1) / float(max_level - 1)
+    return int(base_atk * percent)
+
+
+def _engine_element(params, key, diagnostics, source):
+    """隊長技能 / 篩選條件的元素：_parse_element 對 ALL、HEART 以外的未知值一律當成 FIRE"""
+    element = params.get(key, FIRE)
+    if element == ELEMENT_ALL or element is None:
+        diagnostics.append(("warning", source, f"{key}=ALL 在遊戲中會被當成 FIRE，只影響火屬性卡片"))
+        return FIRE
+    return element
+
+
+# ========== 隊長技能 ==========
+
+class LeaderEffects:
+    """隊長（隊伍第一張卡）的傷害相關效果"""
+
+    def __init__(self):
+        self.atk_multipliers = []       # 每位隊員的永久攻擊倍率
+        self.before_attack = []         # [(effect_type, element, params)]
+        self.ignore_resistance = set()
+        self.combo_bonus = 0            # leader_combo_boost（後設定的覆蓋前面的）
+        self.dual_effects = {}          # {source: (target, percent)}（同來源後設定的覆蓋前面的）
+
+
+def leader_effects(team, table, diagnostics):
+    """套用隊長技能的 PERMANENT / BEFORE_ATTACK 效果"""
+    leader = LeaderEffects()
+    leader.atk_multipliers = [1.0] * len(team)
+    if not team:
+        return leader
+    elements = [card_element(card) for card in team]
+    leader_skills = table["skills"].get("leader", {})
+    for skill_id in team[0].get("leader_skill_ids", []) or []:
+        compiled = leader_skills.get(skill_id)
+        if compiled is None:
+            diagnostics.append(("warning", skill_id, "不是 JSON 隊長技能，未計入"))
+            continue
+        for effect in compiled["timings"].get("PERMANENT", []):
+            effect_type, params = effect["effect_type"], effect["params"]
+            if effect_type == "TEAM_ELEMENT_MULTIPLIER":
+                element = _engine_element(params, "target_element", diagnostics, skill_id)
+                count = elements.count(element)
+                mult = min(params.get("base_multiplier", 1.0) + count * params.get("per_member_boost", 0.3),
+                           params.get("max_multiplier", 2.5))
+                for index, member_element in enumerate(elements):
+                    if member_element == element:
+                        leader.atk_multipliers[index] *= mult
+            elif effect_type == "TEAM_DIVERSITY_MULTIPLIER":
+                mult = min(params.get("base_multiplier", 1.0) + len(set(elements)) * params.get("per_unique_boost", 0.2),
+                           params.get("max_multiplier", 2.0))
+                leader.atk_multipliers = [m * mult for m in leader.atk_multipliers]
+            elif effect_type == "BASE_DAMAGE_BOOST":
+                element = _engine_element(params, "target_element", diagnostics, skill_id)
+                mult = 1.0 + params.get("boost_percent", 30.0) / 100.0
+                for index, member_element in enumerate(elements):
+                    if member_element == element:
+                        leader.atk_multipliers[index] *= mult
+            elif effect_type == "IGNORE_RESISTANCE":
+                leader.ignore_resistance.add(_engine_element(params, "target_element", diagnostics, skill_id))
+            elif effect_type == "COMBO_BOOST":
+                leader.combo_bonus = params.get("combo_bonus", 5)
+            elif effect_type == "ORB_DUAL_EFFECT":
+                source = params.get("source_element", ELEMENTS.index("HEART"))
+                target = _engine_element(params, "target_element", diagnostics, skill_id)
+                leader.dual_effects[source] = (target, params.get("effect_percent", 50.0))
+        for effect in compiled["timings"].get("BEFORE_ATTACK", []):
+            element = _engine_element(effect["params"], "target_element", diagnostics, skill_id)
+            leader.before_attack.append((effect["effect_type"], element, effect["params"]))
+    return leader
+
+
+def before_attack_multiplier(leader, element, profile, typical_orbs):
+    """隊長 BEFORE_ATTACK 效果對 element 攻擊者的倍率（ORB_COUNT_MULTIPLIER 依斬擊情境決定儲存靈珠數）"""
+    total = 1.0
+    for effect_type, target, params in leader.before_attack:
+        if target != element:
+            continue
+        if effect_type == "DAMAGE_MULTIPLIER":
+            total *= params.get("multiplier", 1.0)
+        elif effect_type == "ALL_DAMAGE_BOOST":
+            total *= 1.0 + params.get("boost_percent", 30.0) / 100.0
+        elif effect_type == "ORB_COUNT_MULTIPLIER":
+            base, top = params.get("base_multiplier", 1.0), params.get("max_multiplier", 3.0)
+            per_tier = params.get("orb_per_tier", 3)
+            if profile == "max":
+                mult = top
+            else:
+                orbs = typical_orbs if profile == "typical" else 0
+                mult = min(base + (orbs / float(per_tier) if per_tier > 0 else 0.0) * (top - base), top)
+            if mult > 1.0:
+                total *= mult
+    return total
+
+
+def slash_multiplier(element, profile, combo_bonus, leader, options):
+    """ElementPanel.update_all_element_multipliers 的元素倍率"""
+    if profile == "min":
+        return 1.0
+    hits = options["typical_combo"] if profile == "typical" else options["max_combo"]
+    per_hit = OWN_ELEMENT_BONUS
+    if profile == "max":
+        # 斬來源珠：自己算其他元素 +5%，再以 percent 比例計入目標元素
+        for source, (target, percent) in leader.dual_effects.items():
+            if target == element and source != element:
+                per_hit = max(per_hit, OTHER_ELEMENT_BONUS + OWN_ELEMENT_BONUS * percent / 100.0)
+    return (1.0 + hits * per_hit) * (1.0 + (hits + combo_bonus) * COMBO_MULTIPLIER_PER_HIT)
+
+
+def advantage_multipliers(element, leader):
+    """對六種敵人屬性的相克倍率"""
+    if element in leader.ignore_resistance:
+        return [1.0] * len(ELEMENTS)
+    result = []
+    for enemy in range(len(ELEMENTS)):
+        if enemy == element:
+            result.append(1.0)
+        elif ADVANTAGE.get(element) == enemy:
+            result.append(ADVANTAGE_MULTIPLIER)
+        elif ADVANTAGE.get(enemy) == element:
+            result.append(DISADVANTAGE_MULTIPLIER)
+        else:
+            result.append(1.0)
+    return result
+
+
+# ========== 主動技能 ==========
+
+def stack_distribution(duration, skill_cost):
+    """冷卻好就施放時，任一回合生效的 Buff 層數分布：(最大層數, [P(0 層), P(1 層), ...])"""
+    if duration <= 0:
+        return 0, [1.0]
+    if skill_cost <= 0:
+        return duration, [0.0] * duration + [1.0]
+    ratio = duration / float(skill_cost)
+    low, high = int(math.floor(ratio)), int(math.ceil(ratio))
+    probs = [0.0] * (high + 1)
+    probs[high] += ratio - low
+    probs[low] += 1.0 - (ratio - low)
+    return high, probs
+
+
+def _matches_card(card, params, diagnostics, source):
+    """ActiveSkill.match_card_criteria"""
+    if "target_element" in params:
+        element = params["target_element"]
+        if element not in range(len(ELEMENTS) - 1):
+            diagnostics.append(("warning", source, "target_element 只支援五行，其他值在遊戲中會被當成 FIRE"))
+            element = FIRE
+        if card_element(card) != element:
+            return False
+    if "target_rarity" in params:
+        rarity = str(params["target_rarity"]).upper()
+        if str(card.get("rarity", "")).upper() != RARITY_ALIASES.get(rarity, rarity):
+            return False
+    if "target_card_ids" in params and card.get("card_id") not in (params["target_card_ids"] or []):
+        return False
+    return True
+
+
+class ActiveBuff:
+    """隊伍中一個主動技能的 Buff：每一層對各效果的貢獻"""
+
+    def __init__(self, caster_index, skill_id, compiled):
+        self.caster_index = caster_index
+        self.skill_id = skill_id
+        self.max_stacks, self.probs = stack_distribution(compiled.get("duration", 0), compiled.get("skill_cost", 0))
+        self.damage = 1.0          # DAMAGE_MULTIPLIER × FINAL_DAMAGE_MULTIPLIER
+        self.element_boost = {}    # {element: multiplier}
+        self.base_boosts = []      # [(受影響的隊員索引集合, boost_percent)]
+        self.combo_bonus = 0
+
+
+def active_buffs(team, table, diagnostics):
+    """隊伍中會影響傷害的主動技能（有持續回合的 Buff）"""
+    active_skills = table["skills"].get("active", {})
+    buffs = []
+    for caster_index, card in enumerate(team):
+        skill_id = card.get("active_skill_id", "")
+        if not skill_id:
+            continue
+        compiled = active_skills.get(skill_id)
+        if compiled is None:
+            diagnostics.append(("warning", skill_id, f"{card.get('card_id')} 的主動技能不是 JSON 技能，未計入"))
+            continue
+        effects = [e for effects in compiled["timings"].values() for e in effects if e["effect_type"] in DAMAGE_BUFF_TYPES]
+        if not effects or compiled.get("duration", 0) <= 0:
+            continue
+        buff = ActiveBuff(caster_index, skill_id, compiled)
+        duration, skill_cost = compiled.get("duration", 0), compiled.get("skill_cost", 0)
+        if skill_cost <= 0:
+            diagnostics.append(("error", skill_id, f"skill_cost={skill_cost}：每回合都能重複施放，Buff 可無限疊加（計算時以 {buff.max_stacks} 層為上限）"))
+        elif buff.max_stacks > 1:
+            diagnostics.append(("warning", skill_id, f"duration={duration} 大於 skill_cost={skill_cost}：重複施放最多疊加 {buff.max_stacks} 層"))
+        for effect in effects:
+            effect_type, params = effect["effect_type"], effect["params"]
+            if effect_type in ("DAMAGE_MULTIPLIER", "FINAL_DAMAGE_MULTIPLIER"):
+                buff.damage *= params.get("multiplier", 1.0)
+                if "target_element" in params or params.get("target_scope") == "SELF":
+                    diagnostics.append(("warning", skill_id, f"{effect_type} 的 target_element / target_scope 不會被套用，Buff 對全隊所有元素生效"))
+            elif effect_type == "ELEMENT_DAMAGE_BOOST":
+                if "multiplier" not in params:
+                    diagnostics.append(("warning", skill_id, "ELEMENT_DAMAGE_BOOST 沒有 multiplier，get_active_buff_multiplier 會當成 x1.0"))
+                element = params.get("element", FIRE)
+                buff.element_boost[element] = buff.element_boost.get(element, 1.0) * params.get("multiplier", 1.0)
+            elif effect_type == "BASE_STAT_BOOST":
+                if params.get("target_stat", "base_atk") != "base_atk":
+                    continue
+                scope = params.get("target_scope") or ("SELF" if compiled.get("target_type") == "SELF" else "ALL_ALLIES")
+                targets = {caster_index} if scope == "SELF" else set(range(len(team)))
+                targets = {i for i in targets if _matches_card(team[i], params, diagnostics, skill_id)}
+                buff.base_boosts.append((targets, params.get("boost_percent", 0.0)))
+                if buff.max_stacks > 1:
+                    diagnostics.append(("error", skill_id, "BASE_STAT_BOOST 疊加後依序到期時，restore_base_stats 會還原成第一層之後的數值，攻擊力提升會永久殘留"))
+            elif effect_type == "COMBO_BOOST":
+                buff.combo_bonus = max(buff.combo_bonus, params.get("combo_bonus", 0))
+        buffs.append(buff)
+    return buffs
+
+
+# ========== 組合格點 ==========
+
+def _stack_label(buffs, state):
+    parts = [f"{buff.skill_id}×{stacks}" for buff, stacks in zip(buffs, state) if stacks]
+    return ", ".join(parts) if parts else "(無主動技能)"
+
+
+def evaluate_team(team_ids, cards, table, ceiling=DEFAULT_CEILING, damage_ceiling=None,
+                  max_combo=DEFAULT_MAX_COMBO, typical_combo=DEFAULT_TYPICAL_COMBO,
+                  typical_orbs=DEFAULT_TYPICAL_ORBS, top=10):
+    """計算一支隊伍（第一張為隊長）所有卡片的傷害倍率範圍
+
+    回傳 {"team", "combinations", "attackers": [...], "flagged": [...], "diagnostics": [(severity, source, message)]}
+    """
+    diagnostics = []
+    team = []
+    for card_id in team_ids:
+        if card_id not in cards:
+            diagnostics.append(("error", card_id, "卡片不存在"))
+        else:
+            team.append(cards[card_id])
+    options = {"max_combo": max_combo, "typical_combo": typical_combo}
+    leader = leader_effects(team, table, diagnostics)
+    buffs = active_buffs(team, table, diagnostics)
+
+    lattice = [range(buff.max_stacks + 1) for buff in buffs]
+    size = 1
+    for states in lattice:
+        size *= len(states)
+    result = {"team": [card.get("card_id") for card in team], "combinations": size,
+              "attackers": [], "flagged": [], "diagnostics": diagnostics}
+    if size > MAX_COMBINATIONS:
+        diagnostics.append(("error", "-", f"組合數 {size} 超過上限 {MAX_COMBINATIONS}，未計算"))
+        return result
+
+    # 每位攻擊者與組合無關的部分，先展開成 (情境, 敵人屬性) 的向量
+    attackers = []
+    for index, card in enumerate(team):
+        element = card_element(card)
+        advantages = advantage_multipliers(element, leader)
+        leader_factor = {p: before_attack_multiplier(leader, element, p, typical_orbs) for p in PROFILES}
+        attackers.append({"index": index, "card": card, "element": element, "advantages": advantages,
+                          "leader": leader_factor, "base_level_atk": level_atk(card.get("base_atk", 0), card),
+                          "min": None, "max": None, "expected": 0.0, "max_damage": 0, "exceed": 0.0})
+
+    flagged = []
+    for state in itertools.product(*lattice):
+        probability = 1.0
+        damage_buff, element_boost, combo_active = 1.0, {}, 0
+        boosts = []  # 依施放順序逐層套用
+        for buff, stacks in zip(buffs, state):
+            probability *= buff.probs[stacks]
+            if not stacks:
+                continue
+            damage_buff *= buff.damage ** stacks
+            for element, mult in buff.element_boost.items():
+                element_boost[element] = element_boost.get(element, 1.0) * mult ** stacks
+            boosts.extend(buff.base_boosts * stacks)
+            combo_active = max(combo_active, buff.combo_bonus)  # get_active_buff_value 只取其中一個
+        if damage_buff <= 1.0:
+            damage_buff = 1.0
+        combo_bonus = leader.combo_bonus + combo_active
+
+        for attacker in attackers:
+            base_atk = attacker["card"].get("base_atk", 0)
+            for targets, percent in boosts:
+                if attacker["index"] in targets:
+                    base_atk += int(base_atk * percent / 100.0)
+            current_atk = int(level_atk(base_atk, attacker["card"]) * leader.atk_multipliers[attacker["index"]])
+            buff_factor = damage_buff * max(element_boost.get(attacker["element"], 1.0), 1.0)
+            reference = float(attacker["base_level_atk"] or 1)
+
+            values = {}
+            for profile in PROFILES:
+                slash = slash_multiplier(attacker["element"], profile, combo_bonus, leader, options)
+                factor = attacker["leader"][profile] * buff_factor
+                damage = int(current_atk * slash)
+                values[profile] = [(int(damage * factor * adv), current_atk * slash * factor * adv / reference)
+                                   for adv in attacker["advantages"]]
+            low = min(m for _, m in values["min"])
+            high_damage, high = max(values["max"])
+            expected = sum(m for _, m in values["typical"]) / len(ELEMENTS)
+
+            attacker["min"] = low if attacker["min"] is None else min(attacker["min"], low)
+            attacker["max"] = high if attacker["max"] is None else max(attacker["max"], high)
+            attacker["max_damage"] = max(attacker["max_damage"], high_damage)
+            attacker["expected"] += probability * expected
+            if high > ceiling or (damage_ceiling is not None and high_damage > damage_ceiling):
+                attacker["exceed"] += probability
+                flagged.append((high, high_damage, attacker["card"].get("card_id"), _stack_label(buffs, state), probability))
+
+    flagged.sort(key=lambda item: (-item[0], item[2]))
+    result["flagged"] = flagged[:top]
+    result["attackers"] = [{"card_id": a["card"].get("card_id"), "element": ELEMENTS[a["element"]],
+                            "min": a["min"], "expected": a["expected"], "max": a["max"],
+                            "max_damage": a["max_damage"], "exceed_probability": a["exceed"]}
+                           for a in attackers]
+    return result
+
+
+def worst_case_team(leader_id, cards, table, team_size=TEAM_SIZE):
+    """以 leader_id 為隊長，挑主動技能最大疊層倍率最高的隊員組成最壞情況隊伍"""
+    scored = []
+    for card_id, card in cards.items():
+        if card_id == leader_id:
+            continue
+        buffs = active_buffs([card], table, [])
+        if not buffs:
+            continue
+        buff = buffs[0]
+        peak = buff.damage * math.prod(buff.element_boost.values() or [1.0])
+        peak *= math.prod(1.0 + percent / 100.0 for _, percent in buff.base_boosts)
+        peak *= 1.0 + buff.combo_bonus * COMBO_MULTIPLIER_PER_HIT
+        scored.append((-(peak ** buff.max_stacks), card_id))
+    scored.sort()
+    return [leader_id] + [card_id for _, card_id in scored[:team_size - 1]]
+
+
+# ========== 輸出 ==========
+
+def format_result(result, ceiling, damage_ceiling=None):
+    icons = {"error": "❌", "warning": "⚠️"}
+    lines = [f"=== 隊伍 {' / '.join(result['team'])}：{result['combinations']} 種主動技能組合 ==="]
+    for severity, source, message in sorted(set(result["diagnostics"])):
+        lines.append(f"{icons[severity]} {source}: {message}")
+    for attacker in result["attackers"]:
+        if attacker["min"] is None:
+            continue
+        mark = "❌" if attacker["exceed_probability"] > 0 else "✅"
+        lines.append(f"{mark} {attacker['card_id']:<8} {attacker['element']:<6} "
+                     f"min x{attacker['min']:.2f}  期望 x{attacker['expected']:.2f}  max x{attacker['max']:.2f}  "
+                     f"最高傷害 {attacker['max_damage']}  超標機率 {attacker['exceed_probability']:.1%}")
+    limit = f"x{ceiling:g}" + (f" / {damage_ceiling} 傷害" if damage_ceiling is not None else "")
+    for mult, damage, card_id, label, probability in result["flagged"]:
+        lines.append(f"   超過 {limit}：{card_id} x{mult:.2f}（{damage}）← {label}（機率 {probability:.1%}）")
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description="計算隊伍的傷害倍率疊加範圍")
+    parser.add_argument("data_dir", help="data 資料夾路徑")
+    parser.add_argument("--team", nargs="+", help="隊伍卡片 ID（第一張為隊長）")
+    parser.add_argument("--all-leaders", action="store_true", help="每張卡片輪流當隊長，搭配最壞情況隊員")
+    parser.add_argument("--team-size", type=int, default=TEAM_SIZE, help=f"--all-leaders 的隊伍人數（預設 {TEAM_SIZE}）")
+    parser.add_argument("--ceiling", type=float, default=DEFAULT_CEILING, help=f"傷害倍率上限（預設 {DEFAULT_CEILING}）")
+    parser.add_argument("--damage-ceiling", type=int, default=None, help="最高等級的單次傷害上限")
+    parser.add_argument("--max-combo", type=int, default=DEFAULT_MAX_COMBO, help=f"max 情境的斬擊次數（預設 {DEFAULT_MAX_COMBO}）")
+    parser.add_argument("--typical-combo", type=int, default=DEFAULT_TYPICAL_COMBO, help=f"期望值使用的斬擊次數（預設 {DEFAULT_TYPICAL_COMBO}）")
+    parser.add_argument("--typical-orbs", type=int, default=DEFAULT_TYPICAL_ORBS, help=f"期望值使用的儲存靈珠數（預設 {DEFAULT_TYPICAL_ORBS}）")
+    parser.add_argument("--top", type=int, default=10, help="每支隊伍列出的超標組合數量")
+    args = parser.parse_args()
+
+    if not args.team and not args.all_leaders:
+        parser.error("需要 --team 或 --all-leaders")
+    cards = load_cards(args.data_dir)
+    table = load_table(args.data_dir)
+    if args.all_leaders:
+        teams = [worst_case_team(card_id, cards, table, args.team_size) for card_id in sorted(cards)]
+    else:
+        teams = [args.team]
+
+    exceeded = 0
+    for team in teams:
+        result = evaluate_team(team, cards, table, args.ceiling, args.damage_ceiling, args.max_combo,
+                               args.typical_combo, args.typical_orbs, args.top)
+        if args.all_leaders and not result["flagged"] and not any(d[0] == "error" for d in result["diagnostics"]):
+            continue
+        print("\n".join(format_result(result, args.ceiling, args.damage_ceiling)))
+        exceeded += 1 if result["flagged"] else 0
+    print("✅ 沒有組合超過傷害上限" if not exceeded else f"❌ {exceeded} 支隊伍有組合超過傷害上限")
+    return 1 if exceeded else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,427 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+大型測試資料產生器 (Synthetic Data Generator)
+以固定亂數種子產生結構正確、交叉引用完整的 data 資料夾，
+用於在正式規模下測試 GM.py 與 DialogTaskEditor.py。
+
+使用方式：
+    python tool/DataGenerator.py 輸出資料夾 --records 10000 --seed 42
+    python tool/DataGenerator.py 輸出資料夾 --validate   # 只驗證既有資料夾
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+
+from DataSchema import FILE_PATHS, validate_dataset
+from QuestSimulator import NAVIGATION, lint_quests
+from SkillCompiler import ACTIVE_BUFF_TIMINGS, ACTIVE_INSTANT_TYPES, SKILL_FILES, compile_skills
+
+
+ELEMENTS = ['FIRE', 'WATER', 'WOOD', 'METAL', 'EARTH', 'HEART']
+RARITIES = ['COMMON', 'RARE', 'EPIC', 'LEGENDARY']
+RACES = ['HUMAN', 'ELF', 'DWARF', 'ORC', 'DEMON', 'UNDEAD', 'DRAGON', 'ELEMENTAL']
+QUEST_TYPES = ['tutorial', 'main', 'side', 'daily', 'achievement']
+# 主選單可直接前往的 GameManager.SCENES 場景（scene_entered 條件才有辦法完成）
+SCENES = list(NAVIGATION)
+
+NAME_PARTS = ['宵', '恩', '茉', '莉', '炎', '霜', '嵐', '影', '玄', '青', '赤', '白', '雷', '月', '星', '雲']
+TITLE_PARTS = ['劍士', '術士', '道人', '仙子', '戰將', '妖王', '靈獸', '守衛']
+
+# 各類技能可用的效果模板：(effect_type, 參數產生函式)，effect_type 需在 SkillCompiler 的對應表中
+LEADER_EFFECTS = [
+    ("DAMAGE_MULTIPLIER", lambda r: {"target_element": r.choice(ELEMENTS[:5]), "multiplier": r.choice([1.5, 2.0, 2.5])}),
+    ("HP_MULTIPLIER", lambda r: {"target_element": r.choice(ELEMENTS[:5] + ['ALL']), "multiplier": r.choice([1.2, 1.5, 2.0])}),
+    ("RECOVERY_MULTIPLIER", lambda r: {"target_element": r.choice(ELEMENTS[:5]), "multiplier": r.choice([1.5, 2.0])}),
+    ("TEAM_ELEMENT_MULTIPLIER", lambda r: {"target_element": r.choice(ELEMENTS[:5]), "base_multiplier": 1.0,
+                                            "max_multiplier": r.choice([2.0, 2.5, 3.0]), "per_member_boost": r.choice([0.2, 0.3, 0.5])}),
+    ("TEAM_DIVERSITY_MULTIPLIER", lambda r: {"base_multiplier": 1.0, "max_multiplier": r.choice([2.0, 2.5]),
+                                              "per_unique_boost": r.choice([0.1, 0.2, 0.3])}),
+    ("ORB_SPAWN_RATE_BOOST", lambda r: {"target_element": r.choice(ELEMENTS), "boost_percent": r.choice([10.0, 15.0, 20.0])}),
+    ("EXTEND_SLASH_TIME", lambda r: {"extend_seconds": r.choice([1.0, 2.0, 3.0])}),
+    ("END_TURN_DAMAGE", lambda r: {"element": r.choice(ELEMENTS[:5]), "damage": r.randint(100, 1000)}),
+]
+ACTIVE_EFFECTS = [
+    ("DAMAGE_MULTIPLIER", lambda r: {"multiplier": r.choice([1.5, 2.0, 3.0])}),
+    ("ELEMENT_DAMAGE_BOOST", lambda r: {"element": r.choice(ELEMENTS[:5]), "boost_percent": r.choice([50.0, 100.0])}),
+    ("BASE_STAT_BOOST", lambda r: {"target_scope": r.choice(["SELF", "ALL_ALLIES"]), "target_element": r.choice(ELEMENTS[:5]),
+                                    "target_stat": "base_atk", "boost_percent": r.choice([50.0, 100.0])}),
+    ("FINAL_DAMAGE_MULTIPLIER", lambda r: {"target_scope": "ALL_ALLIES", "target_element": r.choice(ELEMENTS[:5]),
+                                            "multiplier": r.choice([1.5, 2.0])}),
+    ("DAMAGE_REDUCTION", lambda r: {"reduction_percent": r.choice([30.0, 50.0]), "target_scope": "ALL_ALLIES"}),
+    ("COMBO_BOOST", lambda r: {"combo_bonus": r.randint(2, 6), "target_scope": "ALL_ALLIES"}),
+    ("EXTEND_SLASH_TIME", lambda r: {"extend_seconds": r.choice([2.0, 3.0])}),
+]
+ENEMY_EFFECTS = [
+    ("REQUIRE_COMBO", lambda r: {"required_combo": r.randint(3, 12)}),
+    ("REQUIRE_ORB_TOTAL", lambda r: {"required_element": r.choice(ELEMENTS[:5]), "required_count": r.randint(2, 6)}),
+    ("REQUIRE_ORB_CONTINUOUS", lambda r: {"required_element": r.choice(ELEMENTS[:5]), "required_count": r.randint(2, 4)}),
+    ("DAMAGE_REDUCTION_PERCENT", lambda r: {"reduction_percent": r.choice([20.0, 30.0, 50.0])}),
+    ("SEAL_ACTIVE_SKILL", lambda r: {"duration": r.randint(1, 3)}),
+    ("DISABLE_ELEMENT_SLASH", lambda r: {"target_element": r.choice(ELEMENTS[:5]), "duration": r.randint(1, 3)}),
+    ("REDUCE_SLASH_TIME", lambda r: {"reduce_seconds": r.choice([1.0, 2.0])}),
+    ("DEATH_DAMAGE", lambda r: {"damage": r.randint(100, 2000)}),
+]
+
+
+def _scaled(records, ratio, minimum=1):
+    return max(minimum, int(records * ratio))
+
+
+def _random_name(rng, suffix_parts=TITLE_PARTS):
+    return rng.choice(NAME_PARTS) + rng.choice(NAME_PARTS) + rng.choice(suffix_parts)
+
+
+def _active_templates(skill):
+    """duration = 0 的主動技能只會執行瞬發效果，其餘效果只在 buff 期間有作用"""
+    supported = ACTIVE_INSTANT_TYPES if skill["duration"] == 0 else ACTIVE_BUFF_TIMINGS
+    return [template for template in ACTIVE_EFFECTS if template[0] in supported]
+
+
+def _make_skills(rng, prefix, count, templates, extra=None):
+    """templates 可以是模板列表，或依技能內容（extra 產生的欄位）回傳模板列表的函式"""
+    skills = []
+    for i in range(count):
+        effects = []
+        skill = {
+            "skill_id": f"{prefix}{i:06d}",
+            "skill_name": _random_name(rng, ['之力', '結界', '強化', '祝福', '封印']),
+            "description": f"自動產生的技能 #{i}",
+        }
+        if extra:
+            skill.update(extra(rng))
+        choices = templates(skill) if callable(templates) else templates
+        for _ in range(rng.choice([1, 1, 1, 2])):
+            effect_type, make_params = rng.choice(choices)
+            effect = {"effect_type": effect_type}
+            effect.update(make_params(rng))
+            effects.append(effect)
+        skill["effects"] = effects
+        skills.append(skill)
+    return skills
+
+
+def generate_dataset(records=1000, seed=42):
+    """產生完整資料集，回傳 {data_key: 檔案內容}
+
+    records 為主要規模（卡片與對話數量），其他資料依比例縮放。
+    """
+    rng = random.Random(seed)
+
+    leader_skills = _make_skills(rng, "LS_GEN_", _scaled(records, 0.25), LEADER_EFFECTS)
+    active_skills = _make_skills(
+        rng, "AS_GEN_", _scaled(records, 0.25), _active_templates,
+        extra=lambda r: {"skill_cost": r.randint(4, 15), "duration": r.randint(0, 3),
+                         "target_type": r.choice(["SELF", "ALL_ALLIES"])}
+    )
+    enemy_skills = _make_skills(rng, "ES_GEN_", _scaled(records, 0.1), ENEMY_EFFECTS)
+
+    # --- 卡片 ---
+    card_ids = [f"C{i:06d}" for i in range(records)]
+    cards = []
+    for i, card_id in enumerate(card_ids):
+        rank = rng.randint(1, 4)
+        # 進化目標只指向後面的卡片，避免循環
+        evo_target = card_ids[i + 1] if i + 1 < records and rng.random() < 0.3 else None
+        cards.append({
+            "card_id": card_id,
+            "card_name": _random_name(rng),
+            "card_image_path": "res://resources/ui/icons/001i.webp",
+            "rarity": RARITIES[min(rank - 1, 3)],
+            "card_race": rng.choice(RACES),
+            "element": rng.choice(ELEMENTS),
+            "rank": rank,
+            "evoland": [evo_target] if evo_target else [],
+            "material": [rng.choice(card_ids) for _ in range(rng.randint(0, 2))] if evo_target else [],
+            "max_level": rng.choice([30, 50, 70, 99]),
+            "max_exp": rng.choice([300, 500, 1000, 1500]),
+            "base_hp": rng.randint(100, 2000),
+            "base_atk": rng.randint(50, 800),
+            "base_recovery": rng.randint(10, 300),
+            "max_sp": rng.randint(1, 3),
+            "initial_sp": 1,
+            "passive_skill_ids": [],
+            "leader_skill_ids": [rng.choice(leader_skills)["skill_id"]],
+            "active_skill_id": rng.choice(active_skills)["skill_id"],
+        })
+
+    # --- 敵人 ---
+    enemies = []
+    for i in range(_scaled(records, 0.5)):
+        enemies.append({
+            "enemy_id": f"E{i:06d}",
+            "enemy_name": _random_name(rng, ['史萊姆', '哥布林', '骷髏', '法師', '巨龍']),
+            "element": rng.choice(ELEMENTS[:5]),
+            "sprite_path": "res://resources/ui/icons/096i.webp",
+            "max_hp": rng.randint(10, 5000),
+            "base_atk": rng.randint(5, 500),
+            "attack_cd": rng.randint(1, 4),
+            "passive_skill_ids": [s["skill_id"] for s in rng.sample(enemy_skills, min(len(enemy_skills), rng.randint(0, 2)))],
+            "attack_skill_ids": [],
+        })
+
+    # --- 關卡（前置關卡只指向較早的關卡） ---
+    stages = []
+    stage_count = _scaled(records, 0.25)
+    for i in range(stage_count):
+        waves = []
+        for wave_number in range(1, rng.randint(1, 4) + 1):
+            waves.append({
+                "wave_number": wave_number,
+                "enemies": [
+                    {"enemy_id": rng.choice(enemies)["enemy_id"], "count": rng.randint(1, 3)}
+                    for _ in range(rng.randint(1, 3))
+                ],
+            })
+        stages.append({
+            "stage_id": f"STAGE_{i:06d}",
+            "stage_name": _random_name(rng, ['入口', '營地', '墓地', '深淵', '神殿']),
+            "description": f"自動產生的關卡 #{i}",
+            "difficulty": 1 + i * 10 // stage_count,
+            "rewards": {
+                "gold": rng.randint(50, 2000),
+                "exp": rng.randint(10, 500),
+                "card_drops": [
+                    {"card_id": rng.choice(card_ids), "drop_rate": round(rng.uniform(0.01, 0.3), 2)}
+                    for _ in range(rng.randint(0, 2))
+                ],
+            },
+            "unlock_requirements": {
+                "required_stages": [f"STAGE_{i - 1:06d}"] if i > 0 else []
+            },
+            "waves": waves,
+        })
+
+    # --- 區域 / 章節（每章 10 關，每區 10 章） ---
+    regions = []
+    stage_ids = [s["stage_id"] for s in stages]
+    chapters_per_region = 10
+    stages_per_chapter = 10
+    chapter_chunks = [stage_ids[i:i + stages_per_chapter] for i in range(0, len(stage_ids), stages_per_chapter)]
+    for region_idx in range(0, len(chapter_chunks), chapters_per_region):
+        chapters = []
+        previous_chapter = ""
+        for chapter_offset, chunk in enumerate(chapter_chunks[region_idx:region_idx + chapters_per_region]):
+            chapter_id = f"R{region_idx // chapters_per_region + 1}_C{chapter_offset + 1}"
+            chapters.append({
+                "chapter_id": chapter_id,
+                "chapter_name": f"第{chapter_offset + 1}層 - {_random_name(rng, ['之路', '試煉', '之戰'])}",
+                "chapter_desc": "自動產生的章節",
+                "require_previous": bool(previous_chapter),
+                "is_independent": not previous_chapter,
+                "stages": chunk,
+                "previous_chapter": previous_chapter,
+            })
+            previous_chapter = chapter_id
+        regions.append({
+            "region_id": f"region{region_idx // chapters_per_region + 1}",
+            "region_name": _random_name(rng, ['北域', '東域', '南域', '西域']),
+            "region_icon": "🗻",
+            "chapters": chapters,
+        })
+
+    # --- 商城 ---
+    shop_items = []
+    for i in range(_scaled(records, 0.1)):
+        if rng.random() < 0.5:
+            reward_type = "specific_card"
+            reward_config = {"card_id": rng.choice(card_ids), "count": 1}
+        else:
+            reward_type = "currency"
+            reward_config = {"currency_type": rng.choice(["gold", "gem"]), "amount": rng.choice([100, 1000, 5000])}
+        shop_items.append({
+            "id": f"ITEM_{i:06d}",
+            "name": f"商品 #{i}",
+            "description": "自動產生的商品",
+            "price": rng.choice([1, 10, 100, 500, 1000]),
+            "currency": rng.choice(["gold", "gem"]),
+            "category": "single_cards" if reward_type == "specific_card" else "diamonds",
+            "icon": "res://assets/icons/gift_beginner.png",
+            "reward_type": reward_type,
+            "purchase_limit": rng.choice([0, 1, 3, 10]),
+            "reward_config": reward_config,
+        })
+
+    # --- 抽卡池 ---
+    gacha_pools = []
+    for i in range(_scaled(records, 0.01)):
+        card_pool = {rarity: rng.sample(card_ids, min(records, 5)) for rarity in ['legendary', 'epic', 'rare', 'common']}
+        gacha_pools.append({
+            "id": f"pool_{i:04d}",
+            "name": f"卡池 #{i}",
+            "description": "自動產生的卡池",
+            "icon_color": "#4A90E2",
+            "showcase_cards": card_pool['legendary'][:3],
+            "legendary_rate": 0.01,
+            "epic_rate": 0.05,
+            "rare_rate": 0.20,
+            "pity_threshold": 90,
+            "single_pull_cost": 1,
+            "ten_pull_cost": 10,
+            "currency": "gem",
+            "card_pool": card_pool,
+        })
+
+    # --- 訓練室 ---
+    training_rooms = []
+    for i in range(_scaled(records, 0.001, minimum=6)):
+        training_rooms.append({
+            "room_id": f"TR_{i + 1:03d}",
+            "room_name": f"訓練室 #{i + 1}",
+            "room_desc": "自動產生的訓練室",
+            "room_icon": "📚",
+            "training_time": rng.choice([10, 30, 60, 120]),
+            "exp_reward": rng.choice([100, 300, 800, 2000]),
+            "max_teams": rng.randint(1, 5),
+            "unlock_conditions": {
+                "type": "default" if i == 0 else "gold",
+                "cost_gold": 0 if i == 0 else rng.choice([10, 1000, 15000]),
+                "cost_diamond": 0,
+                "required_stage": "",
+                "required_player_level": 1,
+            },
+            "is_unlocked_by_default": i == 0,
+        })
+
+    # --- 對話 ---
+    dialogs = []
+    for i in range(records):
+        dialogs.append({
+            "dialog_id": f"dialog_{i:06d}",
+            "speaker": rng.choice(["???", "引導者", "師父", "村長"]),
+            "speaker_avatar": "mystery",
+            "content": f"自動產生的對話內容 #{i}。\n請繼續修行。",
+            "choices": [{"text": "繼續", "action": rng.choice(["next", "next", "next", "close"])}],
+        })
+
+    # --- 任務（依序分配對話，next_quest 形成鏈） ---
+    quests = []
+    quest_count = _scaled(records, 0.2)
+    dialog_cursor = 0
+    for i in range(quest_count):
+        quest_type = QUEST_TYPES[min(i * len(QUEST_TYPES) // quest_count, len(QUEST_TYPES) - 1)]
+        # 每日/成就任務與主線同時自動開始，對話會覆蓋主線步驟的對話（只顯示最後一個），因此不使用對話步驟
+        uses_dialogs = quest_type not in ('daily', 'achievement')
+        steps = []
+        for step_idx in range(rng.randint(3, 7)):
+            step = {"step_id": f"step_{step_idx + 1:03d}", "step_desc": f"步驟 {step_idx + 1}"}
+            roll = rng.random()
+            if uses_dialogs and roll < 0.5:
+                dialog_id = dialogs[dialog_cursor % len(dialogs)]["dialog_id"]
+                dialog_cursor += 1
+                step["dialog_id"] = dialog_id
+                step["conditions"] = {"type": "dialog_completed", "dialog_id": dialog_id}
+                step["allowed_actions"] = {"type": "dialog_only"}
+            elif roll < 0.7:
+                step["conditions"] = {"type": "scene_entered", "scene_name": rng.choice(SCENES)}
+                step["allowed_actions"] = {"type": "all"}
+            elif roll < 0.85:
+                step["conditions"] = {"type": "training_room_entered", "room_id": rng.choice(training_rooms)["room_id"]}
+                step["allowed_actions"] = {"type": "all"}
+            else:
+                step["conditions"] = {
+                    "type": "or",
+                    "sub_conditions": [
+                        {"type": "scene_entered", "scene_name": rng.choice(SCENES)},
+                        {"type": "training_room_entered", "room_id": rng.choice(training_rooms)["room_id"]},
+                    ],
+                }
+                step["allowed_actions"] = {"type": "all"}
+            steps.append(step)
+
+        quest = {
+            "quest_id": f"quest_{i:06d}",
+            "quest_name": f"任務 #{i}",
+            "quest_desc": "自動產生的任務",
+            "quest_type": quest_type,
+            "is_mandatory": quest_type == 'tutorial',
+            "auto_start": i == 0 or quest_type in ('daily', 'achievement'),
+            "steps": steps,
+            "rewards": {
+                "gold": rng.choice([0, 100, 500, 1000]),
+                "diamond": rng.choice([0, 0, 5, 10]),
+                "cards": [rng.choice(card_ids)] if rng.random() < 0.1 else [],
+            },
+            "next_quest": "",
+        }
+        if i > 0 and quest_type not in ('daily', 'achievement'):
+            quest["unlock_conditions"] = {"type": "quest_completed", "required_quests": [f"quest_{i - 1:06d}"]}
+        quests.append(quest)
+    for i in range(quest_count - 1):
+        if quests[i + 1].get("unlock_conditions"):
+            quests[i]["next_quest"] = quests[i + 1]["quest_id"]
+
+    return {
+        "cards": {"cards": cards},
+        "enemies": {"enemies": enemies},
+        "stages": {"stages": stages},
+        "active_skills": {"active_skills": active_skills},
+        "leader_skills": {"leader_skills": leader_skills},
+        "enemy_skills": {"enemy_skills": enemy_skills},
+        "regions": {"regions": regions},
+        "shop_items": {"items": shop_items},
+        "gacha_pools": {"pools": gacha_pools},
+        "training_rooms": {"training_rooms": training_rooms},
+        "dialogs": {"dialogs": dialogs},
+        "quests": {"quests": quests},
+    }
+
+
+def write_dataset(out_dir, dataset):
+    """將資料集寫成 data 資料夾結構（使用 Tab 縮排，與原始檔案一致）"""
+    for data_key, content in dataset.items():
+        full_path = os.path.join(out_dir, FILE_PATHS[data_key])
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        with open(full_path, 'w', encoding='utf-8') as f:
+            json.dump(content, f, indent='\t', ensure_ascii=False)
+
+
+def load_dataset(data_dir):
+    """讀取 data 資料夾（缺少的檔案略過）"""
+    dataset = {}
+    for data_key, file_rel_path in FILE_PATHS.items():
+        full_path = os.path.join(data_dir, file_rel_path)
+        if os.path.exists(full_path):
+            with open(full_path, 'r', encoding='utf-8') as f:
+                dataset[data_key] = json.load(f)
+    return dataset
+
+
+def validate_generated(dataset):
+    """交叉引用（DataSchema）＋任務靜態檢查（QuestSimulator）＋技能效果（SkillCompiler），回傳問題列表"""
+    errors = validate_dataset(dataset)
+    if "quests" in dataset:
+        rooms = [room.get("room_id") for room in (dataset.get("training_rooms") or {}).get("training_rooms", [])]
+        errors.extend(lint_quests(dataset["quests"], dataset.get("dialogs"), rooms if "training_rooms" in dataset else None))
+    skill_data = {kind: dataset[f"{kind}_skills"] for kind in SKILL_FILES if f"{kind}_skills" in dataset}
+    _, diagnostics = compile_skills(skill_data)
+    errors.extend(f"{kind}_skills/{skill_id}: {message}"
+                  for severity, kind, skill_id, message in diagnostics if severity == "error")
+    return errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description="產生大型測試用 data 資料夾")
+    parser.add_argument("out_dir", help="輸出的 data 資料夾路徑")
+    parser.add_argument("--records", type=int, default=1000, help="主要規模（卡片/對話數量）")
+    parser.add_argument("--seed", type=int, default=42, help="亂數種子")
+    parser.add_argument("--validate", action="store_true", help="只驗證既有資料夾，不產生資料")
+    args = parser.parse_args()
+
+    if not args.validate:
+        dataset = generate_dataset(args.records, args.seed)
+        write_dataset(args.out_dir, dataset)
+        print(f"✅ 已產生 {args.records} 規模資料到 {args.out_dir}")
+
+    errors = validate_generated(load_dataset(args.out_dir))
+    for error in errors[:50]:
+        print(f"⚠️ {error}")
+    print(f"驗證完成：{len(errors)} 個問題")
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
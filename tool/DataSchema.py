@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+資料結構定義 (Data Schema)
+GM 編輯器、對話任務編輯器與各種離線工具共用的資料檔案定義
+
+內容：
+1. 各資料檔案的相對路徑 (與 GM.py 的 FILE_PATHS 一致)
+2. 各資料檔案的記錄列表鍵與主鍵 (用於建立索引)
+"""
+
+import os
+
+
+# 檔案相對路徑 (data 資料夾底下)
+FILE_PATHS = {
+    "cards": "cards.json",
+    "enemies": "enemies.json",
+    "stages": "stages.json",
+    "active_skills": os.path.join("config", "active_skills.json"),
+    "leader_skills": os.path.join("config", "leader_skills.json"),
+    "enemy_skills": os.path.join("config", "enemy_skills.json"),
+    "regions": os.path.join("config", "regions.json"),
+    "shop_items": os.path.join("config", "shop_items.json"),
+    "gacha_pools": os.path.join("config", "gacha_pools.json"),
+    "training_rooms": os.path.join("config", "training_rooms.json"),
+    "dialogs": os.path.join("config", "dialogs.json"),
+    "quests": os.path.join("config", "quests.json"),
+}
+
+# GM 編輯器載入的資料 (不含對話/任務)
+GM_DATA_KEYS = [
+    "cards", "enemies", "stages",
+    "active_skills", "leader_skills", "enemy_skills",
+    "regions", "shop_items", "gacha_pools", "training_rooms",
+]
+
+# 對話任務編輯器載入的資料
+DIALOG_DATA_KEYS = ["dialogs", "quests"]
+
+# data_key -> (記錄列表鍵, 主鍵)
+RECORD_KEYS = {
+    "cards": ("cards", "card_id"),
+    "enemies": ("enemies", "enemy_id"),
+    "stages": ("stages", "stage_id"),
+    "active_skills": ("active_skills", "skill_id"),
+    "leader_skills": ("leader_skills", "skill_id"),
+    "enemy_skills": ("enemy_skills", "skill_id"),
+    "regions": ("regions", "region_id"),
+    "shop_items": ("items", "id"),
+    "gacha_pools": ("pools", "id"),
+    "training_rooms": ("training_rooms", "room_id"),
+    "dialogs": ("dialogs", "dialog_id"),
+    "quests": ("quests", "quest_id"),
+}
+
+
+def get_records(data_cache, data_key):
+    """取得某個資料檔案的記錄列表（格式錯誤時回傳空列表）"""
+    list_key, _ = RECORD_KEYS[data_key]
+    records = (data_cache.get(data_key) or {}).get(list_key, [])
+    return records if isinstance(records, list) else []
+
+
+def build_index(records, id_key):
+    """建立 {主鍵: 記錄} 索引（重複 ID 時保留第一筆，與遊戲載入行為一致）"""
+    index = {}
+    for record in records:
+        if not isinstance(record, dict):
+            continue
+        record_id = record.get(id_key)
+        if record_id is not None and record_id not in index:
+            index[record_id] = record
+    return index
+
+
+def build_indexes(data_cache, data_keys=None):
+    """為 data_cache 中的每個資料檔案建立主鍵索引"""
+    indexes = {}
+    for data_key in (data_keys or data_cache.keys()):
+        if data_key not in RECORD_KEYS or data_key not in data_cache:
+            continue
+        _, id_key = RECORD_KEYS[data_key]
+        indexes[data_key] = build_index(get_records(data_cache, data_key), id_key)
+    return indexes
+
+
+def validate_dataset(dataset, indexes=None):
+    """檢查主鍵重複與交叉引用，回傳錯誤訊息列表"""
+    errors = []
+    indexes = indexes if indexes is not None else build_indexes(dataset)
+
+    for data_key in dataset:
+        if data_key not in RECORD_KEYS:
+            continue
+        records = get_records(dataset, data_key)
+        if len(indexes.get(data_key, {})) != len(records):
+            errors.append(f"{data_key}: 主鍵重複或缺失 ({len(records)} 筆記錄 / {len(indexes.get(data_key, {}))} 個唯一 ID)")
+
+    cards = indexes.get('cards', {})
+    enemies = indexes.get('enemies', {})
+    stages = indexes.get('stages', {})
+    dialogs = indexes.get('dialogs', {})
+    quests = indexes.get('quests', {})
+    leader_skills = indexes.get('leader_skills', {})
+    active_skills = indexes.get('active_skills', {})
+    enemy_skills = indexes.get('enemy_skills', {})
+
+    def check(ref_id, index, where):
+        if ref_id and ref_id not in index:
+            errors.append(f"{where}: 找不到引用 {ref_id}")
+
+    for card in get_records(dataset, 'cards'):
+        where = f"cards/{card.get('card_id')}"
+        for skill_id in card.get('leader_skill_ids', []):
+            check(skill_id, leader_skills, where)
+        check(card.get('active_skill_id'), active_skills, where)
+        for card_id in card.get('evoland', []):
+            check(card_id, cards, where)
+
+    for enemy in get_records(dataset, 'enemies'):
+        for skill_id in enemy.get('passive_skill_ids', []):
+            check(skill_id, enemy_skills, f"enemies/{enemy.get('enemy_id')}")
+
+    for stage in get_records(dataset, 'stages'):
+        where = f"stages/{stage.get('stage_id')}"
+        for wave in stage.get('waves', []):
+            for enemy_config in wave.get('enemies', []):
+                check(enemy_config.get('enemy_id'), enemies, where)
+        for drop in stage.get('rewards', {}).get('card_drops', []):
+            check(drop.get('card_id'), cards, where)
+        for required in stage.get('unlock_requirements', {}).get('required_stages', []):
+            check(required, stages, where)
+
+    for region in get_records(dataset, 'regions'):
+        for chapter in region.get('chapters', []):
+            for stage_id in chapter.get('stages', []):
+                check(stage_id, stages, f"regions/{chapter.get('chapter_id')}")
+
+    for item in get_records(dataset, 'shop_items'):
+        if item.get('reward_type') == 'specific_card':
+            check(item.get('reward_config', {}).get('card_id'), cards, f"shop_items/{item.get('id')}")
+
+    for pool in get_records(dataset, 'gacha_pools'):
+        for card_list in pool.get('card_pool', {}).values():
+            for card_id in card_list:
+                check(card_id, cards, f"gacha_pools/{pool.get('id')}")
+
+    for quest in get_records(dataset, 'quests'):
+        where = f"quests/{quest.get('quest_id')}"
+        for step in quest.get('steps', []):
+            check(step.get('dialog_id'), dialogs, where)
+        check(quest.get('next_quest'), quests, where)
+        for required in quest.get('unlock_conditions', {}).get('required_quests', []):
+            check(required, quests, where)
+        for card_id in quest.get('rewards', {}).get('cards', []):
+            check(card_id, cards, where)
+
+    return errors
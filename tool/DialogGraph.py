@@ -0,0 +1,419 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+對話流程圖 (Dialog Graph)
+將 dialogs.json 與 quests.json 編成有索引的有向圖，並預先計算可達性，
+讓對話編輯器能即時標示無法到達的對話、懸空的 dialog_id 與迴圈。
+
+節點：
+    ("quest", quest_id)             任務
+    ("step", quest_id, index)       任務步驟；index == 步驟數 代表「任務完成」
+    ("dialog", dialog_id)           對話
+    ("scene", scene_name)           go_to_scene 選項指定的場景（選項有 scene_name 時）
+
+邊（與 TaskManager 的執行流程一致）：
+    任務 -> 第一個步驟；步驟 -> 下一步驟（條件可能成立時）；任務完成 -> next_quest
+    步驟 -> 步驟顯示的對話
+    對話 -> 選項觸發 dialog_completed 後前進的步驟（next / close，以及
+           highlight_training_area / claim_reward 固定觸發的對話 ID）
+
+起點為 auto_start 的任務。
+
+單一對話或任務儲存時只更新該節點的邊：
+- 只有新增邊時，從該節點往外延伸可達集合
+- 有邊被移除時才標記需要重算（下次查詢時以 O(V+E) 重算一次）
+迴圈以 Tarjan 強連通分量計算，同樣在圖有變動後的第一次查詢時才重算。
+"""
+
+from collections import deque
+
+from QuestSimulator import CLOSING_ACTIONS, FIXED_DIALOG_EVENTS, _condition_event_types
+
+
+def collect_dialog_conditions(condition, found=None):
+    """條件（含 and / or 巢狀）中等待的 dialog_completed 對話 ID"""
+    if found is None:
+        found = set()
+    if condition.get("type") == "dialog_completed" and condition.get("dialog_id"):
+        found.add(condition["dialog_id"])
+    for sub in condition.get("sub_conditions", []):
+        collect_dialog_conditions(sub, found)
+    return found
+
+
+def dialog_events(dialog):
+    """對話的選項能觸發哪些 dialog_completed 事件"""
+    events = set()
+    for choice in (dialog.get("choices") or [{"action": "next"}]):
+        action = choice.get("action", "close")
+        if action in ("next", "close"):
+            events.add(dialog.get("dialog_id", ""))
+        elif action in FIXED_DIALOG_EVENTS:
+            events.add(FIXED_DIALOG_EVENTS[action])
+    return events
+
+
+def node_label(node):
+    if node[0] == "step":
+        return f"{node[1]}#{node[2] + 1}"
+    return f"{node[0]}:{node[1]}"
+
+
+class DialogGraph:
+    """對話與任務的流程圖"""
+
+    def __init__(self, dialogs_data=None, quests_data=None):
+        self.rebuild(dialogs_data, quests_data)
+
+    # --- 建立 ---
+    def rebuild(self, dialogs_data, quests_data):
+        self.dialogs = {}
+        self.quests = {}
+        self.edges = {}        # 節點 -> set(後繼節點)
+        self.dialog_refs = {}  # dialog_id -> set(顯示此對話的步驟節點)
+        self.waiters = {}      # dialog_id -> set(條件等待此對話完成的步驟節點)
+        self.emitters = {}     # 事件中的 dialog_id -> set(選項會觸發該事件的對話)
+        self.step_checks = {}  # 步驟節點 -> None（條件永遠不成立）或 frozenset(只靠這些對話完成)
+        # 已登記的索引內容：編輯器會直接修改記錄物件，移除時不能重新從記錄讀取
+        self._emitted = {}     # dialog_id -> frozenset(觸發的事件)
+        self._registered = {}  # quest_id -> (步驟數, auto_start, [(步驟節點, 顯示的對話, 等待的對話)])
+        for dialog in (dialogs_data or {}).get("dialogs", []):
+            dialog_id = dialog.get("dialog_id", "")
+            if dialog_id not in self.dialogs:
+                self.dialogs[dialog_id] = dialog
+                self._add_emitter(dialog_id)
+        for quest in (quests_data or {}).get("quests", []):
+            quest_id = quest.get("quest_id", "")
+            if quest_id not in self.quests:
+                self.quests[quest_id] = quest
+                self._add_quest_edges(quest_id)
+        for dialog_id in self.dialogs:
+            self.edges[("dialog", dialog_id)] = self._dialog_targets(dialog_id)
+        self._reachable = None
+        self._loops = None
+        self._loop_nodes = None
+
+    def _add_emitter(self, dialog_id):
+        events = frozenset(dialog_events(self.dialogs[dialog_id]))
+        self._emitted[dialog_id] = events
+        for event_dialog in events:
+            self.emitters.setdefault(event_dialog, set()).add(dialog_id)
+
+    def _remove_emitter(self, dialog_id):
+        for event_dialog in self._emitted.pop(dialog_id, ()):
+            if event_dialog in self.emitters:
+                self.emitters[event_dialog].discard(dialog_id)
+                if not self.emitters[event_dialog]:
+                    del self.emitters[event_dialog]
+
+    def _add_quest_edges(self, quest_id):
+        quest = self.quests[quest_id]
+        steps = quest.get("steps", [])
+        registered = []
+        self.edges[("quest", quest_id)] = {("step", quest_id, 0)}
+        for index, step in enumerate(steps):
+            node = ("step", quest_id, index)
+            targets = set()
+            conditions = step.get("conditions", {})
+            if _condition_event_types(conditions):
+                targets.add(("step", quest_id, index + 1))
+                if conditions.get("type") == "dialog_completed":
+                    self.step_checks[node] = frozenset(collect_dialog_conditions(conditions))
+            else:
+                self.step_checks[node] = None
+            dialog_id = step.get("dialog_id", "")
+            if dialog_id:
+                targets.add(("dialog", dialog_id))
+                self.dialog_refs.setdefault(dialog_id, set()).add(node)
+            waited = collect_dialog_conditions(conditions)
+            for waited_id in waited:
+                self.waiters.setdefault(waited_id, set()).add(node)
+            registered.append((node, dialog_id, waited))
+            self.edges[node] = targets
+        next_quest = quest.get("next_quest", "")
+        self.edges[("step", quest_id, len(steps))] = {("quest", next_quest)} if next_quest else set()
+        self._registered[quest_id] = (len(steps), bool(quest.get("auto_start", False)), registered)
+
+    def _remove_quest_edges(self, quest_id):
+        """移除任務登記的邊與索引，回傳該任務原本等待的對話 ID"""
+        step_count, _, registered = self._registered.pop(quest_id)
+        self.edges.pop(("quest", quest_id), None)
+        touched = set()
+        for node, dialog_id, waited in registered:
+            if dialog_id in self.dialog_refs:
+                self.dialog_refs[dialog_id].discard(node)
+                if not self.dialog_refs[dialog_id]:
+                    del self.dialog_refs[dialog_id]
+            for waited_id in waited:
+                if waited_id in self.waiters:
+                    self.waiters[waited_id].discard(node)
+                    if not self.waiters[waited_id]:
+                        del self.waiters[waited_id]
+            touched |= waited
+            self.edges.pop(node, None)
+            self.step_checks.pop(node, None)
+        self.edges.pop(("step", quest_id, step_count), None)
+        return touched
+
+    def _dialog_targets(self, dialog_id):
+        targets = set()
+        dialog = self.dialogs[dialog_id]
+        for event_dialog in dialog_events(dialog):
+            for quest_id, _, index in self.waiters.get(event_dialog, ()):
+                targets.add(("step", quest_id, index + 1))
+        for choice in dialog.get("choices") or []:
+            if choice.get("action") == "go_to_scene" and choice.get("scene_name"):
+                targets.add(("scene", choice["scene_name"]))
+        return targets
+
+    def _dialog_nodes_emitting(self, event_dialogs):
+        """哪些對話的選項會觸發 event_dialogs 中的 dialog_completed（等待者變動時需要更新這些對話的邊）"""
+        nodes = set()
+        for event_dialog in event_dialogs:
+            nodes |= self.emitters.get(event_dialog, set())
+        return nodes
+
+    # --- 增量更新 ---
+    def _set_edges(self, node, targets):
+        """更新節點的邊；只有新增邊時直接延伸可達集合，否則標記重算"""
+        old = self.edges.get(node, set())
+        self.edges[node] = targets
+        if old == targets:
+            return
+        self._loops = None
+        self._loop_nodes = None
+        if self._reachable is None:
+            return
+        if old - targets:
+            self._reachable = None
+        elif node in self._reachable:
+            self._extend(targets - old)
+
+    def update_dialog(self, old_id, dialog):
+        """對話新增、修改或改名後呼叫（old_id 為 None 表示新增）"""
+        new_id = dialog.get("dialog_id", "")
+        if old_id is not None and old_id != new_id:
+            self.remove_dialog(old_id)
+        if new_id in self.dialogs:
+            self._remove_emitter(new_id)
+        self.dialogs[new_id] = dialog
+        self._add_emitter(new_id)
+        self._set_edges(("dialog", new_id), self._dialog_targets(new_id))
+        if self._reachable is not None and new_id in self.dialog_refs \
+                and any(node in self._reachable for node in self.dialog_refs[new_id]):
+            self._extend({("dialog", new_id)})
+
+    def remove_dialog(self, dialog_id):
+        if dialog_id not in self.dialogs:
+            return
+        self._remove_emitter(dialog_id)
+        del self.dialogs[dialog_id]
+        self.edges.pop(("dialog", dialog_id), None)
+        self._invalidate()
+
+    def _invalidate(self):
+        self._reachable = None
+        self._loops = None
+        self._loop_nodes = None
+
+    def _quest_edges(self, quest_id):
+        if quest_id not in self._registered:
+            return {}
+        nodes = [("quest", quest_id)] + [("step", quest_id, i) for i in range(self._registered[quest_id][0] + 1)]
+        return {node: self.edges.get(node) for node in nodes}
+
+    def update_quest(self, old_id, quest):
+        """任務新增、修改或改名後呼叫（old_id 為 None 表示新增）"""
+        new_id = quest.get("quest_id", "")
+        old_edges = self._quest_edges(old_id) if old_id is not None else {}
+        old_auto_start = old_id in self._registered and self._registered[old_id][1]
+        touched = set()
+        for quest_id in {old_id, new_id}:
+            if quest_id in self._registered:
+                touched |= self._remove_quest_edges(quest_id)
+                del self.quests[quest_id]
+        self.quests[new_id] = quest
+        self._add_quest_edges(new_id)
+        for _, _, waited in self._registered[new_id][2]:
+            touched |= waited
+        # 等待者改變時，會觸發這些事件的對話的邊也要更新
+        for dialog_id in self._dialog_nodes_emitting(touched):
+            self._set_edges(("dialog", dialog_id), self._dialog_targets(dialog_id))
+
+        if old_id != new_id or old_edges != self._quest_edges(new_id) or old_auto_start != self._registered[new_id][1]:
+            if old_id is None and self._reachable is not None:
+                self._loops = None
+                self._loop_nodes = None
+                if self._registered[new_id][1]:
+                    self._extend({("quest", new_id)})
+            else:
+                self._invalidate()
+
+    def remove_quest(self, quest_id):
+        if quest_id not in self._registered:
+            return
+        touched = self._remove_quest_edges(quest_id)
+        del self.quests[quest_id]
+        for dialog_id in self._dialog_nodes_emitting(touched):
+            self.edges[("dialog", dialog_id)] = self._dialog_targets(dialog_id)
+        self._invalidate()
+
+    # --- 可達性與迴圈 ---
+    def _roots(self):
+        return {("quest", quest_id) for quest_id, registered in self._registered.items() if registered[1]}
+
+    def _extend(self, nodes):
+        queue = deque(node for node in nodes if node not in self._reachable)
+        self._reachable.update(queue)
+        while queue:
+            for target in self.edges.get(queue.popleft(), ()):
+                if target not in self._reachable:
+                    self._reachable.add(target)
+                    queue.append(target)
+
+    @property
+    def reachable(self):
+        if self._reachable is None:
+            self._reachable = set()
+            self._extend(self._roots())
+        return self._reachable
+
+    @property
+    def loops(self):
+        """大小 > 1 的強連通分量（或自我迴圈），每個為節點列表"""
+        if self._loops is None:
+            self._loops = self._strongly_connected()
+        return self._loops
+
+    @property
+    def loop_nodes(self):
+        if self._loop_nodes is None:
+            self._loop_nodes = {node for component in self.loops for node in component}
+        return self._loop_nodes
+
+    def _strongly_connected(self):
+        """迭代版 Tarjan（避免數千個節點時超過遞迴深度）"""
+        index_of, low, on_stack, stack, components = {}, {}, set(), [], []
+        counter = 0
+        for start in self.edges:
+            if start in index_of:
+                continue
+            work = [(start, iter(self.edges.get(start, ())))]
+            index_of[start] = low[start] = counter
+            counter += 1
+            stack.append(start)
+            on_stack.add(start)
+            while work:
+                node, successors = work[-1]
+                advanced = False
+                for target in successors:
+                    if target not in index_of:
+                        index_of[target] = low[target] = counter
+                        counter += 1
+                        stack.append(target)
+                        on_stack.add(target)
+                        work.append((target, iter(self.edges.get(target, ()))))
+                        advanced = True
+                        break
+                    if target in on_stack:
+                        low[node] = min(low[node], index_of[target])
+                if advanced:
+                    continue
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    low[parent] = min(low[parent], low[node])
+                if low[node] == index_of[node]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.append(member)
+                        if member == node:
+                            break
+                    if len(component) > 1 or node in self.edges.get(node, ()):
+                        components.append(component)
+        return components
+
+    # --- 檢查結果 ---
+    def dangling_refs(self):
+        """步驟引用了不存在的對話：[(步驟節點, dialog_id, 種類)]，種類為 "show" 或 "wait" """
+        found = []
+        for dialog_id, nodes in self.dialog_refs.items():
+            if dialog_id not in self.dialogs:
+                found.extend((node, dialog_id, "show") for node in nodes)
+        for dialog_id, nodes in self.waiters.items():
+            if dialog_id not in self.dialogs:
+                found.extend((node, dialog_id, "wait") for node in nodes)
+        return sorted(found, key=lambda item: (item[0][1], item[0][2]))
+
+    def dead_end_steps(self):
+        """可到達但條件永遠不會成立的步驟節點"""
+        reachable = self.reachable
+        dead = []
+        for node, waited in self.step_checks.items():
+            if node not in reachable:
+                continue
+            if waited is None:
+                dead.append((node, "條件永遠不成立"))
+            elif not any(dialog_id in self.emitters for dialog_id in waited):
+                dead.append((node, f"等待的對話 {', '.join(sorted(waited))} 不會觸發完成事件"))
+        return sorted(dead, key=lambda item: (item[0][1], item[0][2]))
+
+    def dialog_issues(self, dialog_id):
+        """單一對話的檢查結果（字串列表）"""
+        issues = []
+        node = ("dialog", dialog_id)
+        refs = self.dialog_refs.get(dialog_id, set())
+        if not refs:
+            issues.append("⚠️ 沒有任何任務步驟顯示此對話")
+        elif node not in self.reachable:
+            issues.append("⚠️ 顯示此對話的任務步驟都無法到達")
+        dialog = self.dialogs.get(dialog_id, {})
+        actions = [choice.get("action", "close") for choice in (dialog.get("choices") or [{"action": "next"}])]
+        if not any(action in CLOSING_ACTIONS or action == "show_card_selection" for action in actions):
+            issues.append("❌ 沒有能關閉對話的選項，玩家會卡在此對話")
+        if refs and dialog_events(dialog) and not self.edges.get(node) and any(
+                ("step", q, i) in self.reachable for q, _, i in refs):
+            shown_by = ", ".join(sorted(node_label(ref) for ref in refs))
+            issues.append(f"ℹ️ 完成此對話不會推進任何任務步驟（由 {shown_by} 顯示）")
+        for component in (self.loops if node in self.loop_nodes else ()):
+            if node in component:
+                issues.append("🔁 位於迴圈中：" + " → ".join(node_label(member) for member in reversed(component)))
+                break
+        return issues
+
+    def dialog_marker(self, dialog_id):
+        """對話列表中的標記"""
+        node = ("dialog", dialog_id)
+        dialog = self.dialogs.get(dialog_id, {})
+        actions = [choice.get("action", "close") for choice in (dialog.get("choices") or [{"action": "next"}])]
+        if not any(action in CLOSING_ACTIONS or action == "show_card_selection" for action in actions):
+            return "❌"
+        if node not in self.reachable:
+            return "⚠️"
+        if node in self.loop_nodes:
+            return "🔁"
+        return ""
+
+    def summary(self):
+        reachable = self.reachable
+        return {
+            "dialogs": len(self.dialogs),
+            "unreachable": sum(1 for dialog_id in self.dialogs if ("dialog", dialog_id) not in reachable),
+            "dangling": len(self.dangling_refs()),
+            "loops": len(self.loops),
+            "dead_ends": len(self.dead_end_steps()),
+        }
+
+    def report_lines(self):
+        """全域檢查結果（懸空引用、卡關步驟、迴圈）"""
+        lines = []
+        for node, dialog_id, kind in self.dangling_refs():
+            verb = "顯示" if kind == "show" else "等待"
+            lines.append(f"❌ {node_label(node)} {verb}不存在的對話 {dialog_id}")
+        for node, reason in self.dead_end_steps():
+            lines.append(f"❌ {node_label(node)} 卡關：{reason}")
+        for component in self.loops:
+            lines.append("🔁 迴圈：" + " → ".join(node_label(member) for member in reversed(component)))
+        return lines
@@ -7,6 +7,10 @@
 功能：
 1. 對話編輯 (dialogs.json)
 2. 任務編輯 (quests.json)
+3. 任務流程模擬（以 TaskManager 的規則離線跑隨機流程，確認強制任務都能完成）
+4. 任務流程圖（任務、步驟、對話與 next_quest 連結，點擊節點直接編輯）
+5. 任務獎勵帳本（任務鏈累計獎勵、類型總計、獎勵卡片檢查）
+6. 新手教學限制檢查（強制任務步驟的 allowed_actions 是否擋下完成條件，儲存步驟時檢查）
 """
 
 import tkinter as tk
@@ -15,6 +19,17 @@ import json
 import os
 from functools import partial
 import copy
+import queue
+import threading
+
+from DialogGraph import DialogGraph, node_label
+from QuestDispatch import export_artifact
+from QuestFlowCanvas import QuestFlowView, build_snapshot
+from QuestLedger import QuestLedger, load_card_ids
+from QuestSimulator import format_report, load_config, run_batch
+from RecordStore import RecordStore
+from SafeSave import SaveGuard, describe_conflict
+from TutorialGating import check_quest, check_step, format_issues, load_room_ids, step_location
 
 
 class DialogTaskEditor:
@@ -26,10 +41,14 @@ class DialogTaskEditor:
         # 數據快取
         self.data_cache = {}
         self.data_dir = None
+        self.save_guard = SaveGuard()  # 記錄載入時的檔案版本，儲存時偵測他人修改
 
         # 當前選擇
         self.current_dialog_id = None
         self.current_quest_id = None
+        self.current_dialog_handle = None
+        self.current_quest_handle = None
+        self.stores = {}  # data_key -> RecordStore
 
         # Widget 變數
         self.widget_vars = {}
@@ -85,6 +104,12 @@ class DialogTaskEditor:
         file_menu.add_command(label="退出", command=self.root.quit)
         menu_bar.add_cascade(label="檔案", menu=file_menu)
 
+        # 工具選單
+        tools_menu = tk.Menu(menu_bar, tearoff=0)
+        tools_menu.add_command(label="任務流程模擬...", command=self.open_quest_simulator)
+        tools_menu.add_command(label="匯出任務事件索引", command=self.export_quest_dispatch)
+        menu_bar.add_cascade(label="工具", menu=tools_menu)
+
         self.root.config(menu=menu_bar)
 
     def create_main_ui(self):
@@ -94,9 +119,11 @@ class DialogTaskEditor:
 
         self.tab_dialogs = ttk.Frame(self.notebook)
         self.tab_quests = ttk.Frame(self.notebook)
+        self.tab_flow = ttk.Frame(self.notebook)
 
         self.notebook.add(self.tab_dialogs, text='對話編輯 (Dialogs)', state="disabled")
         self.notebook.add(self.tab_quests, text='任務編輯 (Quests)', state="disabled")
+        self.notebook.add(self.tab_flow, text='任務流程圖 (Flow)', state="disabled")
 
         self.notebook.pack(expand=True, fill='both', padx=10, pady=10)
         self.notebook.pack_forget()
@@ -138,21 +165,16 @@ class DialogTaskEditor:
             messagebox.showerror("錯誤", f"找不到 config 資料夾：{config_dir}")
             return
 
-        # 載入對話
-        dialogs_path = os.path.join(config_dir, "dialogs.json")
-        if os.path.exists(dialogs_path):
-            with open(dialogs_path, 'r', encoding='utf-8') as f:
-                self.data_cache['dialogs'] = json.load(f)
-        else:
-            self.data_cache['dialogs'] = {"dialogs": []}
+        # 載入對話與任務（同時記住載入時的版本，儲存時用來偵測 GM 或其他人的修改）
+        self.save_guard = SaveGuard()
+        self.load_data_file('dialogs')
+        self.load_data_file('quests')
 
-        # 載入任務
-        quests_path = os.path.join(config_dir, "quests.json")
-        if os.path.exists(quests_path):
-            with open(quests_path, 'r', encoding='utf-8') as f:
-                self.data_cache['quests'] = json.load(f)
-        else:
-            self.data_cache['quests'] = {"quests": []}
+        # 對話 / 任務流程圖（可達性、懸空引用、迴圈）
+        self.dialog_graph = DialogGraph(self.data_cache['dialogs'], self.data_cache['quests'])
+        # 任務獎勵帳本（累計獎勵、卡片檢查；卡片清單從 cards.json 讀取）
+        self.quest_ledger = QuestLedger(self.data_cache['quests'], load_card_ids(self.data_dir))
+        self.training_rooms = load_room_ids(self.data_dir)
 
         # 顯示 notebook 並填充數據
         self.placeholder_label.pack_forget()
@@ -161,18 +183,50 @@ class DialogTaskEditor:
         # 啟用分頁
         self.notebook.tab(self.tab_dialogs, state="normal")
         self.notebook.tab(self.tab_quests, state="normal")
+        self.notebook.tab(self.tab_flow, state="normal")
 
         # 填充 UI
         self.populate_dialogs_tab()
         self.populate_quests_tab()
+        self.populate_flow_tab()
 
         self.status_var.set(f"已載入：{config_dir}")
 
+    def load_data_file(self, data_key):
+        """載入單一 JSON 檔並建立主鍵索引"""
+        file_path = os.path.join(self.data_dir, "config", f"{data_key}.json")
+        raw = None
+        if os.path.exists(file_path):
+            with open(file_path, 'rb') as f:
+                raw = f.read()
+            self.data_cache[data_key] = json.loads(raw.decode('utf-8'))
+        else:
+            self.data_cache[data_key] = {data_key: []}
+        self.save_guard.remember(file_path, raw)
+        self.stores[data_key] = RecordStore.for_data_key(self.data_cache, data_key)
+
     def reload_data(self):
-        """重新載入數據"""
-        if self.data_dir:
-            self.load_all_data()
-            messagebox.showinfo("成功", "數據已重新載入")
+        """重新載入數據（只重新讀取磁碟上有變更、或記憶體中有未儲存修改的檔案）"""
+        if not self.data_dir:
+            return
+
+        reloaded = []
+        for data_key in ('dialogs', 'quests'):
+            file_path = os.path.join(self.data_dir, "config", f"{data_key}.json")
+            changed, _ = self.save_guard.disk_changed(file_path)
+            if changed or self.stores[data_key].dirty:
+                self.load_data_file(data_key)
+                reloaded.append(f"{data_key}.json")
+
+        if reloaded:
+            self.dialog_graph.rebuild(self.data_cache['dialogs'], self.data_cache['quests'])
+            self.quest_ledger = QuestLedger(self.data_cache['quests'], load_card_ids(self.data_dir))
+            self.training_rooms = load_room_ids(self.data_dir)
+            self.populate_dialogs_tab()
+            self.populate_quests_tab()
+            messagebox.showinfo("成功", "已重新載入：" + ", ".join(reloaded))
+        else:
+            messagebox.showinfo("成功", "檔案沒有變更，不需要重新載入")
 
     def save_data_to_file(self, data_key):
         """儲存數據到 JSON 檔案"""
@@ -182,14 +236,49 @@ class DialogTaskEditor:
         config_dir = os.path.join(self.data_dir, "config")
         file_path = os.path.join(config_dir, f"{data_key}.json")
 
+        store = self.stores[data_key]
+        if not store.dirty:
+            self.status_var.set(f"{data_key}.json 無變更，略過寫入")
+            return
+
         try:
-            with open(file_path, 'w', encoding='utf-8') as f:
-                json.dump(self.data_cache[data_key], f, ensure_ascii=False, indent=2)
-            self.status_var.set(f"✅ {data_key}.json 已儲存")
+            # 磁碟版本已被他人修改時先做記錄層級的三方合併；沿用原檔排版，內容未變更時不寫檔
+            result = self.save_guard.save(
+                file_path, data_key, self.data_cache[data_key],
+                resolve=partial(self._resolve_save_conflicts, data_key)
+            )
+            if result.status == "cancelled":
+                self.status_var.set(f"⚠️ 已取消儲存 {data_key}.json（磁碟上的版本未被覆蓋）")
+            elif result.status == "unchanged":
+                store.mark_clean()
+                self.status_var.set(f"{data_key}.json 無變更，略過寫入")
+            elif result.status == "merged":
+                # 呼叫端儲存後都會重新填充分頁，直接換成合併結果即可（handle 需以 ID 重新取得）
+                self.data_cache[data_key] = result.data
+                store.reset(result.data)
+                self.dialog_graph.rebuild(self.data_cache['dialogs'], self.data_cache['quests'])
+                self.quest_ledger.rebuild(self.data_cache['quests'])
+                self.status_var.set(f"✅ {data_key}.json 已與其他人的修改合併並儲存")
+            else:
+                store.mark_clean()
+                self.status_var.set(f"✅ {data_key}.json 已儲存")
         except Exception as e:
             messagebox.showerror("儲存錯誤", f"無法儲存檔案：{e}")
             self.status_var.set(f"❌ {data_key}.json 儲存失敗")
 
+    def _resolve_save_conflicts(self, data_key, conflicts):
+        """同一筆記錄的同一欄位雙方都改過時，詢問要保留哪一方"""
+        shown = "\n".join(describe_conflict(c) for c in conflicts[:15])
+        more = f"\n... 另有 {len(conflicts) - 15} 項" if len(conflicts) > 15 else ""
+        answer = messagebox.askyesnocancel(
+            "儲存衝突",
+            f"{data_key}.json 在您編輯期間已被其他人修改，以下項目雙方都改過：\n\n{shown}{more}\n\n"
+            "是：保留我的修改\n否：採用對方的修改\n取消：暫不儲存"
+        )
+        if answer is None:
+            return None
+        return "ours" if answer else "theirs"
+
     # ========== 對話編輯 ==========
 
     def populate_dialogs_tab(self):
@@ -209,27 +298,62 @@ class DialogTaskEditor:
         ttk.Button(btn_frame, text="新增對話", command=self.add_new_dialog).pack(side=tk.LEFT, expand=True, fill='x', padx=(0, 2))
         ttk.Button(btn_frame, text="刪除選定", command=self.delete_current_dialog).pack(side=tk.LEFT, expand=True, fill='x', padx=(2, 0))
 
+        # 流程檢查摘要
+        self.dialog_graph_var = tk.StringVar()
+        ttk.Label(left_frame, textvariable=self.dialog_graph_var, foreground="gray", wraplength=280).pack(anchor='w', pady=(0, 5))
+
         # 列表
         self.dialog_listbox = tk.Listbox(left_frame, exportselection=False)
         self.dialog_listbox.pack(fill=tk.BOTH, expand=True)
+        self.dialog_listbox.bind('<<ListboxSelect>>', self.on_dialog_selected)
 
-        for dialog in self.data_cache['dialogs']['dialogs']:
-            self.dialog_listbox.insert(tk.END, f"{dialog['dialog_id']}")
+        # 全域問題（懸空的 dialog_id、卡關步驟、迴圈）
+        ttk.Label(left_frame, text="流程檢查", font=("Arial", 10, "bold")).pack(anchor='w', pady=(5, 0))
+        self.dialog_issue_listbox = tk.Listbox(left_frame, height=6, exportselection=False, foreground="#b00000")
+        self.dialog_issue_listbox.pack(fill='x')
 
-        self.dialog_listbox.bind('<<ListboxSelect>>', self.on_dialog_selected)
+        self.refresh_dialog_graph_view()
 
         # 右側詳細面板
         self.dialog_detail_frame = ttk.Frame(self.tab_dialogs)
         self.dialog_detail_frame.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=10, pady=10)
         ttk.Label(self.dialog_detail_frame, text="請從左側列表選擇一個對話進行編輯").pack(padx=20, pady=20)
 
+    def refresh_dialog_graph_view(self):
+        """依流程圖更新對話列表的標記、摘要與全域問題（不重建分頁）"""
+        self.refresh_quest_flow()
+        if not getattr(self, 'dialog_listbox', None) or not self.dialog_listbox.winfo_exists():
+            return
+
+        graph = self.dialog_graph
+        colors = {"❌": "#b00000", "⚠️": "#b07000", "🔁": "#0050b0", "": "black"}
+        selection = self.dialog_listbox.curselection()
+        self.dialog_listbox.delete(0, tk.END)
+        for dialog in self.stores['dialogs']:
+            marker = graph.dialog_marker(dialog['dialog_id'])
+            self.dialog_listbox.insert(tk.END, f"{marker} {dialog['dialog_id']}" if marker else dialog['dialog_id'])
+            self.dialog_listbox.itemconfig(tk.END, foreground=colors[marker])
+        for index in selection:
+            self.dialog_listbox.selection_set(index)
+
+        summary = graph.summary()
+        self.dialog_graph_var.set(
+            f"{summary['dialogs']} 個對話｜⚠️ 無法到達 {summary['unreachable']}｜"
+            f"❌ 懸空引用 {summary['dangling']}｜卡關步驟 {summary['dead_ends']}｜🔁 迴圈 {summary['loops']}"
+        )
+        self.dialog_issue_listbox.delete(0, tk.END)
+        for line in graph.report_lines():
+            self.dialog_issue_listbox.insert(tk.END, line)
+
     def on_dialog_selected(self, event):
         """當選擇對話時"""
         if not self.dialog_listbox.curselection():
             return
 
         selected_index = self.dialog_listbox.curselection()[0]
-        selected_dialog = self.data_cache['dialogs']['dialogs'][selected_index]
+        store = self.stores['dialogs']
+        self.current_dialog_handle = store.handle_at(selected_index)
+        selected_dialog = store.record(self.current_dialog_handle)
         self.current_dialog_id = selected_dialog['dialog_id']
 
         # 清空右側面板
@@ -277,6 +401,12 @@ class DialogTaskEditor:
         content_text.pack(fill='x', pady=(0, 10))
         self.widget_vars['content'] = content_text
 
+        # 流程圖：由哪些步驟顯示、檢查結果
+        refs = sorted(node_label(node) for node in self.dialog_graph.dialog_refs.get(selected_dialog['dialog_id'], ()))
+        ttk.Label(form_frame, text="由任務步驟顯示: " + (", ".join(refs) if refs else "(無)"), foreground="gray").pack(anchor='w')
+        for issue in self.dialog_graph.dialog_issues(selected_dialog['dialog_id']):
+            ttk.Label(form_frame, text=issue, foreground="#b00000").pack(anchor='w')
+
         ttk.Separator(form_frame, orient='horizontal').pack(fill='x', pady=10)
 
         # 選項 (Choices)
@@ -344,34 +474,45 @@ class DialogTaskEditor:
 
     def save_current_dialog(self):
         """儲存當前對話"""
-        if not self.current_dialog_id:
+        store = self.stores['dialogs']
+        if not store.has_handle(self.current_dialog_handle):
             return
 
-        # 找到對話
-        dialog_to_update = None
-        for dialog in self.data_cache['dialogs']['dialogs']:
-            if dialog['dialog_id'] == self.current_dialog_id:
-                dialog_to_update = dialog
-                break
+        handle = self.current_dialog_handle
+        old_dialog_id = store.id_of(handle)
 
-        if not dialog_to_update:
+        # 更新數據（只有欄位真的改變時才會標記為需要儲存）
+        try:
+            changed = store.update(handle, {
+                'dialog_id': self.widget_vars['dialog_id'].get(),
+                'speaker': self.widget_vars['speaker'].get(),
+                'speaker_avatar': self.widget_vars['speaker_avatar'].get(),
+                'content': self.widget_vars['content'].get("1.0", tk.END).strip(),
+                'choices': list(self.widget_vars['choices_data']),
+            })
+        except ValueError:
+            messagebox.showerror("錯誤", "此 ID 已存在！")
             return
 
-        # 更新數據
-        dialog_to_update['dialog_id'] = self.widget_vars['dialog_id'].get()
-        dialog_to_update['speaker'] = self.widget_vars['speaker'].get()
-        dialog_to_update['speaker_avatar'] = self.widget_vars['speaker_avatar'].get()
-        dialog_to_update['content'] = self.widget_vars['content'].get("1.0", tk.END).strip()
-        dialog_to_update['choices'] = self.widget_vars['choices_data']
+        if not changed:
+            self.status_var.set("對話沒有修改")
+            return
 
         # 更新 ID
-        self.current_dialog_id = dialog_to_update['dialog_id']
+        self.current_dialog_id = store.id_of(handle)
+        self.dialog_graph.update_dialog(old_dialog_id, store.record(handle))
 
         # 儲存到檔案
         self.save_data_to_file('dialogs')
 
-        # 更新列表
+        # 更新列表並選回同一筆對話（合併儲存後 handle 會重新產生）
         self.populate_dialogs_tab()
+        self.current_dialog_handle = self.stores['dialogs'].handle_of(self.current_dialog_id)
+        if self.current_dialog_handle is not None:
+            position = self.stores['dialogs'].position(self.current_dialog_handle)
+            self.dialog_listbox.selection_set(position)
+            self.dialog_listbox.see(position)
+            self.on_dialog_selected(None)
         messagebox.showinfo("成功", "對話已儲存！")
 
     def add_new_dialog(self):
@@ -381,10 +522,9 @@ class DialogTaskEditor:
             return
 
         # 檢查重複
-        for dialog in self.data_cache['dialogs']['dialogs']:
-            if dialog['dialog_id'] == new_id:
-                messagebox.showerror("錯誤", "此 ID 已存在！")
-                return
+        if new_id in self.stores['dialogs']:
+            messagebox.showerror("錯誤", "此 ID 已存在！")
+            return
 
         # 新增
         new_dialog = {
@@ -397,7 +537,8 @@ class DialogTaskEditor:
             ]
         }
 
-        self.data_cache['dialogs']['dialogs'].append(new_dialog)
+        self.stores['dialogs'].add(new_dialog)
+        self.dialog_graph.update_dialog(None, new_dialog)
         self.save_data_to_file('dialogs')
         self.populate_dialogs_tab()
 
@@ -407,12 +548,15 @@ class DialogTaskEditor:
             return
 
         idx = self.dialog_listbox.curselection()[0]
-        dialog_id = self.data_cache['dialogs']['dialogs'][idx]['dialog_id']
+        store = self.stores['dialogs']
+        handle = store.handle_at(idx)
+        dialog_id = store.id_of(handle)
 
         if not messagebox.askyesno("確認", f"確定要刪除對話 {dialog_id} 嗎？"):
             return
 
-        self.data_cache['dialogs']['dialogs'].pop(idx)
+        store.remove(handle)
+        self.dialog_graph.remove_dialog(dialog_id)
         self.save_data_to_file('dialogs')
         self.populate_dialogs_tab()
 
@@ -439,7 +583,7 @@ class DialogTaskEditor:
         self.quest_listbox = tk.Listbox(left_frame, exportselection=False)
         self.quest_listbox.pack(fill=tk.BOTH, expand=True)
 
-        for quest in self.data_cache['quests']['quests']:
+        for quest in self.stores['quests']:
             self.quest_listbox.insert(tk.END, f"{quest['quest_id']} - {quest['quest_name']}")
 
         self.quest_listbox.bind('<<ListboxSelect>>', self.on_quest_selected)
@@ -455,7 +599,9 @@ class DialogTaskEditor:
             return
 
         selected_index = self.quest_listbox.curselection()[0]
-        selected_quest = self.data_cache['quests']['quests'][selected_index]
+        store = self.stores['quests']
+        self.current_quest_handle = store.handle_at(selected_index)
+        selected_quest = store.record(self.current_quest_handle)
         self.current_quest_id = selected_quest['quest_id']
 
         # 清空右側面板
@@ -528,10 +674,13 @@ class DialogTaskEditor:
         steps_listbox.pack(side=tk.LEFT, fill='both', expand=True, padx=(0, 5))
 
         for step in selected_quest.get('steps', []):
-            steps_listbox.insert(tk.END, f"{step.get('step_id', '')} - {step.get('description', step.get('step_desc', ''))}")
+            steps_listbox.insert(tk.END, self._step_label(step))
 
         self.widget_vars['steps_listbox'] = steps_listbox
-        self.widget_vars['steps_data'] = selected_quest.get('steps', []).copy()  # ✅ 使用 copy
+        # ✅ 使用 copy；步驟以 handle 追蹤，上移 / 下移後仍能選回同一個步驟
+        steps_store = RecordStore({'steps': selected_quest.get('steps', []).copy()}, 'steps', 'step_id')
+        self.widget_vars['steps_store'] = steps_store
+        self.widget_vars['steps_data'] = steps_store.records
 
         # 步驟按鈕
         step_btn_frame = ttk.Frame(steps_frame)
@@ -563,6 +712,21 @@ class DialogTaskEditor:
         ttk.Spinbox(reward_frame, from_=0, to=999999, textvariable=diamond_var, width=15).grid(row=1, column=1, sticky='w', pady=(5, 0))
         self.widget_vars['reward_diamond'] = diamond_var
 
+        # 獎勵帳本：修改金幣 / 鑽石時即時預覽累計
+        ledger_var = tk.StringVar()
+        ttk.Label(form_frame, textvariable=ledger_var, foreground="gray", justify=tk.LEFT).pack(anchor='w', pady=(0, 10))
+
+        def update_ledger_preview(*_):
+            try:
+                gold, diamond = gold_var.get(), diamond_var.get()
+            except tk.TclError:
+                gold = diamond = None  # 輸入到一半（例如空白）時顯示已儲存的累計
+            ledger_var.set("\n".join(self.quest_ledger.describe(self.current_quest_id, gold, diamond)))
+
+        gold_var.trace_add('write', update_ledger_preview)
+        diamond_var.trace_add('write', update_ledger_preview)
+        update_ledger_preview()
+
         ttk.Separator(form_frame, orient='horizontal').pack(fill='x', pady=10)
 
         # 下一個任務
@@ -574,13 +738,25 @@ class DialogTaskEditor:
         # 儲存按鈕
         ttk.Button(form_frame, text="💾 儲存此任務", command=self.save_current_quest).pack(pady=20, fill='x')
 
+    @staticmethod
+    def _step_label(step):
+        return f"{step.get('step_id', '')} - {step.get('description', step.get('step_desc', ''))}"
+
     def add_step(self, listbox):
         """新增步驟"""
         dialog = StepEditorDialog(self.root, self.CONDITION_TYPES)
         self.root.wait_window(dialog)  # ✅ 等待彈窗關閉
         if dialog.result:
-            self.widget_vars['steps_data'].append(dialog.result)
-            listbox.insert(tk.END, f"{dialog.result['step_id']} - {dialog.result.get('description', dialog.result.get('step_desc', ''))}")
+            steps_store = self.widget_vars['steps_store']
+            previous_step = steps_store.records[-1] if len(steps_store.records) else None
+            if not self.confirm_step_gating(dialog.result, previous_step, self.widget_vars['is_mandatory'].get()):
+                return
+            try:
+                self.widget_vars['steps_store'].add(dialog.result)
+            except ValueError:
+                messagebox.showerror("錯誤", f"步驟 ID {dialog.result['step_id']} 已存在！")
+                return
+            listbox.insert(tk.END, self._step_label(dialog.result))
             print(f"✅ 新增步驟: {dialog.result}")
 
     def edit_step(self, listbox):
@@ -590,17 +766,43 @@ class DialogTaskEditor:
             return
 
         idx = listbox.curselection()[0]
-        current_step = self.widget_vars['steps_data'][idx]
+        steps_store = self.widget_vars['steps_store']
+        handle = steps_store.handle_at(idx)
+        current_step = steps_store.record(handle)
 
         dialog = StepEditorDialog(self.root, self.CONDITION_TYPES, current_step)
         self.root.wait_window(dialog)  # ✅ 等待彈窗關閉
         if dialog.result:
-            self.widget_vars['steps_data'][idx] = dialog.result
+            previous_step = steps_store.records[idx - 1] if idx > 0 else None
+            if not self.confirm_step_gating(dialog.result, previous_step, self.widget_vars['is_mandatory'].get()):
+                return
+            try:
+                steps_store.replace(handle, dialog.result)
+            except ValueError:
+                messagebox.showerror("錯誤", f"步驟 ID {dialog.result['step_id']} 已存在！")
+                return
             listbox.delete(idx)
-            listbox.insert(idx, f"{dialog.result['step_id']} - {dialog.result.get('description', dialog.result.get('step_desc', ''))}")
+            listbox.insert(idx, self._step_label(dialog.result))
             listbox.select_set(idx)  # ✅ 重新選中
             print(f"✅ 編輯步驟: {dialog.result}")
 
+    def confirm_step_gating(self, step, previous_step, is_mandatory):
+        """強制任務步驟：檢查 allowed_actions 是否擋下完成條件需要的操作，會卡關時詢問是否仍要套用"""
+        if not is_mandatory:
+            return True
+        dialogs = {dialog.get('dialog_id', ''): dialog for dialog in self.stores['dialogs']}
+        location = step_location(previous_step) if previous_step else None
+        issues = check_step(step, dialogs, self.training_rooms, location)
+        errors = [message for severity, message in issues if severity == "error"]
+        warnings = [message for severity, message in issues if severity == "warning"]
+        if warnings:
+            self.status_var.set(f"⚠️ {step.get('step_id', '')}: {warnings[0]}")
+        if not errors:
+            return True
+        return messagebox.askyesno("新手教學卡關",
+                                   f"步驟 {step.get('step_id', '')} 在強制任務中無法完成：\n\n"
+                                   + "\n".join(f"❌ {message}" for message in errors) + "\n\n仍要套用？")
+
     def remove_step(self, listbox):
         """刪除步驟"""
         if not listbox.curselection():
@@ -608,91 +810,99 @@ class DialogTaskEditor:
             return
 
         idx = listbox.curselection()[0]
-        self.widget_vars['steps_data'].pop(idx)
+        steps_store = self.widget_vars['steps_store']
+        steps_store.remove(steps_store.handle_at(idx))
         listbox.delete(idx)
 
-    def move_step_up(self, listbox):
-        """上移步驟"""
+    def _move_step(self, listbox, offset):
+        """移動步驟並重新選中同一個步驟"""
         if not listbox.curselection():
             return
 
-        idx = listbox.curselection()[0]
-        if idx == 0:
+        steps_store = self.widget_vars['steps_store']
+        handle = steps_store.handle_at(listbox.curselection()[0])
+        old_position = steps_store.position(handle)
+        new_position = steps_store.move(handle, offset)
+        if new_position == old_position:
             return
 
-        # 交換
-        self.widget_vars['steps_data'][idx], self.widget_vars['steps_data'][idx-1] = \
-            self.widget_vars['steps_data'][idx-1], self.widget_vars['steps_data'][idx]
+        # 更新 listbox（只重畫移動範圍內的項目）
+        low, high = min(old_position, new_position), max(old_position, new_position)
+        listbox.delete(low, high)
+        for position in range(low, high + 1):
+            listbox.insert(position, self._step_label(steps_store.records[position]))
+        listbox.selection_clear(0, tk.END)
+        listbox.select_set(steps_store.position(handle))
 
-        # 更新 listbox
-        listbox.delete(idx)
-        listbox.delete(idx-1)
-        listbox.insert(idx-1, f"{self.widget_vars['steps_data'][idx-1]['step_id']} - {self.widget_vars['steps_data'][idx-1].get('description', self.widget_vars['steps_data'][idx-1].get('step_desc', ''))}")
-        listbox.insert(idx, f"{self.widget_vars['steps_data'][idx]['step_id']} - {self.widget_vars['steps_data'][idx].get('description', self.widget_vars['steps_data'][idx].get('step_desc', ''))}")
-        listbox.select_set(idx-1)
+    def move_step_up(self, listbox):
+        """上移步驟"""
+        self._move_step(listbox, -1)
 
     def move_step_down(self, listbox):
         """下移步驟"""
-        if not listbox.curselection():
-            return
-
-        idx = listbox.curselection()[0]
-        if idx >= len(self.widget_vars['steps_data']) - 1:
-            return
-
-        # 交換
-        self.widget_vars['steps_data'][idx], self.widget_vars['steps_data'][idx+1] = \
-            self.widget_vars['steps_data'][idx+1], self.widget_vars['steps_data'][idx]
-
-        # 更新 listbox
-        listbox.delete(idx)
-        listbox.delete(idx)
-        listbox.insert(idx, f"{self.widget_vars['steps_data'][idx]['step_id']} - {self.widget_vars['steps_data'][idx].get('description', self.widget_vars['steps_data'][idx].get('step_desc', ''))}")
-        listbox.insert(idx+1, f"{self.widget_vars['steps_data'][idx+1]['step_id']} - {self.widget_vars['steps_data'][idx+1].get('description', self.widget_vars['steps_data'][idx+1].get('step_desc', ''))}")
-        listbox.select_set(idx+1)
+        self._move_step(listbox, 1)
 
     def save_current_quest(self):
         """儲存當前任務"""
-        if not self.current_quest_id:
+        store = self.stores['quests']
+        if not store.has_handle(self.current_quest_handle):
             return
 
-        # 找到任務
-        quest_to_update = None
-        for quest in self.data_cache['quests']['quests']:
-            if quest['quest_id'] == self.current_quest_id:
-                quest_to_update = quest
-                break
-
-        if not quest_to_update:
-            return
+        handle = self.current_quest_handle
+        old_quest_id = store.id_of(handle)
 
         # ✅ 從帶說明的值中提取實際類型
         quest_type_full = self.widget_vars['quest_type'].get()
         quest_type = quest_type_full.split(' - ')[0] if ' - ' in quest_type_full else quest_type_full
 
-        # 更新數據
-        quest_to_update['quest_id'] = self.widget_vars['quest_id'].get()
-        quest_to_update['quest_name'] = self.widget_vars['quest_name'].get()
-        quest_to_update['quest_desc'] = self.widget_vars['quest_desc'].get("1.0", tk.END).strip()
-        quest_to_update['quest_type'] = quest_type
-        quest_to_update['is_mandatory'] = self.widget_vars['is_mandatory'].get()
-        quest_to_update['auto_start'] = self.widget_vars['auto_start'].get()
-        quest_to_update['steps'] = self.widget_vars['steps_data']
-        quest_to_update['rewards'] = {
-            "gold": self.widget_vars['reward_gold'].get(),
-            "diamond": self.widget_vars['reward_diamond'].get(),
-            "cards": []
-        }
-        quest_to_update['next_quest'] = self.widget_vars['next_quest'].get()
+        # 更新數據（只有欄位真的改變時才會標記為需要儲存）
+        try:
+            changed = store.update(handle, {
+                'quest_id': self.widget_vars['quest_id'].get(),
+                'quest_name': self.widget_vars['quest_name'].get(),
+                'quest_desc': self.widget_vars['quest_desc'].get("1.0", tk.END).strip(),
+                'quest_type': quest_type,
+                'is_mandatory': self.widget_vars['is_mandatory'].get(),
+                'auto_start': self.widget_vars['auto_start'].get(),
+                'steps': list(self.widget_vars['steps_data']),
+                'rewards': {
+                    "gold": self.widget_vars['reward_gold'].get(),
+                    "diamond": self.widget_vars['reward_diamond'].get(),
+                    "cards": []
+                },
+                'next_quest': self.widget_vars['next_quest'].get(),
+            })
+        except ValueError:
+            messagebox.showerror("錯誤", "此 ID 已存在！")
+            return
+
+        if not changed:
+            self.status_var.set("任務沒有修改")
+            return
 
         # 更新 ID
-        self.current_quest_id = quest_to_update['quest_id']
+        self.current_quest_id = store.id_of(handle)
+        gating_issues = check_quest(store.record(handle), {dialog.get('dialog_id', ''): dialog for dialog in self.stores['dialogs']},
+                                    self.training_rooms)
+        self.dialog_graph.update_quest(old_quest_id, store.record(handle))
+        self.quest_ledger.update_quest(old_quest_id, store.record(handle))
 
         # 儲存到檔案
         self.save_data_to_file('quests')
 
-        # 更新列表
+        # 更新列表並選回同一個任務（合併儲存後 handle 會重新產生）
         self.populate_quests_tab()
+        self.refresh_dialog_graph_view()
+        self.current_quest_handle = self.stores['quests'].handle_of(self.current_quest_id)
+        if self.current_quest_handle is not None:
+            position = self.stores['quests'].position(self.current_quest_handle)
+            self.quest_listbox.selection_set(position)
+            self.quest_listbox.see(position)
+            self.on_quest_selected(None)
+        if any(severity == "error" for _, _, severity, _ in gating_issues):
+            messagebox.showwarning("新手教學卡關", "任務已儲存，但以下步驟會卡關：\n\n"
+                                   + "\n".join(format_issues(self.current_quest_id, gating_issues)))
+            return
         messagebox.showinfo("成功", "任務已儲存！")
 
     def add_new_quest(self):
@@ -702,10 +912,9 @@ class DialogTaskEditor:
             return
 
         # 檢查重複
-        for quest in self.data_cache['quests']['quests']:
-            if quest['quest_id'] == new_id:
-                messagebox.showerror("錯誤", "此 ID 已存在！")
-                return
+        if new_id in self.stores['quests']:
+            messagebox.showerror("錯誤", "此 ID 已存在！")
+            return
 
         # 新增
         new_quest = {
@@ -723,9 +932,12 @@ class DialogTaskEditor:
             }
         }
 
-        self.data_cache['quests']['quests'].append(new_quest)
+        self.stores['quests'].add(new_quest)
+        self.dialog_graph.update_quest(None, new_quest)
+        self.quest_ledger.update_quest(None, new_quest)
         self.save_data_to_file('quests')
         self.populate_quests_tab()
+        self.refresh_dialog_graph_view()
 
     def delete_current_quest(self):
         """刪除當前任務"""
@@ -733,14 +945,255 @@ class DialogTaskEditor:
             return
 
         idx = self.quest_listbox.curselection()[0]
-        quest_id = self.data_cache['quests']['quests'][idx]['quest_id']
+        store = self.stores['quests']
+        handle = store.handle_at(idx)
+        quest_id = store.id_of(handle)
 
         if not messagebox.askyesno("確認", f"確定要刪除任務 {quest_id} 嗎？"):
             return
 
-        self.data_cache['quests']['quests'].pop(idx)
+        store.remove(handle)
+        self.dialog_graph.remove_quest(quest_id)
+        self.quest_ledger.remove_quest(quest_id)
         self.save_data_to_file('quests')
         self.populate_quests_tab()
+        self.refresh_dialog_graph_view()
+
+    # ========== 任務流程圖 ==========
+
+    def populate_flow_tab(self):
+        """建立任務流程圖分頁（版面在背景執行緒計算，只繪製可見範圍）"""
+        # 重新載入資料夾時沿用同一個畫布與背景執行緒
+        if getattr(self, 'quest_flow_view', None) is None:
+            self.quest_flow_view = QuestFlowView(self.tab_flow, self.on_flow_node_clicked)
+            self.quest_flow_view.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        self.refresh_quest_flow()
+
+    def refresh_quest_flow(self):
+        """資料或流程檢查結果改變後重新計算流程圖（只重算有變動的任務）"""
+        view = getattr(self, 'quest_flow_view', None)
+        if view is None or not view.winfo_exists():
+            return
+        view.show(build_snapshot(self.stores['quests'], self.dialog_graph))
+
+    def on_flow_node_clicked(self, key, event):
+        """點擊流程圖節點：任務 -> 任務分頁；步驟 -> 步驟編輯；對話 -> 選項選單"""
+        kind = key[0]
+        if kind == "quest":
+            self.select_quest(key[1])
+        elif kind == "next":
+            if key[2] in self.stores['quests']:
+                self.select_quest(key[2])
+            else:
+                self.status_var.set(f"❌ next_quest {key[2]} 不存在（{key[1]}）")
+        elif kind == "step":
+            self.edit_flow_step(key[1], key[2])
+        elif kind == "dialog":
+            self.show_flow_dialog_menu(key[3], event)
+
+    def select_quest(self, quest_id):
+        """切換到任務分頁並選取任務"""
+        handle = self.stores['quests'].handle_of(quest_id)
+        if handle is None:
+            return
+        self.notebook.select(self.tab_quests)
+        position = self.stores['quests'].position(handle)
+        self.quest_listbox.selection_clear(0, tk.END)
+        self.quest_listbox.selection_set(position)
+        self.quest_listbox.see(position)
+        self.on_quest_selected(None)
+
+    def select_dialog(self, dialog_id):
+        """切換到對話分頁並選取對話"""
+        handle = self.stores['dialogs'].handle_of(dialog_id)
+        if handle is None:
+            return
+        self.notebook.select(self.tab_dialogs)
+        position = self.stores['dialogs'].position(handle)
+        self.dialog_listbox.selection_clear(0, tk.END)
+        self.dialog_listbox.selection_set(position)
+        self.dialog_listbox.see(position)
+        self.on_dialog_selected(None)
+
+    def edit_flow_step(self, quest_id, step_index):
+        """從流程圖編輯任務步驟（沿用步驟編輯彈窗，確定後直接儲存）"""
+        store = self.stores['quests']
+        handle = store.handle_of(quest_id)
+        if handle is None:
+            return
+        steps = list(store.record(handle).get('steps', []))
+        if step_index >= len(steps):
+            return
+
+        dialog = StepEditorDialog(self.root, self.CONDITION_TYPES, steps[step_index])
+        self.root.wait_window(dialog)  # ✅ 等待彈窗關閉
+        if not dialog.result:
+            return
+        if any(i != step_index and step.get('step_id') == dialog.result['step_id'] for i, step in enumerate(steps)):
+            messagebox.showerror("錯誤", f"步驟 ID {dialog.result['step_id']} 已存在！")
+            return
+        # 合併到原步驟（保留 allowed_actions 等彈窗沒有編輯的欄位），舊版的 condition 欄位改為 conditions
+        step = {**steps[step_index], **dialog.result}
+        step.pop('condition', None)
+        previous_step = steps[step_index - 1] if step_index > 0 else None
+        if not self.confirm_step_gating(step, previous_step, store.record(handle).get('is_mandatory', False)):
+            return
+
+        steps[step_index] = step
+        if not store.update(handle, {'steps': steps}):
+            self.status_var.set("任務沒有修改")
+            return
+        self.dialog_graph.update_quest(quest_id, store.record(handle))
+        self.quest_ledger.update_quest(quest_id, store.record(handle))
+        self.save_data_to_file('quests')
+        self.populate_quests_tab()
+        self.refresh_dialog_graph_view()
+
+    def show_flow_dialog_menu(self, dialog_id, event):
+        """對話節點的選單：開啟對話或編輯其中一個選項"""
+        handle = self.stores['dialogs'].handle_of(dialog_id)
+        if handle is None:
+            self.status_var.set(f"❌ 對話 {dialog_id} 不存在")
+            return
+
+        menu = tk.Menu(self.root, tearoff=0)
+        menu.add_command(label=f"在對話分頁開啟 {dialog_id}", command=lambda: self.select_dialog(dialog_id))
+        choices = self.stores['dialogs'].record(handle).get('choices', [])
+        if choices:
+            menu.add_separator()
+        for index, choice in enumerate(choices):
+            menu.add_command(label=f"編輯選項：{choice.get('text', '')} -> {choice.get('action', '')}",
+                             command=partial(self.edit_flow_choice, dialog_id, index))
+        menu.tk_popup(event.x_root, event.y_root)
+
+    def edit_flow_choice(self, dialog_id, choice_index):
+        """從流程圖編輯對話選項（沿用選項編輯彈窗，確定後直接儲存）"""
+        store = self.stores['dialogs']
+        handle = store.handle_of(dialog_id)
+        if handle is None:
+            return
+        choices = list(store.record(handle).get('choices', []))
+        if choice_index >= len(choices):
+            return
+
+        dialog = ChoiceEditorDialog(self.root, self.ACTION_TYPES, choices[choice_index])
+        self.root.wait_window(dialog)  # ✅ 等待彈窗關閉
+        if not dialog.result:
+            return
+
+        choices[choice_index] = dialog.result
+        if not store.update(handle, {'choices': choices}):
+            self.status_var.set("對話沒有修改")
+            return
+        self.dialog_graph.update_dialog(dialog_id, store.record(handle))
+        self.save_data_to_file('dialogs')
+        self.populate_dialogs_tab()
+
+    # ========== 任務流程模擬 ==========
+
+    def open_quest_simulator(self):
+        """以目前編輯中的對話與任務跑隨機流程，檢查強制任務是否都能完成"""
+        if not self.data_dir:
+            messagebox.showwarning("提示", "請先設定 data 資料夾")
+            return
+
+        window = tk.Toplevel(self.root)
+        window.title("任務流程模擬")
+        window.geometry("900x600")
+
+        control_frame = ttk.Frame(window)
+        control_frame.pack(fill=tk.X, padx=10, pady=10)
+
+        ttk.Label(control_frame, text="流程數:").pack(side=tk.LEFT)
+        traces_var = tk.IntVar(value=1000)
+        ttk.Spinbox(control_frame, from_=10, to=100000, increment=100, textvariable=traces_var, width=8).pack(side=tk.LEFT, padx=5)
+        ttk.Label(control_frame, text="每條最多操作數:").pack(side=tk.LEFT, padx=(10, 0))
+        max_events_var = tk.IntVar(value=200)
+        ttk.Spinbox(control_frame, from_=10, to=10000, increment=50, textvariable=max_events_var, width=6).pack(side=tk.LEFT, padx=5)
+        ttk.Label(control_frame, text="亂數種子:").pack(side=tk.LEFT, padx=(10, 0))
+        seed_var = tk.IntVar(value=42)
+        ttk.Entry(control_frame, textvariable=seed_var, width=8).pack(side=tk.LEFT, padx=5)
+
+        text_frame = ttk.Frame(window)
+        text_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=(0, 10))
+        scrollbar = ttk.Scrollbar(text_frame)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        report_text = tk.Text(text_frame, wrap=tk.WORD, font=("Consolas", 10), yscrollcommand=scrollbar.set)
+        report_text.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        scrollbar.config(command=report_text.yview)
+
+        # 模擬在背景執行緒執行（大量流程時不會卡住編輯器），結果放進佇列由 Tk 執行緒輪詢
+        results = queue.Queue()
+
+        def work(quests, dialogs, traces, max_events, seed):
+            try:
+                # 訓練室列表從磁碟讀取；對話與任務使用編輯中的資料（包含尚未儲存的修改）
+                _, _, rooms = load_config(self.data_dir)
+                results.put((traces, run_batch(quests, dialogs, traces=traces, seed=seed,
+                                               max_events=max_events, rooms=rooms), None))
+            except Exception as e:
+                results.put((traces, None, e))
+
+        def poll():
+            if not window.winfo_exists():
+                return
+            try:
+                traces, report, error = results.get_nowait()
+            except queue.Empty:
+                self.root.after(50, poll)
+                return
+            window.config(cursor="")
+            run_button.config(state=tk.NORMAL)
+            report_text.delete("1.0", tk.END)
+            if error is not None:
+                report_text.insert("1.0", f"❌ 模擬失敗：{error}")
+                self.status_var.set(f"❌ 任務流程模擬失敗：{error}")
+                return
+            report_text.insert("1.0", format_report(report))
+            if report["mandatory_failures"]:
+                self.status_var.set(f"❌ 任務流程模擬：{len(report['mandatory_failures'])} 個強制任務無法完成")
+            else:
+                self.status_var.set(f"✅ 任務流程模擬：{traces} 條流程，所有強制任務皆可完成")
+
+        def run():
+            try:
+                traces, max_events, seed = traces_var.get(), max_events_var.get(), seed_var.get()
+            except tk.TclError:
+                messagebox.showerror("錯誤", "請輸入整數", parent=window)
+                return
+            window.config(cursor="watch")
+            run_button.config(state=tk.DISABLED)
+            report_text.delete("1.0", tk.END)
+            report_text.insert("1.0", f"模擬中（{traces} 條流程）...")
+            # 複製一份資料，模擬期間仍可繼續編輯
+            quests, dialogs = copy.deepcopy(self.data_cache['quests']), copy.deepcopy(self.data_cache['dialogs'])
+            threading.Thread(target=work, args=(quests, dialogs, traces, max_events, seed),
+                             name="QuestSimulator", daemon=True).start()
+            self.root.after(50, poll)
+
+        run_button = ttk.Button(control_frame, text="▶ 執行模擬", command=run)
+        run_button.pack(side=tk.LEFT, padx=10)
+        run()
+
+    def export_quest_dispatch(self):
+        """編譯 quests.json 的事件分派索引，寫到 config/quest_dispatch.json"""
+        if not self.data_dir:
+            messagebox.showwarning("提示", "請先設定 data 資料夾")
+            return
+        # 索引記錄 quests.json 的 md5，必須以磁碟上的檔案編譯
+        if self.stores.get('quests') is not None and self.stores['quests'].dirty:
+            if not messagebox.askyesno("確認", "任務有尚未儲存的修改，要先儲存再匯出嗎？"):
+                return
+            self.save_data_to_file('quests')
+            self.populate_quests_tab()
+            if self.stores['quests'].dirty:
+                return  # 取消或儲存失敗
+        try:
+            out_path = export_artifact(os.path.join(self.data_dir, "config"))
+        except (OSError, ValueError) as e:
+            messagebox.showerror("錯誤", f"匯出任務事件索引失敗：\n{e}")
+            return
+        self.status_var.set(f"✅ 已匯出任務事件索引：{out_path}")
 
 
 # ========== 彈窗編輯器 ==========
@@ -824,6 +1277,7 @@ class StepEditorDialog(tk.Toplevel):
         self.geometry("600x550")
 
         self.condition_types = condition_types
+        self.step_data = step_data
         self.result = None
 
         # 建立捲動區域
@@ -859,7 +1313,8 @@ class StepEditorDialog(tk.Toplevel):
         ttk.Label(form_frame, text="條件類型:", font=("Arial", 10, "bold")).pack(anchor='w', pady=(0, 0))
         ttk.Label(form_frame, text="選擇此步驟完成的條件", foreground="gray").pack(anchor='w')
 
-        conditions = step_data.get('condition', step_data.get('conditions', {})) if step_data else {}
+        # TaskManager 只讀取 conditions（舊版編輯器寫入的 condition 在此轉換）
+        conditions = step_data.get('conditions', step_data.get('condition', {})) if step_data else {}
         current_condition = conditions.get('type', 'dialog_completed')
         self.condition_type_var = tk.StringVar(value=current_condition)
 
@@ -911,15 +1366,20 @@ class StepEditorDialog(tk.Toplevel):
         except:
             conditions = {"type": condition_type}
 
-        self.result = {
+        # ✅ 保留原步驟的其他欄位（allowed_actions、actions...），移除舊版編輯器的欄位名稱
+        self.result = {key: value for key, value in (self.step_data or {}).items()
+                       if key not in ("condition", "description")}
+        self.result.update({
             "step_id": self.step_id_var.get(),
-            "description": self.step_desc_var.get(),
-            "condition": conditions  # ✅ 使用 "condition" 而不是 "conditions"
-        }
+            "step_desc": self.step_desc_var.get(),
+            "conditions": conditions  # ✅ TaskManager 讀取的是 "conditions"
+        })
 
         # 如果有 dialog_id，添加進去
         if self.dialog_id_var.get():
             self.result["dialog_id"] = self.dialog_id_var.get()
+        else:
+            self.result.pop("dialog_id", None)
 
         self.destroy()
 
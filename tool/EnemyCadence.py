@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+敵人攻擊節奏分析 (Enemy Cadence Timeline)
+依 BattleManager.execute_enemy_turn 的規則，直接以週期分析求出每一波每回合承受的傷害，不需逐回合模擬：
+
+- 進場時 current_cd = attack_cd，每個敵人回合先 tick_cd() 再判斷 should_attack()，攻擊後 reset_cd()，
+  因此 attack_cd = c 的敵人在第 c、2c、3c... 回合攻擊（attack_cd <= 0 視為每回合攻擊）
+- 一波的傷害序列以所有 attack_cd 的最小公倍數 (LCM) 為週期；第 t 回合的傷害 = Σ(c 整除 t 的敵人 ATK)
+- 玩家的 DAMAGE_REDUCTION Buff 對每一下攻擊各自以 int() 取整（apply_damage_to_player）
+
+由週期序列得出：
+1. 最大爆發：任意連續 k 回合的最大傷害（週期序列的滑動視窗）
+2. 存活所需 HP：每回合回復 r、HP 上限為 H 時，H 必須大於任一視窗的 (傷害 - r × 期間回合數)；
+   以 (d - r) 的最大子陣列和求出，不指定回合數時 r 必須不低於每回合平均傷害
+3. 所需回復：指定隊伍 HP 時，能撐過的最低每回合回復（二分搜尋）
+
+假設整波敵人都存活（最壞情況）；DEATH_DAMAGE 全數加進所需 HP，ENTER_HP_TO_ONE 以 HP=1 進場計算所需回復。
+遊戲端目前沒有敵人攻擊技能會改變傷害（ENEMY_DAMAGE_BY_PLAYER_ORBS 僅有宣告），因此每一下攻擊 = base_atk。
+
+用法：
+    python tool/EnemyCadence.py data
+    python tool/EnemyCadence.py data --stage 1-3 --reduction 30 --hp 3000 --turns 10 --timeline
+"""
+
+import argparse
+import math
+import sys
+
+from SkillCompiler import compile_skills
+from StageDifficulty import EnemyProfile, load_data
+
+
+MAX_PERIOD = 100000           # 週期超過此長度時只展開前 MAX_PERIOD 回合
+BURST_WINDOWS = (1, 2, 3)     # 報表列出的爆發視窗長度
+
+
+# ========== 週期序列 ==========
+
+def effective_cd(attack_cd):
+    """敵人實際的攻擊間隔（tick_cd 不會降到 0 以下，attack_cd <= 0 等同每回合攻擊）"""
+    return max(int(attack_cd or 0), 1)
+
+
+def reduce_hit(damage, reduction_percent):
+    """套用玩家 DAMAGE_REDUCTION Buff 後的單次傷害"""
+    if reduction_percent <= 0:
+        return int(damage)
+    return int(damage - damage * (reduction_percent / 100.0))
+
+
+class WaveCadence:
+    """一波敵人的傷害序列（groups: {攻擊間隔: 同時攻擊的傷害總和}）"""
+
+    def __init__(self, groups, death_damage=0, enter_hp_to_one=False, missing=()):
+        self.groups = {cd: damage for cd, damage in groups.items() if damage > 0}
+        self.death_damage = death_damage
+        self.enter_hp_to_one = enter_hp_to_one
+        self.missing = list(missing)
+        self.period = 1
+        for cd in self.groups:
+            self.period = math.lcm(self.period, cd)
+        self.truncated = self.period > MAX_PERIOD
+        length = min(self.period, MAX_PERIOD)
+        self.timeline = [0] * length
+        for cd, damage in self.groups.items():
+            for turn in range(cd, length + 1, cd):
+                self.timeline[turn - 1] += damage
+        # 每週期的傷害與攻擊次數可直接由間隔算出，不受 MAX_PERIOD 影響
+        self.period_damage = sum(damage * (self.period // cd) for cd, damage in self.groups.items())
+        self.average = sum(damage / cd for cd, damage in self.groups.items())
+        self.first_attack = min(self.groups) if self.groups else None
+
+    def damage_at(self, turn):
+        """第 turn 回合（從 1 開始）的敵人傷害"""
+        if self.truncated:
+            return sum(damage for cd, damage in self.groups.items() if turn % cd == 0)
+        return self.timeline[(turn - 1) % self.period]
+
+    def _series(self, turns):
+        if not self.truncated and turns <= self.period:
+            return self.timeline[:turns]
+        return [self.damage_at(turn) for turn in range(1, turns + 1)]
+
+    def burst(self, length):
+        """任意連續 length 回合的最大傷害：(damage, 起始回合)"""
+        if not self.groups or length <= 0:
+            return 0, 1
+        if self.truncated:
+            # 無法展開整個週期時回傳上界（每組最多攻擊 ceil(length / cd) 次）
+            return sum(damage * -(-length // cd) for cd, damage in self.groups.items()), 1
+        full, rest = divmod(length, self.period)
+        if rest == 0:
+            return full * self.period_damage, 1
+        doubled = self.timeline + self.timeline[:rest]
+        window = sum(doubled[:rest])
+        best, start = window, 1
+        for index in range(1, self.period):
+            window += doubled[index + rest - 1] - doubled[index - 1]
+            if window > best:
+                best, start = window, index + 1
+        return full * self.period_damage + best, start
+
+    def sustain_recovery(self):
+        """不限回合數時，每回合至少需要的回復量"""
+        if not self.groups:
+            return 0
+        return -(-self.period_damage // self.period)
+
+    def survival_hp(self, recovery=0, turns=None):
+        """每回合回復 recovery 時，撐過整波（或前 turns 回合）需要的最低隊伍 HP；無法撐過時回傳 None
+
+        第 s~e 回合的損失 = Σd - recovery × (e - s)，即 Σ(d - recovery) + recovery，取最大子陣列和
+        """
+        if turns is None:
+            if recovery * self.period < self.period_damage or self.truncated:
+                return None
+            # 任意 period 個連續回合的 Σ(d - recovery) <= 0，展開兩個週期即可涵蓋所有視窗
+            series = self.timeline + self.timeline
+        else:
+            series = self._series(turns)
+        best, current = None, 0
+        for damage in series:
+            current = max(current, 0) + damage - recovery
+            best = current if best is None else max(best, current)
+        loss = max(best + recovery, 0) if best is not None else 0
+        return loss + self.death_damage + 1
+
+    def min_recovery(self, hp, turns=None):
+        """隊伍 HP 為 hp 時需要的最低每回合回復；無法撐過時回傳 None"""
+        limit = max(self.timeline, default=0) + self.death_damage + 1
+        if turns is None and self.truncated:
+            return None
+
+        def survives(recovery):
+            need = self.survival_hp(recovery, turns)
+            return need is not None and need <= hp
+
+        if not survives(limit):
+            return None
+        low, high = 0, limit
+        while low < high:
+            middle = (low + high) // 2
+            if survives(middle):
+                high = middle
+            else:
+                low = middle + 1
+        return max(low, self.enter_recovery(turns))
+
+    def enter_recovery(self, turns=None):
+        """ENTER_HP_TO_ONE：以 HP=1 進場時，每回合至少需要的回復（回復在敵人攻擊之前）"""
+        if not self.enter_hp_to_one or not self.groups:
+            return 0
+        horizon = turns if turns is not None else len(self.timeline)
+        need, total = 0, 0
+        for turn, damage in enumerate(self._series(horizon), 1):
+            total += damage
+            # 1 + recovery × turn - total > 0
+            need = max(need, (total - 1) // turn + 1 if total >= 1 else 0)
+        return need
+
+
+# ========== 關卡 ==========
+
+def build_profiles(enemies_data, enemy_skills_data=None):
+    """{enemy_id: EnemyProfile}"""
+    skills, _ = compile_skills({"enemy": enemy_skills_data or {}})
+    profiles = {}
+    for enemy in (enemies_data or {}).get("enemies", []):
+        profile = EnemyProfile(enemy, skills.get("enemy", {}))
+        profiles.setdefault(profile.enemy_id, profile)
+    return profiles
+
+
+def wave_cadence(wave, profiles, reduction_percent=0.0):
+    """由波次設定（enemies: [{enemy_id, count}]）建立 WaveCadence"""
+    groups, death_damage, enter_hp_to_one, missing = {}, 0, False, []
+    for entry in wave.get("enemies", []) or []:
+        enemy_id = entry.get("enemy_id", "")
+        profile = profiles.get(enemy_id)
+        if profile is None:
+            missing.append(enemy_id)
+            continue
+        count = int(entry.get("count", 1) or 0)
+        cd = effective_cd(profile.attack_cd)
+        groups[cd] = groups.get(cd, 0) + reduce_hit(profile.atk, reduction_percent) * count
+        death_damage += profile.death_damage * count
+        enter_hp_to_one = enter_hp_to_one or (profile.enter_hp_to_one and count > 0)
+    return WaveCadence(groups, death_damage, enter_hp_to_one, missing)
+
+
+def analyze_stages(stages_data, profiles, reduction_percent=0.0, stage_id=None):
+    """[(stage_id, [WaveCadence])]"""
+    results = []
+    for stage in (stages_data or {}).get("stages", []):
+        sid = stage.get("stage_id", "")
+        if stage_id is not None and sid != stage_id:
+            continue
+        waves = stage.get("waves") or ([{"enemies": stage["enemies"]}] if stage.get("enemies") else [])
+        results.append((sid, [wave_cadence(wave, profiles, reduction_percent) for wave in waves]))
+    return results
+
+
+def summarize(cadence, hp=None, recovery=0, turns=None):
+    """GM 與報表共用的一行摘要"""
+    if not cadence.groups:
+        text = "不會攻擊"
+        if cadence.death_damage:
+            text += f"｜死亡傷害 {cadence.death_damage}"
+        return text
+    horizon = turns if turns is not None else len(cadence.timeline)
+    period = f"{cadence.period}" + ("+" if cadence.truncated else "")
+    parts = [f"週期 {period} 回合 {cadence.period_damage} 傷害 (平均 {cadence.average:.0f}/回合)",
+             "爆發 " + " / ".join(f"{k}回合 {cadence.burst(k)[0]}" for k in BURST_WINDOWS),
+             f"{horizon} 回合內無回復需 HP≥{cadence.survival_hp(0, horizon)}"]
+    need = cadence.survival_hp(recovery, turns)
+    if recovery:
+        parts.append(f"回復 {recovery} 時需 HP≥{need}" if need is not None else f"回復 {recovery} 無法撐過")
+    parts.append(f"長期需回復≥{max(cadence.sustain_recovery(), cadence.enter_recovery())}/回合")
+    if hp is not None:
+        low = cadence.min_recovery(hp, turns)
+        parts.append(f"HP {hp} 需回復≥{low}" if low is not None else f"HP {hp} 無法撐過")
+    if cadence.death_damage:
+        parts.append(f"含死亡傷害 {cadence.death_damage}")
+    if cadence.enter_hp_to_one:
+        parts.append("⚠️ 進場 HP 扣至 1")
+    return "｜".join(parts)
+
+
+def format_report(results, hp=None, recovery=0, turns=None, timeline=False):
+    lines = []
+    for sid, cadences in results:
+        lines.append(f"[{sid}]")
+        if not cadences:
+            lines.append("  (沒有波次)")
+        for number, cadence in enumerate(cadences, 1):
+            lines.append(f"  第 {number} 波：{summarize(cadence, hp, recovery, turns)}")
+            if cadence.missing:
+                lines.append(f"    ⚠️ 敵人不存在: {', '.join(cadence.missing)}")
+            if timeline and cadence.groups:
+                shown = cadence._series(min(turns or cadence.period, 60))
+                lines.append("    " + " ".join(str(damage) for damage in shown))
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description="以攻擊 CD 週期計算每一波的承受傷害與存活需求")
+    parser.add_argument("data_dir", help="data 資料夾路徑")
+    parser.add_argument("--stage", help="只分析指定關卡")
+    parser.add_argument("--reduction", type=float, default=0.0, help="玩家 DAMAGE_REDUCTION 減傷百分比")
+    parser.add_argument("--hp", type=int, help="隊伍 HP（列出需要的最低回復）")
+    parser.add_argument("--recovery", type=int, default=0, help="隊伍每回合回復")
+    parser.add_argument("--turns", type=int, help="只考慮前 N 回合（預設為不限回合）")
+    parser.add_argument("--timeline", action="store_true", help="列出每回合的傷害序列")
+    args = parser.parse_args()
+
+    data = load_data(args.data_dir)
+    if data["stages"] is None or data["enemies"] is None:
+        print("❌ 找不到 stages.json 或 enemies.json")
+        return 1
+    profiles = build_profiles(data["enemies"], data["enemy_skills"])
+    results = analyze_stages(data["stages"], profiles, args.reduction, args.stage)
+    if args.stage and not results:
+        print(f"❌ 找不到關卡 {args.stage}")
+        return 1
+    print("\n".join(format_report(results, args.hp, args.recovery, args.turns, args.timeline)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -6,6 +6,14 @@ import textwrap
 from functools import partial
 import copy # 用於深度複製物件
 
+from DataSchema import RECORD_KEYS, build_index, build_indexes, get_records, validate_dataset
+from SnapshotCache import SnapshotCache
+from GMProfiler import PROFILER, ProfilerOverlay, instrument_class
+from SafeSave import SaveGuard, describe_conflict
+from SkillCompiler import export_table, format_diagnostics, schema_mismatches
+from StageDifficulty import score_stages
+from EnemyCadence import build_profiles, summarize, wave_cadence
+
 
 def attach_prefix_trace(tk_var, prefix):
     """確保 StringVar 內容自動補上指定前綴"""
@@ -482,6 +490,12 @@ class GameEditorApp:
         self._data_file_snapshot = {}
         self._auto_refresh_job = None
         self.auto_refresh_interval_ms = 2000  # 2 秒檢查一次資料夾變化
+        self.profiler_overlay = None
+        self.snapshot_cache = None
+        self.data_indexes = {} # data_key -> {主鍵: 記錄}
+        self._enemy_profiles = None # EnemyCadence.build_profiles 的結果（敵人或敵人技能儲存 / 重新載入時清除）
+        self.save_guard = SaveGuard() # 記錄載入時的檔案版本，儲存時偵測他人修改
+        self._deferred_external_keys = set() # 外部已修改、但分頁正在編輯中而尚未合併的資料
         self.SKILL_ID_PREFIXES = {
             'leader_skills': 'LS_',
             'active_skills': 'AS_',
@@ -501,6 +515,19 @@ class GameEditorApp:
             "gacha_pools": os.path.join("config", "gacha_pools.json"),  # 抽卡池
             "training_rooms": os.path.join("config", "training_rooms.json")  # 訓練室
         }
+        # 資料檔 -> (分頁屬性, 填充方法)，用於外部變更時只重新整理受影響的分頁
+        self.DATA_KEY_TABS = {
+            "cards": ("tab_player_cards", "populate_player_cards_tab"),
+            "enemies": ("tab_enemy_cards", "populate_enemy_cards_tab"),
+            "stages": ("tab_stages", "populate_stages_tab"),
+            "active_skills": ("tab_player_skills", "populate_player_skills_tab"),
+            "leader_skills": ("tab_player_skills", "populate_player_skills_tab"),
+            "enemy_skills": ("tab_enemy_skills", "populate_enemy_skills_tab"),
+            "regions": ("tab_regions", "populate_regions_tab"),
+            "shop_items": ("tab_shop_items", "populate_shop_items_tab"),
+            "gacha_pools": ("tab_gacha_pools", "populate_gacha_pools_tab"),
+            "training_rooms": ("tab_training_rooms", "populate_training_rooms_tab"),
+        }
 
         self._init_skill_metadata()
         self._build_base_ui()
@@ -1267,10 +1294,20 @@ class GameEditorApp:
         file_menu.add_command(label="退出", command=self.root.quit)
         menu_bar.add_cascade(label="檔案", menu=file_menu)
 
+        tools_menu = tk.Menu(menu_bar, tearoff=0)
+        tools_menu.add_command(label="驗證資料引用", command=self.validate_data_references)
+        tools_menu.add_command(label="匯出技能時機表", command=self.export_skill_table)
+        tools_menu.add_separator()
+        tools_menu.add_command(label="效能監控 (F12)", command=self.toggle_profiler_overlay)
+        tools_menu.add_command(label="開始效能分析 (cProfile)", command=self.start_profiling_session)
+        tools_menu.add_command(label="停止並匯出效能分析...", command=self.stop_profiling_session)
+        menu_bar.add_cascade(label="工具", menu=tools_menu)
+
         help_menu = tk.Menu(menu_bar, tearoff=0)
         help_menu.add_command(label="技能組件文檔", command=self.open_skill_documentation_window)
         menu_bar.add_cascade(label="說明", menu=help_menu)
         self.root.config(menu=menu_bar)
+        self.root.bind('<F12>', lambda e: self.toggle_profiler_overlay())
 
     def create_status_bar(self):
         self.status_var = tk.StringVar()
@@ -1295,6 +1332,70 @@ class GameEditorApp:
         text_widget.pack(side=tk.LEFT, fill='both', expand=True)
         scrollbar.config(command=text_widget.yview)
 
+    # --- 效能監控 / 資料驗證 ---
+    def toggle_profiler_overlay(self):
+        """開關效能監控浮動視窗"""
+        if self.profiler_overlay is not None and self.profiler_overlay.winfo_exists():
+            self.profiler_overlay.destroy()
+            self.profiler_overlay = None
+            return
+        self.profiler_overlay = ProfilerOverlay(self.root)
+
+    def start_profiling_session(self):
+        if PROFILER.session_active:
+            self.status_var.set("效能分析已在進行中。")
+            return
+        PROFILER.start_session()
+        self.status_var.set("⏺ 效能分析進行中... 完成操作後請從 [工具] 選單停止並匯出。")
+
+    def stop_profiling_session(self):
+        if not PROFILER.session_active:
+            self.status_var.set("尚未開始效能分析。")
+            return
+        path = filedialog.asksaveasfilename(
+            title="匯出效能分析", defaultextension=".prof",
+            filetypes=[("cProfile", "*.prof")], initialfile="gm_session.prof"
+        )
+        if not path:
+            return
+        trace_path = PROFILER.stop_session(path)
+        print(PROFILER.format_stats())
+        self.status_var.set(f"✅ 已匯出 {path} 與 {trace_path}")
+
+    def validate_data_references(self):
+        """檢查主鍵重複與跨檔案引用（技能、敵人、關卡、卡片等）"""
+        if not self.data_cache:
+            self.status_var.set("請先載入 data 資料夾。")
+            return []
+        errors = validate_dataset(self.data_cache, build_indexes(self.data_cache))
+        if errors:
+            shown = "\n".join(errors[:30])
+            more = f"\n... 另有 {len(errors) - 30} 個問題" if len(errors) > 30 else ""
+            messagebox.showwarning("資料驗證", f"發現 {len(errors)} 個問題：\n\n{shown}{more}", parent=self.root)
+        else:
+            messagebox.showinfo("資料驗證", "所有引用皆正確。", parent=self.root)
+        self.status_var.set(f"資料驗證完成：{len(errors)} 個問題")
+        return errors
+
+    def export_skill_table(self):
+        """編譯三個技能檔案並寫入 config/skill_table.json（模擬器使用），同時比對效果類型清單與遊戲端"""
+        if not self.data_cache:
+            self.status_var.set("請先載入 data 資料夾。")
+            return
+        out_path, table = export_table(self.data_path)
+        problems = format_diagnostics([tuple(item) for item in table["diagnostics"]])
+        editor_only, engine_only = schema_mismatches(self.SKILL_EFFECT_SCHEMA.keys())
+        if editor_only:
+            problems.append("⚠️ 編輯器可選但遊戲端沒有處理: " + ", ".join(editor_only))
+        if engine_only:
+            problems.append("⚠️ 遊戲端支援但編輯器沒有欄位定義: " + ", ".join(engine_only))
+        message = f"已寫入 {out_path}（依磁碟上已儲存的技能檔案編譯）"
+        if problems:
+            messagebox.showwarning("技能時機表", message + "\n\n" + "\n".join(problems), parent=self.root)
+        else:
+            messagebox.showinfo("技能時機表", message, parent=self.root)
+        self.status_var.set(f"技能時機表已匯出：{len(problems)} 個問題")
+
     # --- 2. 資料載入 (相同) ---
     def select_data_directory(self):
         path = filedialog.askdirectory(title="請選擇您的 'data' 資料夾")
@@ -1322,12 +1423,17 @@ class GameEditorApp:
 
     def load_and_populate_all_tabs(self):
         self.data_cache = {}
+        self.data_indexes = {}
+        self._enemy_profiles = None
         try:
-            for key, file_rel_path in self.FILE_PATHS.items():
-                full_path = os.path.join(self.data_path, file_rel_path)
-                if os.path.exists(full_path):
-                    with open(full_path, 'r', encoding='utf-8') as f:
-                        self.data_cache[key] = json.load(f)
+            # 優先使用 data/.gm_cache 的快照（與 JSON 的大小/修改時間/雜湊相符時），否則讀 JSON 並在背景重建
+            if self.snapshot_cache is None or self.snapshot_cache.data_dir != self.data_path:
+                self.snapshot_cache = SnapshotCache(self.data_path, self.FILE_PATHS)
+            self.data_cache, self.data_indexes = self.snapshot_cache.load(self.FILE_PATHS.keys())
+            self.save_guard = SaveGuard()
+            self._deferred_external_keys = set()
+            for key in self.data_cache:
+                self.save_guard.remember(os.path.join(self.data_path, self.FILE_PATHS[key]))
             
             # (重新) 產生效果類型列表（使用統一的分類邏輯）
             enemy_skill_keywords = [
@@ -1410,23 +1516,134 @@ class GameEditorApp:
             return
         current_snapshot = self._get_data_file_snapshot()
         if self._data_file_snapshot and current_snapshot != self._data_file_snapshot:
+            changed_keys = [
+                key for key, file_rel_path in self.FILE_PATHS.items()
+                if current_snapshot.get(os.path.join(self.data_path, file_rel_path))
+                != self._data_file_snapshot.get(os.path.join(self.data_path, file_rel_path))
+            ]
+            self.merge_external_changes(changed_keys)
+        self._auto_refresh_job = self.root.after(self.auto_refresh_interval_ms, self._poll_data_directory)
+
+    def merge_external_changes(self, data_keys):
+        """將其他編輯器寫入的變更併入 data_cache，只重新整理受影響的分頁
+
+        正在顯示的分頁不會被重新整理（避免丟失表單中尚未儲存的內容），
+        留到切換分頁或儲存時再合併。
+        """
+        if any(key not in self.data_cache for key in data_keys):
+            # 新增或刪除了資料檔：整個重新載入
             self.load_and_populate_all_tabs()
             self.status_var.set("偵測到資料夾變更，已自動重新整理。")
-        self._auto_refresh_job = self.root.after(self.auto_refresh_interval_ms, self._poll_data_directory)
+            return
+
+        current_tab = self.notebook.select()
+        refreshed, deferred, conflicted, failed = [], [], [], []
+        for data_key in data_keys:
+            tab_attr, populate_name = self.DATA_KEY_TABS[data_key]
+            if str(getattr(self, tab_attr)) == current_tab:
+                self._deferred_external_keys.add(data_key)
+                deferred.append(data_key)
+                continue
+
+            full_path = os.path.join(self.data_path, self.FILE_PATHS[data_key])
+            try:
+                status, data = self.save_guard.merge_from_disk(full_path, data_key, self.data_cache[data_key])
+            except Exception as e:
+                print(f"⚠️ 讀取外部變更失敗 {full_path}: {e}")
+                failed.append(full_path)
+                continue
+            self._deferred_external_keys.discard(data_key)
+            if status == "conflict":
+                conflicted.append(data_key)
+                continue
+            if status == "unchanged":
+                continue
+            self.data_cache[data_key] = data
+            self._refresh_derived(data_key)
+            if populate_name not in refreshed:
+                refreshed.append(populate_name)
+                getattr(self, populate_name)()
+
+        self._update_data_snapshot()
+        for full_path in failed:
+            self._data_file_snapshot[full_path] = None  # 下次輪詢再試一次（可能是對方寫到一半）
+
+        messages = []
+        if refreshed:
+            messages.append("已自動合併其他人的修改")
+        if deferred:
+            messages.append(f"{', '.join(deferred)} 已被其他人修改（正在編輯中，儲存時會自動合併）")
+        if conflicted:
+            messages.append(f"{', '.join(conflicted)} 與未儲存的修改衝突，儲存時將詢問如何處理")
+        if messages:
+            self.status_var.set("；".join(messages))
+
+    def _resolve_save_conflicts(self, data_key, conflicts):
+        """同一筆記錄的同一欄位雙方都改過時，詢問要保留哪一方"""
+        shown = "\n".join(describe_conflict(c) for c in conflicts[:15])
+        more = f"\n... 另有 {len(conflicts) - 15} 項" if len(conflicts) > 15 else ""
+        answer = messagebox.askyesnocancel(
+            "儲存衝突",
+            f"{self.FILE_PATHS[data_key]} 在您編輯期間已被其他人修改，以下項目雙方都改過：\n\n{shown}{more}\n\n"
+            "是：保留我的修改\n否：採用對方的修改\n取消：暫不儲存",
+            parent=self.root
+        )
+        if answer is None:
+            return None
+        return "ours" if answer else "theirs"
+
+    def _rebuild_index(self, data_key):
+        if data_key in RECORD_KEYS and data_key in self.data_cache:
+            self.data_indexes[data_key] = build_index(get_records(self.data_cache, data_key), RECORD_KEYS[data_key][1])
+
+    def _refresh_derived(self, data_key):
+        """資料檔內容變更後：重建主鍵索引，並清除由此檔案計算出的快取"""
+        if data_key in ('enemies', 'enemy_skills'):
+            self._enemy_profiles = None
+        self._rebuild_index(data_key)
+
+    def find_record(self, data_key, record_id):
+        """以主鍵索引查詢記錄（索引中沒有或主鍵已被修改時重建該檔案的索引）"""
+        record = self.data_indexes.get(data_key, {}).get(record_id)
+        if record is None or record.get(RECORD_KEYS[data_key][1]) != record_id:
+            self._rebuild_index(data_key)
+            record = self.data_indexes.get(data_key, {}).get(record_id)
+        return record
 
     # --- 3. 儲存功能 (相同) ---
     def save_data_to_file(self, data_key):
         if not self.data_path or data_key not in self.data_cache:
             self.status_var.set(f"儲存失敗：找不到資料 {data_key}")
             return
+        # 新增 / 刪除 / 改 ID 後都會呼叫儲存：不論是否寫檔，索引都要反映目前的快取
+        self._refresh_derived(data_key)
             
         full_path = os.path.join(self.data_path, self.FILE_PATHS[data_key])
         
         try:
-            with open(full_path, 'w', encoding='utf-8') as f:
-                json.dump(self.data_cache[data_key], f, indent=4, ensure_ascii=False)
-            self.status_var.set(f"儲存成功！ {self.FILE_PATHS[data_key]} 已更新。")
+            # 磁碟版本已被他人修改時先做記錄層級的三方合併；沿用原檔排版，內容未變更時不寫檔
+            result = self.save_guard.save(
+                full_path, data_key, self.data_cache[data_key],
+                resolve=partial(self._resolve_save_conflicts, data_key)
+            )
+            if result.status == "cancelled":
+                self.status_var.set(f"已取消儲存 {self.FILE_PATHS[data_key]}（磁碟上的版本未被覆蓋）")
+                return
+            if result.status == "unchanged":
+                self.status_var.set(f"{self.FILE_PATHS[data_key]} 無變更，略過寫入。")
+                return
+            if result.status == "merged":
+                self.data_cache[data_key] = result.data
+                self._refresh_derived(data_key)
+                self._deferred_external_keys.discard(data_key)
+                # 等目前的儲存流程（更新列表等）結束後再以合併結果重新整理分頁
+                self.root.after_idle(getattr(self, self.DATA_KEY_TABS[data_key][1]))
+                self.status_var.set(f"儲存成功！ {self.FILE_PATHS[data_key]} 已與其他人的修改合併。")
+            else:
+                self.status_var.set(f"儲存成功！ {self.FILE_PATHS[data_key]} 已更新。")
             self._update_data_snapshot()
+            if self.snapshot_cache:
+                self.snapshot_cache.rebuild_async([data_key])
         except Exception as e:
             messagebox.showerror("儲存錯誤", f"寫入 {full_path} 時發生錯誤: {e}")
             self.status_var.set(f"儲存失敗: {e}")
@@ -1992,17 +2209,16 @@ class GameEditorApp:
             except Exception as e:
                 print(f"⚠️ 分頁切換時自動儲存失敗: {e}")
 
+        # 合併先前因分頁正在編輯而延後的外部變更
+        if self._deferred_external_keys:
+            self.merge_external_changes(sorted(self._deferred_external_keys))
+
     def auto_save_current_player_card(self):
         """自動儲存當前卡片（靜默模式，不顯示訊息）"""
         if not self.current_selected_card_id:
             return
 
-        card_to_update = None
-        for i, card in enumerate(self.data_cache['cards']['cards']):
-            if card.get('card_id') == self.current_selected_card_id:
-                card_to_update = card
-                break
-
+        card_to_update = self.find_record('cards', self.current_selected_card_id)
         if not card_to_update:
             return
 
@@ -2105,10 +2321,9 @@ class GameEditorApp:
         if not new_id: return
         
         # 檢查 ID 是否已存在
-        for card in self.data_cache['cards']['cards']:
-            if card['card_id'] == new_id:
-                messagebox.showerror("錯誤", "此 ID 已存在", parent=self.root)
-                return
+        if self.find_record('cards', new_id) is not None:
+            messagebox.showerror("錯誤", "此 ID 已存在", parent=self.root)
+            return
         
         # 建立一個新的空白卡片
         new_card = {
@@ -2365,10 +2580,9 @@ class GameEditorApp:
         new_id = simpledialog.askstring("新增敵人", "請輸入新敵人的唯一 ID:", parent=self.root)
         if not new_id: return
         
-        for enemy in self.data_cache['enemies']['enemies']:
-            if enemy['enemy_id'] == new_id:
-                messagebox.showerror("錯誤", "此 ID 已存在", parent=self.root)
-                return
+        if self.find_record('enemies', new_id) is not None:
+            messagebox.showerror("錯誤", "此 ID 已存在", parent=self.root)
+            return
         
         new_enemy = {
             "enemy_id": new_id,
@@ -3092,12 +3306,8 @@ class GameEditorApp:
 
     def get_stage_name(self, stage_id):
         """從 stages.json 獲取關卡名稱"""
-        stages_data = self.data_cache.get('stages', {})
-        stages_list = stages_data.get('stages', [])
-        for stage in stages_list:
-            if stage.get('stage_id') == stage_id:
-                return stage.get('stage_name', '')
-        return None
+        stage = self.find_record('stages', stage_id)
+        return stage.get('stage_name', '') if stage is not None else None
 
     def add_stage_from_list(self):
         """從關卡列表中選擇並新增關卡"""
@@ -3248,11 +3458,14 @@ class GameEditorApp:
         self.stage_listbox = tk.Listbox(left_frame, exportselection=False)
         self.stage_listbox.pack(fill=tk.BOTH, expand=True)
 
+        self.stage_scores = self.compute_stage_scores()
         for stage in stages_list:
             stage_id = stage.get('stage_id', '???')
             stage_name = stage.get('stage_name', '未命名')
             difficulty = stage.get('difficulty', 1)
-            self.stage_listbox.insert(tk.END, f"{stage_id} - {stage_name} (難度:{difficulty})")
+            score = self.stage_scores.get(stage_id)
+            estimate = f" / 估算:{score['score']:.1f}" if score else ""
+            self.stage_listbox.insert(tk.END, f"{stage_id} - {stage_name} (難度:{difficulty}{estimate})")
 
         self.stage_listbox.bind('<<ListboxSelect>>', self.on_stage_selected)
 
@@ -3262,6 +3475,13 @@ class GameEditorApp:
 
         ttk.Label(self.stage_detail_frame, text="請從左側選擇關卡進行編輯").pack(padx=20, pady=20)
 
+    def compute_stage_scores(self):
+        """依敵人數值估算每個關卡的難度（StageDifficulty）：{stage_id: 結果}"""
+        result = score_stages(self.data_cache.get('stages'), self.data_cache.get('enemies'),
+                              self.data_cache.get('cards'), self.data_cache.get('regions'),
+                              self.data_cache.get('enemy_skills'))
+        return {row['stage_id']: row for row in result['stages']}
+
     def on_stage_selected(self, event):
         """當選擇關卡時，顯示關卡詳情編輯表單"""
         if not self.stage_listbox.curselection():
@@ -3297,6 +3517,13 @@ class GameEditorApp:
         self.create_stage_form_row(form_frame, "關卡名稱", 'entry', 'stage_name')
         self.create_stage_form_row(form_frame, "描述", 'text', 'description')
         self.create_stage_form_row(form_frame, "難度", 'entry', 'difficulty')
+        score = getattr(self, 'stage_scores', {}).get(self.current_stage_data.get('stage_id'))
+        if score:
+            proposal = (f"建議 HP x{score['hp_scale']:.2f} / ATK x{score['atk_scale']:.2f}（章節目標 {score['target']:.1f}）"
+                        if score['reached'] else "章節目標無法以倍率達到")
+            ttk.Label(form_frame, text=f"估算難度 {score['score']:.1f}：約 {score['turns']:.1f} 回合、"
+                                       f"承受 {score['incoming']:.0f} 傷害（參考隊伍 Lv{score['reference_level']}）\n{proposal}",
+                      foreground="gray").pack(anchor='w', padx=5)
 
         ttk.Separator(form_frame, orient='horizontal').pack(fill='x', pady=10)
 
@@ -3453,6 +3680,28 @@ class GameEditorApp:
         ttk.Button(enemy_btn_frame, text="編輯", command=lambda idx=wave_idx: self.edit_enemy_in_wave(idx)).pack(fill='x', pady=2)
         ttk.Button(enemy_btn_frame, text="刪除", command=lambda idx=wave_idx: self.delete_enemy_from_wave(idx)).pack(fill='x', pady=2)
 
+        # 攻擊節奏與存活需求（EnemyCadence）
+        if not hasattr(self, 'wave_cadence_labels'):
+            self.wave_cadence_labels = {}
+        cadence_label = ttk.Label(wave_frame, foreground='gray', wraplength=500, justify=tk.LEFT)
+        cadence_label.pack(fill='x', padx=10, pady=(0, 5))
+        self.wave_cadence_labels[wave_idx] = cadence_label
+        self.refresh_wave_cadence(wave_idx)
+
+    def refresh_wave_cadence(self, wave_idx):
+        """依波次目前的敵人重新計算每回合承受傷害與存活需求"""
+        label = getattr(self, 'wave_cadence_labels', {}).get(wave_idx)
+        waves = self.current_stage_data.get('waves', [])
+        if label is None or wave_idx >= len(waves):
+            return
+        if self._enemy_profiles is None:
+            self._enemy_profiles = build_profiles(self.data_cache.get('enemies'), self.data_cache.get('enemy_skills'))
+        cadence = wave_cadence(waves[wave_idx], self._enemy_profiles)
+        text = summarize(cadence)
+        if cadence.missing:
+            text += f"\n⚠️ 敵人不存在: {', '.join(cadence.missing)}"
+        label.config(text=text)
+
     def add_enemy_to_wave(self, wave_idx):
         """新增敵人到指定波次（使用選單選擇）"""
         # 獲取所有敵人列表
@@ -3516,6 +3765,7 @@ class GameEditorApp:
                 if wave_idx in self.wave_enemy_listboxes:
                     listbox = self.wave_enemy_listboxes[wave_idx]
                     listbox.insert(tk.END, f"{enemy_id} x{count}")
+                self.refresh_wave_cadence(wave_idx)
 
             dialog.destroy()
 
@@ -3611,6 +3861,7 @@ class GameEditorApp:
             listbox.delete(selected_index)
             listbox.insert(selected_index, f"{enemy_id} x{count}")
             listbox.selection_set(selected_index)
+            self.refresh_wave_cadence(wave_idx)
 
             dialog.destroy()
 
@@ -3640,6 +3891,7 @@ class GameEditorApp:
 
         # 從列表框刪除
         listbox.delete(selected_index)
+        self.refresh_wave_cadence(wave_idx)
 
     def add_new_wave(self):
         """新增波次"""
@@ -4999,6 +5251,17 @@ class GameEditorApp:
             self.populate_training_rooms_tab()
 
 
+# --- 效能監控：為熱點操作套上計時 ---
+instrument_class(GameEditorApp, [
+    "load_and_populate_all_tabs",
+    "populate_*_tab",
+    "populate_skill_sub_tab",
+    "on_*_selected",
+    "save_data_to_file",
+    "validate_data_references",
+], prefix="GM")
+
+
 # --- 程式進入點 ---
 if __name__ == "__main__":
     main_window = tk.Tk()
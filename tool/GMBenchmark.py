@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+GM 編輯器規模效能測試 (GM Scale Benchmark)
+使用 DataGenerator 產生 1k / 10k / 100k 規模的資料夾，量測：
+1. 載入 (json.load) 與快照快取載入 (SnapshotCache)
+2. 建立主鍵索引
+3. 儲存 (與 GM.save_data_to_file 相同的寫入方式：沿用原檔排版，未變更時略過)
+4. 交叉引用驗證
+5. 分頁填充 (populate_*_tab) 與選取 (on_*_selected) 延遲（需要圖形介面）
+
+使用方式：
+    python tool/GMBenchmark.py --sizes 1000 10000 100000 --output bench.json
+    python tool/GMBenchmark.py --sizes 10000 --compare bench.json   # 與先前結果比較
+"""
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+from DataGenerator import generate_dataset, write_dataset
+from DataSchema import FILE_PATHS, build_indexes, validate_dataset
+from JsonWriter import write_json_if_changed
+from SnapshotCache import CACHE_DIR_NAME, SnapshotCache
+
+
+# GM 分頁：(populate 方法, 選取用 listbox 屬性, 需要的資料鍵)
+GM_TABS = [
+    ("populate_player_cards_tab", "player_card_listbox", "cards"),
+    ("populate_enemy_cards_tab", "enemy_card_listbox", "enemies"),
+    ("populate_player_skills_tab", "active_skills_listbox", "active_skills"),
+    ("populate_enemy_skills_tab", "enemy_skills_listbox", "enemy_skills"),
+    ("populate_stages_tab", "stage_listbox", "stages"),
+    ("populate_regions_tab", "region_listbox", "regions"),
+    ("populate_shop_items_tab", "shop_items_listbox", "shop_items"),
+    ("populate_gacha_pools_tab", "gacha_pools_listbox", "gacha_pools"),
+    ("populate_training_rooms_tab", "training_rooms_listbox", "training_rooms"),
+]
+
+# 對話任務編輯器分頁
+DIALOG_TABS = [
+    ("populate_dialogs_tab", "dialog_listbox", "dialogs"),
+    ("populate_quests_tab", "quest_listbox", "quests"),
+]
+
+
+def _timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return (time.perf_counter() - start) * 1000.0, result
+
+
+def bench_data_layer(data_dir, repeat=3):
+    """量測不需要 Tk 的資料層操作，回傳 {操作名稱: 毫秒}"""
+    results = {}
+
+    def load_all():
+        cache = {}
+        for data_key, file_rel_path in FILE_PATHS.items():
+            with open(os.path.join(data_dir, file_rel_path), 'r', encoding='utf-8') as f:
+                cache[data_key] = json.load(f)
+        return cache
+
+    load_times = []
+    data_cache = None
+    for _ in range(repeat):
+        elapsed, data_cache = _timed(load_all)
+        load_times.append(elapsed)
+    results['load'] = min(load_times)
+
+    snapshot = SnapshotCache(data_dir)
+    snapshot.load()
+    snapshot.wait()
+    results['load_cached'] = min(_timed(snapshot.load)[0] for _ in range(repeat))
+    shutil.rmtree(os.path.join(data_dir, CACHE_DIR_NAME), ignore_errors=True)
+
+    results['index_build'] = min(_timed(build_indexes, data_cache)[0] for _ in range(repeat))
+    indexes = build_indexes(data_cache)
+    results['validate'] = min(_timed(validate_dataset, data_cache, indexes)[0] for _ in range(repeat))
+
+    save_dir = tempfile.mkdtemp(prefix="gm_bench_save_")
+    try:
+        for data_key, file_rel_path in FILE_PATHS.items():
+            os.makedirs(os.path.dirname(os.path.join(save_dir, file_rel_path)), exist_ok=True)
+            shutil.copyfile(os.path.join(data_dir, file_rel_path), os.path.join(save_dir, file_rel_path))
+
+        def save_all():
+            for data_key, file_rel_path in FILE_PATHS.items():
+                write_json_if_changed(os.path.join(save_dir, file_rel_path), data_cache[data_key])
+        results['save_unchanged'] = min(_timed(save_all)[0] for _ in range(repeat))
+
+        # 修改最後一筆卡片（最壞情況：整個檔案比對到最後才出現差異）
+        cards = data_cache['cards']['cards']
+        cards[-1]['max_level'] = cards[-1].get('max_level', 0) + 1
+        cards_path = os.path.join(save_dir, FILE_PATHS['cards'])
+        results['save_one_record'] = _timed(write_json_if_changed, cards_path, data_cache['cards'])[0]
+    finally:
+        shutil.rmtree(save_dir, ignore_errors=True)
+
+    return results
+
+
+def _bench_tabs(app, root, tabs, samples):
+    """量測分頁填充與選取延遲（選取取多個位置的中位數）"""
+    results = {}
+    for populate_name, listbox_attr, data_key in tabs:
+        if not app.data_cache.get(data_key):
+            continue
+        populate = getattr(app, populate_name)
+        elapsed, _ = _timed(lambda: (populate(), root.update_idletasks()))
+        results[f"{populate_name}"] = elapsed
+
+        listbox = getattr(app, listbox_attr, None)
+        if listbox is None or listbox.size() == 0:
+            continue
+        size = listbox.size()
+        positions = sorted({0, size // 2, size - 1, *(size * i // samples for i in range(samples))})
+        select_times = []
+        for index in positions:
+            listbox.selection_clear(0, 'end')
+            listbox.selection_set(index)
+            elapsed, _ = _timed(lambda: (listbox.event_generate('<<ListboxSelect>>'), root.update_idletasks()))
+            select_times.append(elapsed)
+        results[f"select:{listbox_attr}"] = statistics.median(select_times)
+    return results
+
+
+def bench_ui_layer(data_dir, samples=5):
+    """量測 GM 與對話任務編輯器的分頁填充/選取延遲；無圖形介面時回傳 None"""
+    try:
+        import tkinter as tk
+        root = tk.Tk()
+    except Exception as e:
+        print(f"⚠️ 無法建立 Tk 視窗，略過 UI 量測: {e}")
+        return None
+
+    import GM
+    import DialogTaskEditor
+
+    results = {}
+    try:
+        root.withdraw()
+        app = GM.GameEditorApp(root)
+        app.data_path = data_dir
+        app.notebook.pack(expand=True, fill='both')
+        elapsed, _ = _timed(app.load_and_populate_all_tabs)
+        results['gm_load_and_populate_all'] = elapsed
+        results.update(_bench_tabs(app, root, GM_TABS, samples))
+        if app._auto_refresh_job:
+            root.after_cancel(app._auto_refresh_job)
+
+        dialog_root = tk.Toplevel(root)
+        editor = DialogTaskEditor.DialogTaskEditor(dialog_root)
+        editor.data_dir = data_dir
+        elapsed, _ = _timed(editor.load_all_data)
+        results['dte_load_all_data'] = elapsed
+        results.update(_bench_tabs(editor, root, DIALOG_TABS, samples))
+    finally:
+        root.destroy()
+    return results
+
+
+def run_benchmark(sizes, seed=42, repeat=3, with_ui=True, keep_dir=None):
+    """對每種規模產生資料並量測，回傳 {規模: {操作: 毫秒}}"""
+    all_results = {}
+    for size in sizes:
+        data_dir = os.path.join(keep_dir, f"data_{size}") if keep_dir else tempfile.mkdtemp(prefix=f"gm_bench_{size}_")
+        try:
+            elapsed, dataset = _timed(generate_dataset, size, seed)
+            write_dataset(data_dir, dataset)
+            print(f"📦 規模 {size}: 產生資料 {elapsed:.0f} ms -> {data_dir}")
+
+            results = bench_data_layer(data_dir, repeat)
+            if with_ui:
+                ui_results = bench_ui_layer(data_dir)
+                if ui_results:
+                    results.update(ui_results)
+            all_results[str(size)] = results
+        finally:
+            if not keep_dir:
+                shutil.rmtree(data_dir, ignore_errors=True)
+    return all_results
+
+
+def format_report(results, baseline=None):
+    """格式化為文字表格，提供 baseline 時附上變化百分比"""
+    lines = []
+    for size, metrics in results.items():
+        lines.append(f"=== 規模 {size} ===")
+        for name, value in metrics.items():
+            line = f"  {name:<45} {value:>10.2f} ms"
+            base_value = (baseline or {}).get(size, {}).get(name)
+            if base_value:
+                change = (value - base_value) / base_value * 100.0
+                line += f"   (基準 {base_value:.2f} ms, {change:+.1f}%)"
+            lines.append(line)
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="GM 編輯器規模效能測試")
+    parser.add_argument("--sizes", type=int, nargs='+', default=[1000, 10000, 100000], help="要測試的資料規模")
+    parser.add_argument("--seed", type=int, default=42, help="亂數種子")
+    parser.add_argument("--repeat", type=int, default=3, help="資料層量測重複次數（取最小值）")
+    parser.add_argument("--no-ui", action="store_true", help="略過需要圖形介面的量測")
+    parser.add_argument("--keep-dir", help="保留產生的資料夾到此路徑")
+    parser.add_argument("--output", help="將結果寫入 JSON 檔")
+    parser.add_argument("--compare", help="與先前輸出的 JSON 結果比較")
+    args = parser.parse_args()
+
+    results = run_benchmark(args.sizes, args.seed, args.repeat, not args.no_ui, args.keep_dir)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+    print(format_report(results, baseline))
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=4, ensure_ascii=False)
+        print(f"✅ 結果已寫入 {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+GM 編輯器效能監控 (GM Profiler)
+記錄編輯器熱點操作（載入、分頁填充、選取、儲存、驗證）的耗時，
+提供 p50/p95 統計浮動視窗，並可匯出 cProfile 與 Chrome Trace 格式的記錄。
+
+用法：
+    from GMProfiler import PROFILER, instrument_class
+
+    @PROFILER.profiled("save")
+    def save(...): ...
+
+    with PROFILER.section("build_index"):
+        ...
+
+    instrument_class(GameEditorApp, ["populate_*_tab", "on_*_selected"])
+"""
+
+import cProfile
+import fnmatch
+import functools
+import json
+import math
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import tkinter as tk
+from tkinter import ttk
+
+
+def percentile(sorted_values, pct):
+    """最近秩百分位數（輸入須已排序）"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, math.ceil(pct / 100.0 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+class Profiler:
+    """以環形緩衝區記錄操作耗時，並可選擇同時進行 cProfile 分析"""
+
+    def __init__(self, capacity=5000):
+        self.samples = deque(maxlen=capacity)  # (操作名稱, 開始時間 us, 耗時 ms, 執行緒 ID, 巢狀深度)
+        self.call_counts = {}  # 不受環形緩衝區大小限制的總呼叫次數
+        self.enabled = True
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._origin = time.perf_counter()
+        self._cprofile = None
+
+    # --- 記錄 ---
+    def record(self, name, start, elapsed_ms):
+        depth = getattr(self._local, 'depth', 0)
+        start_us = (start - self._origin) * 1_000_000.0
+        with self._lock:
+            self.samples.append((name, start_us, elapsed_ms, threading.get_ident(), depth))
+            self.call_counts[name] = self.call_counts.get(name, 0) + 1
+
+    @contextmanager
+    def section(self, name):
+        """以 with 區塊量測一段程式碼"""
+        if not self.enabled:
+            yield
+            return
+        self._local.depth = getattr(self._local, 'depth', 0) + 1
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000.0
+            self._local.depth -= 1
+            self.record(name, start, elapsed_ms)
+
+    def profiled(self, name=None):
+        """裝飾器：量測函式每次呼叫的耗時"""
+        def decorator(func):
+            op_name = name or func.__qualname__
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.section(op_name):
+                    return func(*args, **kwargs)
+            wrapper.__profiled__ = True
+            return wrapper
+        return decorator
+
+    def reset(self):
+        with self._lock:
+            self.samples.clear()
+            self.call_counts.clear()
+
+    # --- 統計 ---
+    def stats(self):
+        """回傳 {操作名稱: {count, samples, p50, p95, max, total}}（依總耗時排序）"""
+        grouped = {}
+        with self._lock:
+            samples = list(self.samples)
+            counts = dict(self.call_counts)
+        for name, _, elapsed_ms, _, _ in samples:
+            grouped.setdefault(name, []).append(elapsed_ms)
+
+        result = {}
+        for name, values in grouped.items():
+            values.sort()
+            result[name] = {
+                "count": counts.get(name, len(values)),
+                "samples": len(values),
+                "p50": percentile(values, 50),
+                "p95": percentile(values, 95),
+                "max": values[-1],
+                "total": sum(values),
+            }
+        return dict(sorted(result.items(), key=lambda item: item[1]["total"], reverse=True))
+
+    def format_stats(self):
+        lines = [f"{'操作':<40} {'次數':>6} {'p50(ms)':>10} {'p95(ms)':>10} {'最大(ms)':>10}"]
+        for name, s in self.stats().items():
+            lines.append(f"{name:<40} {s['count']:>6} {s['p50']:>10.2f} {s['p95']:>10.2f} {s['max']:>10.2f}")
+        return "\n".join(lines)
+
+    # --- 匯出 ---
+    def export_chrome_trace(self, path):
+        """匯出 Chrome Trace Event 格式（可用 chrome://tracing、Perfetto、speedscope 以火焰圖檢視）"""
+        with self._lock:
+            samples = list(self.samples)
+        events = [
+            {
+                "name": name,
+                "cat": name.split('.')[0],
+                "ph": "X",
+                "ts": start_us,
+                "dur": elapsed_ms * 1000.0,
+                "pid": os.getpid(),
+                "tid": thread_id,
+                "args": {"depth": depth},
+            }
+            for name, start_us, elapsed_ms, thread_id, depth in samples
+        ]
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f, ensure_ascii=False)
+
+    @property
+    def session_active(self):
+        return self._cprofile is not None
+
+    def start_session(self):
+        """開始 cProfile 分析整個工作階段"""
+        if self._cprofile is not None:
+            return
+        self._cprofile = cProfile.Profile()
+        self._cprofile.enable()
+
+    def stop_session(self, output_path):
+        """停止 cProfile，輸出 .prof 檔，並在旁邊輸出同名 .trace.json"""
+        if self._cprofile is None:
+            return None
+        self._cprofile.disable()
+        self._cprofile.dump_stats(output_path)
+        self._cprofile = None
+        trace_path = os.path.splitext(output_path)[0] + ".trace.json"
+        self.export_chrome_trace(trace_path)
+        return trace_path
+
+
+# 全域共用的 Profiler
+PROFILER = Profiler()
+
+
+def instrument_class(cls, patterns, profiler=PROFILER, prefix=None):
+    """為類別中名稱符合 fnmatch 樣式的方法套上 profiled 裝飾器
+
+    需在類別定義完成後、建立實例前呼叫（bind 時才會取到包裝後的方法）。
+    """
+    prefix = prefix or cls.__name__
+    wrapped = []
+    for attr_name, attr in list(vars(cls).items()):
+        if not callable(attr) or isinstance(attr, (staticmethod, classmethod, type)):
+            continue
+        if getattr(attr, '__profiled__', False):
+            continue
+        if any(fnmatch.fnmatchcase(attr_name, pattern) for pattern in patterns):
+            setattr(cls, attr_name, profiler.profiled(f"{prefix}.{attr_name}")(attr))
+            wrapped.append(attr_name)
+    return wrapped
+
+
+class ProfilerOverlay(tk.Toplevel):
+    """顯示各操作 p50/p95 的浮動視窗（每秒自動更新）"""
+
+    REFRESH_MS = 1000
+
+    def __init__(self, parent, profiler=PROFILER):
+        super().__init__(parent)
+        self.title("效能監控")
+        self.geometry("640x360")
+        self.attributes('-topmost', True)
+        self.profiler = profiler
+        self._refresh_job = None
+
+        columns = ("count", "p50", "p95", "max", "total")
+        self.tree = ttk.Treeview(self, columns=columns, show='tree headings')
+        self.tree.heading('#0', text="操作")
+        self.tree.column('#0', width=260)
+        for column, label in zip(columns, ("次數", "p50 (ms)", "p95 (ms)", "最大 (ms)", "總計 (ms)")):
+            self.tree.heading(column, text=label)
+            self.tree.column(column, width=70, anchor='e')
+        self.tree.pack(fill='both', expand=True, padx=5, pady=5)
+
+        btn_frame = ttk.Frame(self)
+        btn_frame.pack(fill='x', padx=5, pady=(0, 5))
+        ttk.Button(btn_frame, text="清除記錄", command=self._reset).pack(side=tk.LEFT)
+        ttk.Button(btn_frame, text="關閉", command=self.destroy).pack(side=tk.RIGHT)
+
+        self.protocol("WM_DELETE_WINDOW", self.destroy)
+        self.refresh()
+
+    def _reset(self):
+        self.profiler.reset()
+        # 取消目前排定的更新，避免每次清除都多開一個 after 迴圈
+        if self._refresh_job:
+            self.after_cancel(self._refresh_job)
+            self._refresh_job = None
+        self.refresh()
+
+    def refresh(self):
+        self.tree.delete(*self.tree.get_children())
+        for name, s in self.profiler.stats().items():
+            self.tree.insert('', tk.END, text=name, values=(
+                s['count'], f"{s['p50']:.2f}", f"{s['p95']:.2f}", f"{s['max']:.2f}", f"{s['total']:.1f}"
+            ))
+        self._refresh_job = self.after(self.REFRESH_MS, self.refresh)
+
+    def destroy(self):
+        if self._refresh_job:
+            self.after_cancel(self._refresh_job)
+            self._refresh_job = None
+        super().destroy()
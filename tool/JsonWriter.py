@@ -0,0 +1,403 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+標準化 JSON 寫入器 (Canonical JSON Writer)
+儲存時沿用原檔案的排版，避免每次儲存都把整個檔案重新排版、產生巨大的 git diff。
+
+會從原檔案偵測：
+1. 縮排方式：純 Tab、純空白（寬度）、或「每層 2 格空白、每滿一個 Tab 寬度換成 Tab」的混合縮排
+2. 換行字元 (LF / CRLF) 與檔尾是否有換行
+3. 哪些陣列 / 物件是寫在同一行的（例如 "valid_cards": ["001", "002"]），
+   以「路徑樣式」記錄（陣列索引以 * 表示），新增的記錄也會套用相同排版
+4. 浮點數的原始寫法（例如 0.20、1e-05），未變更的數值沿用原檔的字面值，不會被改寫成 0.2
+
+寫入時以串流方式產生輸出，邊產生邊與原檔內容比對：
+- 內容完全相同時不寫檔（原檔同一個浮點數有多種寫法時，改以解析後的值比對）
+- 內容不同時寫入暫存檔後以 os.replace 取代原檔（寫到一半失敗不會破壞原檔）
+
+用法：
+    from JsonWriter import write_json_if_changed
+    written = write_json_if_changed(path, data)
+"""
+
+import json
+import math
+import os
+import re
+import tempfile
+from dataclasses import dataclass, field
+
+from json.encoder import encode_basestring
+
+
+@dataclass
+class JsonStyle:
+    """JSON 檔案的排版設定"""
+    indent_width: int = 1         # 每層縮排的欄數（use_tabs 時為 Tab 數）
+    use_tabs: bool = True         # 純 Tab 縮排
+    tab_size: int = 0             # > 0 時，縮排以欄數計算後每 tab_size 欄換成一個 Tab（混合縮排）
+    newline: str = "\n"
+    trailing_newline: bool = True
+    inline_paths: set = field(default_factory=set)  # 寫在同一行的容器路徑樣式
+    float_literals: dict = field(default_factory=dict)  # 浮點數值 -> 原檔的字面值（與 json.dumps 不同者）
+    ambiguous_floats: bool = False  # 同一個數值在原檔中有多種寫法（無法保證逐字相同）
+
+    def indent(self, level):
+        if self.use_tabs:
+            return "\t" * (level * self.indent_width)
+        columns = level * self.indent_width
+        if self.tab_size:
+            return "\t" * (columns // self.tab_size) + " " * (columns % self.tab_size)
+        return " " * columns
+
+
+# 遊戲端 (Godot JSON.stringify) 產生的格式
+DEFAULT_STYLE = JsonStyle()
+
+_TOKEN_RE = re.compile(r'"(?:[^"\\\n]|\\.)*"|[\[\]{}:,\n]')
+_LEADING_WS_RE = re.compile(r'^[ \t]+(?=\S)', re.MULTILINE)
+
+
+def _detect_indent(text, sample_lines=5000):
+    """回傳 (indent_width, use_tabs, tab_size)"""
+    leading = []
+    for match in _LEADING_WS_RE.finditer(text):
+        leading.append(match.group())
+        if len(leading) >= sample_lines:
+            break
+    if not leading:
+        return DEFAULT_STYLE.indent_width, DEFAULT_STYLE.use_tabs, DEFAULT_STYLE.tab_size
+
+    has_tabs = any("\t" in ws for ws in leading)
+    has_spaces = any(" " in ws for ws in leading)
+    if has_tabs and not has_spaces:
+        return math.gcd(*(len(ws) for ws in leading)), True, 0
+
+    if not has_tabs:
+        return math.gcd(*(len(ws) for ws in leading)) or 2, False, 0
+
+    # 混合縮排：Tab 代表的欄數不一定是 8，取能讓各層縮排連續（沒有跳層）的那一個
+    best = None
+    for tab_size in (4, 8, 2):
+        columns = {len(ws.expandtabs(tab_size)) for ws in leading}
+        width = math.gcd(*columns) or 2
+        gaps = max(columns) // width - len(columns)
+        if best is None or gaps < best[0]:
+            best = (gaps, width, tab_size)
+    return best[1], False, best[2]
+
+
+def _scan_inline_paths(text, max_chars=1 << 19):
+    """掃描原檔，找出「多數情況寫在同一行」的非空容器路徑樣式
+
+    記錄的排版是重複的，只掃描前 max_chars 個字元（未結束的容器不列入統計）。
+    """
+    text = text[:max_chars]
+    counts = {}  # 路徑樣式 -> [同一行次數, 多行次數]
+    stack = []   # [(路徑樣式, 開始行號, 是否為物件, 是否有內容)]
+    path = []
+    pending_key = None
+    expect_key = False
+    line = 0
+
+    for match in _TOKEN_RE.finditer(text):
+        token = match.group()
+        if token == "\n":
+            line += 1
+        elif token in "{[":
+            if stack:
+                stack[-1][3] = True
+                segment = pending_key if stack[-1][2] else "*"
+                path.append(segment)
+            pattern = ".".join(path)
+            stack.append([pattern, line, token == "{", False])
+            expect_key = token == "{"
+            pending_key = None
+        elif token in "}]":
+            if not stack:
+                break
+            pattern, start_line, _, has_items = stack.pop()
+            if has_items:
+                entry = counts.setdefault(pattern, [0, 0])
+                entry[0 if start_line == line else 1] += 1
+            if path and stack:
+                path.pop()
+            expect_key = False
+        elif token == ",":
+            expect_key = bool(stack) and stack[-1][2]
+        elif token == ":":
+            expect_key = False
+        else:  # 字串
+            if stack:
+                stack[-1][3] = True
+                if expect_key:
+                    pending_key = json.loads(token)
+    return {pattern for pattern, (inline, multiline) in counts.items() if inline > multiline}
+
+
+def _scan_float_literals(text):
+    """回傳 ({浮點數值: 字面值}, 是否有同值多種寫法)，只記錄與 json.dumps 結果不同的寫法"""
+    seen = {}  # 字面值 -> 次數（由 json 解析器的 parse_float 收集，字串內的數字不會被誤認）
+
+    def collect(literal):
+        seen[literal] = seen.get(literal, 0) + 1
+        return 0.0
+
+    try:
+        json.loads(text, parse_float=collect)
+    except ValueError:
+        return {}, False
+    forms = {}  # 數值 -> {字面值: 次數}
+    for literal, count in seen.items():
+        forms.setdefault(float(literal), {})[literal] = count
+    literals = {}
+    for value, counts in forms.items():
+        literal = max(counts, key=counts.get)
+        if literal != json.dumps(value):
+            literals[value] = literal
+    return literals, any(len(counts) > 1 for counts in forms.values())
+
+
+def detect_style(text):
+    """由既有 JSON 文字偵測排版"""
+    indent_width, use_tabs, tab_size = _detect_indent(text)
+    float_literals, ambiguous_floats = _scan_float_literals(text)
+    return JsonStyle(
+        indent_width=indent_width,
+        use_tabs=use_tabs,
+        tab_size=tab_size,
+        newline="\r\n" if "\r\n" in text[:4096] else "\n",
+        trailing_newline=text.endswith("\n"),
+        inline_paths=_scan_inline_paths(text),
+        float_literals=float_literals,
+        ambiguous_floats=ambiguous_floats,
+    )
+
+
+def _encode_scalar(value, float_literals=None):
+    if isinstance(value, str):
+        return encode_basestring(value)
+    if value is None:
+        return "null"
+    if value is True:
+        return "true"
+    if value is False:
+        return "false"
+    if isinstance(value, int):
+        return int.__repr__(value)
+    if float_literals and value in float_literals:
+        return float_literals[value]
+    return json.dumps(value)
+
+
+def _encode_inline(value, float_literals):
+    """寫在同一行的容器（與 json.dumps 的分隔符號相同，浮點數沿用原檔字面值）"""
+    if isinstance(value, dict):
+        return "{" + ", ".join(encode_basestring(str(key)) + ": " + _encode_inline(item, float_literals)
+                               for key, item in value.items()) + "}"
+    if isinstance(value, list):
+        return "[" + ", ".join(_encode_inline(item, float_literals) for item in value) + "]"
+    return _encode_scalar(value, float_literals)
+
+
+def iter_json_chunks(obj, style=DEFAULT_STYLE, stream_depth=2):
+    """以串流方式產生符合 style 的 JSON 文字片段
+
+    外層 stream_depth 層逐項產生（通常是「檔案 → 記錄列表」），
+    每筆記錄內部則先組成字串再一次產生，減少產生器的額外負擔。
+    """
+    newline = style.newline
+    inline_paths = style.inline_paths
+    float_literals = style.float_literals
+    indent_cache = {}
+
+    def indent(level):
+        if level not in indent_cache:
+            indent_cache[level] = newline + style.indent(level)
+        return indent_cache[level]
+
+    def child_path(path, key):
+        return f"{path}.{key}" if path else str(key)
+
+    def encode_into(parts, value, path, level):
+        if isinstance(value, dict):
+            if not value:
+                parts.append("{}")
+            elif path in inline_paths:
+                parts.append(_encode_inline(value, float_literals) if float_literals
+                             else json.dumps(value, ensure_ascii=False))
+            else:
+                inner = indent(level + 1)
+                opener = "{"
+                for key, item in value.items():
+                    parts.append(opener + inner + encode_basestring(str(key)) + ": ")
+                    opener = ","
+                    if isinstance(item, (dict, list)):
+                        encode_into(parts, item, child_path(path, key), level + 1)
+                    else:
+                        parts.append(_encode_scalar(item, float_literals))
+                parts.append(indent(level) + "}")
+        elif isinstance(value, list):
+            if not value:
+                parts.append("[]")
+            elif path in inline_paths:
+                parts.append(_encode_inline(value, float_literals) if float_literals
+                             else json.dumps(value, ensure_ascii=False))
+            else:
+                inner = indent(level + 1)
+                item_path = child_path(path, "*")
+                opener = "["
+                for item in value:
+                    parts.append(opener + inner)
+                    opener = ","
+                    if isinstance(item, (dict, list)):
+                        encode_into(parts, item, item_path, level + 1)
+                    else:
+                        parts.append(_encode_scalar(item, float_literals))
+                parts.append(indent(level) + "]")
+        else:
+            parts.append(_encode_scalar(value, float_literals))
+
+    def encode(value, path, level):
+        if level >= stream_depth or not value or path in inline_paths or not isinstance(value, (dict, list)):
+            parts = []
+            encode_into(parts, value, path, level)
+            yield "".join(parts)
+            return
+        inner = indent(level + 1)
+        if isinstance(value, dict):
+            items = ((child_path(path, key), item, encode_basestring(str(key)) + ": ") for key, item in value.items())
+            brackets = "{}"
+        else:
+            item_path = child_path(path, "*")
+            items = ((item_path, item, "") for item in value)
+            brackets = "[]"
+        opener = brackets[0]
+        for item_path, item, prefix in items:
+            yield opener + inner + prefix
+            opener = ","
+            yield from encode(item, item_path, level + 1)
+        yield indent(level) + brackets[1]
+
+    yield from encode(obj, "", 0)
+    if style.trailing_newline:
+        yield newline
+
+
+def dumps(obj, style=DEFAULT_STYLE):
+    return "".join(iter_json_chunks(obj, style))
+
+
+def _iter_blocks(chunks, block_chars=1 << 16):
+    """將細碎的片段合併成約 64K 字元的區塊後編碼（逐片比對的額外負擔太大）"""
+    buffer, size = [], 0
+    for chunk in chunks:
+        buffer.append(chunk)
+        size += len(chunk)
+        if size >= block_chars:
+            yield "".join(buffer).encode('utf-8')
+            buffer, size = [], 0
+    if buffer:
+        yield "".join(buffer).encode('utf-8')
+
+
+def _same_json(a, b):
+    """解析後的值是否相同（區分 int / float / bool，1 與 1.0 視為不同）"""
+    if type(a) is not type(b):
+        return False
+    if isinstance(a, dict):
+        return a.keys() == b.keys() and all(_same_json(a[key], b[key]) for key in a)
+    if isinstance(a, list):
+        return len(a) == len(b) and all(_same_json(x, y) for x, y in zip(a, b))
+    return a == b
+
+
+def _unchanged_value(existing, obj, style):
+    """文字不同、但只是浮點數寫法不同時視為未變更"""
+    if not style.ambiguous_floats:
+        return False
+    try:
+        return _same_json(json.loads(existing.decode('utf-8')), obj)
+    except ValueError:
+        return False
+
+
+# 路徑 -> ((size, mtime_ns), JsonStyle)，避免每次儲存都重新掃描大型檔案
+_STYLE_CACHE = {}
+
+
+def _signature(path):
+    st = os.stat(path)
+    return st.st_size, st.st_mtime_ns
+
+
+def write_json_if_changed(path, obj, style=None, default_style=DEFAULT_STYLE, return_raw=False):
+    """以原檔排版寫入 JSON；內容與磁碟上相同時不寫檔
+
+    回傳 True 表示有寫入，False 表示內容未變更。
+    return_raw=True 時回傳 (是否寫入, 檔案內容 bytes)：寫入時為實際寫入的內容，未變更時為讀到的原檔內容
+    （不必在寫入後重新讀檔，避免把其他人在這之間寫入的內容當成自己的）。
+    """
+    existing = b""
+    if os.path.exists(path):
+        with open(path, 'rb') as f:
+            existing = f.read()
+        if style is None:
+            cached = _STYLE_CACHE.get(path)
+            signature = _signature(path)
+            if cached and cached[0] == signature:
+                style = cached[1]
+            else:
+                style = detect_style(existing.decode('utf-8'))
+                _STYLE_CACHE[path] = (signature, style)
+    style = style or default_style
+
+    position = 0
+    out = None
+    tmp_path = None
+    parts = [] if return_raw else None  # 寫入的內容（return_raw 時才保留）
+
+    def unchanged():
+        return (False, existing) if return_raw else False
+
+    try:
+        for data in _iter_blocks(iter_json_chunks(obj, style)):
+            if out is None:
+                end = position + len(data)
+                if existing[position:end] == data:
+                    position = end
+                    continue
+                if _unchanged_value(existing, obj, style):
+                    return unchanged()
+                # 第一個不同之處：開始寫暫存檔（先補上相同的前段）
+                fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=".", suffix=".json.tmp")
+                out = os.fdopen(fd, 'wb')
+                out.write(existing[:position])
+                if parts is not None:
+                    parts.append(existing[:position])
+            out.write(data)
+            if parts is not None:
+                parts.append(data)
+
+        if out is None:
+            if position == len(existing) or _unchanged_value(existing, obj, style):
+                return unchanged()
+            # 新內容是原檔的前段（原檔較長）
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=".", suffix=".json.tmp")
+            out = os.fdopen(fd, 'wb')
+            out.write(existing[:position])
+            if parts is not None:
+                parts.append(existing[:position])
+        out.close()
+        out = None
+        if os.path.exists(path):
+            os.chmod(tmp_path, os.stat(path).st_mode & 0o777)
+        os.replace(tmp_path, path)
+        tmp_path = None
+        _STYLE_CACHE[path] = (_signature(path), style)
+        return (True, b"".join(parts)) if return_raw else True
+    finally:
+        if out is not None:
+            out.close()
+        if tmp_path and os.path.exists(tmp_path):
+            os.remove(tmp_path)
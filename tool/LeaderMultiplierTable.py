@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+隊長技能倍率表 (Leader Multiplier Table)
+遊戲在戰鬥開始時才依隊伍的元素組成計算隊長技能的 PERMANENT 倍率
+（SkillRegistry / SkillEffectHandler 的 _apply_team_element_multiplier、_apply_team_diversity_multiplier
+每次都重新數隊伍元素）。本工具對 leader_skills.json 的每個隊長技能，預先算出所有隊伍元素組成下
+每位隊員（依其元素）的 HP / ATK / REC 倍率，存成一個連續的 float64 陣列：
+
+    隊伍元素組成：6 種元素的人數向量，總人數 1..MAX_TEAM_SIZE，共 len(TEAM_VECTORS) 種，team_index() 取得索引
+    技能區塊：[HP × 6 元素][REC × 6 元素][ATK × 6 元素 × 組成數]
+    ATK 只有含 TEAM_ELEMENT_MULTIPLIER / TEAM_DIVERSITY_MULTIPLIER 的技能與組成有關（stride = 6），
+    其餘技能只存一列（stride = 0），因此查表一律是 values[offset + 12 + team_index * stride + element]
+
+倍率的計算順序與遊戲相同（每個效果依序相乘到 CardData 的 hp/atk/recovery_multiplier），
+隊長有多個技能時把各技能的查表結果依序相乘即可。
+
+快取：data/.gm_cache/leader_multipliers.bin，leader_skills.json 的 md5 不同時重新建立。
+
+用法:
+    python LeaderMultiplierTable.py ../data                         # 建立 / 更新快取並列出每個技能的倍率範圍
+    python LeaderMultiplierTable.py ../data --skill LS_TEAM_FIRE_COUNT --team FIRE,FIRE,WATER,WOOD,FIRE
+"""
+
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import struct
+import sys
+import tempfile
+from array import array
+
+from SkillCompiler import ELEMENT_ALL, ELEMENTS, SKILL_FILES, compile_skills
+from SnapshotCache import CACHE_DIR_NAME
+
+TABLE_MAGIC = b"CGLM"
+TABLE_VERSION = 1
+TABLE_FILE_NAME = "leader_multipliers.bin"
+
+MAX_TEAM_SIZE = 6   # Constants.MAX_TEAM_SIZE = 5，另保留一格給好友支援
+STATS = ["hp", "recovery", "atk"]
+HP, RECOVERY, ATK = range(3)
+ELEMENT_COUNT = len(ELEMENTS)
+FIRE = ELEMENTS.index("FIRE")
+
+STAT_EFFECTS = {"HP_MULTIPLIER": HP, "RECOVERY_MULTIPLIER": RECOVERY}
+ATK_EFFECTS = {"BASE_DAMAGE_BOOST", "TEAM_ELEMENT_MULTIPLIER", "TEAM_DIVERSITY_MULTIPLIER"}
+TEAM_EFFECTS = {"TEAM_ELEMENT_MULTIPLIER", "TEAM_DIVERSITY_MULTIPLIER"}
+
+# 所有隊伍元素組成（依總人數、再依向量排序）
+TEAM_VECTORS = sorted((counts for counts in itertools.product(range(MAX_TEAM_SIZE + 1), repeat=ELEMENT_COUNT)
+                       if 1 <= sum(counts) <= MAX_TEAM_SIZE), key=lambda counts: (sum(counts), counts))
+_VECTOR_INDEX = {counts: index for index, counts in enumerate(TEAM_VECTORS)}
+
+
+def team_counts(elements):
+    """隊員元素列表 -> 6 種元素的人數向量"""
+    counts = [0] * ELEMENT_COUNT
+    for element in elements:
+        counts[element] += 1
+    return tuple(counts)
+
+
+def team_index(elements):
+    """隊員元素列表 -> TEAM_VECTORS 的索引"""
+    counts = team_counts(elements)
+    if counts not in _VECTOR_INDEX:
+        raise ValueError(f"隊伍人數必須是 1..{MAX_TEAM_SIZE}：{len(elements)}")
+    return _VECTOR_INDEX[counts]
+
+
+def _member_element(params):
+    """SkillRegistry._parse_element：ALL 與無法解析的元素一律當成 FIRE"""
+    element = params.get("target_element", FIRE)
+    return FIRE if element is None or element == ELEMENT_ALL else element
+
+
+# ========== 建立 ==========
+
+def skill_block(compiled):
+    """一個隊長技能的區塊：回傳 (values, atk_stride)"""
+    effects = compiled.get("timings", {}).get("PERMANENT", [])
+    base = [[1.0] * ELEMENT_COUNT for _ in STATS]
+    team_effects = []
+    for effect in effects:
+        effect_type, params = effect["effect_type"], effect["params"]
+        if effect_type in STAT_EFFECTS:
+            # 沒填或填 ALL 時套用全隊
+            target = params.get("target_element", ELEMENT_ALL)
+            row = base[STAT_EFFECTS[effect_type]]
+            for element in range(ELEMENT_COUNT):
+                if target == ELEMENT_ALL or element == (FIRE if target is None else target):
+                    row[element] *= params.get("multiplier", 1.0)
+        elif effect_type in ATK_EFFECTS:
+            team_effects.append((effect_type, params))
+
+    values = array('d', base[HP] + base[RECOVERY])
+    dependent = any(effect_type in TEAM_EFFECTS for effect_type, _ in team_effects)
+    for counts in (TEAM_VECTORS if dependent else TEAM_VECTORS[:1]):
+        row = list(base[ATK])
+        unique = sum(1 for count in counts if count)
+        for effect_type, params in team_effects:
+            if effect_type == "TEAM_DIVERSITY_MULTIPLIER":
+                mult = min(params.get("base_multiplier", 1.0) + unique * params.get("per_unique_boost", 0.2),
+                           params.get("max_multiplier", 2.0))
+                for element in range(ELEMENT_COUNT):
+                    row[element] *= mult
+                continue
+            element = _member_element(params)
+            if effect_type == "TEAM_ELEMENT_MULTIPLIER":
+                mult = min(params.get("base_multiplier", 1.0) + counts[element] * params.get("per_member_boost", 0.3),
+                           params.get("max_multiplier", 2.5))
+            else:
+                mult = 1.0 + params.get("boost_percent", 30.0) / 100.0
+            row[element] *= mult
+        values.extend(row)
+    return values, ELEMENT_COUNT if dependent else 0
+
+
+class LeaderMultipliers:
+    """所有隊長技能的倍率表"""
+
+    def __init__(self, skill_ids, offsets, strides, values, source_md5=""):
+        self.skill_ids = skill_ids
+        self.slots = {skill_id: slot for slot, skill_id in enumerate(skill_ids)}
+        self.offsets = offsets
+        self.strides = strides
+        self.values = values
+        self.source_md5 = source_md5
+
+    @classmethod
+    def build(cls, compiled_leader_skills, source_md5=""):
+        """compiled_leader_skills: SkillCompiler 編譯後的 {skill_id: compiled}"""
+        skill_ids, offsets, strides = [], array('q'), array('q')
+        values = array('d')
+        for skill_id, compiled in compiled_leader_skills.items():
+            block, stride = skill_block(compiled)
+            skill_ids.append(skill_id)
+            offsets.append(len(values))
+            strides.append(stride)
+            values.extend(block)
+        return cls(skill_ids, offsets, strides, values, source_md5)
+
+    def value(self, skill_id, index, stat, element):
+        """單一技能對某元素隊員的倍率（index = team_index(...)，stat = HP / RECOVERY / ATK）"""
+        slot = self.slots[skill_id]
+        if stat == ATK:
+            return self.values[self.offsets[slot] + 2 * ELEMENT_COUNT + index * self.strides[slot] + element]
+        return self.values[self.offsets[slot] + stat * ELEMENT_COUNT + element]
+
+    def team_multipliers(self, skill_ids, elements):
+        """隊長的技能列表對整隊的倍率：{"hp": [...], "recovery": [...], "atk": [...]}（順序同 elements）
+
+        不在表中的技能（非 JSON 隊長技能）會被略過，回傳第二個值為略過的技能 ID 列表。
+        """
+        result = {stat: [1.0] * len(elements) for stat in STATS}
+        missing = []
+        if not elements:
+            return result, missing
+        index = team_index(elements)
+        values = self.values
+        for skill_id in skill_ids:
+            slot = self.slots.get(skill_id)
+            if slot is None:
+                missing.append(skill_id)
+                continue
+            offset = self.offsets[slot]
+            atk = offset + 2 * ELEMENT_COUNT + index * self.strides[slot]
+            for member, element in enumerate(elements):
+                result["hp"][member] *= values[offset + element]
+                result["recovery"][member] *= values[offset + ELEMENT_COUNT + element]
+                result["atk"][member] *= values[atk + element]
+        return result, missing
+
+    def atk_range(self, skill_id, team_size=None):
+        """某技能在所有組成（可限定總人數）下的 ATK 倍率最小 / 最大值"""
+        slot = self.slots[skill_id]
+        offset = self.offsets[slot] + 2 * ELEMENT_COUNT
+        if not self.strides[slot]:
+            row = self.values[offset:offset + ELEMENT_COUNT]
+            return min(row), max(row)
+        low, high = None, None
+        for index, counts in enumerate(TEAM_VECTORS):
+            if team_size is not None and sum(counts) != team_size:
+                continue
+            start = offset + index * self.strides[slot]
+            for element in range(ELEMENT_COUNT):
+                if counts[element]:
+                    value = self.values[start + element]
+                    low = value if low is None else min(low, value)
+                    high = value if high is None else max(high, value)
+        return (low or 1.0), (high or 1.0)
+
+    # ---------- 檔案 ----------
+
+    def save(self, path):
+        header = json.dumps({"version": TABLE_VERSION, "source_md5": self.source_md5, "skill_ids": self.skill_ids,
+                             "offsets": list(self.offsets), "strides": list(self.strides),
+                             "max_team_size": MAX_TEAM_SIZE, "elements": ELEMENTS},
+                            ensure_ascii=False).encode("utf-8")
+        values = array('d', self.values)
+        if sys.byteorder != "little":
+            values.byteswap()
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        # 每個寫入者使用自己的暫存檔（BalanceRegression 的多個 worker 可能同時重建）
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".", suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(TABLE_MAGIC + struct.pack("<BI", TABLE_VERSION, len(header)))
+                f.write(header)
+                values.tofile(f)
+            os.replace(temp_path, path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    @classmethod
+    def load(cls, path):
+        """讀取快取檔；格式或版本不符時回傳 None"""
+        with open(path, 'rb') as f:
+            head = f.read(9)
+            if len(head) < 9 or head[:4] != TABLE_MAGIC:
+                return None
+            version, length = struct.unpack("<BI", head[4:])
+            header = json.loads(f.read(length).decode("utf-8"))
+            if version != TABLE_VERSION or header.get("max_team_size") != MAX_TEAM_SIZE \
+                    or header.get("elements") != ELEMENTS:
+                return None
+            data = f.read()
+        skill_ids, offsets, strides = header["skill_ids"], header["offsets"], header["strides"]
+        if len(offsets) != len(skill_ids) or len(strides) != len(skill_ids):
+            return None
+        # 區塊必須連續排列：HP + REC 各 6 格，ATK 為 6 格（stride 0）或每種組成 6 格
+        expected = 0
+        for offset, stride in zip(offsets, strides):
+            if offset != expected or stride not in (0, ELEMENT_COUNT):
+                return None
+            expected += 2 * ELEMENT_COUNT + ELEMENT_COUNT * (len(TEAM_VECTORS) if stride else 1)
+        if len(data) != expected * 8:
+            return None
+        values = array('d')
+        values.frombytes(data)
+        if sys.byteorder != "little":
+            values.byteswap()
+        return cls(skill_ids, array('q', offsets), array('q', strides), values, header.get("source_md5", ""))
+
+
+def load_multipliers(data_dir, use_cache=True):
+    """讀取隊長技能倍率表；快取不存在或 leader_skills.json 已修改時重新建立並寫回快取"""
+    rel_path, _ = SKILL_FILES["leader"]
+    source_path = os.path.join(data_dir, rel_path)
+    raw = b""
+    if os.path.exists(source_path):
+        with open(source_path, 'rb') as f:
+            raw = f.read()
+    source_md5 = hashlib.md5(raw).hexdigest()
+    cache_path = os.path.join(data_dir, CACHE_DIR_NAME, TABLE_FILE_NAME)
+    if use_cache and os.path.exists(cache_path):
+        try:
+            table = LeaderMultipliers.load(cache_path)
+        except (OSError, ValueError, KeyError):
+            table = None
+        if table is not None and table.source_md5 == source_md5:
+            return table
+    skills, _ = compile_skills({"leader": json.loads(raw.decode("utf-8")) if raw else {}})
+    table = LeaderMultipliers.build(skills.get("leader", {}), source_md5)
+    if use_cache:
+        try:
+            table.save(cache_path)
+        except OSError:
+            pass
+    return table
+
+
+def main():
+    parser = argparse.ArgumentParser(description="隊長技能 HP / ATK / REC 倍率表")
+    parser.add_argument("data_dir", help="資料目錄")
+    parser.add_argument("--skill", help="只顯示指定技能")
+    parser.add_argument("--team", help="隊員元素（逗號分隔，例如 FIRE,FIRE,WATER）：顯示該組成下的每位隊員倍率")
+    parser.add_argument("--rebuild", action="store_true", help="忽略快取重新建立")
+    args = parser.parse_args()
+
+    if args.rebuild:
+        table = load_multipliers(args.data_dir, use_cache=False)
+        table.save(os.path.join(args.data_dir, CACHE_DIR_NAME, TABLE_FILE_NAME))
+    else:
+        table = load_multipliers(args.data_dir)
+    skill_ids = [args.skill] if args.skill else table.skill_ids
+    if args.skill and args.skill not in table.slots:
+        print(f"❌ 找不到隊長技能 {args.skill}")
+        return 1
+    dependent = sum(1 for stride in table.strides if stride)
+    print(f"隊長技能 {len(table.skill_ids)} 個（與隊伍組成有關 {dependent} 個），"
+          f"組成 {len(TEAM_VECTORS)} 種，共 {len(table.values)} 個倍率（{len(table.values) * 8 / 1024:.0f} KB）")
+
+    if args.team:
+        names = [name.strip().upper() for name in args.team.split(",") if name.strip()]
+        unknown = [name for name in names if name not in ELEMENTS]
+        if unknown or not 1 <= len(names) <= MAX_TEAM_SIZE:
+            print(f"❌ 隊伍元素無效：{args.team}")
+            return 1
+        elements = [ELEMENTS.index(name) for name in names]
+        result, _ = table.team_multipliers(skill_ids, elements)
+        for member, name in enumerate(names):
+            print(f"  隊員 {member + 1} {name:<6} HP x{result['hp'][member]:.3f}  "
+                  f"ATK x{result['atk'][member]:.3f}  REC x{result['recovery'][member]:.3f}")
+        return 0
+
+    for skill_id in skill_ids:
+        slot = table.slots[skill_id]
+        low, high = table.atk_range(skill_id, team_size=5)
+        offset = table.offsets[slot]
+        hp = table.values[offset:offset + ELEMENT_COUNT]
+        recovery = table.values[offset + ELEMENT_COUNT:offset + 2 * ELEMENT_COUNT]
+        if low == high == 1.0 and max(hp) == min(hp) == 1.0 and max(recovery) == min(recovery) == 1.0:
+            continue
+        atk = f"x{low:.2f}" if low == high else f"x{low:.2f}~x{high:.2f}"
+        print(f"  {skill_id:<32} ATK {atk:<14} HP x{min(hp):.2f}~x{max(hp):.2f}  "
+              f"REC x{min(recovery):.2f}~x{max(recovery):.2f}{'  （依組成）' if table.strides[slot] else ''}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,354 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+在地化字串表 (Localization String Tables)
+把資料 JSON 中玩家看得到的文字（對話內容、選項、卡片 / 技能 / 關卡名稱與描述、商店說明...）
+抽出成每個語系一份的字串表，並能以字串表產生指定語系的 data 資料夾。
+
+檔案（預設放在 data/locale/）：
+    keys.json   字串鍵清單：每個資料檔的 sha1、每筆記錄的內容雜湊與 {字串鍵: 文字 ID}
+    zh_TW.json  原文字串表：{"strings": {文字 ID: 原文}}
+    en.json     翻譯字串表：{"strings": {文字 ID: 譯文}, "overrides": {字串鍵: 譯文}}
+
+字串鍵：<data_key>/<記錄 ID>/<欄位路徑>，例如 dialogs/welcome_001/choices/0/text、
+        quests/tutorial_001/steps/step_001/step_desc（有子 ID 的列表以子 ID 代替索引）
+文字 ID：原文的 sha1 前 12 碼，相同原文只需翻譯一次（「繼續」「確定」等不會重複出現）；
+         原文修改後文字 ID 跟著改變，舊譯文不會被誤用。同一原文在不同位置需要不同譯文時使用 overrides。
+
+增量抽取：資料檔 sha1 沒變時整個略過；有變時只重新抽取內容雜湊改變的記錄。
+
+用法：
+    python tool/Localization.py extract data --locales en       # 抽取 / 更新字串表，en.json 補上待翻譯項目
+    python tool/Localization.py status data --locale en         # 翻譯進度
+    python tool/Localization.py build data --locale en --out build/data_en
+    python tool/Localization.py build data --locale zh_TW --out data   # 把原文字串表的修改寫回資料
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+
+from DataSchema import FILE_PATHS, RECORD_KEYS
+from JsonWriter import detect_style, write_json_if_changed
+
+
+SOURCE_LOCALE = "zh_TW"
+MANIFEST_VERSION = 1
+LOCALE_DIR_NAME = "locale"
+
+# data_key -> 需要翻譯的欄位路徑（"[]" 表示列表中的每個元素）
+TEXT_FIELDS = {
+    "cards": [("card_name",)],
+    "enemies": [("enemy_name",), ("card_name",)],
+    "stages": [("stage_name",), ("description",)],
+    "active_skills": [("skill_name",), ("description",)],
+    "leader_skills": [("skill_name",), ("description",)],
+    "enemy_skills": [("skill_name",), ("description",)],
+    "regions": [("region_name",), ("chapters", "[]", "chapter_name"), ("chapters", "[]", "chapter_desc")],
+    "shop_items": [("name",), ("description",)],
+    "gacha_pools": [("name",), ("description",)],
+    "training_rooms": [("room_name",), ("room_desc",)],
+    "dialogs": [("speaker",), ("content",), ("choices", "[]", "text")],
+    "quests": [("quest_name",), ("quest_desc",), ("steps", "[]", "step_desc"), ("steps", "[]", "description")],
+}
+
+# 列表元素的子 ID（字串鍵使用子 ID，插入或調整順序後鍵不會改變）
+LIST_ID_KEYS = {
+    "chapters": "chapter_id",
+    "steps": "step_id",
+}
+
+
+def text_id(text):
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()[:12]
+
+
+def record_hash(record):
+    return hashlib.sha1(json.dumps(record, ensure_ascii=False, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def iter_text_slots(record, fields):
+    """走訪記錄中需要翻譯的欄位：產生 (鍵路徑, 所在的 dict, 欄位名稱)"""
+    def walk(node, path, key_parts):
+        head = path[0]
+        if len(path) == 1:
+            if isinstance(node, dict) and isinstance(node.get(head), str) and node[head]:
+                yield key_parts + [head], node, head
+            return
+        child = node.get(head) if isinstance(node, dict) else None
+        if path[1] == "[]":
+            if not isinstance(child, list):
+                return
+            id_key = LIST_ID_KEYS.get(head)
+            for index, item in enumerate(child):
+                sub_id = item.get(id_key) if id_key and isinstance(item, dict) else None
+                yield from walk(item, path[2:], key_parts + [head, str(sub_id or index)])
+        elif child is not None:
+            yield from walk(child, path[1:], key_parts + [head])
+
+    for path in fields:
+        yield from walk(record, path, [])
+
+
+def extract_record(data_key, record_id, record):
+    """抽取單筆記錄：{字串鍵: (文字 ID, 原文)}"""
+    found = {}
+    for key_parts, holder, field in iter_text_slots(record, TEXT_FIELDS[data_key]):
+        key = "/".join([data_key, str(record_id)] + key_parts)
+        if key not in found:  # 子 ID 重複時保留第一個
+            found[key] = (text_id(holder[field]), holder[field])
+    return found
+
+
+def _load_json(path, default):
+    if not os.path.exists(path):
+        return default
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _read_text(path):
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        return f.read()
+
+
+def locale_dir_for(data_dir):
+    return os.path.join(data_dir, LOCALE_DIR_NAME)
+
+
+def load_locale_table(locale_dir, locale):
+    table = _load_json(os.path.join(locale_dir, f"{locale}.json"), {})
+    table.setdefault("locale", locale)
+    table.setdefault("strings", {})
+    if locale != SOURCE_LOCALE:
+        table.setdefault("overrides", {})
+    return table
+
+
+# ==================== 抽取 ====================
+
+def extract(data_dir, locale_dir=None, locales=()):
+    """抽取（增量）字串表，回傳統計 dict"""
+    locale_dir = locale_dir or locale_dir_for(data_dir)
+    os.makedirs(locale_dir, exist_ok=True)
+    manifest = _load_json(os.path.join(locale_dir, "keys.json"), {})
+    if manifest.get("version") != MANIFEST_VERSION:
+        manifest = {"version": MANIFEST_VERSION, "source_locale": SOURCE_LOCALE, "files": {}}
+    source = load_locale_table(locale_dir, SOURCE_LOCALE)
+
+    stats = {"files_skipped": 0, "files_scanned": 0, "records_extracted": 0, "records_reused": 0,
+             "keys": 0, "texts": 0, "changed_keys": [], "duplicate_ids": []}
+    new_texts = {}
+    files = {}
+    for data_key in TEXT_FIELDS:
+        path = os.path.join(data_dir, FILE_PATHS[data_key])
+        previous = manifest["files"].get(data_key)
+        if not os.path.exists(path):
+            continue
+        with open(path, 'rb') as f:
+            raw = f.read()
+        sha1 = hashlib.sha1(raw).hexdigest()
+        if previous and previous.get("sha1") == sha1:
+            files[data_key] = previous
+            stats["files_skipped"] += 1
+            continue
+
+        stats["files_scanned"] += 1
+        list_key, id_key = RECORD_KEYS[data_key]
+        old_records = (previous or {}).get("records", {})
+        records = {}
+        for record in json.loads(raw.decode('utf-8')).get(list_key, []):
+            if not isinstance(record, dict):
+                continue
+            record_id = record.get(id_key)
+            if record_id is None:
+                continue
+            record_id = str(record_id)
+            if record_id in records:
+                stats["duplicate_ids"].append(f"{data_key}/{record_id}")
+                continue  # 遊戲只讀第一筆
+            digest = record_hash(record)
+            old = old_records.get(record_id)
+            if old and old.get("hash") == digest:
+                records[record_id] = old
+                stats["records_reused"] += 1
+                continue
+            found = extract_record(data_key, record_id, record)
+            for key, (tid, text) in found.items():
+                new_texts[tid] = text
+                if old and key in old.get("keys", {}) and old["keys"][key] != tid:
+                    stats["changed_keys"].append(key)
+            records[record_id] = {"hash": digest, "keys": {key: tid for key, (tid, _) in found.items()}}
+            stats["records_extracted"] += 1
+        files[data_key] = {"sha1": sha1, "records": records}
+
+    manifest["files"] = files
+
+    # 原文字串表：只保留仍被引用的文字
+    used = {tid for entry in files.values() for record in entry["records"].values() for tid in record["keys"].values()}
+    strings = {}
+    for tid in sorted(used):
+        text = new_texts.get(tid, source["strings"].get(tid))
+        if text is None:
+            continue  # 字串表被手動刪除的項目會在下次資料檔修改時補回
+        strings[tid] = text
+    source["strings"] = strings
+    stats["keys"] = sum(len(record["keys"]) for entry in files.values() for record in entry["records"].values())
+    stats["texts"] = len(strings)
+
+    write_json_if_changed(os.path.join(locale_dir, "keys.json"), manifest)
+    write_json_if_changed(os.path.join(locale_dir, f"{SOURCE_LOCALE}.json"), source)
+
+    # 翻譯字串表：補上尚未翻譯的文字（空字串），保留已不再使用的譯文作為翻譯記憶
+    for locale in locales:
+        if locale == SOURCE_LOCALE:
+            continue
+        table = load_locale_table(locale_dir, locale)
+        for tid in strings:
+            table["strings"].setdefault(tid, "")
+        table["strings"] = dict(sorted(table["strings"].items()))
+        write_json_if_changed(os.path.join(locale_dir, f"{locale}.json"), table)
+    return stats
+
+
+# ==================== 產生語系資料夾 ====================
+
+def translate_record(data_key, record_id, record, strings, overrides, missing):
+    """就地把記錄的文字換成譯文；找不到譯文時保留原文並記錄在 missing。回傳替換的欄位數"""
+    replaced = 0
+    for key_parts, holder, field in iter_text_slots(record, TEXT_FIELDS[data_key]):
+        key = "/".join([data_key, str(record_id)] + key_parts)
+        translated = overrides.get(key) or strings.get(text_id(holder[field]))
+        if not translated:
+            missing.append(key)
+        elif translated != holder[field]:
+            holder[field] = translated
+            replaced += 1
+    return replaced
+
+
+def build(data_dir, locale, out_dir, locale_dir=None):
+    """產生語系資料夾：一次處理一個檔案（讀取 -> 替換 -> 以原檔排版寫出），回傳 (寫入的檔案, 缺少譯文的鍵)
+
+    locale 為原文語系時使用原文字串表，可把字串表上的修改寫回 data 資料夾。
+    """
+    locale_dir = locale_dir or locale_dir_for(data_dir)
+    table = load_locale_table(locale_dir, locale)
+    strings, overrides = table["strings"], table.get("overrides", {})
+    if locale == SOURCE_LOCALE:
+        # 原文字串表以文字 ID 對應，修改過的原文要透過字串鍵找回位置
+        manifest = _load_json(os.path.join(locale_dir, "keys.json"), {"files": {}})
+        overrides = {
+            key: strings[tid]
+            for entry in manifest["files"].values()
+            for record in entry["records"].values()
+            for key, tid in record["keys"].items()
+            if tid in strings
+        }
+        strings = {}
+
+    written, missing = [], []
+    for data_key in TEXT_FIELDS:
+        source_path = os.path.join(data_dir, FILE_PATHS[data_key])
+        if not os.path.exists(source_path):
+            continue
+        text = _read_text(source_path)
+        data = json.loads(text)
+        list_key, id_key = RECORD_KEYS[data_key]
+        seen, replaced = set(), 0
+        for record in data.get(list_key, []):
+            if not isinstance(record, dict) or record.get(id_key) is None:
+                continue
+            record_id = str(record[id_key])
+            if record_id in seen:
+                continue
+            seen.add(record_id)
+            replaced += translate_record(data_key, record_id, record, strings, overrides, missing)
+
+        out_path = os.path.join(out_dir, FILE_PATHS[data_key])
+        if not replaced:
+            # 沒有任何文字被替換：原封不動複製（就地寫回時不動檔案），避免重新排版
+            if os.path.abspath(out_path) != os.path.abspath(source_path) and _read_text(out_path) != text:
+                os.makedirs(os.path.dirname(out_path) or ".", exist_ok=True)
+                with open(out_path, 'w', encoding='utf-8', newline='') as f:
+                    f.write(text)
+                written.append(out_path)
+            continue
+        os.makedirs(os.path.dirname(out_path) or ".", exist_ok=True)
+        if write_json_if_changed(out_path, data, style=detect_style(text)):
+            written.append(out_path)
+    return written, missing
+
+
+def status(data_dir, locale, locale_dir=None):
+    """翻譯進度：(文字總數, 已翻譯數, 未翻譯的字串鍵列表)"""
+    locale_dir = locale_dir or locale_dir_for(data_dir)
+    manifest = _load_json(os.path.join(locale_dir, "keys.json"), {"files": {}})
+    table = load_locale_table(locale_dir, locale)
+    strings, overrides = table["strings"], table.get("overrides", {})
+    used, untranslated = set(), []
+    for entry in manifest["files"].values():
+        for record in entry["records"].values():
+            for key, tid in record["keys"].items():
+                used.add(tid)
+                if not (overrides.get(key) or strings.get(tid)):
+                    untranslated.append(key)
+    translated = sum(1 for tid in used if strings.get(tid))
+    return len(used), translated, sorted(untranslated)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="在地化字串表：抽取 / 翻譯進度 / 產生語系資料夾")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_extract = sub.add_parser("extract", help="抽取（增量）字串表")
+    p_extract.add_argument("data_dir")
+    p_extract.add_argument("--locales", nargs="*", default=[], help="同時補齊這些語系的待翻譯項目")
+    p_extract.add_argument("--locale-dir", help=f"字串表資料夾（預設 data/{LOCALE_DIR_NAME}）")
+
+    p_status = sub.add_parser("status", help="翻譯進度")
+    p_status.add_argument("data_dir")
+    p_status.add_argument("--locale", required=True)
+    p_status.add_argument("--locale-dir")
+
+    p_build = sub.add_parser("build", help="產生語系資料夾")
+    p_build.add_argument("data_dir")
+    p_build.add_argument("--locale", required=True)
+    p_build.add_argument("--out", required=True, help="輸出資料夾（與 data_dir 相同時就地寫回）")
+    p_build.add_argument("--locale-dir")
+
+    args = parser.parse_args()
+
+    if args.command == "extract":
+        stats = extract(args.data_dir, args.locale_dir, args.locales)
+        print(f"✅ 字串鍵 {stats['keys']} 個，文字 {stats['texts']} 則（相同原文只算一次）")
+        print(f"   檔案：掃描 {stats['files_scanned']}，未變更略過 {stats['files_skipped']}；"
+              f"記錄：重新抽取 {stats['records_extracted']}，沿用 {stats['records_reused']}")
+        for key in stats["changed_keys"]:
+            print(f"   ⚠️ 原文已修改，需要更新翻譯：{key}")
+        for key in stats["duplicate_ids"]:
+            print(f"   ⚠️ 重複的記錄 ID（只抽取第一筆）：{key}")
+        return 0
+
+    if args.command == "status":
+        total, translated, untranslated = status(args.data_dir, args.locale, args.locale_dir)
+        print(f"{args.locale}: {translated}/{total} 則文字已翻譯（{translated / total * 100 if total else 100:.1f}%）")
+        for key in untranslated[:50]:
+            print(f"   未翻譯：{key}")
+        if len(untranslated) > 50:
+            print(f"   ... 其餘 {len(untranslated) - 50} 個")
+        return 0
+
+    written, missing = build(args.data_dir, args.locale, args.out, args.locale_dir)
+    print(f"✅ 已寫入 {len(written)} 個檔案到 {args.out}")
+    if missing:
+        print(f"⚠️ {len(missing)} 個字串缺少 {args.locale} 譯文，保留原文")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
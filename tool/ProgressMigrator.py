@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+任務進度遷移工具 (Quest Progress Migrator)
+TaskManager.save_progress 會把進行中任務的 current_step_index 寫入 user://task_progress.json。
+在 DialogTaskEditor 中插入、刪除或重新排序步驟後，舊存檔的步驟索引會指到錯誤的步驟。
+
+本工具比對新舊兩個版本的 quests.json，算出每個任務的「舊步驟索引 -> 新步驟索引」對照，
+再以多個 worker process 串流處理整個資料夾的進度檔：
+1. 步驟 ID 在新舊版本中都唯一時，以 step_id 對照（最可靠）
+2. 否則以步驟內容（條件、對話、動作）做序列比對 (difflib)
+3. 目前步驟被刪除時，移到它之後第一個仍存在的步驟
+4. 任務被刪除時，從 active_quests 移除（load_progress 本來就會略過找不到配置的任務）
+
+預設只輸出報告 (dry-run)，加上 --apply 才會覆寫進度檔，或以 --out 寫到另一個資料夾。
+同一批存檔只能以同一組新舊版本遷移一次（遷移後的索引已經是新版本的索引）。
+
+用法：
+    git show HEAD~1:data/config/quests.json > /tmp/quests_old.json
+    python tool/ProgressMigrator.py /tmp/quests_old.json data/config/quests.json saves/
+    python tool/ProgressMigrator.py /tmp/quests_old.json data/config/quests.json saves/ --apply
+"""
+
+import argparse
+import difflib
+import json
+import multiprocessing
+import os
+import sys
+from collections import Counter
+
+from JsonWriter import detect_style, write_json_if_changed
+
+
+def load_quests(path):
+    """讀取 quests.json：{quest_id: quest}"""
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    return {quest.get("quest_id", ""): quest for quest in data.get("quests", [])}
+
+
+def _unique_step_ids(steps):
+    step_ids = [step.get("step_id", "") for step in steps]
+    return step_ids if all(step_ids) and len(set(step_ids)) == len(step_ids) else None
+
+
+def _step_fingerprint(step):
+    """步驟內容（不含說明文字），用於沒有穩定 step_id 時的序列比對"""
+    content = {key: step.get(key) for key in ("conditions", "condition", "dialog_id", "actions", "allowed_actions")}
+    return json.dumps(content, sort_keys=True, ensure_ascii=False)
+
+
+def match_steps(old_steps, new_steps):
+    """每個舊步驟在新版本中的索引：回傳 (method, matched)，被刪除的步驟為 None"""
+    old_ids, new_ids = _unique_step_ids(old_steps), _unique_step_ids(new_steps)
+    matched = [None] * len(old_steps)
+    if old_ids is not None and new_ids is not None:
+        method = "step_id"
+        new_positions = {step_id: index for index, step_id in enumerate(new_ids)}
+        for index, step_id in enumerate(old_ids):
+            matched[index] = new_positions.get(step_id)
+    else:
+        method = "content"
+        matcher = difflib.SequenceMatcher(None, [_step_fingerprint(s) for s in old_steps],
+                                          [_step_fingerprint(s) for s in new_steps], autojunk=False)
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+            # 相同的區段直接對照；數量相同的替換區段視為「修改了內容的同一批步驟」
+            if tag == "equal" or (tag == "replace" and i2 - i1 == j2 - j1):
+                for offset in range(i2 - i1):
+                    matched[i1 + offset] = j1 + offset
+    return method, matched
+
+
+def step_index_map(old_steps, new_steps):
+    """舊步驟索引 -> 新步驟索引
+
+    回傳 (method, index_map)，index_map 長度為 len(old_steps) + 1：
+    最後一個元素對應「所有步驟已完成」(索引 == 步驟數)。
+    被刪除的步驟對應到它之後第一個仍存在的步驟。
+    """
+    method, matched = match_steps(old_steps, new_steps)
+    return method, _index_map(matched, len(new_steps))
+
+
+def _index_map(matched, new_count):
+    index_map = [None] * len(matched) + [new_count]
+    for index in range(len(matched) - 1, -1, -1):
+        index_map[index] = matched[index] if matched[index] is not None else index_map[index + 1]
+    return index_map
+
+
+def build_remap(old_quests, new_quests):
+    """比對兩個版本的任務：{quest_id: plan}，只包含需要遷移的任務
+
+    plan = {"method": "step_id" / "content" / "removed", "index_map": [...], "skipped": {舊索引: [新步驟 ID]}}
+    skipped 記錄遷移後會被跳過的「新插入在目前步驟之前」的步驟。
+    """
+    remap = {}
+    for quest_id, old_quest in old_quests.items():
+        new_quest = new_quests.get(quest_id)
+        if new_quest is None:
+            remap[quest_id] = {"method": "removed", "index_map": [], "skipped": {}}
+            continue
+        old_steps, new_steps = old_quest.get("steps", []), new_quest.get("steps", [])
+        method, matched = match_steps(old_steps, new_steps)
+        if matched == list(range(len(old_steps))) and len(old_steps) == len(new_steps):
+            continue
+        index_map = _index_map(matched, len(new_steps))
+
+        # 停在舊步驟 k 的玩家已完成舊步驟 0..k-1；新索引之前不屬於這些步驟的新步驟都會被跳過
+        skipped = {}
+        done = set()
+        for old_index, new_index in enumerate(index_map):
+            inserted = [new_steps[i].get("step_id", f"#{i + 1}") for i in range(new_index) if i not in done]
+            if inserted:
+                skipped[old_index] = inserted
+            if old_index < len(matched) and matched[old_index] is not None:
+                done.add(matched[old_index])
+        remap[quest_id] = {"method": method, "index_map": index_map, "skipped": skipped}
+    return remap
+
+
+def migrate_progress(progress, remap):
+    """遷移一份進度資料：回傳 (新的進度資料, 變更列表)
+
+    變更列表的項目為 (quest_id, 舊索引, 新索引或 None, 說明)；None 表示任務被移除。
+    """
+    active = progress.get("active_quests", {})
+    if not isinstance(active, dict):
+        return progress, []
+    changes = []
+    new_active = {}
+    for quest_id, saved in active.items():
+        plan = remap.get(quest_id)
+        if plan is None or not isinstance(saved, dict):
+            new_active[quest_id] = saved
+            continue
+        old_index = saved.get("current_step_index", 0)
+        if plan["method"] == "removed":
+            changes.append((quest_id, old_index, None, "任務已刪除"))
+            continue
+        index_map = plan["index_map"]
+        position = min(max(int(old_index), 0), len(index_map) - 1)
+        new_index = index_map[position]
+        if new_index != old_index:
+            note = f"依 {plan['method']} 對照"
+            skipped = plan["skipped"].get(position)
+            if skipped:
+                note += f"，跳過新步驟 {', '.join(skipped)}"
+            changes.append((quest_id, old_index, new_index, note))
+            saved = dict(saved, current_step_index=new_index)
+        new_active[quest_id] = saved
+    if not changes:
+        return progress, []
+    return dict(progress, active_quests=new_active), changes
+
+
+# ========== 多 process 串流處理 ==========
+
+_WORKER_STATE = {}
+
+
+def _init_worker(remap, out_dir, progress_dir, write):
+    # remap 只在每個 worker 啟動時傳一次，不隨每個檔案重新序列化
+    _WORKER_STATE.update(remap=remap, out_dir=out_dir, progress_dir=progress_dir, write=write)
+
+
+def _migrate_file(path):
+    """處理單一進度檔：回傳 (相對路徑, 變更列表, 錯誤訊息)"""
+    state = _WORKER_STATE
+    relative = os.path.relpath(path, state["progress_dir"])
+    try:
+        with open(path, 'r', encoding='utf-8', newline='') as f:
+            text = f.read()
+        progress = json.loads(text)
+    except (OSError, ValueError) as e:
+        return relative, [], str(e)
+    if not isinstance(progress, dict):
+        return relative, [], "不是任務進度格式"
+
+    migrated, changes = migrate_progress(progress, state["remap"])
+    if state["write"] and changes:
+        target = os.path.join(state["out_dir"], relative) if state["out_dir"] else path
+        os.makedirs(os.path.dirname(target) or ".", exist_ok=True)
+        # 沿用原存檔的排版（Godot 的 store_string 不會在檔尾加換行）
+        write_json_if_changed(target, migrated, style=detect_style(text))
+    elif state["write"] and state["out_dir"]:
+        # 沒有變更的檔案也複製到輸出資料夾，讓輸出資料夾是完整的一份
+        target = os.path.join(state["out_dir"], relative)
+        os.makedirs(os.path.dirname(target) or ".", exist_ok=True)
+        with open(path, 'rb') as src, open(target, 'wb') as dst:
+            dst.write(src.read())
+    return relative, changes, None
+
+
+def iter_progress_files(progress_dir):
+    """逐一列出資料夾（含子資料夾）中的 .json 檔，不一次載入整個列表"""
+    for root, dirs, files in os.walk(progress_dir):
+        dirs.sort()
+        for name in sorted(files):
+            if name.endswith(".json"):
+                yield os.path.join(root, name)
+
+
+def migrate_directory(progress_dir, remap, out_dir=None, apply=False, workers=None, chunksize=64):
+    """以多個 worker process 遷移資料夾中的所有進度檔，回傳報告
+
+    apply=False 且沒有 out_dir 時為 dry-run（不寫任何檔案）。
+    """
+    write = apply or bool(out_dir)
+    report = {"files": 0, "changed": 0, "errors": [], "transitions": Counter(), "removed": Counter(), "skipped": Counter()}
+    args = (remap, out_dir, progress_dir, write)
+    files = iter_progress_files(progress_dir)
+
+    if workers == 1:
+        _init_worker(*args)
+        results = map(_migrate_file, files)
+        pool = None
+    else:
+        pool = multiprocessing.Pool(workers, initializer=_init_worker, initargs=args)
+        results = pool.imap_unordered(_migrate_file, files, chunksize=chunksize)
+    try:
+        for relative, changes, error in results:
+            report["files"] += 1
+            if error:
+                report["errors"].append((relative, error))
+                continue
+            if changes:
+                report["changed"] += 1
+            for quest_id, old_index, new_index, note in changes:
+                if new_index is None:
+                    report["removed"][quest_id] += 1
+                else:
+                    report["transitions"][(quest_id, old_index, new_index, note)] += 1
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    report["errors"].sort()
+    return report
+
+
+def format_remap(remap):
+    lines = []
+    for quest_id, plan in sorted(remap.items()):
+        if plan["method"] == "removed":
+            lines.append(f"  {quest_id}: 任務已刪除")
+            continue
+        pairs = [f"{old}->{new}" for old, new in enumerate(plan["index_map"]) if old != new]
+        lines.append(f"  {quest_id} ({plan['method']}): {', '.join(pairs)}")
+    return lines
+
+
+def format_report(report, remap, write):
+    lines = ["=== 步驟索引對照 ==="]
+    lines.extend(format_remap(remap) or ["  （沒有任務需要遷移）"])
+    lines.append(f"=== 進度檔：{report['files']} 個，{report['changed']} 個{'已遷移' if write else '需要遷移'} ===")
+    for (quest_id, old_index, new_index, note), count in sorted(report["transitions"].items()):
+        lines.append(f"  {quest_id}: 步驟 {old_index} -> {new_index} ({note}) × {count}")
+    for quest_id, count in sorted(report["removed"].items()):
+        lines.append(f"  ⚠️ {quest_id}: 任務已刪除，從 active_quests 移除 × {count}")
+    for relative, error in report["errors"]:
+        lines.append(f"  ❌ {relative}: {error}")
+    if not write:
+        lines.append("（dry-run：沒有寫入任何檔案，加上 --apply 或 --out 執行遷移）")
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description="比對新舊 quests.json，遷移任務進度存檔的步驟索引")
+    parser.add_argument("old_quests", help="舊版 quests.json")
+    parser.add_argument("new_quests", help="新版 quests.json")
+    parser.add_argument("progress_dir", help="匯出的 task_progress.json 所在資料夾")
+    parser.add_argument("--apply", action="store_true", help="直接覆寫進度檔")
+    parser.add_argument("--out", help="遷移後的進度檔寫到此資料夾（不修改原檔）")
+    parser.add_argument("--workers", type=int, default=None, help="worker process 數量（預設為 CPU 數）")
+    parser.add_argument("--report", help="將報告寫入 JSON 檔")
+    args = parser.parse_args()
+
+    remap = build_remap(load_quests(args.old_quests), load_quests(args.new_quests))
+    if not remap:
+        print("✅ 兩個版本的任務步驟順序相同，不需要遷移")
+        return 0
+
+    report = migrate_directory(args.progress_dir, remap, out_dir=args.out, apply=args.apply, workers=args.workers)
+    print("\n".join(format_report(report, remap, args.apply or bool(args.out))))
+
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump({
+                "remap": remap,
+                "files": report["files"],
+                "changed": report["changed"],
+                "transitions": [{"quest_id": q, "from": o, "to": n, "note": note, "count": c}
+                                for (q, o, n, note), c in sorted(report["transitions"].items())],
+                "removed": dict(report["removed"]),
+                "errors": [{"file": r, "error": e} for r, e in report["errors"]],
+            }, f, ensure_ascii=False, indent=2)
+        print(f"✅ 報告已寫入 {args.report}")
+    return 1 if report["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+任務事件分派索引 (Quest Event Dispatch Index)
+TaskManager.notify_event 目前對每個事件、每個進行中的任務都執行一次 evaluate_condition。
+這裡將每個任務步驟的條件樹編譯成「可能滿足它的事件鍵」，以事件鍵索引進行中的任務，
+事件發生時只檢查候選任務，最後仍以 evaluate_condition 確認（結果與逐一檢查完全相同）。
+
+事件鍵 = (事件類型, 區分值)：
+    dialog_completed       -> dialog_id
+    scene_entered          -> scene_name
+    training_room_entered  -> room_id
+    card_selected          -> 每張 valid_cards
+    training_started / card_leveled_up -> None（不區分，該類型的事件都要檢查）
+and / or 條件取所有子條件鍵的聯集（and 的候選會多一些，由 evaluate_condition 排除）。
+
+編譯結果可匯出成 quest_dispatch.json（DialogTaskEditor：工具 -> 匯出任務事件索引），
+內含 quests.json 的 md5，讀取端可用來判斷索引是否過期。
+
+用法：
+    python tool/QuestDispatch.py data                # 匯出 data/config/quest_dispatch.json
+    python tool/QuestDispatch.py --bench --active 1000
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import random
+import sys
+import time
+
+from QuestSimulator import SimState, evaluate_condition
+
+
+DISPATCH_VERSION = 1
+DISPATCH_FILE_NAME = "quest_dispatch.json"
+
+# 事件類型 -> 事件資料中用來區分的欄位
+EVENT_KEY_FIELDS = {
+    "dialog_completed": "dialog_id",
+    "scene_entered": "scene_name",
+    "training_room_entered": "room_id",
+    "card_selected": "card_id",
+}
+
+
+def condition_event_keys(condition):
+    """條件樹可能被哪些事件鍵滿足，回傳 set((event_type, key))"""
+    condition_type = condition.get("type", "")
+    if condition_type in ("and", "or"):
+        keys = set()
+        for sub in condition.get("sub_conditions", []):
+            keys |= condition_event_keys(sub)
+        return keys
+    if condition_type == "dialog_completed":
+        return {("dialog_completed", condition.get("dialog_id", ""))}
+    if condition_type == "scene_entered":
+        return {("scene_entered", condition.get("scene_name", ""))}
+    if condition_type == "training_room_entered":
+        return {("training_room_entered", condition.get("room_id", ""))}
+    if condition_type == "card_selected":
+        return {("card_selected", card_id) for card_id in condition.get("valid_cards", [])}
+    if condition_type == "card_in_training":
+        return {("training_started", None)}
+    if condition_type == "card_level_up":
+        return {("card_leveled_up", None)}
+    return set()
+
+
+def event_keys(event_type, event_data):
+    """事件本身對應的索引鍵（區分值與不區分兩種都要查）"""
+    field = EVENT_KEY_FIELDS.get(event_type)
+    if field is None:
+        return ((event_type, None),)
+    return ((event_type, event_data.get(field, "")), (event_type, None))
+
+
+def compile_quests(quests_data):
+    """編譯每個任務步驟的事件鍵：{quest_id: [[(event_type, key), ...] 每個步驟]}"""
+    compiled = {}
+    for quest in (quests_data or {}).get("quests", []):
+        quest_id = quest.get("quest_id", "")
+        if quest_id in compiled:
+            continue  # get_quest_config 取第一筆
+        compiled[quest_id] = [
+            sorted(condition_event_keys(step.get("conditions", {})), key=lambda k: (k[0], k[1] or ""))
+            for step in quest.get("steps", [])
+        ]
+    return compiled
+
+
+class DispatchIndex:
+    """以事件鍵索引進行中任務的目前步驟"""
+
+    def __init__(self, quests_data):
+        self.compiled = compile_quests(quests_data)
+        self.quests = {}
+        for quest in (quests_data or {}).get("quests", []):
+            self.quests.setdefault(quest.get("quest_id", ""), quest)
+        self.active = {}     # quest_id -> current_step_index
+        self.started = {}    # quest_id -> 開始順序（與 active_quests 的走訪順序相同）
+        self._sequence = 0
+        self.listeners = {}  # (event_type, key) -> {quest_id: True}（保持任務開始順序）
+
+    def _keys(self, quest_id, index):
+        steps = self.compiled.get(quest_id, [])
+        return steps[index] if index < len(steps) else ()
+
+    def set_step(self, quest_id, index):
+        """任務開始或前進時呼叫；index 為 None 表示任務結束"""
+        old_index = self.active.get(quest_id)
+        if old_index is not None:
+            for key in self._keys(quest_id, old_index):
+                listeners = self.listeners.get(key)
+                if listeners is not None:
+                    listeners.pop(quest_id, None)
+                    if not listeners:
+                        del self.listeners[key]
+        if index is None:
+            self.active.pop(quest_id, None)
+            self.started.pop(quest_id, None)
+            return
+        if quest_id not in self.started:
+            self._sequence += 1
+            self.started[quest_id] = self._sequence
+        self.active[quest_id] = index
+        for key in self._keys(quest_id, index):
+            self.listeners.setdefault(key, {})[quest_id] = True
+
+    def candidates(self, event_type, event_data):
+        """可能被此事件完成的任務（依開始順序，不重複）"""
+        found = {}
+        for key in event_keys(event_type, event_data):
+            listeners = self.listeners.get(key)
+            if listeners:
+                found.update(listeners)
+        if len(found) > 1:
+            return sorted(found, key=self.started.__getitem__)
+        return list(found)
+
+    def dispatch(self, event_type, event_data, state):
+        """只對候選任務執行 evaluate_condition，回傳條件成立的任務 ID"""
+        matched = []
+        for quest_id in self.candidates(event_type, event_data):
+            steps = self.quests[quest_id].get("steps", [])
+            index = self.active[quest_id]
+            if index < len(steps) and evaluate_condition(steps[index].get("conditions", {}), event_type, event_data, state):
+                matched.append(quest_id)
+        return matched
+
+
+def naive_dispatch(quests, active, event_type, event_data, state):
+    """TaskManager.notify_event 目前的做法：每個進行中的任務都檢查一次"""
+    matched = []
+    for quest_id, index in active.items():
+        steps = quests[quest_id].get("steps", [])
+        if index < len(steps) and evaluate_condition(steps[index].get("conditions", {}), event_type, event_data, state):
+            matched.append(quest_id)
+    return matched
+
+
+# ==================== 匯出 ====================
+
+def build_artifact(quests_path):
+    """編譯 quests.json，回傳可寫成 JSON 的索引"""
+    with open(quests_path, 'rb') as f:
+        raw = f.read()
+    compiled = compile_quests(json.loads(raw.decode('utf-8')))
+    return {
+        "version": DISPATCH_VERSION,
+        "source": os.path.basename(quests_path),
+        "source_md5": hashlib.md5(raw).hexdigest(),  # Godot 可用 FileAccess.get_md5 比對
+        "key_fields": EVENT_KEY_FIELDS,
+        "steps": {
+            quest_id: [[[event_type, key] for event_type, key in step_keys] for step_keys in steps]
+            for quest_id, steps in compiled.items()
+        },
+    }
+
+
+def export_artifact(config_dir):
+    """將 config/quests.json 的索引寫到 config/quest_dispatch.json，回傳寫入路徑"""
+    from JsonWriter import write_json_if_changed
+
+    artifact = build_artifact(os.path.join(config_dir, "quests.json"))
+    out_path = os.path.join(config_dir, DISPATCH_FILE_NAME)
+    write_json_if_changed(out_path, artifact)
+    return out_path
+
+
+# ==================== 效能測試 ====================
+
+def generate_live_ops_quests(count=1000, seed=42):
+    """產生 daily / achievement 類型的任務（條件分布接近營運活動）"""
+    rng = random.Random(seed)
+    scenes = ["main_menu", "stage_select", "inventory", "team_list", "gacha", "shop", "training_select", "evolution"]
+    dialogs = [f"event_dialog_{i:03d}" for i in range(200)]
+    rooms = [f"TR_{i:03d}" for i in range(1, 7)]
+    cards = [f"{i:03d}" for i in range(1, 60)]
+
+    def leaf():
+        kind = rng.random()
+        if kind < 0.35:
+            return {"type": "dialog_completed", "dialog_id": rng.choice(dialogs)}
+        if kind < 0.6:
+            return {"type": "scene_entered", "scene_name": rng.choice(scenes)}
+        if kind < 0.75:
+            return {"type": "training_room_entered", "room_id": rng.choice(rooms)}
+        if kind < 0.85:
+            return {"type": "card_selected", "valid_cards": rng.sample(cards, 3)}
+        if kind < 0.93:
+            return {"type": "card_in_training"}
+        return {"type": "card_level_up", "card_type": "starter", "target_level": rng.randint(2, 5)}
+
+    quests = []
+    for i in range(count):
+        steps = []
+        for s in range(rng.randint(1, 5)):
+            roll = rng.random()
+            if roll < 0.15:
+                conditions = {"type": "or", "sub_conditions": [leaf() for _ in range(rng.randint(2, 3))]}
+            elif roll < 0.25:
+                conditions = {"type": "and", "sub_conditions": [leaf(), leaf()]}
+            else:
+                conditions = leaf()
+            steps.append({"step_id": f"step_{s + 1:03d}", "conditions": conditions})
+        quests.append({
+            "quest_id": f"live_{i:05d}",
+            "quest_type": "daily" if i % 2 == 0 else "achievement",
+            "steps": steps,
+        })
+    return {"quests": quests}, scenes, dialogs, rooms, cards
+
+
+def run_benchmark(active_count=1000, events=5000, seed=42):
+    quests_data, scenes, dialogs, rooms, cards = generate_live_ops_quests(active_count, seed)
+    rng = random.Random(seed + 1)
+    state = SimState()
+    state.starter = "001"
+
+    def random_event():
+        kind = rng.random()
+        if kind < 0.35:
+            return "dialog_completed", {"dialog_id": rng.choice(dialogs)}
+        if kind < 0.7:
+            return "scene_entered", {"scene_name": rng.choice(scenes)}
+        if kind < 0.8:
+            return "training_room_entered", {"room_id": rng.choice(rooms)}
+        if kind < 0.88:
+            return "card_selected", {"card_id": rng.choice(cards)}
+        if kind < 0.94:
+            return "training_started", {"room_id": rng.choice(rooms), "teams": [["001", "002"]]}
+        return "card_leveled_up", {"card_id": "001", "new_level": rng.randint(2, 6)}
+
+    stream = [random_event() for _ in range(events)]
+
+    quests = {q["quest_id"]: q for q in quests_data["quests"]}
+    index = DispatchIndex(quests_data)
+    for quest_id in quests:
+        index.set_step(quest_id, 0)
+    naive_active = dict(index.active)
+
+    def advance(active, quest_id, setter=None):
+        """條件成立後前進一步；完成的任務從頭重新開始，維持進行中任務數量"""
+        next_index = active[quest_id] + 1
+        if next_index >= len(quests[quest_id]["steps"]):
+            next_index = 0
+        if setter:
+            setter(quest_id, next_index)
+        else:
+            active[quest_id] = next_index
+
+    start = time.perf_counter()
+    naive_results = []
+    checks_naive = 0
+    for event_type, event_data in stream:
+        matched = naive_dispatch(quests, naive_active, event_type, event_data, state)
+        checks_naive += len(naive_active)
+        naive_results.append(matched)
+        for quest_id in matched:
+            advance(naive_active, quest_id)
+    naive_ms = (time.perf_counter() - start) * 1000.0
+
+    start = time.perf_counter()
+    indexed_results = []
+    checks_indexed = 0
+    for event_type, event_data in stream:
+        checks_indexed += len(index.candidates(event_type, event_data))
+        matched = index.dispatch(event_type, event_data, state)
+        indexed_results.append(matched)
+        for quest_id in matched:
+            advance(index.active, quest_id, index.set_step)
+    indexed_ms = (time.perf_counter() - start) * 1000.0
+
+    return {
+        "active_quests": active_count,
+        "events": events,
+        "naive_ms": naive_ms,
+        "indexed_ms": indexed_ms,
+        "naive_checks_per_event": checks_naive / events,
+        "indexed_checks_per_event": checks_indexed / events,
+        "identical": naive_results == indexed_results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="編譯任務事件分派索引 / 效能測試")
+    parser.add_argument("data_dir", nargs="?", help="data 資料夾路徑（匯出 config/quest_dispatch.json）")
+    parser.add_argument("--bench", action="store_true", help="比較逐一檢查與索引分派的效能")
+    parser.add_argument("--active", type=int, default=1000, help="效能測試的進行中任務數")
+    parser.add_argument("--events", type=int, default=5000, help="效能測試的事件數")
+    parser.add_argument("--seed", type=int, default=42, help="亂數種子")
+    args = parser.parse_args()
+
+    if args.bench:
+        result = run_benchmark(args.active, args.events, args.seed)
+        print(f"=== 任務事件分派：{result['active_quests']} 個進行中任務，{result['events']} 個事件 ===")
+        print(f"逐一檢查  {result['naive_ms']:9.1f} ms  每個事件檢查 {result['naive_checks_per_event']:.1f} 個任務")
+        print(f"索引分派  {result['indexed_ms']:9.1f} ms  每個事件檢查 {result['indexed_checks_per_event']:.1f} 個任務")
+        print(f"加速 {result['naive_ms'] / max(result['indexed_ms'], 1e-9):.1f}x，結果"
+              + ("✅ 完全相同" if result["identical"] else "❌ 不一致"))
+        return 0 if result["identical"] else 1
+
+    if not args.data_dir:
+        parser.error("請指定 data 資料夾，或使用 --bench")
+    out_path = export_artifact(os.path.join(args.data_dir, "config"))
+    print(f"✅ 已匯出 {out_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
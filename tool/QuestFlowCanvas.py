@@ -0,0 +1,412 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+任務流程圖 (Quest Flow Canvas)
+以圖形顯示任務、步驟、對話與 next_quest 連結，讓編輯者看得到長任務鏈的形狀。
+
+版面：
+- 每個任務一列：任務節點 -> 步驟 1 -> 步驟 2 ... -> next_quest 接口
+- 步驟下方是它顯示的對話
+- 任務依 next_quest 鏈排序（鏈的起點在前，後續任務緊接在下一列）
+
+效能：
+- 版面在背景執行緒計算；每個任務的區塊以內容為鍵快取，修改一個任務只重算該區塊
+- 節點與連線放進格狀空間索引，捲動時只繪製可見範圍，移出畫面的項目會被刪除
+
+用法：
+    view = QuestFlowView(parent, on_node_click)
+    view.show(build_snapshot(quest_records, dialog_graph))
+"""
+
+import queue
+import threading
+import time
+import tkinter as tk
+from tkinter import ttk
+
+
+QUEST_W = 190
+STEP_W = 160
+NODE_H = 42
+PORT_W = 120
+COL_GAP = 36
+DIALOG_DY = NODE_H + 22
+ROW_GAP = 26
+MARGIN = 20
+CELL = 512          # 空間索引的格子大小 (px)
+RENDER_PAD = 200    # 可見範圍外多畫一點，捲動時比較不會閃
+
+FILL = {
+    "quest": "#dde8ff",
+    "step": "#f4f4f4",
+    "dialog": "#fff6d8",
+    "next": "#e8f5e8",
+}
+MARKER_FILL = {"❌": "#ffd0d0", "⚠️": "#ffe8b0", "🔁": "#d8e8ff"}
+
+
+def _clip(text, width):
+    """依節點寬度截斷文字（約 7px 一個字元）"""
+    limit = max(4, width // 7)
+    return text if len(text) <= limit else text[:limit - 1] + "…"
+
+
+def build_snapshot(quest_records, dialog_graph):
+    """在主執行緒擷取版面需要的欄位（不可變 tuple，可安全交給背景執行緒）
+
+    每個任務：(quest_id, quest_name, next_quest, steps)
+    每個步驟：(step_id, 描述, dialog_id, 步驟標記, 對話標記, 對話是否存在)
+    """
+    dead = {node for node, _ in dialog_graph.dead_end_steps()}
+    reachable = dialog_graph.reachable
+    snapshot = []
+    seen = set()
+    for quest in quest_records:
+        quest_id = quest.get('quest_id', '')
+        if quest_id in seen:
+            continue  # 重複 ID 時遊戲只讀第一筆
+        seen.add(quest_id)
+        steps = []
+        for index, step in enumerate(quest.get('steps', [])):
+            node = ("step", quest_id, index)
+            step_marker = "❌" if node in dead else ("⚠️" if node not in reachable else "")
+            dialog_id = step.get('dialog_id', '')
+            exists = dialog_id in dialog_graph.dialogs
+            dialog_marker = (dialog_graph.dialog_marker(dialog_id) if exists else "❌") if dialog_id else ""
+            steps.append((step.get('step_id', ''), step.get('description', step.get('step_desc', '')),
+                          dialog_id, step_marker, dialog_marker, exists))
+        snapshot.append((quest_id, quest.get('quest_name', ''), quest.get('next_quest', '') or '', tuple(steps)))
+    return tuple(snapshot)
+
+
+def layout_block(quest):
+    """單一任務的相對版面：(節點列表, 連線列表, 高度, next 接口節點索引或 None)
+
+    節點：(key, kind, label, x, y, w, h, marker)
+    連線：(起點節點索引, 終點節點索引)
+    """
+    quest_id, quest_name, next_quest, steps = quest
+    nodes = [(("quest", quest_id), "quest", f"{_clip(quest_id, QUEST_W)}\n{_clip(quest_name, QUEST_W)}",
+              0, 0, QUEST_W, NODE_H, "")]
+    edges = []
+    previous = 0
+    has_dialog = False
+    x = QUEST_W + COL_GAP
+    for index, (step_id, description, dialog_id, step_marker, dialog_marker, exists) in enumerate(steps):
+        nodes.append((("step", quest_id, index), "step",
+                      f"{_clip(step_id, STEP_W)}\n{_clip(description, STEP_W)}", x, 0, STEP_W, NODE_H, step_marker))
+        step_index = len(nodes) - 1
+        edges.append((previous, step_index))
+        previous = step_index
+        if dialog_id:
+            has_dialog = True
+            label = dialog_id if exists else f"{dialog_id}\n(不存在)"
+            nodes.append((("dialog", quest_id, index, dialog_id), "dialog", _clip(label, STEP_W),
+                          x, DIALOG_DY, STEP_W, NODE_H, dialog_marker))
+            edges.append((step_index, len(nodes) - 1))
+        x += STEP_W + COL_GAP
+    port = None
+    if next_quest:
+        nodes.append((("next", quest_id, next_quest), "next", _clip(f"→ {next_quest}", PORT_W),
+                      x, 0, PORT_W, NODE_H, ""))
+        port = len(nodes) - 1
+        edges.append((previous, port))
+    height = (DIALOG_DY + NODE_H if has_dialog else NODE_H) + ROW_GAP
+    return nodes, edges, height, port
+
+
+def chain_order(snapshot):
+    """依 next_quest 鏈排序任務索引：鏈的起點在前，後續任務緊接其後；迴圈中的任務最後依檔案順序補上"""
+    position = {quest[0]: i for i, quest in enumerate(snapshot)}
+    referenced = {quest[2] for quest in snapshot if quest[2] in position and quest[2] != quest[0]}
+    order, placed = [], set()
+
+    def follow(index):
+        while index is not None and index not in placed:
+            placed.add(index)
+            order.append(index)
+            index = position.get(snapshot[index][2])
+
+    for index, quest in enumerate(snapshot):
+        if quest[0] not in referenced:
+            follow(index)
+    for index in range(len(snapshot)):
+        follow(index)
+    return order
+
+
+class FlowLayout:
+    """整張圖的絕對座標版面與空間索引（背景執行緒產生，主執行緒唯讀）"""
+
+    def __init__(self):
+        self.nodes = []       # (key, kind, label, x1, y1, x2, y2, marker)
+        self.edges = []       # (x1, y1, x2, y2, kind)
+        self.node_cells = {}  # (cx, cy) -> [node index]
+        self.edge_cells = {}  # (cx, cy) -> [edge index]
+        self.width = 0
+        self.height = 0
+        self.quest_count = 0
+        self.rebuilt_blocks = 0
+        self.elapsed_ms = 0.0
+
+    @staticmethod
+    def _cells(x1, y1, x2, y2):
+        for cx in range(int(min(x1, x2)) // CELL, int(max(x1, x2)) // CELL + 1):
+            for cy in range(int(min(y1, y2)) // CELL, int(max(y1, y2)) // CELL + 1):
+                yield cx, cy
+
+    def add_node(self, node):
+        index = len(self.nodes)
+        self.nodes.append(node)
+        for cell in self._cells(*node[3:7]):
+            self.node_cells.setdefault(cell, []).append(index)
+
+    def add_edge(self, edge):
+        index = len(self.edges)
+        self.edges.append(edge)
+        for cell in self._cells(*edge[:4]):
+            self.edge_cells.setdefault(cell, []).append(index)
+
+    def visible(self, x1, y1, x2, y2):
+        """範圍內的 (節點索引集合, 連線索引集合)"""
+        nodes, edges = set(), set()
+        for cell in self._cells(x1, y1, x2, y2):
+            nodes.update(self.node_cells.get(cell, ()))
+            edges.update(self.edge_cells.get(cell, ()))
+        return nodes, edges
+
+
+class FlowLayoutEngine:
+    """以任務內容為鍵快取區塊版面；只有背景執行緒會使用"""
+
+    def __init__(self):
+        self._blocks = {}  # quest tuple -> layout_block 結果
+
+    def compute(self, snapshot):
+        start = time.perf_counter()
+        blocks, rebuilt = {}, 0
+        for quest in snapshot:
+            block = self._blocks.get(quest)
+            if block is None:
+                block = layout_block(quest)
+                rebuilt += 1
+            blocks[quest] = block
+        self._blocks = blocks  # 刪除或修改後不再使用的區塊一併丟棄
+
+        layout = FlowLayout()
+        quest_nodes = {}  # quest_id -> 任務節點的絕對座標
+        ports = []        # (next 接口節點索引, next_quest)
+        y = MARGIN
+        for index in chain_order(snapshot):
+            quest = snapshot[index]
+            nodes, edges, height, port = blocks[quest]
+            base = len(layout.nodes)
+            for key, kind, label, x, dy, w, h, marker in nodes:
+                layout.add_node((key, kind, label, MARGIN + x, y + dy, MARGIN + x + w, y + dy + h, marker))
+                layout.width = max(layout.width, MARGIN + x + w)
+            for source, target in edges:
+                a, b = layout.nodes[base + source], layout.nodes[base + target]
+                if b[4] > a[4]:  # 步驟 -> 對話（往下）
+                    layout.add_edge(((a[3] + a[5]) / 2, a[6], (b[3] + b[5]) / 2, b[4], "dialog"))
+                else:
+                    layout.add_edge((a[5], (a[4] + a[6]) / 2, b[3], (b[4] + b[6]) / 2, "step"))
+            quest_nodes[quest[0]] = layout.nodes[base]
+            if port is not None:
+                ports.append((base + port, quest[2]))
+            y += height
+
+        # next_quest 連線：接口右側 -> 下一個任務節點左側；目標不存在時把接口標成紅色
+        for port_index, next_quest in ports:
+            target = quest_nodes.get(next_quest)
+            key, kind, label, x1, y1, x2, y2, marker = layout.nodes[port_index]
+            if target is None:
+                layout.nodes[port_index] = (key, kind, label, x1, y1, x2, y2, "❌")
+                continue
+            layout.add_edge((x2, (y1 + y2) / 2, target[3], (target[4] + target[6]) / 2, "next"))
+
+        layout.width += MARGIN
+        layout.height = y + MARGIN
+        layout.quest_count = len(snapshot)
+        layout.rebuilt_blocks = rebuilt
+        layout.elapsed_ms = (time.perf_counter() - start) * 1000.0
+        return layout
+
+
+class LayoutWorker(threading.Thread):
+    """背景版面計算：只處理最新送出的快照，結果放進 results 佇列"""
+
+    def __init__(self):
+        super().__init__(daemon=True)
+        self.engine = FlowLayoutEngine()
+        self.jobs = queue.Queue()
+        self.results = queue.Queue()
+        self.start()
+
+    def submit(self, generation, snapshot):
+        self.jobs.put((generation, snapshot))
+
+    def run(self):
+        while True:
+            job = self.jobs.get()
+            while True:  # 連續修改時略過過時的快照
+                try:
+                    job = self.jobs.get_nowait()
+                except queue.Empty:
+                    break
+            generation, snapshot = job
+            self.results.put((generation, self.engine.compute(snapshot)))
+
+
+class QuestFlowView(ttk.Frame):
+    """可捲動的任務流程圖；點擊節點時呼叫 on_node_click(key, event)"""
+
+    def __init__(self, parent, on_node_click):
+        super().__init__(parent)
+        self.on_node_click = on_node_click
+        self.layout = None
+        self.generation = 0
+        self.worker = LayoutWorker()
+        self._drawn_nodes = {}  # node index -> [canvas item]
+        self._drawn_edges = {}  # edge index -> canvas item
+        self._render_pending = False
+        self._polling = False
+
+        self.info_var = tk.StringVar(value="版面計算中...")
+        ttk.Label(self, textvariable=self.info_var, foreground="gray").pack(anchor='w', pady=(0, 5))
+
+        canvas_frame = ttk.Frame(self)
+        canvas_frame.pack(fill=tk.BOTH, expand=True)
+        self.canvas = tk.Canvas(canvas_frame, background="white", highlightthickness=0)
+        x_scroll = ttk.Scrollbar(canvas_frame, orient="horizontal", command=self._xview)
+        y_scroll = ttk.Scrollbar(canvas_frame, orient="vertical", command=self._yview)
+        self.canvas.configure(xscrollcommand=x_scroll.set, yscrollcommand=y_scroll.set)
+        y_scroll.pack(side=tk.RIGHT, fill=tk.Y)
+        x_scroll.pack(side=tk.BOTTOM, fill=tk.X)
+        self.canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+
+        self.canvas.bind("<Configure>", lambda e: self.schedule_render())
+        self.canvas.bind("<MouseWheel>", self._on_mousewheel)
+        self.canvas.bind("<Shift-MouseWheel>", self._on_shift_mousewheel)
+        self.canvas.bind("<Button-4>", lambda e: self._scroll_units("y", -1))
+        self.canvas.bind("<Button-5>", lambda e: self._scroll_units("y", 1))
+        self.canvas.bind("<ButtonPress-2>", lambda e: self.canvas.scan_mark(e.x, e.y))
+        self.canvas.bind("<B2-Motion>", self._on_drag)
+        self.canvas.tag_bind("node", "<Button-1>", self._on_click)
+
+    # --- 資料 ---
+    def show(self, snapshot):
+        """送出新的快照（版面在背景計算完成後才重畫）"""
+        self.generation += 1
+        self.worker.submit(self.generation, snapshot)
+        if not self._polling:
+            self._polling = True
+            self.after(20, self._poll)
+
+    def _poll(self):
+        latest = None
+        try:
+            while True:
+                latest = self.worker.results.get_nowait()
+        except queue.Empty:
+            pass
+        if latest is not None and latest[0] == self.generation:
+            self._polling = False
+            self._apply(latest[1])
+        else:
+            self.after(30, self._poll)
+
+    def _apply(self, layout):
+        self.layout = layout
+        self.canvas.delete("all")
+        self._drawn_nodes.clear()
+        self._drawn_edges.clear()
+        self.canvas.configure(scrollregion=(0, 0, layout.width, layout.height))
+        self.info_var.set(
+            f"{layout.quest_count} 個任務｜{len(layout.nodes)} 個節點｜"
+            f"版面 {layout.elapsed_ms:.0f} ms（重算 {layout.rebuilt_blocks} 個任務）｜"
+            "點擊節點編輯，中鍵拖曳移動"
+        )
+        self.render()
+
+    # --- 捲動 ---
+    def _xview(self, *args):
+        self.canvas.xview(*args)
+        self.schedule_render()
+
+    def _yview(self, *args):
+        self.canvas.yview(*args)
+        self.schedule_render()
+
+    def _scroll_units(self, axis, amount):
+        (self.canvas.xview_scroll if axis == "x" else self.canvas.yview_scroll)(amount, "units")
+        self.schedule_render()
+        return "break"
+
+    def _on_mousewheel(self, event):
+        return self._scroll_units("y", int(-1 * (event.delta / 120)) or (-1 if event.delta > 0 else 1))
+
+    def _on_shift_mousewheel(self, event):
+        return self._scroll_units("x", int(-1 * (event.delta / 120)) or (-1 if event.delta > 0 else 1))
+
+    def _on_drag(self, event):
+        self.canvas.scan_dragto(event.x, event.y, gain=1)
+        self.schedule_render()
+
+    # --- 繪製 ---
+    def schedule_render(self):
+        if not self._render_pending:
+            self._render_pending = True
+            self.after_idle(self.render)
+
+    def render(self):
+        """只繪製可見範圍（加上 RENDER_PAD）內的節點與連線，刪除已移出範圍的項目"""
+        self._render_pending = False
+        layout = self.layout
+        if layout is None:
+            return
+        x1 = self.canvas.canvasx(0) - RENDER_PAD
+        y1 = self.canvas.canvasy(0) - RENDER_PAD
+        x2 = self.canvas.canvasx(self.canvas.winfo_width()) + RENDER_PAD
+        y2 = self.canvas.canvasy(self.canvas.winfo_height()) + RENDER_PAD
+        nodes, edges = layout.visible(max(0, x1), max(0, y1), max(0, x2), max(0, y2))
+
+        for index in [i for i in self._drawn_edges if i not in edges]:
+            self.canvas.delete(self._drawn_edges.pop(index))
+        for index in [i for i in self._drawn_nodes if i not in nodes]:
+            self.canvas.delete(*self._drawn_nodes.pop(index))
+
+        for index in edges:
+            if index not in self._drawn_edges:
+                ex1, ey1, ex2, ey2, kind = layout.edges[index]
+                if kind == "next":
+                    item = self.canvas.create_line(ex1, ey1, ex1 + COL_GAP / 2, ey1, ex1 + COL_GAP / 2, ey2 - NODE_H,
+                                                   ex2 - COL_GAP / 2, ey2 - NODE_H, ex2 - COL_GAP / 2, ey2, ex2, ey2,
+                                                   arrow=tk.LAST, fill="#2a7a2a", width=2, smooth=True)
+                else:
+                    item = self.canvas.create_line(ex1, ey1, ex2, ey2, arrow=tk.LAST,
+                                                   fill="#999999" if kind == "dialog" else "#555555")
+                self.canvas.tag_lower(item)
+                self._drawn_edges[index] = item
+        for index in nodes:
+            if index not in self._drawn_nodes:
+                self._drawn_nodes[index] = self._draw_node(index, layout.nodes[index])
+
+    def _draw_node(self, index, node):
+        key, kind, label, x1, y1, x2, y2, marker = node
+        fill = MARKER_FILL.get(marker, FILL[kind])
+        tags = ("node", f"n{index}")
+        rect = self.canvas.create_rectangle(x1, y1, x2, y2, fill=fill,
+                                            outline="#b00000" if marker == "❌" else "#777777",
+                                            width=2 if kind == "quest" else 1, tags=tags)
+        text = self.canvas.create_text((x1 + x2) / 2, (y1 + y2) / 2, text=f"{marker} {label}" if marker else label,
+                                       font=("Arial", 9, "bold" if kind == "quest" else "normal"),
+                                       justify=tk.CENTER, tags=tags)
+        return [rect, text]
+
+    def _on_click(self, event):
+        if self.layout is None:
+            return
+        for tag in self.canvas.gettags("current"):
+            if tag.startswith("n") and tag[1:].isdigit():
+                self.on_node_click(self.layout.nodes[int(tag[1:])][0], event)
+                return
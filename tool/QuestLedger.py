@@ -0,0 +1,378 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+任務獎勵帳本 (Quest Reward Ledger)
+統計 quests.json 的獎勵（金幣、鑽石、卡片）在整個任務鏈上的累計，供經濟平衡與編輯時參考。
+
+依賴關係：next_quest（A 完成後開始 B）與 unlock_conditions.required_quests（B 需要先完成 A）
+- 依拓撲順序計算每個任務的「累計獎勵」= 自身 + 所有前置任務（完成此任務時玩家已拿到的總額）
+- next_quest 鏈：從沒有被其他任務指向的任務開始，計算鏈上的累計與總額
+- 依任務類型（tutorial / main / side / daily / achievement）加總
+- 檢查獎勵卡片與 card_selected.valid_cards 是否存在於 cards.json
+- 每日獎勵預算：daily 任務每天可完成一次，其他任務依拓撲順序每天完成 pace 個
+
+增量更新：只修改獎勵時，差額直接加到後續任務、所屬鏈與類型總計；依賴關係改變時才重算。
+
+用法：
+    python tool/QuestLedger.py data
+    python tool/QuestLedger.py data --budget budget.csv --days 30 --pace 3
+"""
+
+import argparse
+import csv
+import heapq
+import json
+import os
+import sys
+
+
+QUEST_TYPES = ["tutorial", "main", "side", "daily", "achievement"]
+REPEATABLE_TYPES = {"daily"}
+
+
+def quest_rewards(quest):
+    """(gold, diamond, cards tuple)"""
+    rewards = quest.get("rewards") or {}
+    cards = rewards.get("cards") or []
+    return (int(rewards.get("gold", 0) or 0), int(rewards.get("diamond", 0) or 0),
+            tuple(card for card in cards if isinstance(card, str)))
+
+
+def quest_parents(quest_id, quest, next_from):
+    """前置任務：unlock_conditions.required_quests 與指向此任務的 next_quest"""
+    parents = set(next_from.get(quest_id, ()))
+    unlock = quest.get("unlock_conditions") or {}
+    if unlock.get("type") == "quest_completed":
+        parents.update(unlock.get("required_quests") or [])
+    parents.discard(quest_id)
+    return parents
+
+
+def condition_cards(condition):
+    """條件樹中 card_selected 的 valid_cards"""
+    if not isinstance(condition, dict):
+        return []
+    if condition.get("type") in ("and", "or"):
+        return [card for sub in condition.get("sub_conditions", []) for card in condition_cards(sub)]
+    if condition.get("type") == "card_selected":
+        return list(condition.get("valid_cards") or [])
+    return []
+
+
+def _structure(quest):
+    """影響依賴關係的欄位（改變時需要重算）"""
+    unlock = quest.get("unlock_conditions") or {}
+    return (quest.get("quest_type", ""), quest.get("next_quest", "") or "",
+            unlock.get("type", ""), tuple(unlock.get("required_quests") or ()))
+
+
+def _amounts(reward):
+    """(gold, diamond, 卡片張數)，累計只需要數量"""
+    return reward[0], reward[1], len(reward[2])
+
+
+def _add(total, amounts):
+    return total[0] + amounts[0], total[1] + amounts[1], total[2] + amounts[2]
+
+
+class QuestLedger:
+    """任務獎勵的累計帳本"""
+
+    def __init__(self, quests_data, card_ids=None):
+        self.card_ids = set(card_ids) if card_ids is not None else None
+        self.rebuild(quests_data)
+
+    # --- 建立 ---
+    def rebuild(self, quests_data):
+        """重新建立（記錄 snapshot，編輯器就地修改記錄後以 update_quest 通知）"""
+        self.quests = {}
+        for quest in (quests_data or {}).get("quests", []):
+            self.quests.setdefault(quest.get("quest_id", ""), quest)
+        self.order_index = {quest_id: i for i, quest_id in enumerate(self.quests)}
+        self.reward_cards = {}
+        self.own = {}
+        for quest_id, quest in self.quests.items():
+            reward = quest_rewards(quest)
+            self.reward_cards[quest_id] = reward[2]
+            self.own[quest_id] = _amounts(reward)
+        self.structure = {quest_id: _structure(quest) for quest_id, quest in self.quests.items()}
+        self.types = {quest_id: quest.get("quest_type", "") for quest_id, quest in self.quests.items()}
+
+        next_from = {}
+        for quest_id, quest in self.quests.items():
+            target = quest.get("next_quest", "") or ""
+            if target and target != quest_id:
+                next_from.setdefault(target, []).append(quest_id)
+        self.parents = {quest_id: quest_parents(quest_id, quest, next_from) for quest_id, quest in self.quests.items()}
+        self.missing_parents = {
+            quest_id: sorted(parent for parent in parents if parent not in self.quests)
+            for quest_id, parents in self.parents.items()
+            if any(parent not in self.quests for parent in parents)
+        }
+        self.children = {quest_id: [] for quest_id in self.quests}
+        for quest_id, parents in self.parents.items():
+            for parent in parents:
+                if parent in self.children:
+                    self.children[parent].append(quest_id)
+
+        self._topological_sort()
+        self._accumulate()
+        self._build_chains(next_from)
+        self._type_totals()
+        self.card_issues = {}
+        for quest_id in self.quests:
+            self._check_cards(quest_id)
+
+    def _topological_sort(self):
+        """Kahn 演算法（同時可處理時依檔案順序）；迴圈中的任務不會出現在 order"""
+        indegree = {quest_id: sum(1 for p in parents if p in self.quests) for quest_id, parents in self.parents.items()}
+        ready = [(self.order_index[q], q) for q, degree in indegree.items() if degree == 0]
+        heapq.heapify(ready)
+        self.order = []
+        while ready:
+            _, quest_id = heapq.heappop(ready)
+            self.order.append(quest_id)
+            for child in self.children[quest_id]:
+                indegree[child] -= 1
+                if indegree[child] == 0:
+                    heapq.heappush(ready, (self.order_index[child], child))
+        placed = set(self.order)
+        self.cyclic = [quest_id for quest_id in self.quests if quest_id not in placed]
+
+    def _accumulate(self):
+        """累計獎勵：單一前置時 = 前置累計 + 自身；多個前置時展開前置集合避免重複計算"""
+        self.cumulative = {}
+        for quest_id in self.order:
+            parents = [p for p in self.parents[quest_id] if p in self.quests]
+            if not parents:
+                total = (0, 0, 0)
+            elif len(parents) == 1:
+                total = self.cumulative[parents[0]]
+            else:
+                total = (0, 0, 0)
+                for ancestor in self.ancestors(quest_id):
+                    total = _add(total, self.own[ancestor])
+            self.cumulative[quest_id] = _add(total, self.own[quest_id])
+
+    def ancestors(self, quest_id):
+        seen, stack = set(), [p for p in self.parents.get(quest_id, ()) if p in self.quests]
+        while stack:
+            node = stack.pop()
+            if node in seen:
+                continue
+            seen.add(node)
+            stack.extend(p for p in self.parents[node] if p in self.quests and p not in seen)
+        return seen
+
+    def descendants(self, quest_id):
+        seen, stack = set(), list(self.children.get(quest_id, ()))
+        while stack:
+            node = stack.pop()
+            if node in seen:
+                continue
+            seen.add(node)
+            stack.extend(c for c in self.children[node] if c not in seen)
+        return seen
+
+    def _build_chains(self, next_from):
+        """next_quest 鏈：鏈頭為沒有被其他任務的 next_quest 指向的任務（合流時歸入先到的鏈）"""
+        self.chain_of = {}
+        self.chains = {}      # 鏈頭 -> [quest_id]
+        self.chain_prefix = {}
+        starts = [q for q in self.quests if q not in next_from] + list(self.quests)
+        for head in starts:
+            if head in self.chain_of:
+                continue
+            members, quest_id, total = [], head, (0, 0, 0)
+            while quest_id in self.quests and quest_id not in self.chain_of:
+                self.chain_of[quest_id] = head
+                members.append(quest_id)
+                total = _add(total, self.own[quest_id])
+                self.chain_prefix[quest_id] = total
+                quest_id = self.quests[quest_id].get("next_quest", "") or ""
+            self.chains[head] = members
+
+    def chain_total(self, head):
+        members = self.chains.get(head) or [head]
+        return self.chain_prefix.get(members[-1], (0, 0, 0))
+
+    def _type_totals(self):
+        self.type_totals = {}
+        for quest_id, reward in self.own.items():
+            self.type_totals[self.types[quest_id]] = _add(self.type_totals.get(self.types[quest_id], (0, 0, 0)), reward)
+
+    def _check_cards(self, quest_id):
+        self.card_issues.pop(quest_id, None)
+        if self.card_ids is None:
+            return
+        quest = self.quests[quest_id]
+        issues = [f"獎勵卡片 {card} 不存在" for card in self.reward_cards[quest_id] if card not in self.card_ids]
+        for index, step in enumerate(quest.get("steps", [])):
+            for card in condition_cards(step.get("conditions", {})):
+                if card not in self.card_ids:
+                    issues.append(f"{step.get('step_id', index)} 可選卡片 {card} 不存在")
+        if issues:
+            self.card_issues[quest_id] = issues
+
+    # --- 增量更新 ---
+    def update_quest(self, old_id, quest):
+        """任務新增或修改後呼叫；只改獎勵時以差額更新，依賴關係改變時重算"""
+        quest_id = quest.get("quest_id", "")
+        if old_id != quest_id or quest_id not in self.quests or _structure(quest) != self.structure[quest_id]:
+            self._rebuild_with(old_id, quest)
+            return
+        reward = quest_rewards(quest)
+        new_amounts, old_amounts = _amounts(reward), self.own[quest_id]
+        self.quests[quest_id] = quest
+        self.reward_cards[quest_id] = reward[2]
+        self._check_cards(quest_id)
+        if new_amounts == old_amounts:
+            return
+        delta = tuple(new - old for new, old in zip(new_amounts, old_amounts))
+        self.own[quest_id] = new_amounts
+
+        def shift(total):
+            return _add(total, delta)
+
+        if quest_id in self.cumulative:
+            for node in [quest_id] + list(self.descendants(quest_id)):
+                if node in self.cumulative:
+                    self.cumulative[node] = shift(self.cumulative[node])
+        members = self.chains[self.chain_of[quest_id]]
+        for node in members[members.index(quest_id):]:
+            self.chain_prefix[node] = shift(self.chain_prefix[node])
+        self.type_totals[self.types[quest_id]] = shift(self.type_totals[self.types[quest_id]])
+
+    def remove_quest(self, quest_id):
+        self._rebuild_with(quest_id, None)
+
+    def _rebuild_with(self, old_id, quest):
+        """以目前的記錄重建，old_id 的記錄換成 quest（quest 為 None 表示刪除），保持原本順序"""
+        records = []
+        replaced = False
+        for current_id, current in self.quests.items():
+            if current_id == old_id:
+                if quest is not None:
+                    records.append(quest)
+                replaced = True
+            else:
+                records.append(current)
+        if quest is not None and not replaced:
+            records.append(quest)
+        self.rebuild({"quests": records})
+
+    # --- 查詢 ---
+    def preview(self, quest_id, gold, diamond):
+        """編輯中的獎勵改成 gold / diamond 時，此任務的累計（尚未儲存）"""
+        if quest_id not in self.cumulative:
+            return None
+        total, own = self.cumulative[quest_id], self.own[quest_id]
+        return (total[0] - own[0] + gold, total[1] - own[1] + diamond, total[2])
+
+    def describe(self, quest_id, gold=None, diamond=None):
+        """編輯器顯示用的累計說明；傳入 gold / diamond 時以編輯中的獎勵預覽累計"""
+        lines = []
+        if quest_id in self.cumulative:
+            editing = gold is not None and diamond is not None and (gold, diamond) != self.own[quest_id][:2]
+            total_gold, total_diamond, cards = self.preview(quest_id, gold, diamond) if editing else self.cumulative[quest_id]
+            lines.append(f"完成時累計{'（編輯中）' if editing else ''}：💰 {total_gold:,}  💎 {total_diamond:,}  🎴 {cards}"
+                         f"（含 {len(self.ancestors(quest_id))} 個前置任務）")
+        elif quest_id in self.quests:
+            lines.append("❌ 任務在依賴迴圈中，無法計算累計")
+        head = self.chain_of.get(quest_id)
+        if head is not None and len(self.chains[head]) > 1:
+            members = self.chains[head]
+            gold, diamond, cards = self.chain_total(head)
+            lines.append(f"任務鏈 {head}（第 {members.index(quest_id) + 1}/{len(members)} 個）總計：💰 {gold:,}  💎 {diamond:,}  🎴 {cards}")
+        quest_type = self.types.get(quest_id)
+        if quest_type in self.type_totals:
+            gold, diamond, cards = self.type_totals[quest_type]
+            lines.append(f"{quest_type} 類型總計：💰 {gold:,}  💎 {diamond:,}  🎴 {cards}")
+        for parent in self.missing_parents.get(quest_id, []):
+            lines.append(f"⚠️ 前置任務 {parent} 不存在")
+        lines.extend(f"❌ {issue}" for issue in self.card_issues.get(quest_id, []))
+        return lines
+
+    def daily_budget(self, days=30, pace=3):
+        """每日獎勵預算：[{day, daily_*, one_time_*, total_*}]
+
+        daily 任務每天各完成一次；其他任務依拓撲順序每天完成 pace 個（迴圈中的任務不計）。
+        """
+        daily = (0, 0, 0)
+        for quest_id in self.quests:
+            if self.types[quest_id] in REPEATABLE_TYPES:
+                daily = _add(daily, self.own[quest_id])
+        one_time = [q for q in self.order if self.types[q] not in REPEATABLE_TYPES]
+        rows, total = [], (0, 0, 0)
+        for day in range(1, days + 1):
+            today = (0, 0, 0)
+            for quest_id in one_time[(day - 1) * pace:day * pace]:
+                today = _add(today, self.own[quest_id])
+            total = _add(_add(total, daily), today)
+            rows.append({
+                "day": day,
+                "daily_gold": daily[0], "daily_diamond": daily[1], "daily_cards": daily[2],
+                "one_time_gold": today[0], "one_time_diamond": today[1], "one_time_cards": today[2],
+                "total_gold": total[0], "total_diamond": total[1], "total_cards": total[2],
+            })
+        return rows
+
+    def report_lines(self):
+        lines = [f"=== 任務獎勵帳本：{len(self.quests)} 個任務，{sum(1 for m in self.chains.values() if len(m) > 1)} 條任務鏈 ==="]
+        for quest_type in QUEST_TYPES + sorted(set(self.type_totals) - set(QUEST_TYPES)):
+            if quest_type in self.type_totals:
+                gold, diamond, cards = self.type_totals[quest_type]
+                count = sum(1 for t in self.types.values() if t == quest_type)
+                lines.append(f"{quest_type or '(未設定)':12s} {count:5d} 個  💰 {gold:>10,}  💎 {diamond:>8,}  🎴 {cards}")
+        longest = sorted(self.chains.items(), key=lambda item: -len(item[1]))[:5]
+        for head, members in longest:
+            if len(members) > 1:
+                gold, diamond, cards = self.chain_total(head)
+                lines.append(f"任務鏈 {head}: {len(members)} 個任務  💰 {gold:,}  💎 {diamond:,}  🎴 {cards}")
+        if self.cyclic:
+            lines.append(f"❌ 依賴迴圈：{', '.join(self.cyclic[:10])}{' ...' if len(self.cyclic) > 10 else ''}")
+        for quest_id, parents in self.missing_parents.items():
+            lines.append(f"⚠️ {quest_id}: 前置任務 {', '.join(parents)} 不存在")
+        for quest_id, issues in self.card_issues.items():
+            for issue in issues:
+                lines.append(f"❌ {quest_id}: {issue}")
+        return lines
+
+
+def load_card_ids(data_dir):
+    """cards.json 的卡片 ID（檔案不存在時回傳 None，略過卡片檢查）"""
+    path = os.path.join(data_dir, "cards.json")
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return {card.get("card_id") for card in json.load(f).get("cards", [])}
+
+
+def write_budget_csv(path, rows):
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()) if rows else ["day"])
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="任務獎勵帳本：任務鏈累計、類型總計、卡片檢查、每日預算")
+    parser.add_argument("data_dir", help="data 資料夾路徑")
+    parser.add_argument("--budget", help="輸出每日獎勵預算 CSV")
+    parser.add_argument("--days", type=int, default=30, help="預算天數")
+    parser.add_argument("--pace", type=int, default=3, help="每天完成的一次性任務數")
+    args = parser.parse_args()
+
+    with open(os.path.join(args.data_dir, "config", "quests.json"), 'r', encoding='utf-8') as f:
+        quests_data = json.load(f)
+    ledger = QuestLedger(quests_data, load_card_ids(args.data_dir))
+    print("\n".join(ledger.report_lines()))
+
+    if args.budget:
+        write_budget_csv(args.budget, ledger.daily_budget(args.days, args.pace))
+        print(f"✅ 已輸出每日預算：{args.budget}")
+    return 1 if ledger.card_issues or ledger.cyclic else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,751 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+任務流程模擬器 (Quest Flow Simulator)
+在不開 Godot 的情況下，以 quests.json / dialogs.json 模擬 TaskManager.gd 的任務流程，
+確認每個強制任務在出貨前都能完成。
+
+與 TaskManager.gd 對應的行為：
+1. evaluate_condition：dialog_completed / card_selected / scene_entered / training_room_entered /
+   card_in_training / card_level_up / and / or（其他類型一律不成立）
+2. check_quest_unlock_conditions：quest_completed / player_level / card_count（其他類型一律通過）
+3. 步驟條件讀取 step["conditions"]（注意：不是 "condition"）
+4. notify_event 對「事件發生當下」的進行中任務各檢查一次，每個事件每個任務最多前進一步
+5. 任務完成後啟動 next_quest；auto_start 任務只在遊戲啟動時檢查
+6. is_action_allowed：強制任務進行中時，依步驟的 allowed_actions 限制玩家操作
+7. 對話選項：next / close 觸發目前對話的 dialog_completed；
+   highlight_training_area、claim_reward 固定觸發 training_guide_001 / training_complete；
+   show_card_selection 開啟起始卡片選擇 (001~005)；go_to_scene 在遊戲中沒有任何處理
+
+玩家操作的簡化假設：
+- 對話框與選卡界面是強制回應的（開啟時只能選擇選項 / 卡片）
+- 從任何場景都能回到主選單再前往其他場景
+- 每次領取訓練獎勵，訓練中的起始卡片升一級
+- 「提升玩家等級」、「獲得卡片」代表戰鬥、抽卡等不影響任務條件的遊戲過程
+
+用法：
+    python tool/QuestSimulator.py data --traces 2000 --seed 1
+    python tool/QuestSimulator.py data --script tutorial_events.json
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+from collections import Counter
+
+
+# TaskManager.show_card_selection_for_tutorial 固定的起始卡片
+STARTER_CARDS = ["001", "002", "003", "004", "005"]
+
+# 對話選項 action -> 固定觸發的 dialog_completed（TaskManager._on_dialog_choice_selected）
+FIXED_DIALOG_EVENTS = {
+    "highlight_training_area": "training_guide_001",
+    "claim_reward": "training_complete",
+}
+# 選擇後對話框會關閉的 action
+CLOSING_ACTIONS = {"next", "close", "highlight_training_area", "claim_reward"}
+
+# GameManager.SCENES 的場景 key
+SCENES = [
+    "main_menu", "chapter_select", "stage_select", "inventory", "team_list", "battle", "reward",
+    "gacha", "shop", "training_select", "training", "evolution", "quest",
+]
+
+# 主選單可前往的場景 -> (is_action_allowed 的 action_type, action_data)；None 表示不受限制
+NAVIGATION = {
+    "main_menu": None,
+    "quest": None,
+    "training_select": ("navigate_ui", {"target": "training_area"}),
+    "evolution": ("navigate_ui", {"target": "evolution_area"}),
+    "inventory": ("navigate_ui", {"target": "inventory"}),
+    "team_list": ("navigate_ui", {"target": "team"}),
+    "shop": ("navigate_ui", {"target": "shop"}),
+    "chapter_select": ("navigate_region", {"target": "region1"}),
+}
+
+# 引導式隨機：需要某事件時，哪些操作能往那個方向前進
+PATH_TO_EVENT = {
+    "scene_entered": {"navigate"},
+    "training_room_entered": {"navigate:training_select"},
+    "training_started": {"navigate:training_select", "enter_room"},
+    "card_leveled_up": {"navigate:training_select", "enter_room", "start_training"},
+}
+
+
+# ==================== 條件（與 TaskManager.gd 相同語意） ====================
+
+def evaluate_condition(condition, event_type, event_data, state):
+    """對應 TaskManager.evaluate_condition"""
+    condition_type = condition.get("type", "")
+
+    if condition_type == "dialog_completed":
+        return event_type == "dialog_completed" and event_data.get("dialog_id", "") == condition.get("dialog_id", "")
+    if condition_type == "card_selected":
+        if event_type != "card_selected":
+            return False
+        return event_data.get("card_id", "") in condition.get("valid_cards", [])
+    if condition_type == "scene_entered":
+        return event_type == "scene_entered" and event_data.get("scene_name", "") == condition.get("scene_name", "")
+    if condition_type == "training_room_entered":
+        return event_type == "training_room_entered" and event_data.get("room_id", "") == condition.get("room_id", "")
+    if condition_type == "card_in_training":
+        if event_type != "training_started" or not state.starter:
+            return False
+        return any(card_id == state.starter for team in event_data.get("teams", []) for card_id in team)
+    if condition_type == "card_level_up":
+        if event_type != "card_leveled_up" or condition.get("card_type", "") != "starter":
+            return False
+        return (event_data.get("card_id", "") == state.starter
+                and event_data.get("new_level", 1) >= condition.get("target_level", 2))
+    if condition_type == "and":
+        return all(evaluate_condition(sub, event_type, event_data, state) for sub in condition.get("sub_conditions", []))
+    if condition_type == "or":
+        return any(evaluate_condition(sub, event_type, event_data, state) for sub in condition.get("sub_conditions", []))
+    return False
+
+
+def check_quest_unlock_conditions(quest, state):
+    """對應 TaskManager.check_quest_unlock_conditions"""
+    unlock = quest.get("unlock_conditions", {})
+    if not unlock:
+        return True
+    unlock_type = unlock.get("type", "")
+    if unlock_type == "quest_completed":
+        return all(quest_id in state.completed for quest_id in unlock.get("required_quests", []))
+    if unlock_type == "player_level":
+        return state.player_level >= unlock.get("required_level", 1)
+    if unlock_type == "card_count":
+        return state.card_count >= unlock.get("required_count", 1)
+    return True
+
+
+def is_action_allowed(step, action_type, action_data=None):
+    """對應 TaskManager.is_action_allowed（step 為目前強制任務的步驟，None 表示沒有強制任務）"""
+    if step is None:
+        return True
+    allowed = step.get("allowed_actions", {})
+    allowed_type = allowed.get("type", "all")
+    if allowed_type == "all":
+        return True
+    if allowed_type == "dialog_only":
+        return action_type in ("dialog", "dialog_choice")
+    if allowed_type == "specific_ui":
+        if action_type == "navigate_ui":
+            return (action_data or {}).get("target", "") in allowed.get("allowed_targets", [])
+        return False
+    if allowed_type == "training_only":
+        return action_type in ("training_start", "training_card_select", "training_claim", "navigate_ui")
+    return False
+
+
+def missing_conditions(step):
+    """步驟沒有 conditions 欄位時回傳問題說明（TaskManager 只讀取 conditions，步驟永遠無法完成），否則回傳空字串"""
+    if "conditions" in step:
+        return ""
+    hint = "（有 condition 欄位，TaskManager 讀取的是 conditions）" if "condition" in step else ""
+    return f"缺少 conditions，步驟永遠無法完成{hint}"
+
+
+def _condition_event_types(condition):
+    """條件可能被哪些事件類型滿足"""
+    condition_type = condition.get("type", "")
+    if condition_type in ("and", "or"):
+        types = set()
+        for sub in condition.get("sub_conditions", []):
+            types |= _condition_event_types(sub)
+        return types
+    return {
+        "dialog_completed": {"dialog_completed"},
+        "card_selected": {"card_selected"},
+        "scene_entered": {"scene_entered"},
+        "training_room_entered": {"training_room_entered"},
+        "card_in_training": {"training_started"},
+        "card_level_up": {"card_leveled_up"},
+    }.get(condition_type, set())
+
+
+# ==================== 模擬狀態 ====================
+
+class SimState:
+    """玩家與 TaskManager 的執行期狀態"""
+
+    def __init__(self, player_level=1, card_count=0):
+        self.active = {}          # quest_id -> current_step_index（保持插入順序，與 GDScript Dictionary 相同）
+        self.completed = []
+        self.starter = ""         # selected_starter_card
+        self.starter_level = 1
+        self.player_level = player_level
+        self.card_count = card_count
+        self.scene = "main_menu"
+        self.open_dialog = None
+        self.selector_cards = None
+        self.training_room = None
+        self.training_with_starter = None  # None 表示沒有進行中的訓練
+
+
+class QuestSimulator:
+    """以 TaskManager.gd 的規則執行任務流程"""
+
+    def __init__(self, quests_data, dialogs_data, rooms=None, player_level=1, card_count=0):
+        self.quests = [q for q in (quests_data or {}).get("quests", []) if isinstance(q, dict)]
+        self.quest_index = {}
+        for quest in self.quests:
+            self.quest_index.setdefault(quest.get("quest_id", ""), quest)  # get_quest_config 取第一筆
+        self.dialogs = {d.get("dialog_id", ""): d for d in (dialogs_data or {}).get("dialogs", []) if isinstance(d, dict)}
+        self.rooms = list(rooms) if rooms else self._rooms_from_conditions()
+        self.initial_player_level = player_level
+        self.initial_card_count = card_count
+        self._event_types_cache = {}
+        self.reset()
+
+    def _rooms_from_conditions(self):
+        rooms = set()
+
+        def collect(condition):
+            if condition.get("type") == "training_room_entered" and condition.get("room_id"):
+                rooms.add(condition["room_id"])
+            for sub in condition.get("sub_conditions", []):
+                collect(sub)
+        for quest in self.quests:
+            for step in quest.get("steps", []):
+                collect(step.get("conditions", {}))
+        return sorted(rooms) or ["TR_001"]
+
+    def reset(self):
+        self.state = SimState(self.initial_player_level, self.initial_card_count)
+        self.log = []
+        self._deferred = []  # complete_quest_step / complete_quest 中 await 之後才執行的動作
+        self._listeners = {}  # event_type -> {quest_id: True}：目前步驟可能被該事件完成的任務（保持開始順序）
+
+    def _step_event_types(self, quest_id, index):
+        key = (quest_id, index)
+        if key not in self._event_types_cache:
+            steps = self.quest_index[quest_id].get("steps", [])
+            conditions = steps[index].get("conditions", {}) if index < len(steps) else {}
+            self._event_types_cache[key] = _condition_event_types(conditions)
+        return self._event_types_cache[key]
+
+    def _set_step(self, quest_id, index):
+        """更新任務的目前步驟（None 表示移除），並維護事件 -> 任務的對照"""
+        old_index = self.state.active.get(quest_id)
+        if old_index is not None:
+            for event_type in self._step_event_types(quest_id, old_index):
+                self._listeners[event_type].pop(quest_id, None)
+        if index is None:
+            self.state.active.pop(quest_id, None)
+            return
+        self.state.active[quest_id] = index
+        for event_type in self._step_event_types(quest_id, index):
+            self._listeners.setdefault(event_type, {})[quest_id] = True
+
+    # --- TaskManager 任務控制 ---
+    def startup(self):
+        """遊戲啟動：check_auto_start_quests"""
+        for quest in self.quests:
+            quest_id = quest.get("quest_id", "")
+            if quest.get("auto_start", False) and quest_id and quest_id not in self.state.active \
+                    and quest_id not in self.state.completed:
+                self.start_quest(quest_id)
+        self._run_deferred()
+
+    def start_quest(self, quest_id):
+        quest = self.quest_index.get(quest_id)
+        if quest is None:
+            self.log.append(("error", f"找不到任務 {quest_id}"))
+            return False
+        if quest_id in self.state.active or quest_id in self.state.completed:
+            return False
+        if not check_quest_unlock_conditions(quest, self.state):
+            self.log.append(("locked", quest_id))
+            return False
+        self._set_step(quest_id, 0)
+        self.log.append(("quest_started", quest_id))
+        self._process_current_step(quest_id)
+        return True
+
+    def _process_current_step(self, quest_id):
+        if quest_id not in self.state.active:
+            return
+        steps = self.quest_index[quest_id].get("steps", [])
+        index = self.state.active[quest_id]
+        if index >= len(steps):
+            self._complete_quest(quest_id)
+            return
+        step = steps[index]
+        for action in step.get("actions", []):
+            if action.get("type") == "show_card_selection":
+                self.state.selector_cards = list(action.get("cards", []))
+        dialog_id = step.get("dialog_id", "")
+        if dialog_id:
+            if dialog_id in self.dialogs:
+                self.state.open_dialog = dialog_id
+            else:
+                self.log.append(("error", f"{quest_id}/{step.get('step_id', index)} 找不到對話 {dialog_id}"))
+
+    def _complete_quest_step(self, quest_id):
+        steps = self.quest_index[quest_id].get("steps", [])
+        index = self.state.active[quest_id]
+        if index >= len(steps):
+            return
+        self.log.append(("step_completed", quest_id, steps[index].get("step_id", str(index))))
+        self._set_step(quest_id, index + 1)
+        self._deferred.append(lambda: self._process_current_step(quest_id))
+
+    def _complete_quest(self, quest_id):
+        quest = self.quest_index[quest_id]
+        self.state.card_count += len(quest.get("rewards", {}).get("cards", []))
+        self._set_step(quest_id, None)
+        self.state.completed.append(quest_id)
+        self.log.append(("quest_completed", quest_id))
+        next_quest = quest.get("next_quest", "")
+        if next_quest:
+            self._deferred.append(lambda: self.start_quest(next_quest))
+
+    def _run_deferred(self):
+        while self._deferred:
+            pending, self._deferred = self._deferred, []
+            for callback in pending:
+                callback()
+
+    def current_step(self, quest_id):
+        steps = self.quest_index[quest_id].get("steps", [])
+        index = self.state.active.get(quest_id, len(steps))
+        return steps[index] if index < len(steps) else None
+
+    def mandatory_step(self):
+        """get_current_mandatory_step（沒有強制任務時回傳 None）"""
+        for quest_id in self.state.active:
+            if self.quest_index[quest_id].get("is_mandatory", False):
+                return self.current_step(quest_id) or {}
+        return None
+
+    def notify_event(self, event_type, event_data=None):
+        """對應 TaskManager.notify_event，回傳本次前進的任務數"""
+        event_data = event_data or {}
+        self.log.append(("event", event_type, event_data))
+        advanced = 0
+        for quest_id in list(self._listeners.get(event_type, ())):
+            if quest_id not in self.state.active:
+                continue
+            step = self.current_step(quest_id)
+            if step is None:
+                continue
+            if evaluate_condition(step.get("conditions", {}), event_type, event_data, self.state):
+                self._complete_quest_step(quest_id)
+                advanced += 1
+        return advanced
+
+    # --- 玩家操作 ---
+    def choose_dialog_choice(self, choice_index):
+        """對應 StoryDialog._on_choice_pressed + TaskManager._on_dialog_choice_selected"""
+        dialog_id = self.state.open_dialog
+        choices = self.dialogs.get(dialog_id, {}).get("choices") or [{"text": "繼續", "action": "next"}]
+        action = choices[choice_index].get("action", "close")
+        self.log.append(("choice", dialog_id, action))
+        if action == "show_card_selection":
+            self.state.selector_cards = list(STARTER_CARDS)
+        elif action in FIXED_DIALOG_EVENTS:
+            self.notify_event("dialog_completed", {"dialog_id": FIXED_DIALOG_EVENTS[action]})
+        elif action in ("next", "close"):
+            self.notify_event("dialog_completed", {"dialog_id": dialog_id})
+        if action in CLOSING_ACTIONS and self.state.open_dialog == dialog_id:
+            self.state.open_dialog = None
+        self._run_deferred()
+
+    def select_card(self, card_id):
+        """對應 TaskManager._on_card_selected"""
+        self.state.selector_cards = None
+        self.state.card_count += 1
+        self.state.starter = card_id
+        self.state.starter_level = 1
+        if self.state.open_dialog and self.dialogs.get(self.state.open_dialog, {}).get("choices"):
+            # 選完卡片後回到對話（若任務沒有接著顯示新對話，玩家可繼續操作）
+            self.state.open_dialog = None
+        self.notify_event("card_selected", {"card_id": card_id})
+        self._run_deferred()
+
+    def available_actions(self):
+        """目前玩家能執行的操作列表"""
+        state = self.state
+        if state.selector_cards is not None:
+            return [("select_card", card_id) for card_id in state.selector_cards]
+        if state.open_dialog:
+            choices = self.dialogs.get(state.open_dialog, {}).get("choices") or [{}]
+            return [("choice", i) for i in range(len(choices))]
+
+        step = self.mandatory_step()
+        actions = []
+        for scene, gate in NAVIGATION.items():
+            if scene != state.scene and (gate is None or is_action_allowed(step, *gate)):
+                actions.append(("navigate", scene))
+        if state.scene == "training_select":
+            actions.extend(("enter_room", room_id) for room_id in self.rooms)
+        if state.scene == "training":
+            if state.training_with_starter is None:
+                if is_action_allowed(step, "training_card_select") and is_action_allowed(step, "training_start"):
+                    if state.starter:
+                        actions.append(("start_training", True))
+                    actions.append(("start_training", False))
+            else:
+                actions.append(("claim_training", None))
+        actions.extend([("restart", None), ("level_up_player", None), ("gain_card", None)])
+        return actions
+
+    def _predict_events(self, action):
+        kind, arg = action
+        state = self.state
+        if kind == "select_card":
+            return [("card_selected", {"card_id": arg})]
+        if kind == "choice":
+            choices = self.dialogs.get(state.open_dialog, {}).get("choices") or [{"action": "next"}]
+            choice_action = choices[arg].get("action", "close")
+            if choice_action in FIXED_DIALOG_EVENTS:
+                return [("dialog_completed", {"dialog_id": FIXED_DIALOG_EVENTS[choice_action]})]
+            if choice_action in ("next", "close"):
+                return [("dialog_completed", {"dialog_id": state.open_dialog})]
+            return []
+        if kind == "navigate":
+            return [("scene_entered", {"scene_name": arg})]
+        if kind == "enter_room":
+            return [("scene_entered", {"scene_name": "training"}), ("training_room_entered", {"room_id": arg})]
+        if kind == "start_training":
+            team = [state.starter] if arg else ["__other__"]
+            return [("training_started", {"room_id": state.training_room, "teams": [team]})]
+        if kind == "claim_training" and state.training_with_starter:
+            return [("card_leveled_up", {"card_id": state.starter, "new_level": state.starter_level + 1})]
+        return []
+
+    def perform(self, action):
+        """執行一個玩家操作"""
+        kind, arg = action
+        state = self.state
+        if kind == "select_card":
+            self.select_card(arg)
+            return
+        if kind == "choice":
+            self.choose_dialog_choice(arg)
+            return
+
+        self.log.append(("action", kind, arg))
+        if kind == "navigate":
+            state.scene = arg
+            state.training_room = None
+            self.notify_event("scene_entered", {"scene_name": arg})
+        elif kind == "enter_room":
+            state.scene = "training"
+            state.training_room = arg
+            self.notify_event("scene_entered", {"scene_name": "training"})
+            self.notify_event("training_room_entered", {"room_id": arg})
+        elif kind == "start_training":
+            state.training_with_starter = bool(arg)
+            team = [state.starter] if arg else ["__other__"]
+            self.notify_event("training_started", {"room_id": state.training_room, "teams": [team]})
+        elif kind == "claim_training":
+            with_starter = state.training_with_starter
+            state.training_with_starter = None
+            self.notify_event("training_completed", {"room_id": state.training_room})
+            if with_starter:
+                state.starter_level += 1
+                self.notify_event("card_leveled_up", {"card_id": state.starter, "new_level": state.starter_level})
+        elif kind == "restart":
+            state.scene = "main_menu"
+            state.open_dialog = None
+            state.selector_cards = None
+            state.training_room = None
+            self._run_deferred()
+            # load_progress 恢復進行中的任務並重新處理目前步驟，之後才檢查 auto_start
+            for quest_id in list(state.active.keys()):
+                self._process_current_step(quest_id)
+            self.startup()
+        elif kind == "level_up_player":
+            state.player_level += 1
+        elif kind == "gain_card":
+            state.card_count += 1
+        self._run_deferred()
+
+    def _score_action(self, action, wanted):
+        """引導式隨機的評分：能直接推進任務為 2，往需要的事件方向前進為 1"""
+        for event_type, event_data in self._predict_events(action):
+            for quest_id in self._listeners.get(event_type, ()):
+                step = self.current_step(quest_id)
+                if step and evaluate_condition(step.get("conditions", {}), event_type, event_data, self.state):
+                    return 2
+        kind, arg = action
+        if kind == "choice" and "card_selected" in wanted:
+            choices = self.dialogs.get(self.state.open_dialog, {}).get("choices") or [{}]
+            if choices[arg].get("action") == "show_card_selection":
+                return 2
+        for event_type in wanted:
+            paths = PATH_TO_EVENT.get(event_type, ())
+            if kind in paths or f"{kind}:{arg}" in paths:
+                return 1
+        return 0
+
+    def _wanted_events(self):
+        return {event_type for event_type, quest_ids in self._listeners.items() if quest_ids}
+
+    def run_random_trace(self, rng, max_events=200, guidance=0.85):
+        """以引導式隨機操作跑一條流程，回傳 TraceResult"""
+        self.reset()
+        self.startup()
+        mandatory = {q.get("quest_id") for q in self.quests if q.get("is_mandatory", False)}
+        events = 0
+        while events < max_events:
+            if not self.state.active and mandatory <= set(self.state.completed):
+                break
+            actions = self.available_actions()
+            if not actions:
+                break
+            if rng.random() < guidance:
+                wanted = self._wanted_events()
+                scored = [(self._score_action(action, wanted), action) for action in actions]
+                best = max(score for score, _ in scored)
+                if best > 0:
+                    actions = [action for score, action in scored if score == best]
+            self.perform(rng.choice(actions))
+            events += 1
+        return TraceResult(
+            completed=list(self.state.completed),
+            stalled={quest_id: index for quest_id, index in self.state.active.items()},
+            events=events,
+            started={entry[1] for entry in self.log if entry[0] == "quest_started"},
+        )
+
+    def run_script(self, script):
+        """重播腳本事件
+
+        每一項可以是：
+            {"event": "scene_entered", "data": {"scene_name": "training_select"}}   直接 notify_event
+            {"event": "card_selected", "data": {"card_id": "001"}}                  視為在選卡界面選卡
+            {"choice": 0}                                                           選擇目前對話的選項
+            {"action": "restart"}                                                   其他玩家操作（同 perform）
+        """
+        self.reset()
+        self.startup()
+        for entry in script:
+            if "choice" in entry:
+                if self.state.open_dialog:
+                    self.choose_dialog_choice(entry["choice"])
+                else:
+                    self.log.append(("error", "目前沒有開啟的對話，略過選項"))
+            elif "action" in entry:
+                self.perform((entry["action"], entry.get("arg")))
+            elif entry.get("event") == "card_selected":
+                self.select_card(entry.get("data", {}).get("card_id", ""))
+            else:
+                self.notify_event(entry.get("event", ""), entry.get("data", {}))
+                self._run_deferred()
+        return self.log
+
+
+class TraceResult:
+    __slots__ = ("completed", "stalled", "events", "started")
+
+    def __init__(self, completed, stalled, events, started):
+        self.completed = completed
+        self.stalled = stalled
+        self.events = events
+        self.started = started
+
+
+# ==================== 靜態檢查 ====================
+
+def lint_quests(quests_data, dialogs_data, rooms=None):
+    """找出一定無法完成的步驟與無法開始的任務，回傳問題列表"""
+    issues = []
+    quests = [q for q in (quests_data or {}).get("quests", []) if isinstance(q, dict)]
+    dialogs = {d.get("dialog_id", ""): d for d in (dialogs_data or {}).get("dialogs", []) if isinstance(d, dict)}
+    quest_ids = {q.get("quest_id") for q in quests}
+    next_targets = {q.get("next_quest") for q in quests if q.get("next_quest")}
+
+    # 哪些 dialog_completed 事件可能發生
+    completable_dialogs = set(FIXED_DIALOG_EVENTS.values()) & set(dialogs)
+    for dialog_id, dialog in dialogs.items():
+        actions = [c.get("action", "close") for c in (dialog.get("choices") or [{"action": "next"}])]
+        if any(action in ("next", "close") for action in actions):
+            completable_dialogs.add(dialog_id)
+        if actions and all(action == "go_to_scene" for action in actions):
+            issues.append(f"dialogs/{dialog_id}: 選項只有 go_to_scene，遊戲中沒有處理此 action，對話無法結束")
+
+    def check_condition(condition, where):
+        condition_type = condition.get("type", "")
+        if condition_type in ("and", "or"):
+            subs = condition.get("sub_conditions", [])
+            if not subs and condition_type == "or":
+                issues.append(f"{where}: or 條件沒有 sub_conditions，永遠不成立")
+            for sub in subs:
+                check_condition(sub, where)
+        elif condition_type == "dialog_completed":
+            dialog_id = condition.get("dialog_id", "")
+            if dialog_id not in completable_dialogs:
+                issues.append(f"{where}: 對話 {dialog_id} 不存在或沒有 next/close 選項，dialog_completed 不會觸發")
+        elif condition_type == "card_selected":
+            if not set(condition.get("valid_cards", [])) & set(STARTER_CARDS):
+                issues.append(f"{where}: valid_cards 與選卡界面的卡片 {STARTER_CARDS} 沒有交集")
+        elif condition_type == "scene_entered":
+            if condition.get("scene_name", "") not in SCENES:
+                issues.append(f"{where}: 場景 {condition.get('scene_name')} 不存在於 GameManager.SCENES")
+        elif condition_type == "training_room_entered":
+            if rooms is not None and condition.get("room_id", "") not in rooms:
+                issues.append(f"{where}: 訓練室 {condition.get('room_id')} 不存在")
+        elif condition_type == "card_level_up":
+            if condition.get("card_type", "") != "starter":
+                issues.append(f"{where}: card_level_up 只支援 card_type = starter")
+        elif condition_type != "card_in_training":
+            issues.append(f"{where}: 條件類型 {condition_type or '(空)'} 不被 TaskManager 支援，永遠不成立")
+
+    for quest in quests:
+        quest_id = quest.get("quest_id", "")
+        if not quest.get("auto_start", False) and quest_id not in next_targets:
+            issues.append(f"quests/{quest_id}: 不是 auto_start，也不是任何任務的 next_quest，永遠不會開始")
+        if quest.get("next_quest") and quest["next_quest"] not in quest_ids:
+            issues.append(f"quests/{quest_id}: next_quest {quest['next_quest']} 不存在")
+        for index, step in enumerate(quest.get("steps", [])):
+            where = f"quests/{quest_id}/{step.get('step_id', index)}"
+            missing = missing_conditions(step)
+            if missing:
+                issues.append(f"{where}: {missing}")
+                continue
+            check_condition(step["conditions"], where)
+            if step.get("dialog_id") and step["dialog_id"] not in dialogs:
+                issues.append(f"{where}: 找不到對話 {step['dialog_id']}")
+    return issues
+
+
+# ==================== 批次模擬 ====================
+
+def run_batch(quests_data, dialogs_data, traces=1000, seed=42, max_events=200, rooms=None,
+              player_level=1, card_count=0, guidance=0.85):
+    """跑多條隨機流程並彙整，回傳報告 dict"""
+    simulator = QuestSimulator(quests_data, dialogs_data, rooms, player_level, card_count)
+    rng = random.Random(seed)
+    started = Counter()
+    completed = Counter()
+    stalls = Counter()  # (quest_id, step_index) -> 次數
+    events_to_finish = []
+
+    for _ in range(traces):
+        result = simulator.run_random_trace(rng, max_events, guidance)
+        started.update(result.started)
+        completed.update(result.completed)
+        stalls.update(result.stalled.items())
+        if not result.stalled:
+            events_to_finish.append(result.events)
+
+    quests = simulator.quests
+    report = {
+        "traces": traces,
+        "seed": seed,
+        "quests": {},
+        "mandatory_failures": [],
+        "never_started": [],
+        "lint": lint_quests(quests_data, dialogs_data, rooms),
+        "avg_events_when_finished": (sum(events_to_finish) / len(events_to_finish)) if events_to_finish else None,
+    }
+    for quest in quests:
+        quest_id = quest.get("quest_id", "")
+        steps = quest.get("steps", [])
+        quest_stalls = sorted(
+            ((count, index) for (qid, index), count in stalls.items() if qid == quest_id), reverse=True
+        )
+        report["quests"][quest_id] = {
+            "mandatory": bool(quest.get("is_mandatory", False)),
+            "started": started[quest_id],
+            "completed": completed[quest_id],
+            "stalls": [
+                {"step": steps[index].get("step_id", str(index)) if index < len(steps) else str(index),
+                 "index": index, "count": count}
+                for count, index in quest_stalls[:3]
+            ],
+        }
+        if not started[quest_id]:
+            report["never_started"].append(quest_id)
+        if quest.get("is_mandatory", False) and completed[quest_id] == 0:
+            report["mandatory_failures"].append(quest_id)
+    return report
+
+
+def _short_list(items, limit=20):
+    text = ", ".join(items[:limit])
+    return text + (f" ... 等 {len(items)} 個" if len(items) > limit else "")
+
+
+def format_report(report):
+    lines = [f"=== 任務流程模擬：{report['traces']} 條流程 (seed={report['seed']}) ==="]
+    if report["avg_events_when_finished"] is not None:
+        lines.append(f"完成所有進行中任務的平均操作數：{report['avg_events_when_finished']:.1f}")
+    lines.append("")
+    for quest_id, info in report["quests"].items():
+        mark = "★" if info["mandatory"] else " "
+        rate = info["completed"] / report["traces"] * 100.0 if report["traces"] else 0.0
+        lines.append(f"{mark} {quest_id:<30} 開始 {info['started']:>6}  完成 {info['completed']:>6} ({rate:5.1f}%)")
+        for stall in info["stalls"]:
+            lines.append(f"      停在步驟 {stall['index'] + 1} ({stall['step']})：{stall['count']} 次")
+    if report["mandatory_failures"]:
+        lines.append("")
+        lines.append("❌ 無法完成的強制任務：" + _short_list(report["mandatory_failures"]))
+    risky = [f"{quest_id} ({info['started'] - info['completed']}/{info['started']})"
+             for quest_id, info in report["quests"].items()
+             if info["mandatory"] and info["completed"] and info["completed"] < info["started"]]
+    if risky:
+        lines.append("⚠️ 部分流程卡關的強制任務（卡關 / 開始）：" + _short_list(risky))
+    if report["never_started"]:
+        lines.append("⚠️ 從未開始的任務：" + _short_list(report["never_started"]))
+    if report["lint"]:
+        lines.append("")
+        lines.append(f"靜態檢查發現 {len(report['lint'])} 個問題：")
+        lines.extend(f"  - {issue}" for issue in report["lint"])
+    if not report["mandatory_failures"] and not report["lint"]:
+        lines.append("")
+        lines.append("✅ 所有強制任務皆可完成")
+    return "\n".join(lines)
+
+
+def load_config(data_dir):
+    """讀取 quests / dialogs / training_rooms（不存在的檔案回傳 None）"""
+    def read(name):
+        path = os.path.join(data_dir, "config", name)
+        if not os.path.exists(path):
+            return None
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    rooms_data = read("training_rooms.json")
+    rooms = [r.get("room_id") for r in rooms_data.get("training_rooms", [])] if rooms_data else None
+    return read("quests.json") or {"quests": []}, read("dialogs.json") or {"dialogs": []}, rooms
+
+
+def main():
+    parser = argparse.ArgumentParser(description="離線模擬 TaskManager 任務流程")
+    parser.add_argument("data_dir", help="data 資料夾路徑")
+    parser.add_argument("--traces", type=int, default=1000, help="隨機流程數量")
+    parser.add_argument("--seed", type=int, default=42, help="亂數種子")
+    parser.add_argument("--max-events", type=int, default=200, help="每條流程最多的玩家操作數")
+    parser.add_argument("--player-level", type=int, default=1, help="初始玩家等級")
+    parser.add_argument("--script", help="重播指定的事件腳本 (JSON 陣列)，不跑隨機流程")
+    parser.add_argument("--json", help="將報告寫入 JSON 檔")
+    args = parser.parse_args()
+
+    quests_data, dialogs_data, rooms = load_config(args.data_dir)
+
+    if args.script:
+        with open(args.script, 'r', encoding='utf-8') as f:
+            script = json.load(f)
+        simulator = QuestSimulator(quests_data, dialogs_data, rooms, args.player_level)
+        for entry in simulator.run_script(script):
+            print("  ".join(str(part) for part in entry))
+        print(f"已完成：{simulator.state.completed}")
+        print(f"進行中：{ {qid: idx + 1 for qid, idx in simulator.state.active.items()} }")
+        return 0
+
+    report = run_batch(quests_data, dialogs_data, args.traces, args.seed, args.max_events, rooms, args.player_level)
+    print(format_report(report))
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=4, ensure_ascii=False)
+    return 1 if report["mandatory_failures"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
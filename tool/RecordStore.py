@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+記錄倉庫 (Record Store)
+包裝 data_cache 中的記錄列表（例如 dialogs.json 的 "dialogs"），提供：
+1. 依主鍵 O(1) 查詢，並維持原本的列表順序
+2. 穩定的 handle：記錄改名、上移 / 下移之後 handle 仍指向同一筆記錄
+3. 變更追蹤：只有內容真的改變時才標記 dirty，儲存時可略過沒有修改的檔案
+
+倉庫直接操作原本的列表物件，因此 data_cache 仍然是要寫入檔案的資料本身。
+
+用法：
+    store = RecordStore(data_cache['dialogs'], 'dialogs', 'dialog_id')
+    handle = store.handle_at(listbox_index)
+    store.update(handle, {"content": "..."})
+    if store.dirty: ...
+"""
+
+import itertools
+
+from DataSchema import RECORD_KEYS
+
+
+class RecordStore:
+    """以主鍵索引、保持順序的記錄列表"""
+
+    _handle_counter = itertools.count(1)
+
+    def __init__(self, container, list_key, id_key):
+        self.list_key = list_key
+        self.id_key = id_key
+        self.reset(container)
+
+    @classmethod
+    def for_data_key(cls, data_cache, data_key):
+        """依 DataSchema.RECORD_KEYS 建立對應資料檔的倉庫"""
+        list_key, id_key = RECORD_KEYS[data_key]
+        return cls(data_cache[data_key], list_key, id_key)
+
+    def reset(self, container):
+        """重新包裝（檔案重新載入或合併後，data_cache 換成新物件時呼叫）"""
+        self.container = container
+        records = container.get(self.list_key)
+        if not isinstance(records, list):
+            records = container[self.list_key] = []
+        self.records = records
+        self._handles = [next(self._handle_counter) for _ in records]  # 與 records 平行
+        self._by_handle = dict(zip(self._handles, records))
+        self._by_id = {}
+        for handle, record in zip(self._handles, records):
+            self._by_id.setdefault(record.get(self.id_key), handle)  # 重複 ID 時保留第一筆（與遊戲載入行為一致）
+        self._positions = None
+        self.dirty = False
+
+    # --- 查詢 ---
+    def __len__(self):
+        return len(self.records)
+
+    def __iter__(self):
+        return iter(self.records)
+
+    def __contains__(self, record_id):
+        return record_id in self._by_id
+
+    def handles(self):
+        return list(self._handles)
+
+    def has_handle(self, handle):
+        return handle in self._by_handle
+
+    def get(self, record_id, default=None):
+        handle = self._by_id.get(record_id)
+        return self._by_handle[handle] if handle is not None else default
+
+    def handle_of(self, record_id):
+        return self._by_id.get(record_id)
+
+    def handle_at(self, position):
+        return self._handles[position]
+
+    def record(self, handle):
+        return self._by_handle[handle]
+
+    def id_of(self, handle):
+        return self._by_handle[handle].get(self.id_key)
+
+    def position(self, handle):
+        """handle 目前在列表中的位置（移動或刪除後第一次查詢時重建位置表）"""
+        if self._positions is None:
+            self._positions = {h: i for i, h in enumerate(self._handles)}
+        return self._positions[handle]
+
+    # --- 修改 ---
+    def _reindex_id(self, record_id):
+        """某個 ID 的記錄改名或刪除後，讓同 ID 的下一筆記錄（若有）接手索引"""
+        self._by_id.pop(record_id, None)
+        for handle, record in zip(self._handles, self.records):
+            if record.get(self.id_key) == record_id:
+                self._by_id[record_id] = handle
+                break
+
+    def add(self, record, position=None):
+        """新增記錄（預設加在最後），回傳 handle；ID 重複時拋出 ValueError"""
+        record_id = record.get(self.id_key)
+        if record_id in self._by_id:
+            raise ValueError(f"{self.id_key} {record_id} 已存在")
+        handle = next(self._handle_counter)
+        if position is None:
+            self.records.append(record)
+            self._handles.append(handle)
+            if self._positions is not None:
+                self._positions[handle] = len(self._handles) - 1
+        else:
+            self.records.insert(position, record)
+            self._handles.insert(position, handle)
+            self._positions = None
+        self._by_handle[handle] = record
+        self._by_id[record_id] = handle
+        self.dirty = True
+        return handle
+
+    def remove(self, handle):
+        """刪除記錄，回傳被刪除的記錄"""
+        position = self.position(handle)
+        record = self.records.pop(position)
+        self._handles.pop(position)
+        del self._by_handle[handle]
+        self._positions = None
+        if self._by_id.get(record.get(self.id_key)) == handle:
+            self._reindex_id(record.get(self.id_key))
+        self.dirty = True
+        return record
+
+    def update(self, handle, fields):
+        """以 fields 更新記錄（可包含新的 ID），回傳是否有任何欄位改變
+
+        新 ID 與其他記錄重複時拋出 ValueError，記錄保持不變。
+        """
+        record = self._by_handle[handle]
+        old_id = record.get(self.id_key)
+        new_id = fields.get(self.id_key, old_id)
+        if new_id != old_id and new_id in self._by_id:
+            raise ValueError(f"{self.id_key} {new_id} 已存在")
+
+        changed = False
+        for key, value in fields.items():
+            if key not in record or record[key] != value:
+                record[key] = value
+                changed = True
+        if not changed:
+            return False
+        if new_id != old_id:
+            if self._by_id.get(old_id) == handle:
+                self._reindex_id(old_id)
+            self._by_id[new_id] = handle
+        self.dirty = True
+        return True
+
+    def replace(self, handle, record):
+        """以新的記錄物件取代（例如編輯彈窗回傳的新 dict），handle 不變；回傳是否有改變"""
+        old = self._by_handle[handle]
+        if old == record:
+            return False
+        old_id, new_id = old.get(self.id_key), record.get(self.id_key)
+        if new_id != old_id and new_id in self._by_id:
+            raise ValueError(f"{self.id_key} {new_id} 已存在")
+        self.records[self.position(handle)] = record
+        self._by_handle[handle] = record
+        if new_id != old_id:
+            if self._by_id.get(old_id) == handle:
+                self._reindex_id(old_id)
+            self._by_id[new_id] = handle
+        self.dirty = True
+        return True
+
+    def move(self, handle, offset):
+        """將記錄往前 (負數) 或往後 (正數) 移動，回傳新位置；超出範圍時不移動"""
+        position = self.position(handle)
+        target = position + offset
+        if target < 0 or target >= len(self.records) or offset == 0:
+            return position
+        record = self.records.pop(position)
+        self.records.insert(target, record)
+        self._handles.pop(position)
+        self._handles.insert(target, handle)
+        if self._positions is not None:
+            low, high = min(position, target), max(position, target)
+            for i in range(low, high + 1):
+                self._positions[self._handles[i]] = i
+        self.dirty = True
+        return target
+
+    def mark_clean(self):
+        self.dirty = False
@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多人安全儲存 (Safe Save)
+避免兩個編輯器（或兩位企劃）同時編輯同一個 JSON 時互相覆蓋。
+
+做法（樂觀並行控制）：
+1. 載入時記住每個檔案的「基準版本」（原始內容與 sha1）
+2. 儲存前比對磁碟上的 sha1：與基準相同就直接寫入
+3. 不同時表示別人已經改過，以主鍵 (DataSchema.RECORD_KEYS) 對記錄做三方合併：
+   - 只有一方改動的記錄 / 欄位直接採用改動的一方
+   - 雙方都新增、刪除或修改成相同內容視為一致
+   - 雙方把同一筆記錄的同一個欄位改成不同值，才算真正的衝突，交由使用者決定
+
+用法：
+    guard = SaveGuard()
+    guard.remember(path)                       # 載入時
+    result = guard.save(path, data_key, data, resolve=ask_user)
+    if result.status == "cancelled": ...
+"""
+
+import hashlib
+import json
+import os
+from collections import namedtuple
+
+from DataSchema import RECORD_KEYS
+from JsonWriter import write_json_if_changed
+
+
+# 衝突：record_id 為 None 表示檔案層級的欄位；field 為 None 表示整筆記錄（一方刪除、一方修改等）
+MergeConflict = namedtuple("MergeConflict", ["record_id", "field", "ours", "theirs"])
+
+# status: "written" / "unchanged" / "merged" / "cancelled"
+SaveResult = namedtuple("SaveResult", ["status", "data", "conflicts"])
+
+_MISSING = object()
+
+
+def content_hash(raw):
+    return hashlib.sha1(raw).hexdigest()
+
+
+def describe_conflict(conflict):
+    """衝突的簡短說明（用於提示視窗）"""
+    if conflict.record_id is None:
+        return f"檔案欄位 {conflict.field}"
+    if conflict.field is None:
+        ours = "已刪除" if conflict.ours is _MISSING else "已修改"
+        theirs = "已刪除" if conflict.theirs is _MISSING else "已修改"
+        return f"{conflict.record_id}（我方{ours}，對方{theirs}）"
+    return f"{conflict.record_id}.{conflict.field}"
+
+
+def _merge_value(base, ours, theirs, prefer):
+    """回傳 (合併值, 是否衝突)"""
+    if ours == theirs:
+        return ours, False
+    if ours == base:
+        return theirs, False
+    if theirs == base:
+        return ours, False
+    return (theirs if prefer == "theirs" else ours), True
+
+
+def _merge_dict_fields(base, ours, theirs, prefer, conflicts, record_id):
+    merged = {}
+    for key in list(ours.keys()) + [k for k in theirs.keys() if k not in ours]:
+        value, conflict = _merge_value(base.get(key, _MISSING), ours.get(key, _MISSING), theirs.get(key, _MISSING), prefer)
+        if conflict:
+            conflicts.append(MergeConflict(record_id, key, ours.get(key, _MISSING), theirs.get(key, _MISSING)))
+        if value is not _MISSING:
+            merged[key] = value
+    return merged
+
+
+def _index_records(records, id_key):
+    """建立 {主鍵: 記錄}；有記錄缺主鍵或主鍵重複時回傳 None（改以整個列表合併）"""
+    if not isinstance(records, list):
+        return None
+    index = {}
+    for record in records:
+        record_id = record.get(id_key) if isinstance(record, dict) else None
+        if record_id is None or record_id in index:
+            return None
+        index[record_id] = record
+    return index
+
+
+def _merge_record_lists(base_list, ours_list, theirs_list, id_key, prefer, conflicts):
+    base_index = _index_records(base_list, id_key)
+    ours_index = _index_records(ours_list, id_key)
+    theirs_index = _index_records(theirs_list, id_key)
+    if base_index is None or ours_index is None or theirs_index is None:
+        return None
+
+    merged = {}
+    for record_id in list(ours_index) + [rid for rid in theirs_index if rid not in ours_index] + \
+            [rid for rid in base_index if rid not in ours_index and rid not in theirs_index]:
+        base = base_index.get(record_id, _MISSING)
+        ours = ours_index.get(record_id, _MISSING)
+        theirs = theirs_index.get(record_id, _MISSING)
+        if ours == theirs or theirs == base:
+            merged[record_id] = ours
+        elif ours == base:
+            merged[record_id] = theirs
+        elif isinstance(ours, dict) and isinstance(theirs, dict):
+            # 雙方都改了同一筆記錄：逐欄位合併（雙方都新增時以空記錄為基準）
+            base_fields = base if isinstance(base, dict) else {}
+            merged[record_id] = _merge_dict_fields(base_fields, ours, theirs, prefer, conflicts, record_id)
+        else:
+            conflicts.append(MergeConflict(record_id, None, ours, theirs))
+            merged[record_id] = theirs if prefer == "theirs" else ours
+
+    # 順序以我方為主，對方新增（或保留）的記錄插在對方列表中前一筆的後面
+    result_ids = [rid for rid in ours_index if merged.get(rid, _MISSING) is not _MISSING]
+    placed = set(result_ids)
+    previous = None
+    for record_id in theirs_index:
+        if record_id not in placed and merged.get(record_id, _MISSING) is not _MISSING:
+            position = result_ids.index(previous) + 1 if previous in placed else len(result_ids)
+            result_ids.insert(position, record_id)
+            placed.add(record_id)
+        if record_id in placed:
+            previous = record_id
+    return [merged[rid] for rid in result_ids]
+
+
+def merge_file(base, ours, theirs, data_key, prefer="ours"):
+    """三方合併整個資料檔，回傳 (合併結果, 衝突列表)
+
+    衝突的地方採用 prefer 指定的一方 ("ours" / "theirs")。
+    """
+    conflicts = []
+    if not all(isinstance(d, dict) for d in (base, ours, theirs)):
+        value, conflict = _merge_value(base, ours, theirs, prefer)
+        return value, ([MergeConflict(None, data_key, ours, theirs)] if conflict else [])
+
+    list_key, id_key = RECORD_KEYS.get(data_key, (None, None))
+    merged = {}
+    for key in list(ours.keys()) + [k for k in theirs.keys() if k not in ours]:
+        base_value = base.get(key, _MISSING)
+        ours_value = ours.get(key, _MISSING)
+        theirs_value = theirs.get(key, _MISSING)
+        value = None
+        if key == list_key and ours_value != theirs_value and _MISSING not in (base_value, ours_value, theirs_value):
+            value = _merge_record_lists(base_value, ours_value, theirs_value, id_key, prefer, conflicts)
+        if value is None:
+            value, conflict = _merge_value(base_value, ours_value, theirs_value, prefer)
+            if conflict:
+                conflicts.append(MergeConflict(None, key, ours_value, theirs_value))
+        if value is not _MISSING:
+            merged[key] = value
+    return merged, conflicts
+
+
+class SaveGuard:
+    """記錄每個檔案的基準版本，並在儲存時檢查是否被別人改過"""
+
+    def __init__(self):
+        self.bases = {}  # 路徑 -> (sha1, 原始內容 bytes)；檔案不存在時為 (None, None)
+
+    @staticmethod
+    def _read(path):
+        if not os.path.exists(path):
+            return None
+        with open(path, 'rb') as f:
+            return f.read()
+
+    def remember(self, path, raw=_MISSING):
+        """記住目前磁碟上（或指定內容）的版本作為基準"""
+        if raw is _MISSING:
+            raw = self._read(path)
+        self.bases[path] = (content_hash(raw) if raw is not None else None, raw)
+
+    def forget(self, path):
+        self.bases.pop(path, None)
+
+    def _base_data(self, path):
+        raw = self.bases[path][1]
+        return json.loads(raw.decode('utf-8')) if raw is not None else {}
+
+    def disk_changed(self, path):
+        """磁碟上的內容是否已與基準不同，回傳 (是否變更, 磁碟內容)"""
+        raw = self._read(path)
+        if path not in self.bases:
+            return False, raw
+        disk_hash = content_hash(raw) if raw is not None else None
+        return disk_hash != self.bases[path][0], raw
+
+    def save(self, path, data_key, data, resolve=None):
+        """安全儲存；磁碟版本已變更時先三方合併
+
+        resolve(conflicts) 回傳 "ours" / "theirs"，或 None 表示取消儲存；
+        未提供時衝突一律採用我方。
+        """
+        changed, disk_raw = self.disk_changed(path)
+        status = "written"
+        conflicts = []
+        if changed and disk_raw is not None:
+            base = self._base_data(path)
+            theirs = json.loads(disk_raw.decode('utf-8'))
+            merged, conflicts = merge_file(base, data, theirs, data_key)
+            if conflicts:
+                choice = resolve(conflicts) if resolve else "ours"
+                if choice is None:
+                    return SaveResult("cancelled", None, conflicts)
+                if choice == "theirs":
+                    merged, _ = merge_file(base, data, theirs, data_key, prefer="theirs")
+            data = merged
+            status = "merged"
+
+        # 以實際寫入（或未變更時讀到）的內容作為基準，不在寫入後重新讀檔
+        written, raw = write_json_if_changed(path, data, return_raw=True)
+        self.remember(path, raw)
+        if status != "merged" and not written:
+            status = "unchanged"
+        return SaveResult(status, data, conflicts)
+
+    def merge_from_disk(self, path, data_key, data):
+        """將磁碟上的外部變更併入記憶體中的資料（不會提示使用者）
+
+        回傳 (status, data)：
+        - "unchanged"：磁碟內容與基準相同
+        - "reloaded"：記憶體中沒有未儲存的修改，直接採用磁碟版本
+        - "merged"：已自動合併
+        - "conflict"：有真正的衝突，維持記憶體版本與原基準，留待儲存時處理
+        """
+        changed, disk_raw = self.disk_changed(path)
+        if not changed or disk_raw is None:
+            return "unchanged", data
+        base = self._base_data(path)
+        theirs = json.loads(disk_raw.decode('utf-8'))
+        if data == base:
+            self.remember(path, disk_raw)
+            return "reloaded", theirs
+        merged, conflicts = merge_file(base, data, theirs, data_key)
+        if conflicts:
+            return "conflict", data
+        self.remember(path, disk_raw)
+        return "merged", merged
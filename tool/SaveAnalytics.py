@@ -0,0 +1,365 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+玩家存檔分析 (Player Save Analytics)
+PlayerDataManager.save_data 會把整個 player_data 寫成 JSON（user://player_save.json）。
+本工具串流讀取一整個資料夾的匯出存檔（可上千份），在 process pool 中解析，
+把每份存檔整理成欄位式陣列 (array.array)，再彙總成平衡性分析用的報表：
+
+1. 卡片持有：持有率、總張數、平均 / 最高等級
+2. 等級分佈：玩家等級、卡片等級
+3. 關卡漏斗：依 stages.json 的順序統計完成人數與逐關轉換率
+4. 貨幣：金幣 / 鑽石的分位數
+5. 背包超量：卡片數超過 bag_capacity（add_card 允許臨時突破上限）的存檔
+
+用法：
+    python tool/SaveAnalytics.py saves/ --data data
+    python tool/SaveAnalytics.py saves/ --data data --out report/
+"""
+
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import sys
+from array import array
+from collections import Counter
+
+# 與 Constants.DEFAULT_BAG_CAPACITY 相同（舊存檔沒有 bag_capacity 時使用）
+DEFAULT_BAG_CAPACITY = 20
+
+# 每份存檔一列：(欄位, array typecode)
+SAVE_COLUMNS = [
+    ("gold", "q"),
+    ("diamond", "q"),
+    ("level", "l"),
+    ("exp", "q"),
+    ("cards", "l"),
+    ("bag_capacity", "l"),
+    ("overflow", "l"),
+    ("stages_completed", "l"),
+    ("training_rooms", "l"),
+    ("shop_purchases", "l"),
+    ("in_training", "b"),
+]
+
+
+def _number(value, default=0):
+    """Godot 讀回的 JSON 數字都是 float，重新存檔後可能寫成 500.0"""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
+
+
+class SaveColumns:
+    """一批存檔的欄位式資料
+
+    卡片與關卡以整數代碼儲存（card_vocab / stage_vocab 為代碼對照表），
+    每張卡片實例與每個完成的關卡各是一列，以 save 欄位指向存檔列。
+    """
+
+    def __init__(self):
+        self.files = []
+        self.errors = []
+        self.saves = {name: array(typecode) for name, typecode in SAVE_COLUMNS}
+        self.card_save, self.card_code, self.card_level = array("l"), array("l"), array("l")
+        self.stage_save, self.stage_code = array("l"), array("l")
+        self.card_vocab, self.stage_vocab = [], []
+        self._card_codes, self._stage_codes = {}, {}
+
+    def __len__(self):
+        return len(self.files)
+
+    def _code(self, value, vocab, codes):
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(vocab)
+            vocab.append(value)
+        return code
+
+    def add_save(self, name, data):
+        """加入一份 player_data"""
+        save = len(self.files)
+        instances = data.get("card_instances") or {}
+        inventory = data.get("inventory") or []
+        capacity = _number(data.get("bag_capacity"), DEFAULT_BAG_CAPACITY)
+
+        for instance_id in inventory:
+            instance = instances.get(str(instance_id)) if isinstance(instances, dict) else None
+            if not isinstance(instance, dict):
+                # 舊版存檔的 inventory 直接存 card_id（尚未遷移到實例系統）
+                instance = {"card_id": str(instance_id), "level": 1}
+            self.card_save.append(save)
+            self.card_code.append(self._code(str(instance.get("card_id", "")), self.card_vocab, self._card_codes))
+            self.card_level.append(_number(instance.get("level"), 1))
+
+        stages = set(data.get("completed_stages") or [])
+        for stage_id in stages:
+            self.stage_save.append(save)
+            self.stage_code.append(self._code(str(stage_id), self.stage_vocab, self._stage_codes))
+
+        purchases = data.get("shop_purchases") or {}
+        row = {
+            "gold": _number(data.get("gold")),
+            "diamond": _number(data.get("diamond")),
+            "level": _number(data.get("level"), 1),
+            "exp": _number(data.get("exp")),
+            "cards": len(inventory),
+            "bag_capacity": capacity,
+            "overflow": max(0, len(inventory) - capacity),
+            "stages_completed": len(stages),
+            "training_rooms": len(data.get("unlocked_training_rooms") or []),
+            "shop_purchases": sum(_number(count) for count in purchases.values()) if isinstance(purchases, dict) else 0,
+            "in_training": 1 if data.get("active_training") else 0,
+        }
+        for column_name, column in self.saves.items():
+            column.append(row[column_name])
+        self.files.append(name)
+
+    def extend(self, other):
+        """合併另一批資料（代碼重新對照到這一批的代碼表）"""
+        offset = len(self.files)
+        card_map = [self._code(value, self.card_vocab, self._card_codes) for value in other.card_vocab]
+        stage_map = [self._code(value, self.stage_vocab, self._stage_codes) for value in other.stage_vocab]
+        self.files.extend(other.files)
+        self.errors.extend(other.errors)
+        for column_name, column in self.saves.items():
+            column.extend(other.saves[column_name])
+        self.card_save.extend(save + offset for save in other.card_save)
+        self.card_code.extend(card_map[code] for code in other.card_code)
+        self.card_level.extend(other.card_level)
+        self.stage_save.extend(save + offset for save in other.stage_save)
+        self.stage_code.extend(stage_map[code] for code in other.stage_code)
+
+    def __getstate__(self):
+        # 代碼查詢表可由 vocab 重建，不需要在 process 之間傳送
+        state = dict(self.__dict__)
+        del state["_card_codes"], state["_stage_codes"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._card_codes = {value: code for code, value in enumerate(self.card_vocab)}
+        self._stage_codes = {value: code for code, value in enumerate(self.stage_vocab)}
+
+
+# ========== 多 process 解析 ==========
+
+def _parse_batch(args):
+    """在 worker 中解析一批存檔"""
+    root, paths = args
+    columns = SaveColumns()
+    for path in paths:
+        name = os.path.relpath(path, root)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            columns.errors.append((name, str(e)))
+            continue
+        if not isinstance(data, dict):
+            columns.errors.append((name, "不是 player_data 格式"))
+            continue
+        columns.add_save(name, data)
+    return columns
+
+
+def iter_save_batches(save_dir, batch_size):
+    """逐批列出資料夾（含子資料夾）中的 .json 存檔"""
+    batch = []
+    for root, dirs, files in os.walk(save_dir):
+        dirs.sort()
+        for name in sorted(files):
+            if name.endswith(".json"):
+                batch.append(os.path.join(root, name))
+                if len(batch) >= batch_size:
+                    yield save_dir, batch
+                    batch = []
+    if batch:
+        yield save_dir, batch
+
+
+def load_saves(save_dir, workers=None, batch_size=256):
+    """解析整個資料夾的存檔，回傳合併後的 SaveColumns（存檔順序依完成順序，不保證與檔名順序相同）"""
+    columns = SaveColumns()
+    batches = iter_save_batches(save_dir, batch_size)
+    if workers == 1:
+        for batch in map(_parse_batch, batches):
+            columns.extend(batch)
+        return columns
+    with multiprocessing.Pool(workers) as pool:
+        for batch in pool.imap_unordered(_parse_batch, batches):
+            columns.extend(batch)
+    return columns
+
+
+# ========== 彙總 ==========
+
+def percentiles(values, points=(10, 50, 90)):
+    """最近秩分位數與平均值"""
+    ordered = sorted(values)
+    if not ordered:
+        return {"mean": 0, "max": 0, **{f"p{p}": 0 for p in points}}
+    stats = {"mean": round(sum(ordered) / len(ordered), 2), "max": ordered[-1]}
+    for point in points:
+        rank = max(1, -(-point * len(ordered) // 100))
+        stats[f"p{point}"] = ordered[rank - 1]
+    return stats
+
+
+def card_table(columns, card_info=None):
+    """每張卡片的持有率、張數與等級"""
+    count = len(columns.card_vocab)
+    owners, copies, level_sum, level_max = [0] * count, [0] * count, [0] * count, [0] * count
+    last_save = [-1] * count
+    for save, code, level in zip(columns.card_save, columns.card_code, columns.card_level):
+        copies[code] += 1
+        level_sum[code] += level
+        level_max[code] = max(level_max[code], level)
+        if last_save[code] != save:  # 同一份存檔的卡片是連續的
+            last_save[code] = save
+            owners[code] += 1
+
+    saves = len(columns) or 1
+    rows = []
+    for code, card_id in enumerate(columns.card_vocab):
+        info = (card_info or {}).get(card_id, {})
+        rows.append({
+            "card_id": card_id,
+            "card_name": info.get("card_name", "" if card_info is None else "（不在 cards.json）"),
+            "rarity": info.get("rarity", ""),
+            "owners": owners[code],
+            "owner_rate": round(owners[code] / saves, 4),
+            "copies": copies[code],
+            "avg_level": round(level_sum[code] / copies[code], 2),
+            "max_level": level_max[code],
+        })
+    rows.sort(key=lambda row: (-row["owners"], row["card_id"]))
+    return rows
+
+
+def stage_funnel(columns, stage_order=None):
+    """關卡漏斗：依 stage_order 統計完成人數與相對上一關的轉換率"""
+    completed = Counter(columns.stage_vocab[code] for code in columns.stage_code)
+    order = list(stage_order or [])
+    known = set(order)
+    order.extend(sorted(stage for stage in completed if stage not in known))
+    saves = len(columns) or 1
+    rows, previous = [], len(columns)
+    for stage_id in order:
+        count = completed.get(stage_id, 0)
+        rows.append({
+            "stage_id": stage_id,
+            "completed": count,
+            "rate": round(count / saves, 4),
+            "step_conversion": round(count / previous, 4) if previous else 0.0,
+            "known": stage_order is None or stage_id in stage_order,
+        })
+        previous = count
+    return rows
+
+
+def summarize(columns, stage_order=None, card_info=None):
+    saves = columns.saves
+    over = [value for value in saves["overflow"] if value > 0]
+    return {
+        "saves": len(columns),
+        "errors": len(columns.errors),
+        "currency": {"gold": percentiles(saves["gold"]), "diamond": percentiles(saves["diamond"])},
+        "player_levels": dict(sorted(Counter(saves["level"]).items())),
+        "card_levels": dict(sorted(Counter(columns.card_level).items())),
+        "cards_per_save": percentiles(saves["cards"]),
+        "bag": {
+            "over_capacity": len(over),
+            "over_capacity_rate": round(len(over) / (len(columns) or 1), 4),
+            "overflow": percentiles(over),
+            "capacities": dict(sorted(Counter(saves["bag_capacity"]).items())),
+        },
+        "in_training": sum(saves["in_training"]),
+        "cards": card_table(columns, card_info),
+        "funnel": stage_funnel(columns, stage_order),
+    }
+
+
+def load_game_data(data_dir):
+    """stages.json 的關卡順序與 cards.json 的卡片資訊（檔案不存在時回傳 None）"""
+    def read(name):
+        path = os.path.join(data_dir, name)
+        if not os.path.exists(path):
+            return None
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    stages, cards = read("stages.json"), read("cards.json")
+    stage_order = [stage.get("stage_id") for stage in stages.get("stages", [])] if stages else None
+    card_info = {card.get("card_id"): card for card in cards.get("cards", [])} if cards else None
+    return stage_order, card_info
+
+
+def format_summary(summary, top=10):
+    lines = [f"=== 存檔分析：{summary['saves']} 份存檔，{summary['errors']} 份無法解析 ==="]
+    for currency, stats in summary["currency"].items():
+        lines.append(f"{currency}: 平均 {stats['mean']}  p10 {stats['p10']}  p50 {stats['p50']}  p90 {stats['p90']}  最高 {stats['max']}")
+    lines.append("玩家等級: " + ", ".join(f"Lv{level}×{count}" for level, count in summary["player_levels"].items()))
+    bag = summary["bag"]
+    lines.append(f"背包超量: {bag['over_capacity']} 份 ({bag['over_capacity_rate']:.1%})，"
+                 f"超出張數 p50 {bag['overflow']['p50']} / 最多 {bag['overflow']['max']}")
+    lines.append(f"訓練中: {summary['in_training']} 份")
+    lines.append("--- 關卡漏斗 ---")
+    for row in summary["funnel"]:
+        mark = "" if row["known"] else "  ⚠️ 不在 stages.json"
+        lines.append(f"  {row['stage_id']:<12} {row['completed']:>7} ({row['rate']:.1%})  轉換 {row['step_conversion']:.1%}{mark}")
+    lines.append(f"--- 持有率前 {top} 的卡片 ---")
+    for row in summary["cards"][:top]:
+        lines.append(f"  {row['card_id']:<8} {row['card_name']:<10} 持有 {row['owner_rate']:.1%}  "
+                     f"{row['copies']} 張  平均 Lv{row['avg_level']}")
+    return lines
+
+
+def _write_csv(path, rows, fieldnames):
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def export_summary(out_dir, columns, summary):
+    """輸出 summary.json 與 saves / cards / funnel / levels 的 CSV"""
+    os.makedirs(out_dir, exist_ok=True)
+    with open(os.path.join(out_dir, "summary.json"), 'w', encoding='utf-8') as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+    names = [name for name, _ in SAVE_COLUMNS]
+    rows = ({"file": file, **{name: columns.saves[name][i] for name in names}} for i, file in enumerate(columns.files))
+    _write_csv(os.path.join(out_dir, "saves.csv"), rows, ["file"] + names)
+    _write_csv(os.path.join(out_dir, "cards.csv"), summary["cards"], list(summary["cards"][0]) if summary["cards"] else ["card_id"])
+    _write_csv(os.path.join(out_dir, "funnel.csv"), summary["funnel"], ["stage_id", "completed", "rate", "step_conversion", "known"])
+    levels = [{"kind": kind, "level": level, "count": count}
+              for kind in ("player_levels", "card_levels") for level, count in summary[kind].items()]
+    _write_csv(os.path.join(out_dir, "levels.csv"), levels, ["kind", "level", "count"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="彙總大量玩家存檔的卡片、等級、關卡漏斗、貨幣與背包資料")
+    parser.add_argument("save_dir", help="匯出的 player_save.json 所在資料夾")
+    parser.add_argument("--data", help="data 資料夾路徑（提供關卡順序與卡片名稱）")
+    parser.add_argument("--out", help="輸出 summary.json 與 CSV 的資料夾")
+    parser.add_argument("--workers", type=int, default=None, help="worker process 數量（預設為 CPU 數）")
+    parser.add_argument("--top", type=int, default=10, help="顯示持有率前幾名的卡片")
+    args = parser.parse_args()
+
+    stage_order, card_info = load_game_data(args.data) if args.data else (None, None)
+    columns = load_saves(args.save_dir, workers=args.workers)
+    summary = summarize(columns, stage_order, card_info)
+    print("\n".join(format_summary(summary, args.top)))
+    for name, error in sorted(columns.errors)[:20]:
+        print(f"❌ {name}: {error}")
+
+    if args.out:
+        export_summary(args.out, columns, summary)
+        print(f"✅ 報表已輸出到 {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
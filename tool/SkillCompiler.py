@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+技能時機編譯器 (Skill Timing Compiler)
+把 active_skills.json / leader_skills.json / enemy_skills.json 編譯成「技能 -> 觸發時機 -> 效果列表」的表格，
+元素名稱轉成 Constants.Element 的索引、數值參數轉成 int / float，
+讓 GM 編輯器匯出、Python 模擬器直接使用，不必在每場戰鬥中比對 effect_type 字串。
+
+觸發時機與遊戲端一致：
+1. 隊長技能：SkillRegistry.create_json_skill_wrapper 的 PERMANENT / BEFORE_ATTACK / TURN_START 分類
+2. 主動技能：duration = 0 為瞬發 (ActiveSkill.apply_instant_effect)，其餘成為 buff，
+   在 BattleManager 讀取該 buff 的時機生效
+3. 敵人技能：EnemySkillWrapper 一律以 PERMANENT 註冊
+
+編譯時會回報：
+- 未知的 effect_type（遊戲端沒有任何處理）
+- 遊戲端在此類技能中會忽略的效果（例如主動技能的 buff 沒有任何地方讀取）
+- 無法解析的元素名稱
+
+用法：
+    python tool/SkillCompiler.py data
+    python tool/SkillCompiler.py data --export      # 寫入 data/config/skill_table.json
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+
+TABLE_FILE_NAME = "skill_table.json"
+TABLE_VERSION = 1
+
+# Constants.TriggerTiming / Constants.Element 的順序
+TIMINGS = [
+    "PERMANENT", "BATTLE_START", "TURN_START", "TURN_END", "BEFORE_ATTACK", "AFTER_ATTACK",
+    "BEFORE_DAMAGED", "AFTER_DAMAGED", "ON_ATTACK", "ON_DAMAGE_CALC", "ON_ORB_GEN", "ON_SLASH", "MANUAL",
+]
+ELEMENTS = ["METAL", "WOOD", "WATER", "FIRE", "EARTH", "HEART"]
+ELEMENT_ALL = -1  # target_element = "ALL"
+
+# 技能種類 -> (data 資料夾底下的檔案, 記錄列表鍵)
+SKILL_FILES = {
+    "active": (os.path.join("config", "active_skills.json"), "active_skills"),
+    "leader": (os.path.join("config", "leader_skills.json"), "leader_skills"),
+    "enemy": (os.path.join("config", "enemy_skills.json"), "enemy_skills"),
+}
+
+# SkillRegistry.create_json_skill_wrapper
+LEADER_TIMINGS = {
+    "HP_MULTIPLIER": "PERMANENT",
+    "RECOVERY_MULTIPLIER": "PERMANENT",
+    "TEAM_ELEMENT_MULTIPLIER": "PERMANENT",
+    "TEAM_DIVERSITY_MULTIPLIER": "PERMANENT",
+    "EXTEND_SLASH_TIME": "PERMANENT",
+    "IGNORE_RESISTANCE": "PERMANENT",
+    "ORB_DUAL_EFFECT": "PERMANENT",
+    "ORB_CAPACITY_BOOST": "PERMANENT",
+    "BASE_DAMAGE_BOOST": "PERMANENT",
+    "END_TURN_DAMAGE": "PERMANENT",
+    "COMBO_BOOST": "PERMANENT",
+    "DAMAGE_MULTIPLIER": "BEFORE_ATTACK",
+    "ALL_DAMAGE_BOOST": "BEFORE_ATTACK",
+    "ORB_COUNT_MULTIPLIER": "BEFORE_ATTACK",
+    "FORCE_ORB_SPAWN": "TURN_START",
+    "ORB_SPAWN_RATE_BOOST": "TURN_START",
+    "ORB_DROP_END_TURN": "TURN_START",
+    "ORB_DROP_ON_SLASH": "TURN_START",
+    "SLASH_ORB_SPAWN": "TURN_START",
+}
+
+# ActiveSkill.apply_instant_effect（duration = 0）
+ACTIVE_INSTANT_TYPES = {"EXTEND_SLASH_TIME"}
+# 主動技能 buff -> 讀取該 buff 的時機（BattleManager / ElementPanel）
+ACTIVE_BUFF_TIMINGS = {
+    "BASE_STAT_BOOST": "MANUAL",              # 發動時直接修改卡片數值
+    "DAMAGE_MULTIPLIER": "ON_DAMAGE_CALC",
+    "FINAL_DAMAGE_MULTIPLIER": "ON_DAMAGE_CALC",
+    "ELEMENT_DAMAGE_BOOST": "ON_DAMAGE_CALC",
+    "IGNORE_ENEMY_SKILL": "ON_DAMAGE_CALC",
+    "DAMAGE_REDUCTION": "BEFORE_DAMAGED",
+    "END_TURN_DAMAGE": "TURN_END",
+    "ORB_DROP_END_TURN": "TURN_END",
+    "COMBO_BOOST": "ON_SLASH",
+}
+
+# EnemySkillWrapper._apply_enemy_effect -> 分類（is_condition_skill 的條件類會疊加）
+ENEMY_CATEGORIES = {
+    "REQUIRE_COMBO": "condition",
+    "REQUIRE_COMBO_EXACT": "condition",
+    "REQUIRE_COMBO_MAX": "condition",
+    "REQUIRE_ORB_TOTAL": "condition",
+    "REQUIRE_ORB_CONTINUOUS": "condition",
+    "REQUIRE_ELEMENTS": "condition",
+    "REQUIRE_STORED_ORB_MIN": "condition",
+    "REQUIRE_STORED_ORB_EXACT": "condition",
+    "REQUIRE_ENEMY_ATTACK": "condition",
+    "DAMAGE_ONCE_ONLY": "condition",
+    "DAMAGE_REDUCTION_PERCENT": "reduction",
+    "DAMAGE_REDUCTION_FLAT": "reduction",
+    "SEAL_ACTIVE_SKILL": "restriction",
+    "DISABLE_ELEMENT_SLASH": "restriction",
+    "ZERO_RECOVERY": "restriction",
+    "REDUCE_SLASH_TIME": "restriction",
+    "ENTER_HP_TO_ONE": "special",
+    "DEATH_DAMAGE": "special",
+    "REVIVE_ONCE": "special",
+}
+# Constants.EnemySkillEffectType 中有定義、但 EnemySkillWrapper 沒有處理的類型
+ENEMY_DECLARED_TYPES = {
+    "REQUIRE_ORB_SEQUENCE", "SEAL_ORB_SWAP", "ENEMY_DAMAGE_BY_PLAYER_ORBS", "ENEMY_DAMAGE_BY_PLAYER_LOW_ORBS",
+    "REMOVE_RANDOM_ORBS", "SPAWN_INVALID_ORBS", "REDUCE_DAMAGE_TURNS",
+}
+
+ENGINE_TYPES = set(LEADER_TIMINGS) | ACTIVE_INSTANT_TYPES | set(ACTIVE_BUFF_TIMINGS) | set(ENEMY_CATEGORIES)
+
+# 參數解析（欄位名稱與 GM.SKILL_EFFECT_SCHEMA 相同）
+ELEMENT_FIELDS = {"target_element", "element", "source_element", "slash_element", "drop_element",
+                  "spawn_element", "required_element"}
+INT_FIELDS = {"count", "bonus_capacity", "orb_per_tier", "required_count", "spawn_count", "combo_bonus", "damage",
+              "required_combo", "max_combo", "required_unique_elements", "reduction_amount", "duration"}
+JSON_FIELDS = {"requirements", "target_card_ids"}
+
+
+def parse_element(name):
+    """元素名稱 -> Constants.Element 索引（"ALL" 為 ELEMENT_ALL），無法解析時回傳 None"""
+    name = str(name).upper()
+    if name == "ALL":
+        return ELEMENT_ALL
+    return ELEMENTS.index(name) if name in ELEMENTS else None
+
+
+def parse_params(effect):
+    """解析效果參數：回傳 (params, 錯誤訊息列表)"""
+    params, errors = {}, []
+    for key, value in effect.items():
+        if key == "effect_type":
+            continue
+        if key in ELEMENT_FIELDS:
+            element = parse_element(value)
+            if element is None:
+                errors.append(f"{key} 無法解析的元素 {value!r}")
+            params[key] = element
+        elif key in JSON_FIELDS and isinstance(value, str):
+            try:
+                params[key] = json.loads(value) if value.strip() else []
+            except ValueError:
+                errors.append(f"{key} 不是有效的 JSON：{value!r}")
+                params[key] = value
+        elif key in INT_FIELDS and isinstance(value, (int, float)) and not isinstance(value, bool):
+            params[key] = int(value)
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            params[key] = float(value)
+        else:
+            params[key] = value
+    # REQUIRE_STORED_ORB_*：[{"element": "FIRE", "count": 3}]
+    if isinstance(params.get("requirements"), list):
+        requirements = []
+        for requirement in params["requirements"]:
+            if isinstance(requirement, dict) and "element" in requirement:
+                element = parse_element(requirement["element"])
+                if element is None:
+                    errors.append(f"requirements 無法解析的元素 {requirement['element']!r}")
+                requirement = dict(requirement, element=element)
+            requirements.append(requirement)
+        params["requirements"] = requirements
+    return params, errors
+
+
+def _effect_timing(kind, effect_type, skill):
+    """回傳 (時機, 問題)；時機為 None 表示遊戲端會忽略此效果"""
+    if kind == "leader":
+        timing = LEADER_TIMINGS.get(effect_type)
+        return timing, None if timing else "create_json_skill_wrapper 不會為此效果建立觸發時機，隊長技能中無效"
+    if kind == "active":
+        if skill.get("duration", 0) == 0:
+            if effect_type in ACTIVE_INSTANT_TYPES:
+                return "MANUAL", None
+            return None, "瞬發技能 (duration = 0) 只支援 " + ", ".join(sorted(ACTIVE_INSTANT_TYPES))
+        timing = ACTIVE_BUFF_TIMINGS.get(effect_type)
+        return timing, None if timing else "主動技能 buff 沒有任何地方讀取此效果"
+    if effect_type in ENEMY_CATEGORIES:
+        return "PERMANENT", None
+    return None, "EnemySkillWrapper 沒有處理此效果"
+
+
+def compile_skill(kind, skill):
+    """編譯單一技能：回傳 (compiled, diagnostics)，diagnostics 為 [(severity, message)]"""
+    timings, diagnostics = {}, []
+    for index, effect in enumerate(skill.get("effects", [])):
+        effect_type = effect.get("effect_type", "")
+        label = f"效果 #{index + 1} {effect_type or '(空白)'}"
+        if effect_type not in ENGINE_TYPES and effect_type not in ENEMY_DECLARED_TYPES:
+            diagnostics.append(("error", f"{label}: 未知的 effect_type"))
+            continue
+        timing, problem = _effect_timing(kind, effect_type, skill)
+        if timing is None:
+            diagnostics.append(("error", f"{label}: {problem}"))
+            continue
+        params, errors = parse_params(effect)
+        diagnostics.extend(("error", f"{label}: {error}") for error in errors)
+        compiled_effect = {"effect_type": effect_type, "params": params}
+        if kind == "enemy":
+            compiled_effect["category"] = ENEMY_CATEGORIES[effect_type]
+        timings.setdefault(timing, []).append(compiled_effect)
+
+    compiled = {"timings": {timing: timings[timing] for timing in TIMINGS if timing in timings}}
+    if kind == "active":
+        compiled.update(duration=int(skill.get("duration", 0)), skill_cost=int(skill.get("skill_cost", 0)),
+                        target_type=skill.get("target_type", ""))
+    if kind == "enemy":
+        compiled["is_condition_skill"] = any(e["category"] == "condition"
+                                             for effects in timings.values() for e in effects)
+    return compiled, diagnostics
+
+
+def compile_skills(skill_data):
+    """編譯所有技能
+
+    skill_data: {"active": active_skills.json, "leader": ..., "enemy": ...}
+    回傳 (skills, diagnostics)：skills = {kind: {skill_id: compiled}}，
+    diagnostics = [(severity, kind, skill_id, message)]
+    """
+    skills, diagnostics = {}, []
+    for kind, (_, list_key) in SKILL_FILES.items():
+        compiled_kind = skills.setdefault(kind, {})
+        for skill in (skill_data.get(kind) or {}).get(list_key, []):
+            skill_id = skill.get("skill_id", "")
+            if skill_id in compiled_kind:
+                diagnostics.append(("error", kind, skill_id, "重複的 skill_id（遊戲端只會使用第一筆）"))
+                continue
+            compiled, problems = compile_skill(kind, skill)
+            compiled_kind[skill_id] = compiled
+            diagnostics.extend((severity, kind, skill_id, message) for severity, message in problems)
+    return skills, diagnostics
+
+
+def schema_mismatches(schema_types):
+    """比對 GM 編輯器的 effect_type 清單與遊戲端：回傳 (編輯器有但遊戲端沒有, 遊戲端有但編輯器沒有)"""
+    schema_types = set(schema_types)
+    return sorted(schema_types - ENGINE_TYPES), sorted(ENGINE_TYPES - schema_types)
+
+
+# ==================== 匯出 / 載入 ====================
+
+def _read_sources(data_dir):
+    raw, data = {}, {}
+    for kind, (rel_path, _) in SKILL_FILES.items():
+        path = os.path.join(data_dir, rel_path)
+        if not os.path.exists(path):
+            continue
+        with open(path, 'rb') as f:
+            raw[kind] = f.read()
+        data[kind] = json.loads(raw[kind].decode('utf-8'))
+    return raw, data
+
+
+def build_table(data_dir):
+    """編譯 data 資料夾中的技能檔案，回傳可寫成 JSON 的表格"""
+    raw, data = _read_sources(data_dir)
+    skills, diagnostics = compile_skills(data)
+    return {
+        "version": TABLE_VERSION,
+        "source_md5": {kind: hashlib.md5(content).hexdigest() for kind, content in raw.items()},
+        "timings": TIMINGS,
+        "elements": ELEMENTS,
+        "skills": skills,
+        "diagnostics": [list(item) for item in diagnostics],
+    }
+
+
+def export_table(data_dir):
+    """將編譯結果寫到 config/skill_table.json，回傳 (寫入路徑, 表格)"""
+    from JsonWriter import write_json_if_changed
+
+    table = build_table(data_dir)
+    out_path = os.path.join(data_dir, "config", TABLE_FILE_NAME)
+    write_json_if_changed(out_path, table)
+    return out_path, table
+
+
+def load_table(data_dir):
+    """模擬器使用：讀取 skill_table.json；技能檔案已修改（md5 不同）或表格不存在時重新編譯"""
+    path = os.path.join(data_dir, "config", TABLE_FILE_NAME)
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            table = json.load(f)
+        raw, _ = _read_sources(data_dir)
+        current = {kind: hashlib.md5(content).hexdigest() for kind, content in raw.items()}
+        if table.get("version") == TABLE_VERSION and table.get("source_md5") == current:
+            return table
+    return build_table(data_dir)
+
+
+def format_diagnostics(diagnostics):
+    icons = {"error": "❌", "warning": "⚠️"}
+    return [f"{icons[severity]} [{kind}] {skill_id}: {message}" for severity, kind, skill_id, message in diagnostics]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="將技能 JSON 編譯成「觸發時機 -> 效果」表格")
+    parser.add_argument("data_dir", help="data 資料夾路徑")
+    parser.add_argument("--export", action="store_true", help=f"寫入 config/{TABLE_FILE_NAME}")
+    args = parser.parse_args()
+
+    if args.export:
+        out_path, table = export_table(args.data_dir)
+        print(f"✅ 已寫入 {out_path}")
+    else:
+        table = build_table(args.data_dir)
+
+    for kind, skills in table["skills"].items():
+        per_timing = {}
+        for compiled in skills.values():
+            for timing, effects in compiled["timings"].items():
+                per_timing[timing] = per_timing.get(timing, 0) + len(effects)
+        summary = ", ".join(f"{timing} {count}" for timing, count in per_timing.items())
+        print(f"{kind}: {len(skills)} 個技能（{summary}）")
+    diagnostics = [tuple(item) for item in table["diagnostics"]]
+    print("\n".join(format_diagnostics(diagnostics)) or "✅ 所有效果都有對應的觸發時機")
+    return 1 if any(item[0] == "error" for item in diagnostics) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
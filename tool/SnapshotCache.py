@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+資料快照快取 (Snapshot Cache)
+將 data 資料夾中各 JSON 檔解析後的記錄與主鍵索引，以二進位格式存到 data/.gm_cache/，
+讓 GM 編輯器冷啟動時不必重新解析所有 JSON。
+
+快取檔格式（每個資料檔一個 <data_key>.bin）：
+    MAGIC (8 bytes) | 標頭長度 (4 bytes, little-endian) | 標頭 marshal | 內容 marshal
+
+快取放在共用的 data 資料夾中，因此只用 marshal 儲存純資料（dict / list / str / 數字），
+讀取時不會像 pickle 一樣執行任意程式碼；marshal 也會保留索引與記錄列表共用的物件。
+
+標頭記錄來源 JSON 的 size / mtime_ns / sha1；讀取時以 mmap 先解出標頭比對，
+相符才解出內容，不符則改讀 JSON，並在背景執行緒重建快取。
+快取只是 JSON 的副本，可以隨時刪除 .gm_cache 資料夾。
+"""
+
+import gc
+import hashlib
+import json
+import marshal
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import threading
+from contextlib import contextmanager
+
+from DataSchema import FILE_PATHS, RECORD_KEYS, build_index, get_records
+
+
+CACHE_DIR_NAME = ".gm_cache"
+CACHE_MAGIC = b"GMSNAP02"
+CACHE_VERSION = 2
+_HEADER_LEN = struct.Struct("<I")
+
+
+@contextmanager
+def gc_paused():
+    """大量建立物件時暫停循環垃圾回收（載入大型資料時可省下約一半時間）"""
+    was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if was_enabled:
+            gc.enable()
+
+
+def file_signature(path):
+    """回傳 (size, mtime_ns)；檔案不存在時回傳 None"""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_size, st.st_mtime_ns
+
+
+def _sha1_file(path):
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class SnapshotCache:
+    """管理某個 data 資料夾的快照快取"""
+
+    def __init__(self, data_dir, file_paths=None):
+        self.data_dir = data_dir
+        self.file_paths = file_paths or FILE_PATHS
+        self.cache_dir = os.path.join(data_dir, CACHE_DIR_NAME)
+        self.last_load_stats = {}  # data_key -> "cache" / "json"
+        self._rebuild_lock = threading.Lock()
+        self._rebuild_thread = None
+        self._pending = set()
+
+    def _json_path(self, data_key):
+        return os.path.join(self.data_dir, self.file_paths[data_key])
+
+    def _cache_path(self, data_key):
+        return os.path.join(self.cache_dir, f"{data_key}.bin")
+
+    # --- 讀取 ---
+    def _read_cache(self, data_key, signature):
+        """快取有效時回傳 (data, index, 標頭是否需要更新)，否則回傳 None"""
+        cache_path = self._cache_path(data_key)
+        try:
+            with open(cache_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                view = memoryview(mm)
+                try:
+                    if bytes(view[:len(CACHE_MAGIC)]) != CACHE_MAGIC:
+                        return None
+                    offset = len(CACHE_MAGIC)
+                    (header_len,) = _HEADER_LEN.unpack_from(view, offset)
+                    offset += _HEADER_LEN.size
+                    header = marshal.loads(view[offset:offset + header_len])
+                    if not isinstance(header, dict):
+                        return None
+                    match = self._header_matches(header, data_key, signature)
+                    if not match:
+                        return None
+                    data, index = marshal.loads(view[offset + header_len:])
+                finally:
+                    view.release()
+        except (OSError, ValueError, EOFError, TypeError, struct.error):
+            return None
+        return data, index, match == "hash"
+
+    def _header_matches(self, header, data_key, signature):
+        if header.get('version') != CACHE_VERSION or header.get('python') != sys.version_info[:2]:
+            return None
+        if header.get('data_key') != data_key or header.get('size') != signature[0]:
+            return None
+        if header.get('mtime_ns') == signature[1]:
+            return "exact"
+        # 大小相同但修改時間不同（例如被 touch 或重新 checkout）：以內容雜湊確認
+        if header.get('sha1') == _sha1_file(self._json_path(data_key)):
+            return "hash"
+        return None
+
+    def _read_json(self, data_key):
+        """讀取原始 JSON，回傳 (data, raw_bytes)"""
+        with open(self._json_path(data_key), 'rb') as f:
+            raw = f.read()
+        return json.loads(raw.decode('utf-8')), raw
+
+    def load(self, data_keys=None):
+        """載入資料，回傳 (data_cache, indexes)
+
+        有效的快取直接使用；缺少或過期的改讀 JSON，並排入背景重建。
+        JSON 格式錯誤時會直接拋出例外（與直接 json.load 的行為相同）。
+        """
+        data_cache, indexes, stale = {}, {}, []
+        self.last_load_stats = {}
+        with gc_paused():
+            for data_key in (data_keys or self.file_paths.keys()):
+                signature = file_signature(self._json_path(data_key))
+                if signature is None:
+                    continue
+                cached = self._read_cache(data_key, signature)
+                if cached is not None:
+                    data_cache[data_key], index, refresh_header = cached
+                    if index is not None:
+                        indexes[data_key] = index
+                    if refresh_header:
+                        stale.append(data_key)
+                    self.last_load_stats[data_key] = "cache"
+                    continue
+                data_cache[data_key], _ = self._read_json(data_key)
+                if data_key in RECORD_KEYS:
+                    indexes[data_key] = build_index(get_records(data_cache, data_key), RECORD_KEYS[data_key][1])
+                self.last_load_stats[data_key] = "json"
+                stale.append(data_key)
+        if stale:
+            self.rebuild_async(stale)
+        return data_cache, indexes
+
+    # --- 寫入 ---
+    def rebuild(self, data_key):
+        """由磁碟上的 JSON 重新建立某個檔案的快取（自行讀取，不共用編輯器中的資料物件）"""
+        json_path = self._json_path(data_key)
+        signature = file_signature(json_path)
+        if signature is None:
+            return False
+        data, raw = self._read_json(data_key)
+        if file_signature(json_path) != signature:
+            return False  # 讀取期間檔案被改寫，下次載入時再重建
+        index = None
+        if data_key in RECORD_KEYS:
+            index = build_index(get_records({data_key: data}, data_key), RECORD_KEYS[data_key][1])
+        header = marshal.dumps({
+            'version': CACHE_VERSION,
+            'python': sys.version_info[:2],
+            'data_key': data_key,
+            'size': signature[0],
+            'mtime_ns': signature[1],
+            'sha1': hashlib.sha1(raw).hexdigest(),
+        })
+        payload = marshal.dumps((data, index))
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, prefix=f".{data_key}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(CACHE_MAGIC)
+                f.write(_HEADER_LEN.pack(len(header)))
+                f.write(header)
+                f.write(payload)
+            os.replace(tmp_path, self._cache_path(data_key))
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return True
+
+    def rebuild_async(self, data_keys=None):
+        """在背景執行緒重建快取（同時只會有一個重建執行緒）"""
+        with self._rebuild_lock:
+            self._pending.update(data_keys or self.file_paths.keys())
+            if self._rebuild_thread and self._rebuild_thread.is_alive():
+                return
+            self._rebuild_thread = threading.Thread(target=self._rebuild_worker, name="SnapshotCacheRebuild", daemon=True)
+            self._rebuild_thread.start()
+
+    def _rebuild_worker(self):
+        while True:
+            with self._rebuild_lock:
+                if not self._pending:
+                    self._rebuild_thread = None
+                    return
+                data_key = self._pending.pop()
+            try:
+                self.rebuild(data_key)
+            except Exception as e:
+                print(f"⚠️ 重建快取 {data_key} 失敗: {e}")
+
+    def wait(self, timeout=None):
+        """等待背景重建完成（主要給命令列工具與效能測試使用）"""
+        thread = self._rebuild_thread
+        if thread:
+            thread.join(timeout)
+
+    def clear(self):
+        """刪除所有快取檔"""
+        if not os.path.isdir(self.cache_dir):
+            return
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".bin") or name.endswith(".tmp"):
+                os.remove(os.path.join(self.cache_dir, name))
+
+
+def main():
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="建立或檢查 GM 編輯器的資料快照快取")
+    parser.add_argument("data_dir", help="data 資料夾路徑")
+    parser.add_argument("--clear", action="store_true", help="刪除快取後結束")
+    args = parser.parse_args()
+
+    cache = SnapshotCache(args.data_dir)
+    if args.clear:
+        cache.clear()
+        print(f"✅ 已清除 {cache.cache_dir}")
+        return 0
+
+    start = time.perf_counter()
+    cache.load()
+    cache.wait()
+    first = (time.perf_counter() - start) * 1000.0
+    start = time.perf_counter()
+    cache.load()
+    second = (time.perf_counter() - start) * 1000.0
+    print(f"首次載入 (含重建) {first:.1f} ms，快取載入 {second:.1f} ms")
+    for data_key, source in cache.last_load_stats.items():
+        print(f"  {data_key:<16} {source}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
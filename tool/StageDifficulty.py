@@ -0,0 +1,377 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+關卡難度估算 (Stage Difficulty Scorer)
+stages.json 的 difficulty 是手動填寫的，與 waves[].enemies[] 實際的敵人數值沒有關聯。
+本工具依敵人的 max_hp / base_atk / attack_cd 與被動技能，對照參考隊伍曲線估算每個關卡的有效難度：
+
+1. 有效血量 (EHP)：max_hp × 數量，DAMAGE_REDUCTION_PERCENT 除以 (1 - 減傷)，REVIVE_ONCE ×2
+2. 需要的回合數：EHP ÷ 參考隊伍每回合傷害；條件類技能（REQUIRE_COMBO 等）依 GATE_FACTORS 增加回合數，
+   DAMAGE_REDUCTION_FLAT 從每一下攻擊扣除
+3. 承受傷害：敵人依序被擊倒，存活期間每 attack_cd 回合攻擊一次；加上 DEATH_DAMAGE、ENTER_HP_TO_ONE
+4. 原始分數 = 回合數 × (1 + PRESSURE_WEIGHT × 承受傷害 / 參考隊伍 HP)，
+   再以最小平方法對齊手動難度的尺度（估算難度 = k × 原始分數）
+
+參考隊伍：TEAM_SIZE 張「中位數」卡片（cards.json 各卡片在該等級的 ATK / HP 中位數），
+等級隨關卡在章節順序（regions.json）中的位置提升。
+
+自動調整：每個章節依目標曲線（linear：章節第一關到最後一關的手動難度線性內插；authored：手動難度）
+求出讓估算難度命中目標的 HP / ATK 倍率。所有關卡同時以對數二分法求根（每一輪一次計算全部關卡）。
+遊戲端的波次只記錄 enemy_id / count，沒有關卡專屬倍率，因此結果是調整建議（--out 輸出 JSON）。
+
+用法：
+    python tool/StageDifficulty.py data
+    python tool/StageDifficulty.py data --curve authored --tune hp --out stage_scalers.json
+"""
+
+import argparse
+import json
+import math
+import os
+import statistics
+import sys
+
+from DamageStacking import COMBO_MULTIPLIER_PER_HIT, OWN_ELEMENT_BONUS
+from SkillCompiler import compile_skills
+
+
+TEAM_SIZE = 5
+REFERENCE_COMBO = 6
+REFERENCE_LEVEL_START = 1
+REFERENCE_LEVEL_PER_STAGE = 3
+PRESSURE_WEIGHT = 2.0
+UNASSIGNED_CHAPTER = "(未分配章節)"
+# 條件類敵人技能 -> 回合數倍率（無法精確模擬的操作門檻，以額外回合數估計）
+GATE_FACTORS = {
+    "REQUIRE_COMBO_EXACT": 1.5,
+    "REQUIRE_ORB_TOTAL": 1.25,
+    "REQUIRE_ORB_CONTINUOUS": 1.5,
+    "REQUIRE_ELEMENTS": 1.25,
+    "REQUIRE_STORED_ORB_MIN": 1.5,
+    "REQUIRE_STORED_ORB_EXACT": 2.0,
+}
+SCALE_RANGE = (1.0 / 64, 64.0)
+SOLVER_ITERATIONS = 40
+TUNE_MODES = ("both", "hp", "atk")
+
+
+# ========== 參考隊伍 ==========
+
+def _level_stat(card, stat, level):
+    max_level = int(card.get("max_level", 1) or 1)
+    level = min(level, max_level)
+    percent = 1.0 if max_level <= 1 else 0.1 + 0.9 * (level - 1) / float(max_level - 1)
+    return int(card.get(stat, 0) * percent)
+
+
+def slash_multiplier(combo):
+    """全部斬本屬性時的元素倍率（ElementPanel）"""
+    return (1.0 + combo * OWN_ELEMENT_BONUS) * (1.0 + combo * COMBO_MULTIPLIER_PER_HIT)
+
+
+class ReferenceTeam:
+    """參考隊伍在某個等級的每下傷害與總 HP"""
+
+    def __init__(self, cards, level, team_size=TEAM_SIZE, combo=REFERENCE_COMBO):
+        cards = [card for card in cards if card.get("base_atk", 0) > 1] or cards
+        self.level = level
+        self.team_size = team_size
+        self.combo = combo
+        self.hit = statistics.median(_level_stat(c, "base_atk", level) for c in cards) * slash_multiplier(combo) if cards else 1.0
+        self.hp = statistics.median(_level_stat(c, "base_hp", level) for c in cards) * team_size if cards else 1.0
+
+
+def reference_curve(cards, count, level_start=REFERENCE_LEVEL_START, level_per_stage=REFERENCE_LEVEL_PER_STAGE,
+                    team_size=TEAM_SIZE, combo=REFERENCE_COMBO):
+    """關卡進度 0..count-1 的參考隊伍（超過所有卡片最高等級後數值相同，共用同一個物件）"""
+    top_level = max((int(card.get("max_level", 1) or 1) for card in cards), default=1)
+    teams, curve = {}, []
+    for index in range(count):
+        level = min(level_start + level_per_stage * index, max(top_level, level_start))
+        if level not in teams:
+            teams[level] = ReferenceTeam(cards, level, team_size, combo)
+        curve.append(teams[level])
+    return curve
+
+
+# ========== 敵人 ==========
+
+class EnemyProfile:
+    """一種敵人對難度有影響的數值"""
+
+    def __init__(self, enemy, enemy_skills):
+        self.enemy_id = enemy.get("enemy_id", "")
+        self.max_hp = enemy.get("max_hp", 0)
+        self.atk = enemy.get("base_atk", 0)
+        self.attack_cd = max(int(enemy.get("attack_cd", 1) or 1), 1)
+        self.hp_factor = 1.0
+        self.flat_reduction = 0
+        self.gates = []            # [(effect_type, params)]
+        self.death_damage = 0
+        self.enter_hp_to_one = False
+        self.ignored_skills = []
+        for skill_id in enemy.get("passive_skill_ids", []) or []:
+            compiled = enemy_skills.get(skill_id)
+            if compiled is None:
+                if skill_id:
+                    self.ignored_skills.append(skill_id)
+                continue
+            for effects in compiled["timings"].values():
+                for effect in effects:
+                    self._apply(effect["effect_type"], effect["params"], effect.get("category"))
+
+    def _apply(self, effect_type, params, category):
+        if effect_type == "DAMAGE_REDUCTION_PERCENT":
+            self.hp_factor /= max(1.0 - params.get("reduction_percent", 50.0) / 100.0, 0.01)
+        elif effect_type == "DAMAGE_REDUCTION_FLAT":
+            self.flat_reduction += params.get("reduction_amount", 100)
+        elif effect_type == "REVIVE_ONCE":
+            self.hp_factor *= 2.0
+        elif effect_type == "DEATH_DAMAGE":
+            self.death_damage += params.get("damage", 1000)
+        elif effect_type == "ENTER_HP_TO_ONE":
+            self.enter_hp_to_one = True
+        elif category == "condition":
+            self.gates.append((effect_type, params))
+
+    def turn_factor(self, reference):
+        """條件類技能讓擊倒需要的回合數變成幾倍"""
+        factor = 1.0
+        for effect_type, params in self.gates:
+            if effect_type == "REQUIRE_COMBO":
+                factor *= max(1.0, params.get("required_combo", 10) / float(reference.combo))
+            elif effect_type == "REQUIRE_COMBO_MAX":
+                limit = params.get("max_combo", reference.combo)
+                if limit < reference.combo:
+                    factor *= slash_multiplier(reference.combo) / slash_multiplier(max(limit, 0))
+            elif effect_type == "REQUIRE_ENEMY_ATTACK":
+                factor *= self.attack_cd
+            elif effect_type == "DAMAGE_ONCE_ONLY":
+                factor *= reference.team_size
+            else:
+                factor *= GATE_FACTORS.get(effect_type, 1.0)
+        return factor
+
+
+# ========== 評分 ==========
+
+def stage_terms(waves, enemies, reference):
+    """每一波在 HP / ATK 倍率為 1 時的係數：[(回合數, 隨 HP×ATK 變化的承受傷害, 固定承受傷害)]
+
+    回合數與 HP 倍率成正比、敵人攻擊次數也與回合數成正比，因此調整倍率時只需重新組合係數。
+    參考隊伍打不動的敵人（減傷後傷害為 0）讓該波無法通過：回合數與承受傷害皆為 inf
+    """
+    terms = []
+    for wave in waves:
+        elapsed, scaled, fixed = 0.0, 0.0, 0.0
+        impossible = False
+        for entry in wave.get("enemies", []):
+            profile = enemies.get(entry.get("enemy_id", ""))
+            if profile is None:
+                continue
+            count = int(entry.get("count", 1) or 0)
+            fixed += count * (profile.death_damage + (reference.hp if profile.enter_hp_to_one else 0))
+            per_turn = max(reference.hit - profile.flat_reduction, 0.0) * reference.team_size
+            if per_turn <= 0:
+                # 先判斷再相除：否則 atk = 0 時 0 × inf 會變成 nan 並影響排序
+                impossible = impossible or count > 0
+                continue
+            kill_turns = profile.max_hp * profile.hp_factor * profile.turn_factor(reference) / per_turn
+            for _ in range(count):
+                elapsed += kill_turns
+                scaled += profile.atk * elapsed / profile.attack_cd
+        terms.append((math.inf, math.inf, fixed) if impossible else (elapsed, scaled, fixed))
+    return terms
+
+
+def raw_score(terms, reference_hp, hp_scale=1.0, atk_scale=1.0):
+    """原始分數與組成：(score, turns, incoming)；每一波至少算 1 回合"""
+    turns = sum(max(wave_turns * hp_scale, 1.0) for wave_turns, _, _ in terms)
+    incoming = sum(scaled * hp_scale * atk_scale + fixed for _, scaled, fixed in terms)
+    return turns * (1.0 + PRESSURE_WEIGHT * incoming / reference_hp), turns, incoming
+
+
+def stage_raw_score(waves, enemies, reference, hp_scale=1.0, atk_scale=1.0):
+    """單一關卡的原始分數：(score, turns, incoming)"""
+    return raw_score(stage_terms(waves, enemies, reference), reference.hp, hp_scale, atk_scale)
+
+
+def chapter_order(stages, regions_data):
+    """依 regions.json 的章節順序排列關卡：[(chapter_id, [stage_id])]，不存在的關卡會被略過"""
+    stage_ids = [stage.get("stage_id", "") for stage in stages]
+    known, assigned, chapters = set(stage_ids), set(), []
+    for region in (regions_data or {}).get("regions", []):
+        for chapter in region.get("chapters", []):
+            ids = [sid for sid in chapter.get("stages", []) if sid in known and sid not in assigned]
+            assigned.update(ids)
+            if ids:
+                chapters.append((chapter.get("chapter_id", ""), ids))
+    leftover = [sid for sid in stage_ids if sid not in assigned]
+    if leftover:
+        chapters.append((UNASSIGNED_CHAPTER, leftover))
+    return chapters
+
+
+def calibrate(raw_scores, authored):
+    """最小平方法求 k（authored ≈ k × raw），沒有可用資料時回傳 1.0"""
+    pairs = [(raw, target) for raw, target in zip(raw_scores, authored) if 0 < raw < math.inf and target]
+    denominator = sum(raw * raw for raw, _ in pairs)
+    return sum(raw * target for raw, target in pairs) / denominator if denominator else 1.0
+
+
+def target_curve(chapters, authored, curve="linear"):
+    """每個關卡的目標難度：{stage_id: target}"""
+    targets = {}
+    for _, ids in chapters:
+        if curve == "authored" or len(ids) == 1:
+            targets.update((sid, authored[sid]) for sid in ids)
+            continue
+        first, last = authored[ids[0]], authored[ids[-1]]
+        for index, sid in enumerate(ids):
+            targets[sid] = first + (last - first) * index / float(len(ids) - 1)
+    return targets
+
+
+def solve_scalers(evaluate, targets, tune="both"):
+    """同時對所有關卡做對數二分法：evaluate(index, hp_scale, atk_scale) -> 估算難度
+
+    回傳每個關卡的 (hp_scale, atk_scale, 是否命中)；目標超出 SCALE_RANGE 時停在邊界
+    """
+    count = len(targets)
+    low = [math.log(SCALE_RANGE[0])] * count
+    high = [math.log(SCALE_RANGE[1])] * count
+
+    def scales(index, log_scale):
+        scale = math.exp(log_scale)
+        return (scale if tune in ("both", "hp") else 1.0), (scale if tune in ("both", "atk") else 1.0)
+
+    for _ in range(SOLVER_ITERATIONS):
+        middle = [(lo + hi) / 2 for lo, hi in zip(low, high)]
+        values = [evaluate(i, *scales(i, middle[i])) for i in range(count)]
+        for i in range(count):
+            if values[i] < targets[i]:
+                low[i] = middle[i]
+            else:
+                high[i] = middle[i]
+    results = []
+    for i in range(count):
+        hp_scale, atk_scale = scales(i, (low[i] + high[i]) / 2)
+        value = evaluate(i, hp_scale, atk_scale)
+        reached = targets[i] <= 0 or abs(value - targets[i]) <= 0.01 * max(targets[i], 1.0)
+        results.append((hp_scale, atk_scale, reached))
+    return results
+
+
+def score_stages(stages_data, enemies_data, cards_data, regions_data=None, enemy_skills_data=None,
+                 curve="linear", tune="both"):
+    """估算所有關卡的難度並求出調整倍率
+
+    回傳 {"scale": k, "stages": [{stage_id, chapter_id, authored, score, turns, incoming,
+    reference_level, target, hp_scale, atk_scale, reached}], "warnings": [...]}
+    """
+    stages = (stages_data or {}).get("stages", [])
+    skills, _ = compile_skills({"enemy": enemy_skills_data or {}})
+    enemies, warnings = {}, []
+    for enemy in (enemies_data or {}).get("enemies", []):
+        profile = EnemyProfile(enemy, skills.get("enemy", {}))
+        enemies.setdefault(profile.enemy_id, profile)
+        if profile.ignored_skills:
+            warnings.append(f"{profile.enemy_id}: 非 JSON 技能未計入 ({', '.join(profile.ignored_skills)})")
+
+    by_id = {stage.get("stage_id", ""): stage for stage in stages}
+    for stage in stages:
+        for wave in stage.get("waves", []) or []:
+            for entry in wave.get("enemies", []):
+                if entry.get("enemy_id", "") not in enemies:
+                    warnings.append(f"{stage.get('stage_id')}: 敵人 {entry.get('enemy_id')} 不存在")
+    chapters = chapter_order(stages, regions_data)
+    ordered = [(chapter_id, sid) for chapter_id, ids in chapters for sid in ids]
+    curve_teams = reference_curve((cards_data or {}).get("cards", []), len(ordered))
+
+    terms = [stage_terms(by_id[sid].get("waves", []) or [], enemies, curve_teams[index])
+             for index, (_, sid) in enumerate(ordered)]
+
+    def raw(index, hp_scale=1.0, atk_scale=1.0):
+        return raw_score(terms[index], curve_teams[index].hp, hp_scale, atk_scale)
+
+    raws = [raw(i) for i in range(len(ordered))]
+    warnings.extend(f"{sid}: 參考隊伍對某些敵人造成的傷害為 0，關卡無法通過"
+                    for (_, sid), (score, _, _) in zip(ordered, raws) if score == math.inf)
+    authored = {sid: float(by_id[sid].get("difficulty", 0) or 0) for _, sid in ordered}
+    k = calibrate([r[0] for r in raws], [authored[sid] for _, sid in ordered])
+    targets = target_curve(chapters, authored, curve)
+    target_list = [targets[sid] for _, sid in ordered]
+    scalers = solve_scalers(lambda i, h, a: k * raw(i, h, a)[0], target_list, tune)
+
+    results = []
+    for index, (chapter_id, sid) in enumerate(ordered):
+        score, turns, incoming = raws[index]
+        hp_scale, atk_scale, reached = scalers[index]
+        results.append({"stage_id": sid, "chapter_id": chapter_id, "authored": authored[sid],
+                        "score": k * score, "turns": turns, "incoming": incoming,
+                        "reference_level": curve_teams[index].level, "target": target_list[index],
+                        "hp_scale": hp_scale, "atk_scale": atk_scale, "reached": reached})
+    return {"scale": k, "stages": results, "warnings": warnings}
+
+
+def load_data(data_dir):
+    """讀取評分需要的資料檔（不存在的檔案為 None）"""
+    paths = {
+        "stages": "stages.json",
+        "enemies": "enemies.json",
+        "cards": "cards.json",
+        "regions": os.path.join("config", "regions.json"),
+        "enemy_skills": os.path.join("config", "enemy_skills.json"),
+    }
+    data = {}
+    for key, rel_path in paths.items():
+        path = os.path.join(data_dir, rel_path)
+        data[key] = None
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                data[key] = json.load(f)
+    return data
+
+
+def format_report(result):
+    lines = [f"=== 關卡難度估算（k = {result['scale']:.4f}）==="]
+    lines.extend(f"⚠️ {warning}" for warning in result["warnings"])
+    chapter = None
+    for row in result["stages"]:
+        if row["chapter_id"] != chapter:
+            chapter = row["chapter_id"]
+            lines.append(f"[{chapter}]")
+        if row["reached"]:
+            proposal = f"✅ HP x{row['hp_scale']:.2f} ATK x{row['atk_scale']:.2f}"
+        else:
+            proposal = f"⚠️ 倍率在 {SCALE_RANGE[0]:g}~{SCALE_RANGE[1]:g} 內無法達到目標（每波至少 1 回合）"
+        lines.append(f"  {row['stage_id']:<12} 手動 {row['authored']:>5.1f}  估算 {row['score']:>6.2f}  "
+                     f"目標 {row['target']:>5.1f}  回合 {row['turns']:>6.2f}  承受 {row['incoming']:>8.0f}  "
+                     f"Lv{row['reference_level']:<3} {proposal}")
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description="依敵人數值估算關卡難度並建議 HP / ATK 倍率")
+    parser.add_argument("data_dir", help="data 資料夾路徑")
+    parser.add_argument("--curve", choices=["linear", "authored"], default="linear", help="每個章節的目標難度曲線")
+    parser.add_argument("--tune", choices=TUNE_MODES, default="both", help="要調整的數值")
+    parser.add_argument("--out", help="將建議倍率寫成 JSON")
+    args = parser.parse_args()
+
+    data = load_data(args.data_dir)
+    if data["stages"] is None or data["enemies"] is None:
+        print("❌ 找不到 stages.json 或 enemies.json")
+        return 1
+    result = score_stages(data["stages"], data["enemies"], data["cards"], data["regions"], data["enemy_skills"],
+                          args.curve, args.tune)
+    print("\n".join(format_report(result)))
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"✅ 已寫入 {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
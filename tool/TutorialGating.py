@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+新手教學限制檢查 (Tutorial Gating Checker)
+強制任務 (is_mandatory) 進行中時，TaskManager.is_action_allowed 會依目前步驟的 allowed_actions
+擋下玩家的操作。本工具逐一檢查每個強制任務步驟：完成條件需要的操作（前往場景、進入訓練室、
+開始訓練、選擇卡片...）在該步驟的 allowed_actions 下是否真的做得到。
+
+每個步驟檢查兩種起點：
+1. 步驟開始時玩家所在的場景（由上一個步驟的條件推得，例如上一步是進入 training_select）
+2. 重新啟動遊戲後的 main_menu（load_progress 會恢復步驟，但玩家回到主選單）
+只有起點 1 做得到時，玩家離開場景或重新啟動後就會卡關。
+
+UI 的限制點（與 MainMenu.gd / TrainingScene.gd 相同）：
+- 主選單按鈕：navigate_ui (training_area / evolution_area / inventory / team / shop / settings)
+- 區域按鈕：navigate_region (region1~5 / cloud / vortex)
+- 訓練：training_card_select、training_start；進入訓練室、領取訓練、對話選項、選卡不受限制
+
+用法：
+    python tool/TutorialGating.py data
+"""
+
+import argparse
+import json
+import os
+import sys
+
+from DialogGraph import dialog_events
+from QuestSimulator import SCENES, _condition_event_types, is_action_allowed, load_config, missing_conditions
+
+
+# 場景 -> 從主選單前往的路線（每條路線是需要通過的 is_action_allowed 檢查；任一條路線可行即可）
+REGION_ROUTES = [[("navigate_region", {"target": target})]
+                 for target in ["region1", "region2", "region3", "region4", "region5", "cloud", "vortex"]]
+SCENE_ROUTES = {
+    "main_menu": [[]],
+    "quest": [[]],
+    "training_select": [[("navigate_ui", {"target": "training_area"})]],
+    "training": [[("navigate_ui", {"target": "training_area"})]],
+    "evolution": [[("navigate_ui", {"target": "evolution_area"})]],
+    "inventory": [[("navigate_ui", {"target": "inventory"})]],
+    "team_list": [[("navigate_ui", {"target": "team"})]],
+    "shop": [[("navigate_ui", {"target": "shop"})]],
+    "gacha": [[("navigate_ui", {"target": "shop"})]],
+    "chapter_select": REGION_ROUTES,
+    "stage_select": REGION_ROUTES,
+    "battle": REGION_ROUTES,
+    "reward": REGION_ROUTES,
+}
+# 在這些場景時可以直接進入訓練室（不經過主選單）
+TRAINING_SCENES = {"training_select", "training"}
+# 遊戲中會以 navigate_ui 檢查的 target
+KNOWN_UI_TARGETS = {"training_area", "evolution_area", "inventory", "team", "shop", "settings"}
+TRAINING_GATES = [("training_card_select", {}), ("training_start", {})]
+
+
+def _gate_label(gate):
+    action_type, action_data = gate
+    return f"{action_type}({action_data['target']})" if action_data.get("target") else action_type
+
+
+def _blocked(step, gates):
+    """第一個被 allowed_actions 擋下的操作（全部允許時回傳 None）"""
+    for gate in gates:
+        if not is_action_allowed(step, *gate):
+            return gate
+    return None
+
+
+def _route(step, scene):
+    """從主選單前往 scene：(是否可行, 被擋下的操作說明)"""
+    blocked = []
+    for gates in SCENE_ROUTES.get(scene, []):
+        gate = _blocked(step, gates)
+        if gate is None:
+            return True, ""
+        blocked.append(_gate_label(gate))
+    return False, " / ".join(sorted(set(blocked)))
+
+
+def step_location(step):
+    """步驟完成時玩家所在的場景（無法確定時回傳 None）"""
+    condition = step.get("conditions", {}) or {}
+    condition_type = condition.get("type", "")
+    if condition_type == "scene_entered":
+        return condition.get("scene_name") or None
+    if condition_type in ("training_room_entered", "card_in_training", "card_level_up"):
+        return "training"
+    return None
+
+
+class Need:
+    """一個條件（或子條件）的可行性：now = 從步驟開始的場景，restart = 從主選單"""
+
+    def __init__(self, now, restart, reason="", warnings=()):
+        self.now = now
+        self.restart = restart
+        self.reason = reason
+        self.warnings = list(warnings)
+
+
+def _check_condition(condition, step, location, context):
+    condition_type = condition.get("type", "")
+    dialogs, rooms, emitted_anywhere = context
+
+    if condition_type in ("and", "or"):
+        subs = [_check_condition(sub, step, location, context) for sub in condition.get("sub_conditions", [])]
+        if not subs:
+            return Need(False, False, f"{condition_type} 沒有子條件")
+        pick = any if condition_type == "or" else all
+        now, restart = pick(s.now for s in subs), pick(s.restart for s in subs)
+        reasons = [s.reason for s in subs if s.reason and (not s.now or not s.restart)]
+        return Need(now, restart, "；".join(reasons), [w for s in subs for w in s.warnings])
+
+    if not _condition_event_types(condition):
+        return Need(False, False, f"TaskManager 不支援條件類型 {condition_type or '(空白)'}")
+
+    step_dialog = dialogs.get(step.get("dialog_id", ""))
+    if condition_type == "dialog_completed":
+        dialog_id = condition.get("dialog_id", "")
+        if step_dialog is not None and dialog_id in dialog_events(step_dialog):
+            return Need(True, True)  # 重新啟動時 process_current_step 會再次顯示對話
+        if dialog_id not in emitted_anywhere:
+            return Need(False, False, f"沒有任何對話會觸發 {dialog_id} 完成")
+        return Need(True, True, warnings=[f"此步驟不會顯示觸發 {dialog_id} 完成的對話（需依賴其他任務顯示）"])
+
+    if condition_type == "card_selected":
+        if step_dialog is not None and any(c.get("action") == "show_card_selection" for c in step_dialog.get("choices", [])):
+            return Need(True, True)
+        return Need(False, False, "選卡介面只能由對話的 show_card_selection 選項開啟，但此步驟的對話沒有此選項")
+
+    if condition_type == "scene_entered":
+        scene = condition.get("scene_name", "")
+        if scene not in SCENES:
+            return Need(False, False, f"場景 {scene} 不在 GameManager.SCENES 中")
+        ok, blocked = _route(step, scene)
+        now = ok or (scene == "training" and location in TRAINING_SCENES)
+        return Need(now, ok, "" if ok else f"前往 {scene} 需要 {blocked}")
+
+    # 需要在訓練區的條件
+    if condition_type == "training_room_entered":
+        room_id = condition.get("room_id", "")
+        if rooms is not None and room_id not in rooms:
+            return Need(False, False, f"訓練室 {room_id} 不存在")
+    ok, blocked = _route(step, "training_select")
+    reason = "" if ok else f"前往訓練區需要 {blocked}"
+    now = ok or location in TRAINING_SCENES
+    if condition_type in ("card_in_training", "card_level_up"):
+        gate = _blocked(step, TRAINING_GATES)
+        if gate is not None:
+            return Need(False, False, f"開始訓練需要 {_gate_label(gate)}")
+    return Need(now, ok, reason)
+
+
+def load_room_ids(data_dir):
+    """讀取 config/training_rooms.json 的訓練室 ID（檔案不存在時回傳 None，不檢查訓練室）"""
+    path = os.path.join(data_dir, "config", "training_rooms.json")
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return [room.get("room_id") for room in json.load(f).get("training_rooms", [])]
+
+
+def check_step(step, dialogs, rooms=None, location=None, emitted_anywhere=None):
+    """檢查單一強制任務步驟，回傳 [(severity, message)]，severity 為 "error" 或 "warning"
+
+    dialogs: {dialog_id: dialog}；location: 步驟開始時玩家所在的場景（None 表示未知）
+    """
+    if emitted_anywhere is None:
+        emitted_anywhere = {event for dialog in dialogs.values() for event in dialog_events(dialog)}
+    allowed = step.get("allowed_actions", {}) or {}
+    allowed_type = allowed.get("type", "all")
+    missing = missing_conditions(step)
+    if missing:
+        return [("error", f"無法完成（allowed_actions={allowed_type}）：{missing}")]
+    need = _check_condition(step["conditions"] or {}, step, location, (dialogs, rooms, emitted_anywhere))
+
+    issues = []
+    if not need.now:
+        issues.append(("error", f"無法完成（allowed_actions={allowed_type}）：{need.reason}"))
+    elif not need.restart:
+        issues.append(("error", f"離開 {location} 或重新啟動遊戲後會卡關（allowed_actions={allowed_type}）：{need.reason}"))
+    issues.extend(("warning", warning) for warning in need.warnings)
+    if allowed_type == "specific_ui":
+        unknown = [t for t in allowed.get("allowed_targets", []) if t not in KNOWN_UI_TARGETS]
+        if unknown:
+            issues.append(("warning", f"allowed_targets {', '.join(unknown)} 沒有任何 UI 會檢查（可用：{', '.join(sorted(KNOWN_UI_TARGETS))}）"))
+    elif allowed_type not in ("all", "dialog_only", "training_only"):
+        issues.append(("error", f"未知的 allowed_actions 類型 {allowed_type}，除了對話以外的操作都會被擋下"))
+    return issues
+
+
+def check_quest(quest, dialogs, rooms=None, emitted_anywhere=None):
+    """檢查一個任務的所有步驟（非強制任務不受 allowed_actions 限制，回傳空列表）
+
+    回傳 [(步驟索引, step_id, severity, message)]
+    """
+    if not quest.get("is_mandatory", False):
+        return []
+    if emitted_anywhere is None:
+        emitted_anywhere = {event for dialog in dialogs.values() for event in dialog_events(dialog)}
+    results, location = [], None
+    for index, step in enumerate(quest.get("steps", [])):
+        for severity, message in check_step(step, dialogs, rooms, location, emitted_anywhere):
+            results.append((index, step.get("step_id", f"#{index + 1}"), severity, message))
+        location = step_location(step)
+    return results
+
+
+def check_all(quests_data, dialogs_data, rooms=None):
+    """一次檢查所有強制任務：{quest_id: [(步驟索引, step_id, severity, message)]}（只包含有問題的任務）"""
+    dialogs = {}
+    for dialog in (dialogs_data or {}).get("dialogs", []):
+        dialogs.setdefault(dialog.get("dialog_id", ""), dialog)
+    emitted_anywhere = {event for dialog in dialogs.values() for event in dialog_events(dialog)}
+    results = {}
+    for quest in (quests_data or {}).get("quests", []):
+        issues = check_quest(quest, dialogs, rooms, emitted_anywhere)
+        if issues:
+            results[quest.get("quest_id", "")] = issues
+    return results
+
+
+def format_issues(quest_id, issues):
+    icons = {"error": "❌", "warning": "⚠️"}
+    return [f"{icons[severity]} {quest_id} {step_id}: {message}" for _, step_id, severity, message in issues]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="檢查強制任務步驟的 allowed_actions 是否會造成卡關")
+    parser.add_argument("data_dir", help="data 資料夾路徑")
+    args = parser.parse_args()
+
+    quests_data, dialogs_data, rooms = load_config(args.data_dir)
+    results = check_all(quests_data, dialogs_data, rooms)
+    mandatory = sum(1 for q in quests_data.get("quests", []) if q.get("is_mandatory", False))
+    errors = sum(1 for issues in results.values() for issue in issues if issue[2] == "error")
+    print(f"=== 新手教學限制檢查：{mandatory} 個強制任務 ===")
+    for quest_id, issues in results.items():
+        print("\n".join(format_issues(quest_id, issues)))
+    print("✅ 沒有發現卡關" if not errors else f"❌ 發現 {errors} 個卡關問題")
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())